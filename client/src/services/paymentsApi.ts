@@ -99,6 +99,14 @@ export interface PaymentSummary {
   completion_percentage: number;
 }
 
+// Cursor paginated list: pass next_cursor back as `cursor` for the next page
+export interface CursorPage<T> {
+  next: string | null;
+  next_cursor: string | null;
+  count?: number;
+  results: T[];
+}
+
 // Payment Methods API
 export const paymentMethodsApi = {
   // Get all payment methods for current user
@@ -221,10 +229,13 @@ export const paymentsApi = {
     }
   },
 
-  // Get payment summary
-  getPaymentSummary: async (): Promise<PaymentSummary[]> => {
+  // Get payment summary (one page of contracts, newest first)
+  getPaymentSummary: async (params?: {
+    cursor?: string;
+    page_size?: number;
+  }): Promise<CursorPage<PaymentSummary>> => {
     try {
-      const response = await apiClient.get('/payments/summary/');
+      const response = await apiClient.get('/payments/summary/', { params });
       return response.data;
     } catch (error: any) {
       const errorInfo = error.errorInfo || handleApiError(error);
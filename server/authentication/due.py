@@ -0,0 +1,20 @@
+"""Expired email verification tokens"""
+from django.conf import settings
+
+from common.scheduler import DueJob
+
+from .models import EmailVerificationToken
+
+
+def _delete_tokens(tokens):
+    EmailVerificationToken.objects.filter(pk__in=[token.pk for token in tokens]).delete()
+
+
+# Kept for a while after expiry so the verify link can still say "expired"
+email_token_expiry = DueJob(
+    name='email_token_expiry',
+    model=EmailVerificationToken,
+    due_field='expires_at',
+    handle=_delete_tokens,
+    grace=getattr(settings, 'EMAIL_VERIFICATION_TOKEN_RETENTION', 7 * 24 * 60 * 60),
+)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_emaildeliverylog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emailverificationtoken',
+            index=models.Index(fields=['expires_at'], name='email_verif_expires_770728_idx'),
+        ),
+    ]
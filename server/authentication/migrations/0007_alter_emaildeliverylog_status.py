@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0006_emailverificationtoken_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emaildeliverylog',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent Successfully'), ('failed', 'Failed to Send'), ('deferred', 'Deferred'), ('delivered', 'Delivered'), ('bounced', 'Bounced'), ('opened', 'Opened'), ('clicked', 'Clicked')], default='pending', help_text='Current delivery status', max_length=20),
+        ),
+    ]
@@ -401,6 +401,7 @@ class EmailVerificationToken(models.Model):
             models.Index(fields=['token']),
             models.Index(fields=['user']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['expires_at']),
         ]
     
     def __str__(self):
@@ -422,6 +423,7 @@ class EmailDeliveryLog(models.Model):
         ('pending', 'Pending'),
         ('sent', 'Sent Successfully'),
         ('failed', 'Failed to Send'),
+        ('deferred', 'Deferred'),
         ('delivered', 'Delivered'),
         ('bounced', 'Bounced'),
         ('opened', 'Opened'),
@@ -536,6 +538,13 @@ class EmailDeliveryLog(models.Model):
         self.attempts += 1
         self.save()
     
+    def mark_as_deferred(self, error_message):
+        """Mark email as queued for a later attempt (provider unavailable)"""
+        self.status = 'deferred'
+        self.error_message = error_message
+        self.attempts += 1
+        self.save()
+    
     def mark_as_delivered(self):
         """Mark email as delivered"""
         self.status = 'delivered'
@@ -6,11 +6,17 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail, Email, To, Content, CustomArg, MailSettings, SandBoxMode, Header, TrackingSettings, ClickTracking, OpenTracking, SubscriptionTracking, SpamCheck
+from common.resilience import ProviderUnavailable, provider_guard
 from .models import EmailDeliveryLog
 from .email_deliverability_config import EmailDeliverabilityConfig, SENDGRID_ENHANCED_CONFIG
 
 logger = logging.getLogger(__name__)
 
+
+class SendGridTransientError(Exception):
+    """SendGrid timed out, could not be reached or answered 429/5xx; worth retrying later"""
+
+
 class SendGridEmailService:
     """
     خدمة إرسال البريد الإلكتروني باستخدام SendGrid مع تتبع الحالة
@@ -25,12 +31,17 @@ class SendGridEmailService:
         
         if self.api_key:
             self.client = SendGridAPIClient(api_key=self.api_key)
+            # لا ننتظر مزوداً بطيئاً أكثر من اللازم
+            self.client.client.timeout = getattr(settings, 'SENDGRID_TIMEOUT', 10)
         else:
             logger.error("SendGrid API key not found in settings")
     
-    def send_verification_email(self, user, verification_token) -> Optional[EmailDeliveryLog]:
+    def send_verification_email(self, user, verification_token, email_log=None, deferrable=False) -> Optional[EmailDeliveryLog]:
         """
         إرسال بريد التحقق من البريد الإلكتروني
+        
+        email_log: سجل بريد مؤجل تتم إعادة محاولته بدلاً من إنشاء سجل جديد
+        deferrable: تأجيل الإرسال إلى مهمة خلفية إذا كان SendGrid غير متاح
         """
         print(f"DEBUG: Starting send_verification_email for user: {user.email if hasattr(user, 'email') else 'Unknown'}")
         
@@ -39,7 +50,7 @@ class SendGridEmailService:
             return None
         
         # إنشاء سجل تتبع البريد الإلكتروني
-        email_log = EmailDeliveryLog.objects.create(
+        email_log = email_log or EmailDeliveryLog.objects.create(
             user=user,
             email_type='verification',
             recipient_email=user.email,
@@ -217,7 +228,7 @@ class SendGridEmailService:
             # إرسال البريد الإلكتروني
             print(f"DEBUG: About to send email via SendGrid")
             try:
-                response = self.client.send(message)
+                response = self._send(message)
                 print(f"DEBUG: SendGrid response status: {response.status_code}")
             except Exception as e:
                 print(f"ERROR: Error during SendGrid send: {e}")
@@ -247,6 +258,8 @@ class SendGridEmailService:
                 logger.error(f"Failed to send verification email to {user.email}: {error_msg}")
                 return email_log
                 
+        except (ProviderUnavailable, SendGridTransientError) as e:
+            return self._unavailable(email_log, e, deferrable=deferrable)
         except Exception as e:
             # خطأ في الإرسال
             error_msg = str(e)
@@ -321,7 +334,7 @@ class SendGridEmailService:
             message.add_custom_arg(CustomArg('email_type', 'password_reset'))
             
             # إرسال البريد الإلكتروني
-            response = self.client.send(message)
+            response = self._send(message)
             
             if response.status_code in [200, 202]:
                 # تحديث حالة البريد الإلكتروني إلى مرسل
@@ -336,6 +349,8 @@ class SendGridEmailService:
                 logger.error(f"Failed to send password reset email to {user.email}: {error_msg}")
                 return email_log
                 
+        except (ProviderUnavailable, SendGridTransientError) as e:
+            return self._unavailable(email_log, e, deferrable=False)
         except Exception as e:
             # خطأ في الإرسال
             error_msg = str(e)
@@ -343,16 +358,18 @@ class SendGridEmailService:
             logger.error(f"Exception while sending password reset email to {user.email}: {error_msg}")
             return email_log
     
-    def send_welcome_email(self, user) -> Optional[EmailDeliveryLog]:
+    def send_welcome_email(self, user, email_log=None, deferrable=True) -> Optional[EmailDeliveryLog]:
         """
         إرسال بريد الترحيب للمستخدمين الجدد
+        
+        بريد غير عاجل: يؤجل افتراضياً إلى مهمة خلفية إذا كان SendGrid غير متاح
         """
         if not self.client:
             logger.error("SendGrid client not initialized")
             return None
         
         # إنشاء سجل تتبع البريد الإلكتروني
-        email_log = EmailDeliveryLog.objects.create(
+        email_log = email_log or EmailDeliveryLog.objects.create(
             user=user,
             email_type='welcome',
             recipient_email=user.email,
@@ -407,7 +424,7 @@ class SendGridEmailService:
             message.add_custom_arg(CustomArg('email_type', 'welcome'))
             
             # إرسال البريد الإلكتروني
-            response = self.client.send(message)
+            response = self._send(message)
             
             if response.status_code in [200, 202]:
                 # تحديث حالة البريد الإلكتروني إلى مرسل
@@ -422,6 +439,8 @@ class SendGridEmailService:
                 logger.error(f"Failed to send welcome email to {user.email}: {error_msg}")
                 return email_log
                 
+        except (ProviderUnavailable, SendGridTransientError) as e:
+            return self._unavailable(email_log, e, deferrable=deferrable)
         except Exception as e:
             # خطأ في الإرسال
             error_msg = str(e)
@@ -429,6 +448,47 @@ class SendGridEmailService:
             logger.error(f"Exception while sending welcome email to {user.email}: {error_msg}")
             return email_log
     
+    def _send(self, message):
+        """
+        إرسال الرسالة عبر حد التزامن وقاطع الدائرة الخاصين بـ SendGrid
+        
+        Timeouts, connection errors, 429 and 5xx count as provider failures
+        and are raised as SendGridTransientError; other 4xx mean SendGrid
+        answered but rejected this message.
+        """
+        with provider_guard('sendgrid').attempt() as call:
+            try:
+                response = self.client.send(message)
+            except Exception as e:
+                status_code = getattr(e, 'status_code', None)
+                if status_code is not None and status_code < 500 and status_code != 429:
+                    call.succeeded()
+                    raise
+                raise SendGridTransientError(str(e)) from e
+            if response.status_code >= 500 or response.status_code == 429:
+                raise SendGridTransientError(f"SendGrid returned status code: {response.status_code}")
+            return response
+    
+    def _unavailable(self, email_log, error, deferrable):
+        """
+        SendGrid رفض الطلب دون إرساله (الدائرة مفتوحة أو حد التزامن ممتلئ)
+        أو فشل فشلاً مؤقتاً (مهلة، خطأ اتصال، 429 أو 5xx)
+        البريد غير العاجل يؤجل إلى مهمة خلفية، والباقي يسجل كفاشل
+        """
+        max_attempts = getattr(settings, 'DEFERRED_EMAIL_MAX_ATTEMPTS', 5)
+        if not deferrable or email_log.attempts >= max_attempts:
+            email_log.mark_as_failed(str(error))
+            logger.error(f"{email_log.email_type} email to {email_log.recipient_email} not sent: {str(error)}")
+            return email_log
+        
+        from .tasks import send_deferred_email
+        
+        email_log.mark_as_deferred(str(error))
+        delay = min(provider_guard('sendgrid').reset_timeout * 2 ** (email_log.attempts - 1), 60 * 60)
+        send_deferred_email.apply_async((email_log.id,), countdown=delay)
+        logger.warning(f"{email_log.email_type} email to {email_log.recipient_email} deferred for {delay}s: {str(error)}")
+        return email_log
+    
     def _render_email_template(self, template_name: str, context: Dict[str, Any]) -> str:
         """
         تحويل قالب البريد الإلكتروني إلى نص
@@ -0,0 +1,50 @@
+from celery import shared_task
+from .models import EmailDeliveryLog, EmailVerificationToken
+from .sendgrid_service import sendgrid_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def send_deferred_email(email_log_id):
+    """
+    إعادة محاولة إرسال بريد غير عاجل تم تأجيله لأن SendGrid كان غير متاح
+    إذا بقي المزود غير متاح يعاد تأجيله بمهلة أطول حتى الحد الأقصى للمحاولات
+    """
+    try:
+        email_log = EmailDeliveryLog.objects.select_related('user').filter(
+            pk=email_log_id, status='deferred'
+        ).first()
+        if email_log is None:
+            return {'success': True, 'email_log_id': email_log_id, 'skipped': True}
+        
+        user = email_log.user
+        if email_log.email_type == 'verification':
+            verification_token = EmailVerificationToken.objects.filter(
+                user=user, is_used=False
+            ).order_by('-created_at').first()
+            if user.email_verified or verification_token is None or not verification_token.is_valid():
+                email_log.mark_as_failed('Verification no longer pending')
+                return {'success': True, 'email_log_id': email_log_id, 'skipped': True}
+            sendgrid_service.send_verification_email(
+                user, verification_token, email_log=email_log, deferrable=True
+            )
+        elif email_log.email_type == 'welcome':
+            sendgrid_service.send_welcome_email(user, email_log=email_log)
+        else:
+            email_log.mark_as_failed(f'{email_log.email_type} emails cannot be deferred')
+        
+        return {
+            'success': email_log.status == 'sent',
+            'email_log_id': email_log_id,
+            'status': email_log.status
+        }
+        
+    except Exception as e:
+        logger.error(f'Deferred email {email_log_id} failed: {str(e)}')
+        return {
+            'success': False,
+            'email_log_id': email_log_id,
+            'error': str(e)
+        }
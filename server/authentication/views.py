@@ -29,6 +29,7 @@ from .serializers import (
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from .sendgrid_service import sendgrid_service
+from common.pagination import KeysetPagination
 
 User = get_user_model()
 
@@ -65,7 +66,8 @@ class UserRegistrationView(generics.CreateAPIView):
             
             # Send verification email with welcome message
             try:
-                send_verification_email(user)
+                # Not worth holding the sign-up on: queued if SendGrid is down or busy
+                send_verification_email(user, deferrable=True)
                 print(f"📧 Verification email sent to {user.email}")
             except Exception as e:
                 print(f"❌ Failed to send verification email: {str(e)}")
@@ -838,17 +840,26 @@ def user_search(request):
 @extend_schema(
     operation_id="get_user_favorites",
     summary="Get User Favorites",
-    description="Get current user's favorite projects",
+    description="Get current user's favorite projects, one cursor page at a time",
     tags=["User Profile"],
-    responses={200: {"type": "array", "items": {"type": "object"}}}
+    responses={200: {
+        "type": "object",
+        "properties": {
+            "next": {"type": "string", "nullable": True},
+            "next_cursor": {"type": "string", "nullable": True},
+            "results": {"type": "array", "items": {"type": "object"}}
+        }
+    }}
 )
 def user_favorites(request):
     """Get user's favorite projects"""
     user = request.user
-    favorites = user.favorite_projects.all()
+    favorites = user.favorite_projects.select_related('project')
     
+    paginator = KeysetPagination()
     favorites_data = []
-    for project in favorites:
+    for favorite in paginator.paginate_queryset(favorites, request):
+        project = favorite.project
         favorites_data.append({
             'id': project.id,
             'title': project.title,
@@ -857,10 +868,11 @@ def user_favorites(request):
             'budget_max': project.budget_max,
             'location': project.location,
             'created_at': project.created_at,
-            'status': project.status
+            'status': project.status,
+            'favorited_at': favorite.created_at
         })
     
-    return Response(favorites_data)
+    return paginator.get_paginated_response(favorites_data)
 
 
 @api_view(['GET'])
@@ -1066,20 +1078,26 @@ class TokenRefreshView(APIView):
             )
 
 
-def send_verification_email(user):
+def send_verification_email(user, deferrable=False):
     """
     Send email verification link with welcome message to user using SendGrid
+    
+    With ``deferrable`` the email is queued for a background retry when
+    SendGrid is unavailable, and that counts as sent.
     """
     try:
         # Create verification token
         verification_token = EmailVerificationToken.objects.create(user=user)
         
         # Use SendGrid service to send verification email
-        email_log = sendgrid_service.send_verification_email(user, verification_token)
+        email_log = sendgrid_service.send_verification_email(user, verification_token, deferrable=deferrable)
         
         if email_log and email_log.status == 'sent':
             print(f"Verification email sent successfully to {user.email} via SendGrid")
             return True
+        elif email_log and email_log.status == 'deferred':
+            print(f"Verification email to {user.email} queued until SendGrid is available")
+            return True
         else:
             print(f"Failed to send verification email to {user.email} via SendGrid")
             return False
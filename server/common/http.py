@@ -0,0 +1,123 @@
+"""
+Outbound HTTP helpers for payment and email gateways.
+
+``pooled_session`` builds a ``requests.Session`` whose connections are kept
+alive and reused across calls, so only the first request from a process pays
+for the TCP and TLS handshake. Its adapter retries only failures where the
+request never reached the server (connection errors), which is safe for any
+call; callers retry idempotent calls on top of that with ``backoff_delays``.
+
+``CallMetrics`` keeps per-operation call counts, errors, retries and latency
+(average, max and percentiles over a bounded window of recent calls) for the
+current process.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def pooled_session(pool_size=10, connect_retries=2, backoff_factor=0.2, headers=None):
+    """Session with a keep-alive pool of ``pool_size`` connections per host"""
+    retry = Retry(
+        total=None,
+        connect=connect_retries,
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=backoff_factor,
+        allowed_methods=None,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def backoff_delays(retries, base=0.2, cap=2.0):
+    """Sleep durations before each retry: base, 2*base, 4*base, ... capped at ``cap``"""
+    return [min(base * (2 ** attempt), cap) for attempt in range(retries)]
+
+
+class CallMetrics:
+    """Thread-safe per-operation counters and latency samples"""
+
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self._window = window
+        self._reset()
+
+    def _reset(self):
+        self._stats = defaultdict(lambda: {'calls': 0, 'errors': 0, 'retries': 0, 'total': 0.0, 'max': 0.0})
+        self._samples = defaultdict(lambda: deque(maxlen=self._window))
+
+    def record(self, operation, seconds, ok=True, retries=0):
+        with self._lock:
+            stats = self._stats[operation]
+            stats['calls'] += 1
+            stats['errors'] += 0 if ok else 1
+            stats['retries'] += retries
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+            self._samples[operation].append(seconds)
+
+    def timer(self, operation):
+        return _Timer(self, operation)
+
+    def snapshot(self):
+        """{operation: counts and latency in milliseconds}"""
+        with self._lock:
+            result = {}
+            for operation, stats in self._stats.items():
+                samples = sorted(self._samples[operation])
+                result[operation] = {
+                    'calls': stats['calls'],
+                    'errors': stats['errors'],
+                    'retries': stats['retries'],
+                    'avg_ms': round(stats['total'] / stats['calls'] * 1000, 1) if stats['calls'] else 0,
+                    'max_ms': round(stats['max'] * 1000, 1),
+                    'p50_ms': _percentile_ms(samples, 0.5),
+                    'p95_ms': _percentile_ms(samples, 0.95),
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+
+def _percentile_ms(samples, fraction):
+    if not samples:
+        return 0
+    index = min(int(len(samples) * fraction), len(samples) - 1)
+    return round(samples[index] * 1000, 1)
+
+
+class _Timer:
+    """``with metrics.timer(op) as call:`` records the call when the block exits"""
+
+    def __init__(self, metrics, operation):
+        self.metrics = metrics
+        self.operation = operation
+        self.ok = True
+        self.retries = 0
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.metrics.record(
+            self.operation,
+            time.monotonic() - self.started,
+            ok=self.ok and exc_type is None,
+            retries=self.retries,
+        )
+        return False
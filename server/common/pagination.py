@@ -0,0 +1,174 @@
+"""
+Keyset (cursor) pagination shared by list endpoints.
+
+Pages are addressed by the (timestamp, id) pair of the last row already seen
+instead of an OFFSET, so every page is one indexed range scan no matter how
+deep the client goes. Results are always capped at ``max_page_size`` rows.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Cheap row count: the planner estimate on PostgreSQL, an exact count elsewhere
+    (development databases are small).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor paginator ordered by ``(timestamp_field, id)`` descending.
+
+    Views can override ``keyset_timestamp_field`` / ``keyset_include_count``;
+    clients pass ``?cursor=`` from the previous ``next_cursor`` and may ask for
+    ``?include_total=true`` to get an estimated ``count``. A cursor that does
+    not decode to a timestamp and a valid primary key is a 400.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    total_query_param = 'include_total'
+    timestamp_field = 'created_at'
+    include_count = False
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.timestamp_field = getattr(view, 'keyset_timestamp_field', self.timestamp_field)
+        self.page_size = self.get_page_size(request)
+        self.count = None
+        if getattr(view, 'keyset_include_count', self.include_count) or \
+                request.query_params.get(self.total_query_param, '').lower() == 'true':
+            self.count = estimate_count(queryset)
+
+        queryset = queryset.order_by(f'-{self.timestamp_field}', '-pk')
+        cursor = self.decode_cursor(request, queryset.model)
+        if cursor is not None:
+            timestamp, pk = cursor
+            queryset = queryset.filter(
+                Q(**{f'{self.timestamp_field}__lt': timestamp}) |
+                Q(**{self.timestamp_field: timestamp, 'pk__lt': pk})
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request, model=None):
+        """(timestamp, pk) from the cursor parameter, None without one"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            if not isinstance(payload, list) or len(payload) != 2 or \
+                    not all(isinstance(part, str) for part in payload):
+                raise ValueError('malformed cursor')
+            timestamp, pk = payload
+            parsed = parse_datetime(timestamp)
+            if model is not None:
+                pk = model._meta.pk.to_python(pk)
+        except (TypeError, ValueError, UnicodeDecodeError, DjangoValidationError):
+            raise self.invalid_cursor()
+        if parsed is None or pk is None:
+            raise self.invalid_cursor()
+        return parsed, pk
+
+    def invalid_cursor(self):
+        return ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+
+    def encode_cursor(self, instance):
+        timestamp = getattr(instance, self.timestamp_field)
+        payload = json.dumps([timestamp.isoformat(), str(instance.pk)])
+        return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii').rstrip('=')
+
+    def get_next_cursor(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_data(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'next_cursor': self.get_next_cursor(),
+            'results': data,
+        }
+        if self.count is not None:
+            payload['count'] = self.count
+        return payload
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'count': {'type': 'integer', 'description': 'Estimated total (only when requested)'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor returned as next_cursor by the previous page',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of results per page (max {self.max_page_size})',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.total_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Include an estimated total count',
+                'schema': {'type': 'boolean'},
+            },
+        ]
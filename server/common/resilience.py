@@ -0,0 +1,195 @@
+"""
+Circuit breaker and bulkhead for outbound provider calls.
+
+Every external provider (SendGrid, Authorize.Net, ...) gets one
+``ProviderGuard`` per process, configured from ``PROVIDER_GUARDS``:
+
+* bulkhead: at most ``max_concurrent`` calls to the provider are in flight at
+  once; further callers fail fast (after waiting ``acquire_timeout`` seconds)
+  instead of queueing request workers behind a slow provider;
+* circuit breaker: after ``failure_threshold`` consecutive failures the
+  circuit opens and calls fail fast for ``reset_timeout`` seconds; then a
+  single probe call is let through (half-open) and its outcome closes or
+  re-opens the circuit.
+
+Rejected calls raise ``ProviderUnavailable``. Callers decide what that means:
+a payment reports an error straight away, a non-critical email is deferred to
+a background retry.
+
+Usage::
+
+    with provider_guard('sendgrid').attempt() as call:
+        response = client.send(message)
+        if response.status_code >= 500:
+            call.failed()
+
+An exception escaping the block counts as a failure unless ``call.succeeded()``
+was called (e.g. the provider answered, but rejected a bad request).
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+DEFAULTS = {
+    'max_concurrent': 10,
+    'acquire_timeout': 0,
+    'failure_threshold': 5,
+    'reset_timeout': 30,
+}
+
+
+class ProviderUnavailable(Exception):
+    """A call was rejected without reaching the provider"""
+
+    def __init__(self, provider, reason):
+        self.provider = provider
+        self.reason = reason  # 'open' or 'saturated'
+        super().__init__(f'{provider} is unavailable ({reason})')
+
+
+class ProviderGuard:
+    """Bulkhead plus circuit breaker for one provider in this process"""
+
+    def __init__(self, name, max_concurrent=10, acquire_timeout=0, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.acquire_timeout = acquire_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._in_flight = 0
+        self._counts = dict.fromkeys(
+            ('calls', 'successes', 'failures', 'rejected_open', 'rejected_saturated', 'opened'), 0
+        )
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
+
+    def attempt(self):
+        return _Attempt(self)
+
+    def _enter(self):
+        with self._lock:
+            state = self._current_state()
+            if state == OPEN or (state == HALF_OPEN and self._probing):
+                self._counts['rejected_open'] += 1
+                raise ProviderUnavailable(self.name, 'open')
+            probe = state == HALF_OPEN
+            if probe:
+                self._probing = True
+
+        if self.acquire_timeout:
+            acquired = self._slots.acquire(timeout=self.acquire_timeout)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                if probe:
+                    self._probing = False
+                self._counts['rejected_saturated'] += 1
+            raise ProviderUnavailable(self.name, 'saturated')
+
+        with self._lock:
+            self._in_flight += 1
+            self._counts['calls'] += 1
+        return probe
+
+    def _exit(self, probe, ok):
+        self._slots.release()
+        with self._lock:
+            self._in_flight -= 1
+            if probe:
+                self._probing = False
+
+            if ok:
+                self._counts['successes'] += 1
+                self._failures = 0
+                if probe or self._state != CLOSED:
+                    self._state = CLOSED
+                    logger.info(f'{self.name} circuit closed')
+                return
+
+            self._counts['failures'] += 1
+            self._failures += 1
+            if probe or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._counts['opened'] += 1
+                logger.warning(
+                    f'{self.name} circuit opened after {self._failures} consecutive failures; '
+                    f'failing fast for {self.reset_timeout}s'
+                )
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'in_flight': self._in_flight,
+                'max_concurrent': self.max_concurrent,
+                'consecutive_failures': self._failures,
+                **self._counts,
+            }
+
+
+class _Attempt:
+    def __init__(self, guard):
+        self.guard = guard
+        self.ok = None
+
+    def failed(self):
+        self.ok = False
+
+    def succeeded(self):
+        self.ok = True
+
+    def __enter__(self):
+        self.probe = self.guard._enter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self.ok is None:
+            self.ok = exc_type is None
+        self.guard._exit(self.probe, self.ok)
+        return False
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def provider_guard(name):
+    """This process's guard for provider ``name``"""
+    guard = _guards.get(name)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.get(name)
+            if guard is None:
+                options = {**DEFAULTS, **getattr(settings, 'PROVIDER_GUARDS', {}).get(name, {})}
+                guard = _guards[name] = ProviderGuard(name, **options)
+    return guard
+
+
+def guard_metrics():
+    """{provider: state and counters} for every guard used in this process"""
+    return {name: guard.snapshot() for name, guard in list(_guards.items())}
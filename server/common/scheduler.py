@@ -0,0 +1,157 @@
+"""
+Due-time scheduler.
+
+Records that become actionable at a time stored in one of their columns
+(escrow auto-release, contract balance release, temporary file and share
+expiry, ...) are described by a ``DueJob``: the model, the indexed due-time
+column, the filters that keep only rows still waiting, and a handler.
+
+``run_job`` drains a job's due rows in small batches. Each batch is locked
+with ``SELECT ... FOR UPDATE SKIP LOCKED`` inside its own transaction, so any
+number of workers can run the same job at once and simply split the rows.
+Handlers must be idempotent: handling a row has to take it out of the job's
+filters (change its status, clear its due time, delete it), and a handler
+should re-check the row rather than trust that it is still due.
+
+Each run records its metrics in the cache (``job_metrics``): rows processed
+and failed, batches, run time and lag, i.e. how long past its due time the
+oldest waiting row was when the run started.
+"""
+import logging
+import time
+from datetime import timedelta
+from typing import Callable, NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# job name -> dotted path of its DueJob
+DUE_JOBS = {
+    'escrow_auto_release': 'payments.due.escrow_auto_release',
+    'contract_balance_release': 'contracts.due.contract_balance_release',
+    'temp_file_expiry': 'file_management.due.temp_file_expiry',
+    'file_share_expiry': 'file_management.due.file_share_expiry',
+    'location_permission_expiry': 'location_services.due.location_permission_expiry',
+    'email_token_expiry': 'authentication.due.email_token_expiry',
+}
+
+
+class DueJob(NamedTuple):
+    """
+    Rows of ``model`` whose ``due_field`` has passed (by at least ``grace``
+    seconds) and that still match ``filters``.
+
+    ``handle(rows)`` gets a locked batch and returns the primary keys it could
+    not process (or None); those are left for the next run.
+    """
+    name: str
+    model: object
+    due_field: str
+    handle: Callable
+    filters: Q = Q()
+    grace: int = 0
+
+
+def each_row(handle_row):
+    """Batch handler calling ``handle_row`` per row, each in its own savepoint"""
+    def handle(rows):
+        failed = []
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    handle_row(row)
+            except Exception as e:
+                logger.error(f'Due handler {handle_row.__name__} failed for {row.pk}: {str(e)}')
+                failed.append(row.pk)
+        return failed
+    handle.__name__ = handle_row.__name__
+    return handle
+
+
+def get_job(name):
+    return import_string(DUE_JOBS[name])
+
+
+def due_rows(job, now=None):
+    cutoff = (now or timezone.now()) - timedelta(seconds=job.grace)
+    return job.model._default_manager.filter(job.filters, **{f'{job.due_field}__lte': cutoff})
+
+
+def _lock_batch(rows, job, batch_size):
+    rows = rows.order_by(job.due_field, 'pk').select_for_update(skip_locked=True)
+    return list(rows[:batch_size])
+
+
+def _lag_seconds(job, rows, now):
+    oldest = rows.order_by(job.due_field).values_list(job.due_field, flat=True).first()
+    if oldest is None:
+        return 0
+    return max((now - timedelta(seconds=job.grace) - oldest).total_seconds(), 0)
+
+
+def run_job(job, now=None, batch_size=None, max_batches=None):
+    """Process ``job``'s due rows batch by batch; returns the run's metrics"""
+    if isinstance(job, str):
+        job = get_job(job)
+    batch_size = batch_size or getattr(settings, 'DUE_JOBS_BATCH_SIZE', 100)
+    max_batches = max_batches or getattr(settings, 'DUE_JOBS_MAX_BATCHES', 50)
+    now = now or timezone.now()
+    started = time.monotonic()
+
+    rows = due_rows(job, now)
+    metrics = {
+        'processed': 0,
+        'failed': 0,
+        'batches': 0,
+        'lag_seconds': _lag_seconds(job, rows, now),
+    }
+    failed_ids = set()
+
+    while metrics['batches'] < max_batches:
+        batch = []
+        try:
+            with transaction.atomic():
+                batch = _lock_batch(rows.exclude(pk__in=failed_ids), job, batch_size)
+                if not batch:
+                    break
+                failed = set(job.handle(batch) or ())
+        except Exception as e:
+            logger.error(f'Due job {job.name} batch failed: {str(e)}')
+            failed = {row.pk for row in batch}
+            if not failed:
+                break
+
+        metrics['batches'] += 1
+        metrics['processed'] += len(batch) - len(failed)
+        metrics['failed'] += len(failed)
+        failed_ids |= failed
+
+    metrics['duration_seconds'] = round(time.monotonic() - started, 3)
+    metrics['finished_at'] = timezone.now().isoformat()
+    _record_metrics(job, metrics)
+    return metrics
+
+
+def _record_metrics(job, metrics):
+    cache.set(f'due_jobs:metrics:{job.name}', metrics, timeout=None)
+
+    message = (
+        f"Due job {job.name}: {metrics['processed']} processed, {metrics['failed']} failed "
+        f"in {metrics['batches']} batches, lag {metrics['lag_seconds']:.0f}s"
+    )
+    if metrics['lag_seconds'] > getattr(settings, 'DUE_JOBS_LAG_WARNING', 60 * 60):
+        logger.warning(message)
+    else:
+        logger.info(message)
+
+
+def job_metrics():
+    """{job name: metrics of its last run, or None}"""
+    stored = cache.get_many([f'due_jobs:metrics:{name}' for name in DUE_JOBS])
+    return {name: stored.get(f'due_jobs:metrics:{name}') for name in DUE_JOBS}
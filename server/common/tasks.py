@@ -0,0 +1,33 @@
+from celery import shared_task
+from .scheduler import DUE_JOBS, run_job
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def run_due_jobs():
+    """
+    مهمة مجدولة توزع كل نوع من السجلات المستحقة على مهمة مستقلة
+    حتى تعالجها عدة عمليات في نفس الوقت
+    """
+    for name in DUE_JOBS:
+        run_due_job.delay(name)
+    return {'success': True, 'jobs': list(DUE_JOBS)}
+
+
+@shared_task
+def run_due_job(name):
+    """
+    معالجة السجلات التي حان موعدها لنوع واحد على دفعات صغيرة
+    """
+    try:
+        metrics = run_job(name)
+        return {'success': True, 'job': name, **metrics}
+    except Exception as e:
+        logger.error(f'Due job {name} failed: {str(e)}')
+        return {
+            'success': False,
+            'job': name,
+            'error': str(e)
+        }
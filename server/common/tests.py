@@ -0,0 +1,234 @@
+import base64
+import io
+import json
+import time
+import zipfile
+from datetime import timedelta
+
+from django.test import SimpleTestCase, TestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from location_services.due import location_permission_expiry
+from location_services.models import LocationPermission
+from projects.models import Project
+from .exports import stream_csv, stream_xlsx
+from .pagination import KeysetPagination
+from .resilience import ProviderGuard, ProviderUnavailable
+from .scheduler import each_row, job_metrics, run_job
+
+User = get_user_model()
+
+
+class KeysetPaginationTest(TestCase):
+    """Test cursor pagination over (created_at, id)"""
+    
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.projects = [
+            Project.objects.create(
+                title=f'Project {i}',
+                description='Test project',
+                client=client_user,
+                location='Austin, TX'
+            )
+            for i in range(5)
+        ]
+    
+    def get_page(self, params):
+        paginator = KeysetPagination()
+        request = Request(self.factory.get('/projects/', params))
+        page = paginator.paginate_queryset(Project.objects.all(), request)
+        return paginator, page
+    
+    def test_walks_every_row_once(self):
+        """Following next_cursor returns each row exactly once, newest first"""
+        seen = []
+        params = {'page_size': 2}
+        while True:
+            paginator, page = self.get_page(params)
+            seen.extend(page)
+            cursor = paginator.get_next_cursor()
+            if cursor is None:
+                break
+            params = {'page_size': 2, 'cursor': cursor}
+        
+        expected = sorted(self.projects, key=lambda p: (p.created_at, p.pk), reverse=True)
+        self.assertEqual(seen, expected)
+    
+    def test_page_size_is_capped_and_total_optional(self):
+        """page_size can't exceed the maximum and count is only added on request"""
+        paginator, page = self.get_page({'page_size': 10000})
+        self.assertEqual(paginator.page_size, KeysetPagination.max_page_size)
+        self.assertNotIn('count', paginator.get_paginated_data([]))
+        
+        paginator, page = self.get_page({'include_total': 'true'})
+        self.assertEqual(paginator.get_paginated_data([])['count'], 5)
+    
+    def test_invalid_cursor(self):
+        """Undecodable cursors and well-formed ones with a bad pk are both a 400"""
+        bad_pk = base64.urlsafe_b64encode(
+            json.dumps([self.projects[0].created_at.isoformat(), 'abc']).encode('ascii')
+        ).decode('ascii')
+        for cursor in ('not-a-cursor', bad_pk):
+            with self.assertRaises(ValidationError):
+                self.get_page({'cursor': cursor})
+
+
+class StreamingExportTest(SimpleTestCase):
+    """Export writers stream valid files chunk by chunk"""
+    
+    def rows(self, count):
+        for i in range(count):
+            yield [i, f'Payment <{i}> & co', 12.5, None]
+    
+    def test_csv_chunks(self):
+        chunks = list(stream_csv(['id', 'name', 'amount', 'note'], self.rows(1200)))
+        self.assertGreater(len(chunks), 1)
+        lines = ''.join(chunks).splitlines()
+        self.assertEqual(len(lines), 1201)
+        self.assertEqual(lines[1], '0,Payment <0> & co,12.5,')
+    
+    def test_xlsx_is_a_valid_workbook(self):
+        chunks = list(stream_xlsx(['id', 'name', 'amount', 'note'], self.rows(1200), sheet_name='Payments'))
+        self.assertGreater(len(chunks), 2)
+        
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        self.assertIsNone(archive.testzip())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('<row r="1201">', sheet)
+        self.assertIn('Payment &lt;5&gt; &amp; co', sheet)
+
+
+class DueJobSchedulerTest(TestCase):
+    """Due rows are processed in batches, once, with failures left for later"""
+    
+    def setUp(self):
+        owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        viewers = [
+            User.objects.create_user(
+                username=f'viewer{i}',
+                email=f'viewer{i}@example.com',
+                password='testpass123',
+                user_type='home_pro'
+            )
+            for i in range(4)
+        ]
+        now = timezone.now()
+        expiries = [now - timedelta(hours=2), now - timedelta(minutes=5), now - timedelta(minutes=1), now + timedelta(days=1)]
+        self.permissions = [
+            LocationPermission.objects.create(
+                user=owner,
+                granted_to=viewer,
+                permission_type='view_location',
+                expires_at=expires_at
+            )
+            for viewer, expires_at in zip(viewers, expiries)
+        ]
+    
+    def test_expired_permissions_are_deactivated_once(self):
+        metrics = run_job(location_permission_expiry, batch_size=2)
+        self.assertEqual(metrics['processed'], 3)
+        self.assertEqual(metrics['batches'], 2)
+        self.assertGreaterEqual(metrics['lag_seconds'], 2 * 60 * 60 - 60)
+        self.assertEqual(
+            list(LocationPermission.objects.filter(is_active=True)),
+            [self.permissions[3]]
+        )
+        self.assertEqual(job_metrics()['location_permission_expiry']['processed'], 3)
+        
+        # Handled rows no longer match the job
+        self.assertEqual(run_job(location_permission_expiry)['processed'], 0)
+    
+    def test_failed_rows_are_skipped_for_the_run(self):
+        failing_pk = self.permissions[1].pk
+        
+        @each_row
+        def deactivate(permission):
+            if permission.pk == failing_pk:
+                raise ValueError('boom')
+            LocationPermission.objects.filter(pk=permission.pk).update(is_active=False)
+        
+        job = location_permission_expiry._replace(handle=deactivate)
+        metrics = run_job(job, batch_size=1)
+        self.assertEqual((metrics['processed'], metrics['failed']), (2, 1))
+        self.assertTrue(LocationPermission.objects.get(pk=failing_pk).is_active)
+        self.assertEqual(LocationPermission.objects.filter(is_active=True).count(), 2)
+
+
+class ProviderGuardTest(SimpleTestCase):
+    """Circuit breaker and bulkhead around provider calls"""
+    
+    def failing_call(self, guard):
+        with self.assertRaises(ConnectionError):
+            with guard.attempt():
+                raise ConnectionError('provider down')
+    
+    def test_opens_after_consecutive_failures_and_probes_once(self):
+        guard = ProviderGuard('test', failure_threshold=2, reset_timeout=0.05)
+        self.failing_call(guard)
+        with guard.attempt():
+            pass  # a success resets the count
+        self.failing_call(guard)
+        self.assertEqual(guard.state, 'closed')
+        self.failing_call(guard)
+        self.assertEqual(guard.state, 'open')
+        
+        with self.assertRaises(ProviderUnavailable) as rejected:
+            with guard.attempt():
+                pass
+        self.assertEqual(rejected.exception.reason, 'open')
+        
+        time.sleep(0.06)
+        self.assertEqual(guard.state, 'half_open')
+        with guard.attempt():
+            # only one probe at a time
+            with self.assertRaises(ProviderUnavailable):
+                with guard.attempt():
+                    pass
+        self.assertEqual(guard.state, 'closed')
+        
+        snapshot = guard.snapshot()
+        self.assertEqual((snapshot['opened'], snapshot['rejected_open'], snapshot['failures']), (1, 2, 3))
+    
+    def test_failed_probe_reopens(self):
+        guard = ProviderGuard('test', failure_threshold=1, reset_timeout=0.05)
+        self.failing_call(guard)
+        time.sleep(0.06)
+        self.failing_call(guard)
+        self.assertEqual(guard.state, 'open')
+    
+    def test_bulkhead_rejects_when_saturated(self):
+        guard = ProviderGuard('test', max_concurrent=1)
+        with guard.attempt():
+            with self.assertRaises(ProviderUnavailable) as rejected:
+                with guard.attempt():
+                    pass
+            self.assertEqual(rejected.exception.reason, 'saturated')
+        with guard.attempt() as call:
+            call.succeeded()
+        self.assertEqual(guard.snapshot()['in_flight'], 0)
+    
+    def test_answered_errors_do_not_count(self):
+        guard = ProviderGuard('test', failure_threshold=1)
+        with self.assertRaises(ValueError):
+            with guard.attempt() as call:
+                call.succeeded()
+                raise ValueError('bad request')
+        self.assertEqual(guard.state, 'closed')
+        with guard.attempt() as call:
+            call.failed()
+        self.assertEqual(guard.state, 'open')
@@ -19,7 +19,7 @@ class ContractAdmin(admin.ModelAdmin):
     search_fields = ['contract_number', 'title', 'client__username', 'professional__username']
     readonly_fields = [
         'contract_number', 'created_at', 'updated_at', 'remaining_amount',
-        'available_contract_balance', 'is_professional_balance_available',
+        'available_contract_balance', 'pending_payments_total', 'is_professional_balance_available',
         'platform_commission_amount', 'net_amount_to_professional'
     ]
     autocomplete_fields = ['client', 'professional', 'project']
@@ -34,7 +34,8 @@ class ContractAdmin(admin.ModelAdmin):
         ('التفاصيل المالية', {
             'fields': (
                 'total_amount', 'contract_balance', 'professional_balance', 'paid_amount', 
-                'remaining_amount', 'available_contract_balance', 'payment_type', 'hourly_rate'
+                'remaining_amount', 'pending_payments_total', 'available_contract_balance',
+                'payment_type', 'hourly_rate'
             )
         }),
         ('العمولة والمبالغ الصافية', {
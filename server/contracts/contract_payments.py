@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from django.utils import timezone
@@ -22,6 +23,9 @@ class ContractPayment(models.Model):
         ('disputed', 'Disputed'),
     ]
     
+    # Statuses whose amount is held against Contract.pending_payments_total
+    RESERVED_STATUSES = ('pending', 'approved')
+    
     # Basic Info
     payment_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     contract = models.ForeignKey(
@@ -118,13 +122,52 @@ class ContractPayment(models.Model):
     def __str__(self):
         return f"Payment {self.payment_id} - {self.contract.contract_number} - ${self.amount}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_reserved_amount = instance._reserved_amount()
+        return instance
+    
+    def _reserved_amount(self):
+        if self.status in self.RESERVED_STATUSES and self.amount:
+            return self.amount
+        return Decimal('0')
+    
+    def _adjust_contract_total(self, delta):
+        """Move the contract's pending total by ``delta`` without a read-modify-write"""
+        if not delta:
+            return
+        from .models import Contract
+        
+        Contract.objects.filter(pk=self.contract_id).update(
+            pending_payments_total=F('pending_payments_total') + delta
+        )
+        if self.__class__.contract.is_cached(self):
+            self.contract.refresh_from_db(fields=['pending_payments_total'])
+    
     def save(self, *args, **kwargs):
         # Calculate commission and net amount
         if self.amount:
             commission_rate = Decimal(str(self.platform_commission_rate))
             self.platform_commission_amount = self.amount * commission_rate
             self.net_amount_to_professional = self.amount - self.platform_commission_amount
-        super().save(*args, **kwargs)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'status', 'amount'} & set(update_fields):
+            return super().save(*args, **kwargs)
+        
+        reserved = self._reserved_amount()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._adjust_contract_total(reserved - getattr(self, '_saved_reserved_amount', Decimal('0')))
+        self._saved_reserved_amount = reserved
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            self._adjust_contract_total(-getattr(self, '_saved_reserved_amount', Decimal('0')))
+            result = super().delete(*args, **kwargs)
+        self._saved_reserved_amount = Decimal('0')
+        return result
     
     @property
     def is_available_to_professional(self):
@@ -178,50 +221,45 @@ class ContractPayment(models.Model):
     
     def _process_payment_transfer(self):
         """Internal method to process the actual payment transfer"""
-        from payments.models import Wallet, WalletTransaction
+        from payments import ledger
         
+        contract = self.contract
         try:
-            # Deduct from contract balance
-            self.contract.contract_balance -= self.amount
-            self.contract.paid_amount += self.amount
-            self.contract.save()
-            
-            # Deduct from client's pending balance
-            client_wallet, created = Wallet.objects.get_or_create(user=self.contract.client)
-            if client_wallet.pending_balance >= self.amount:
-                client_wallet.pending_balance -= self.amount
-                client_wallet.save()
-                
-                # Create client transaction record
-                WalletTransaction.objects.create(
-                    wallet=client_wallet,
-                    amount=-self.amount,
-                    transaction_type='debit',
-                    source='contract_payment',
-                    description=f'Payment to {self.contract.professional.get_full_name()} for contract {self.contract.contract_number}'
+            with transaction.atomic():
+                # Contract row first, then both wallets in id order (payments.ledger)
+                contract._locked_copy()
+                contract._update_balances(
+                    contract_balance=F('contract_balance') - self.amount,
+                    paid_amount=F('paid_amount') + self.amount,
                 )
-            else:
-                raise ValueError("Insufficient client pending balance")
-            
-            # Add to professional's pending balance (with 3-day hold)
-            professional_wallet, created = Wallet.objects.get_or_create(user=self.contract.professional)
-            professional_wallet.pending_balance += self.net_amount_to_professional
-            professional_wallet.save()
-            
-            # Create professional transaction record
-            WalletTransaction.objects.create(
-                wallet=professional_wallet,
-                amount=self.net_amount_to_professional,
-                transaction_type='credit',
-                source='contract_payment',
-                description=f'Payment from {self.contract.client.get_full_name()} for contract {self.contract.contract_number} (3-day hold)'
-            )
-            
-            # Update payment status and timing
-            self.status = 'transferred'
-            self.transferred_at = timezone.now()
-            self.available_at = timezone.now() + timezone.timedelta(days=3)
-            self.save()
+                
+                # Client's pending balance pays; professional's pending balance
+                # holds the net amount for 3 days
+                try:
+                    ledger.post([
+                        ledger.debit(
+                            contract.client_id,
+                            self.amount,
+                            'contract_payment',
+                            f'Payment to {contract.professional.get_full_name()} for contract {contract.contract_number}',
+                            pending=True
+                        ),
+                        ledger.credit(
+                            contract.professional_id,
+                            self.net_amount_to_professional,
+                            'contract_payment',
+                            f'Payment from {contract.client.get_full_name()} for contract {contract.contract_number} (3-day hold)',
+                            pending=True
+                        ),
+                    ])
+                except ledger.InsufficientFunds:
+                    raise ValueError("Insufficient client pending balance")
+                
+                # Update payment status and timing
+                self.status = 'transferred'
+                self.transferred_at = timezone.now()
+                self.available_at = timezone.now() + timezone.timedelta(days=3)
+                self.save()
             
             return {
                 'success': True,
@@ -233,8 +271,11 @@ class ContractPayment(models.Model):
             }
             
         except Exception as e:
-            # Rollback any changes if something goes wrong
-            self.status = 'approved'  # Keep as approved for retry
+            # Nothing above was committed; keep the payment approved for retry
+            contract.refresh_from_db()
+            self.status = 'approved'
+            self.transferred_at = None
+            self.available_at = None
             self.save()
             raise e
     
@@ -258,54 +299,46 @@ class ContractPayment(models.Model):
     
     def _refund_payment(self, reason=''):
         """Refund a transferred payment"""
-        from payments.models import Wallet, WalletTransaction
+        from payments import ledger
         
-        try:
-            # Add back to contract balance
-            self.contract.contract_balance += self.amount
-            self.contract.paid_amount -= self.amount
-            self.contract.save()
-            
-            # Add back to client's pending balance
-            client_wallet = Wallet.objects.get(user=self.contract.client)
-            client_wallet.pending_balance += self.amount
-            client_wallet.save()
+        contract = self.contract
+        with transaction.atomic():
+            contract._locked_copy()
             
-            # Create client refund transaction
-            WalletTransaction.objects.create(
-                wallet=client_wallet,
-                amount=self.amount,
-                transaction_type='credit',
-                source='payment_refund',
-                description=f'Refund for cancelled payment to {self.contract.professional.get_full_name()}'
+            # Add back to contract balance
+            contract._update_balances(
+                contract_balance=F('contract_balance') + self.amount,
+                paid_amount=F('paid_amount') - self.amount,
             )
             
-            # Deduct from professional's pending balance
-            professional_wallet = Wallet.objects.get(user=self.contract.professional)
+            # Client's pending balance is restored; the professional's share is
+            # taken back only if it is still held
+            entries = [ledger.credit(
+                contract.client_id,
+                self.amount,
+                'payment_refund',
+                f'Refund for cancelled payment to {contract.professional.get_full_name()}',
+                pending=True
+            )]
+            professional_wallet = ledger.lock_wallets([contract.professional_id])[contract.professional_id]
             if professional_wallet.pending_balance >= self.net_amount_to_professional:
-                professional_wallet.pending_balance -= self.net_amount_to_professional
-                professional_wallet.save()
-                
-                # Create professional refund transaction
-                WalletTransaction.objects.create(
-                    wallet=professional_wallet,
-                    amount=-self.net_amount_to_professional,
-                    transaction_type='debit',
-                    source='payment_refund',
-                    description=f'Refund of cancelled payment from {self.contract.client.get_full_name()}'
-                )
+                entries.append(ledger.debit(
+                    contract.professional_id,
+                    self.net_amount_to_professional,
+                    'payment_refund',
+                    f'Refund of cancelled payment from {contract.client.get_full_name()}',
+                    pending=True
+                ))
+            ledger.post(entries)
             
             self.status = 'cancelled'
             self.client_notes = reason
             self.save()
-            
-            return {
-                'success': True,
-                'message': 'Payment refunded successfully'
-            }
-            
-        except Exception as e:
-            raise e
+        
+        return {
+            'success': True,
+            'message': 'Payment refunded successfully'
+        }
     
     def complete_payment(self):
         """Complete payment by moving funds from pending to available (after 3-day hold)"""
@@ -315,34 +348,30 @@ class ContractPayment(models.Model):
         if not self.is_available_to_professional:
             raise ValueError("Payment is not yet available (3-day hold period)")
         
-        from payments.models import Wallet, WalletTransaction
+        from payments import ledger
         
-        # Move from professional's pending to available balance
-        professional_wallet = Wallet.objects.get(user=self.contract.professional)
+        net_amount = self.net_amount_to_professional
+        try:
+            with transaction.atomic():
+                # Move from professional's pending to available balance
+                ledger.post([ledger.Entry(
+                    self.contract.professional_id,
+                    available=net_amount,
+                    pending=-net_amount,
+                    earned=net_amount,
+                    amount=net_amount,
+                    source='balance_release',
+                    description=f'Payment available from contract {self.contract.contract_number}'
+                )])
+                
+                self.status = 'completed'
+                self.completed_at = timezone.now()
+                self.save()
+        except ledger.InsufficientFunds:
+            raise ValueError("Insufficient pending balance for completion")
         
-        if professional_wallet.pending_balance >= self.net_amount_to_professional:
-            professional_wallet.pending_balance -= self.net_amount_to_professional
-            professional_wallet.available_balance += self.net_amount_to_professional
-            professional_wallet.total_earned += self.net_amount_to_professional
-            professional_wallet.save()
-            
-            # Create transaction record
-            WalletTransaction.objects.create(
-                wallet=professional_wallet,
-                amount=self.net_amount_to_professional,
-                transaction_type='credit',
-                source='balance_release',
-                description=f'Payment available from contract {self.contract.contract_number}'
-            )
-            
-            self.status = 'completed'
-            self.completed_at = timezone.now()
-            self.save()
-            
-            return {
-                'success': True,
-                'message': 'Payment completed successfully',
-                'amount': self.net_amount_to_professional
-            }
-        else:
-            raise ValueError("Insufficient pending balance for completion")
\ No newline at end of file
+        return {
+            'success': True,
+            'message': 'Payment completed successfully',
+            'amount': net_amount
+        }
\ No newline at end of file
@@ -0,0 +1,23 @@
+"""Professional balances moved to the wallet once their hold ends"""
+from django.db.models import Q
+
+from common.scheduler import DueJob, each_row
+
+from .models import Contract
+
+
+@each_row
+def _release_balance(contract):
+    result = contract.release_professional_balance()
+    if not result['success']:
+        # Nothing left to release; clear the date so the row stops coming due
+        contract._update_balances(professional_balance_release_date=None)
+
+
+contract_balance_release = DueJob(
+    name='contract_balance_release',
+    model=Contract,
+    due_field='professional_balance_release_date',
+    handle=_release_balance,
+    filters=Q(professional_balance_release_date__isnull=False),
+)
@@ -0,0 +1,57 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from contracts.models import Contract
+from contracts.contract_payments import ContractPayment
+
+
+def reserved_total_subquery():
+    return Coalesce(
+        Subquery(
+            ContractPayment.objects.filter(
+                contract=OuterRef('pk'),
+                status__in=ContractPayment.RESERVED_STATUSES
+            ).order_by().values('contract').annotate(total=Sum('amount')).values('total')[:1]
+        ),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+
+
+class Command(BaseCommand):
+    help = 'Verify Contract.pending_payments_total against the pending/approved contract payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rewrite totals that have drifted',
+        )
+
+    def handle(self, *args, **options):
+        mismatched = (
+            Contract.objects.annotate(actual_total=reserved_total_subquery())
+            .exclude(pending_payments_total=F('actual_total'))
+            .values_list('pk', 'contract_number', 'pending_payments_total', 'actual_total')
+        )
+
+        drifted = 0
+        for pk, number, stored, actual in mismatched.iterator(chunk_size=1000):
+            drifted += 1
+            self.stdout.write(f'{number}: stored {stored}, actual {actual}')
+            if options['fix']:
+                with transaction.atomic():
+                    # Row lock blocks concurrent F() updates while the total is recomputed
+                    contract = Contract.objects.select_for_update().annotate(
+                        actual_total=reserved_total_subquery()
+                    ).get(pk=pk)
+                    Contract.objects.filter(pk=pk).update(pending_payments_total=contract.actual_total)
+
+        if drifted and not options['fix']:
+            self.stdout.write(self.style.WARNING(f'{drifted} contracts out of sync (run with --fix)'))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'Pending payment totals reconciled ({drifted} fixed)')
+            )
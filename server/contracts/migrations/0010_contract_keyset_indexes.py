@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0009_contractpayment'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['client', 'created_at'], name='contracts_client__73eaf9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['professional', 'created_at'], name='contracts_profess_2339c0_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+
+def backfill_pending_payments_total(apps, schema_editor):
+    Contract = apps.get_model('contracts', 'Contract')
+    ContractPayment = apps.get_model('contracts', 'ContractPayment')
+    totals = (
+        ContractPayment.objects.filter(status__in=['pending', 'approved'])
+        .order_by()
+        .values('contract_id')
+        .annotate(total=models.Sum('amount'))
+    )
+    for row in totals.iterator():
+        Contract.objects.filter(pk=row['contract_id']).update(pending_payments_total=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0010_contract_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='pending_payments_total',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Contract payments awaiting approval or transfer', max_digits=10),
+        ),
+        migrations.RunPython(backfill_pending_payments_total, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0011_contract_pending_payments_total'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['professional_balance_release_date'], name='contracts_profess_dd3d58_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
@@ -76,6 +77,15 @@ class Contract(models.Model):
         help_text="Funds allocated from client's wallet to this contract"
     )
     
+    # Pending/approved contract payments not yet transferred, kept current by
+    # ContractPayment.save() with F() updates (see reconcile_contract_payments)
+    pending_payments_total = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        help_text="Contract payments awaiting approval or transfer"
+    )
+    
     # Professional balance - funds transferred to professional after project completion
     professional_balance = models.DecimalField(
         max_digits=10,
@@ -156,14 +166,39 @@ class Contract(models.Model):
             models.Index(fields=['professional']),
             models.Index(fields=['start_date']),
             models.Index(fields=['end_date']),
+            models.Index(fields=['client', 'created_at']),
+            models.Index(fields=['professional', 'created_at']),
+            models.Index(fields=['professional_balance_release_date']),
         ]
     
     def __str__(self):
         return f"{self.contract_number} - {self.title}"
     
+    @classmethod
+    def for_participant(cls, user):
+        """
+        Contracts where ``user`` is the client or the professional.
+        
+        Written as a UNION of two single-column lookups so each side is an
+        index scan, instead of an OR that has to consider both columns.
+        """
+        contract_ids = cls.objects.filter(client=user).order_by().values('pk').union(
+            cls.objects.filter(professional=user).order_by().values('pk')
+        )
+        return cls.objects.filter(pk__in=contract_ids)
+    
     def save(self, *args, **kwargs):
         if not self.contract_number:
             self.contract_number = f"CON-{timezone.now().year}-{str(uuid.uuid4())[:8].upper()}"
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # pending_payments_total is only ever moved with F() by ContractPayment;
+            # writing back this instance's copy could undo a concurrent change
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred
+                and field.name != 'pending_payments_total'
+            ]
         super().save(*args, **kwargs)
     
     @property
@@ -178,15 +213,7 @@ class Contract(models.Model):
         """Available balance for payments from contract funds"""
         if self.contract_balance is None:
             return 0
-        
-        # Calculate pending/approved payments that haven't been transferred yet
-        from .contract_payments import ContractPayment
-        pending_payments = ContractPayment.objects.filter(
-            contract=self,
-            status__in=['pending', 'approved']
-        ).aggregate(total=models.Sum('amount'))['total'] or 0
-        
-        return self.contract_balance - pending_payments
+        return self.contract_balance - (self.pending_payments_total or 0)
     
     @property
     def is_professional_balance_available(self):
@@ -224,67 +251,79 @@ class Contract(models.Model):
             return self.available_contract_balance > 0
         return self.available_contract_balance >= amount
     
+    def _locked_copy(self):
+        """
+        This contract re-read under a row lock. Money-moving methods lock the
+        contract before any wallet (payments.ledger then locks wallets in id
+        order), so concurrent payouts queue instead of deadlocking.
+        """
+        return type(self).objects.select_for_update().get(pk=self.pk)
+    
+    def _update_balances(self, **changes):
+        """Apply F()/value updates to this contract's row and refresh those fields"""
+        changes['updated_at'] = timezone.now()
+        type(self).objects.filter(pk=self.pk).update(**changes)
+        self.refresh_from_db(fields=list(changes))
+    
     def transfer_to_professional_balance(self, amount):
         """Transfer funds to professional balance with 3-day hold"""
-        from payments.models import Wallet, WalletTransaction
-        
-        if self.available_contract_balance < amount:
-            raise ValueError("Insufficient contract balance")
-        
-        # Calculate net amount after commission
-        net_amount = amount * (1 - self.platform_commission_rate)
-        
-        # Update contract balances
-        self.paid_amount += amount
-        self.professional_balance += net_amount
-        self.professional_balance_release_date = timezone.now() + timezone.timedelta(days=3)
-        self.save()
+        from payments import ledger
         
-        # Create transaction record for professional
-        professional_wallet, created = Wallet.objects.get_or_create(user=self.professional)
-        WalletTransaction.objects.create(
-            wallet=professional_wallet,
-            amount=net_amount,
-            transaction_type='credit',
-            source='contract_payment',
-            description=f'Payment from contract {self.contract_number} (3-day hold)'
-        )
+        with transaction.atomic():
+            contract = self._locked_copy()
+            if contract.available_contract_balance < amount:
+                raise ValueError("Insufficient contract balance")
+            
+            # Calculate net amount after commission
+            net_amount = amount * (1 - contract.platform_commission_rate)
+            
+            # Update contract balances
+            self._update_balances(
+                paid_amount=F('paid_amount') + amount,
+                professional_balance=F('professional_balance') + net_amount,
+                professional_balance_release_date=timezone.now() + timezone.timedelta(days=3),
+            )
+            
+            # Transaction record for the professional; the balance itself moves on release
+            ledger.post([ledger.Entry(
+                self.professional_id,
+                amount=net_amount,
+                source='contract_payment',
+                description=f'Payment from contract {self.contract_number} (3-day hold)'
+            )])
         
         return {
             'gross_amount': amount,
             'net_amount': net_amount,
-            'commission_amount': amount * self.platform_commission_rate,
+            'commission_amount': amount * contract.platform_commission_rate,
             'release_date': self.professional_balance_release_date
         }
     
     def release_professional_balance(self):
         """Release professional balance to their wallet after hold period"""
-        from payments.models import Wallet, WalletTransaction
-        
-        if not self.is_professional_balance_available:
-            raise ValueError("Professional balance is not yet available for release")
-        
-        if self.professional_balance <= 0:
-            return {'success': False, 'message': 'No balance to release'}
-        
-        # Transfer to professional's available balance
-        professional_wallet, created = Wallet.objects.get_or_create(user=self.professional)
-        professional_wallet.available_balance += self.professional_balance
-        professional_wallet.save()
+        from payments import ledger
         
-        # Create transaction record
-        WalletTransaction.objects.create(
-            wallet=professional_wallet,
-            amount=self.professional_balance,
-            transaction_type='credit',
-            source='balance_release',
-            description=f'Balance release from contract {self.contract_number}'
-        )
-        
-        released_amount = self.professional_balance
-        self.professional_balance = 0
-        self.professional_balance_release_date = None
-        self.save()
+        with transaction.atomic():
+            contract = self._locked_copy()
+            if not contract.is_professional_balance_available:
+                raise ValueError("Professional balance is not yet available for release")
+            
+            if contract.professional_balance <= 0:
+                return {'success': False, 'message': 'No balance to release'}
+            
+            # Transfer to professional's available balance
+            released_amount = contract.professional_balance
+            ledger.post([ledger.credit(
+                self.professional_id,
+                released_amount,
+                'balance_release',
+                f'Balance release from contract {self.contract_number}'
+            )])
+            
+            self._update_balances(
+                professional_balance=F('professional_balance') - released_amount,
+                professional_balance_release_date=None,
+            )
         
         return {
             'success': True,
@@ -293,79 +332,74 @@ class Contract(models.Model):
     
     def allocate_contract_funds(self, amount):
         """Allocate funds from client wallet to contract balance"""
-        from payments.models import Wallet, WalletTransaction
-        
-        client_wallet, created = Wallet.objects.get_or_create(user=self.client)
+        from payments import ledger
         
-        if client_wallet.available_balance >= amount:
-            # Move funds from client's available to pending balance
-            client_wallet.available_balance -= amount
-            client_wallet.pending_balance += amount
-            client_wallet.save()
-            
-            # Allocate to contract balance
-            self.contract_balance += amount
-            self.save()
-            
-            # Create transaction record
-            WalletTransaction.objects.create(
-                wallet=client_wallet,
-                amount=-amount,
-                transaction_type='debit',
-                source='contract_allocation',
-                description=f'Funds allocated to contract {self.contract_number}'
-            )
-            
-            return True
-        return False
+        try:
+            with transaction.atomic():
+                self._locked_copy()
+                
+                # Move funds from client's available to pending balance
+                ledger.post([ledger.Entry(
+                    self.client_id,
+                    available=-amount,
+                    pending=amount,
+                    amount=-amount,
+                    source='contract_allocation',
+                    description=f'Funds allocated to contract {self.contract_number}'
+                )])
+                
+                # Allocate to contract balance
+                self._update_balances(contract_balance=F('contract_balance') + amount)
+        except ledger.InsufficientFunds:
+            return False
+        return True
     
     def complete_contract(self):
         """Complete contract and transfer remaining funds to professional"""
-        from payments.models import Wallet, WalletTransaction
+        from payments import ledger
         
-        if self.status != 'active':
-            raise ValueError("Contract must be active to complete")
-        
-        remaining_balance = self.available_contract_balance
-        net_amount = 0
-        
-        if remaining_balance > 0:
-            # Calculate net amount after commission
-            net_amount = remaining_balance * (1 - self.platform_commission_rate)
-            
-            # Update contract balances
-            self.paid_amount += remaining_balance
-            self.professional_balance += net_amount
-            self.professional_balance_release_date = timezone.now() + timezone.timedelta(days=3)
+        with transaction.atomic():
+            contract = self._locked_copy()
+            if contract.status != 'active':
+                raise ValueError("Contract must be active to complete")
             
-            # Update client's pending balance (reduce by remaining amount)
-            client_wallet, created = Wallet.objects.get_or_create(user=self.client)
-            client_wallet.pending_balance -= remaining_balance
-            client_wallet.save()
+            remaining_balance = contract.available_contract_balance
+            net_amount = 0
+            changes = {}
             
-            # Create transaction record for client
-            WalletTransaction.objects.create(
-                wallet=client_wallet,
-                amount=-remaining_balance,
-                transaction_type='debit',
-                source='contract_completion',
-                description=f'Contract completion payment for {self.contract_number}'
-            )
+            if remaining_balance > 0:
+                # Calculate net amount after commission
+                net_amount = remaining_balance * (1 - contract.platform_commission_rate)
+                changes = {
+                    'paid_amount': F('paid_amount') + remaining_balance,
+                    'professional_balance': F('professional_balance') + net_amount,
+                    'professional_balance_release_date': timezone.now() + timezone.timedelta(days=3),
+                }
+                
+                # Client's pending balance pays the remainder; the professional's
+                # share is recorded now and released after the hold
+                ledger.post([
+                    ledger.Entry(
+                        self.client_id,
+                        pending=-remaining_balance,
+                        amount=-remaining_balance,
+                        source='contract_completion',
+                        description=f'Contract completion payment for {self.contract_number}'
+                    ),
+                    ledger.Entry(
+                        self.professional_id,
+                        amount=net_amount,
+                        source='contract_completion',
+                        description=f'Contract completion payment from {self.contract_number} (3-day hold)'
+                    ),
+                ])
             
-            # Create transaction record for professional
-            professional_wallet, created = Wallet.objects.get_or_create(user=self.professional)
-            WalletTransaction.objects.create(
-                wallet=professional_wallet,
-                amount=net_amount,
-                transaction_type='credit',
-                source='contract_completion',
-                description=f'Contract completion payment from {self.contract_number} (3-day hold)'
+            self._update_balances(
+                status='completed',
+                completion_percentage=100,
+                actual_end_date=timezone.now().date(),
+                **changes
             )
-            
-        self.status = 'completed'
-        self.completion_percentage = 100
-        self.actual_end_date = timezone.now().date()
-        self.save()
         
         return {
             'status': 'completed',
@@ -841,31 +875,31 @@ class ContractInstallment(models.Model):
         if self.status != 'pending':
             raise ValueError("Only pending installments can be cancelled")
         
-        from payments.models import Wallet, WalletTransaction
-        
-        # Get client wallet
-        client_wallet = Wallet.objects.get(user=self.contract.client)
+        from payments import ledger
         
-        # Release funds from pending balance back to available balance
-        client_wallet.release_pending(self.amount)
-        
-        # Create wallet transaction record
-        WalletTransaction.objects.create(
-            wallet=client_wallet,
-            transaction_type='installment_refund',
-            amount=self.amount,
-            description=f'Refund for cancelled installment - Contract {self.contract.contract_number}',
-            related_contract=self.contract
-        )
-        
-        # Deduct from contract balance
-        self.contract.contract_balance -= self.amount
-        self.contract.save()
-        
-        # Update installment status
-        self.status = 'cancelled'
-        self.description = f"{self.description}\nCancelled: {reason}" if reason else f"{self.description}\nCancelled"
-        self.save()
+        with transaction.atomic():
+            # Lock the contract before the ledger locks the client's wallet
+            self.contract._locked_copy()
+            if type(self).objects.select_for_update().get(pk=self.pk).status != 'pending':
+                raise ValueError("Only pending installments can be cancelled")
+            
+            # Release funds from pending balance back to available balance
+            ledger.post([ledger.Entry(
+                self.contract.client_id,
+                available=self.amount,
+                pending=-self.amount,
+                amount=self.amount,
+                source='installment_refund',
+                description=f'Refund for cancelled installment - Contract {self.contract.contract_number}'
+            )])
+            
+            # Deduct from contract balance
+            self.contract._update_balances(contract_balance=F('contract_balance') - self.amount)
+            
+            # Update installment status
+            self.status = 'cancelled'
+            self.description = f"{self.description}\nCancelled: {reason}" if reason else f"{self.description}\nCancelled"
+            self.save(update_fields=['status', 'description'])
         
         return {
             'success': True, 
@@ -37,7 +37,9 @@ class ContractPaymentListView(generics.ListCreateAPIView):
         if self.request.user not in [contract.client, contract.professional]:
             return ContractPayment.objects.none()
         
-        return ContractPayment.objects.filter(contract=contract)
+        return ContractPaymentSerializer.setup_eager_loading(
+            ContractPayment.objects.filter(contract=contract)
+        )
     
     def get_serializer_context(self):
         """Add contract to serializer context for validation"""
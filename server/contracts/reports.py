@@ -0,0 +1,151 @@
+"""
+Payment report shared by the export endpoint (and background report jobs).
+
+``payment_report_rows`` is a generator over ``iterator(chunk_size=...)`` so a
+multi-year report never sits in memory, and ``payment_report_summary``
+computes the status breakdown and totals with a single grouped aggregate.
+"""
+from datetime import datetime
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Contract
+
+REPORT_CHUNK_SIZE = 2000
+
+BASE_COLUMNS = [
+    'payment_id', 'contract_id', 'contract_title', 'amount', 'status',
+    'payment_method', 'created_at', 'completed_at',
+    'milestone_id', 'milestone_title', 'milestone_status',
+]
+DETAIL_COLUMNS = [
+    'payer_name', 'recipient_name', 'description', 'transaction_id', 'fees', 'net_amount',
+]
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def report_user_role(user):
+    return 'professional' if hasattr(user, 'professional_profile') else 'client'
+
+
+def payment_report_queryset(user, params):
+    """Payments on the user's contracts narrowed by the report filters"""
+    from payments.models import Payment
+
+    if report_user_role(user) == 'professional':
+        contracts = Contract.objects.filter(professional=user)
+    else:
+        contracts = Contract.objects.filter(client=user)
+
+    contract_id = params.get('contract_id')
+    if contract_id:
+        contracts = contracts.filter(id=contract_id)
+
+    payments = Payment.objects.filter(
+        Q(milestone__contract__in=contracts) | Q(contract__in=contracts)
+    )
+
+    start_date = _parse_date(params.get('start_date'))
+    if start_date:
+        payments = payments.filter(created_at__date__gte=start_date)
+
+    end_date = _parse_date(params.get('end_date'))
+    if end_date:
+        payments = payments.filter(created_at__date__lte=end_date)
+
+    payment_status = params.get('status', 'all')
+    if payment_status != 'all':
+        payments = payments.filter(status=payment_status)
+
+    payment_type = params.get('payment_type', 'all')
+    if payment_type == 'milestone':
+        payments = payments.filter(milestone__isnull=False)
+    elif payment_type == 'full_payment':
+        payments = payments.filter(milestone__isnull=True)
+
+    return payments
+
+
+def payment_report_columns(include_details):
+    return BASE_COLUMNS + (DETAIL_COLUMNS if include_details else [])
+
+
+def _timestamp(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+
+def payment_report_rows(payments, include_details=True, chunk_size=REPORT_CHUNK_SIZE):
+    """Yield one list per payment in ``payment_report_columns`` order"""
+    payments = payments.select_related(
+        'contract', 'milestone__contract', 'payment_method', 'payer', 'payee'
+    ).order_by('created_at', 'pk')
+
+    for payment in payments.iterator(chunk_size=chunk_size):
+        contract = payment.contract or (payment.milestone.contract if payment.milestone else None)
+        milestone = payment.milestone
+        row = [
+            str(payment.id),
+            str(contract.id) if contract else '',
+            contract.title if contract else '',
+            float(payment.amount),
+            payment.status,
+            str(payment.payment_method) if payment.payment_method else '',
+            _timestamp(payment.created_at),
+            _timestamp(payment.processed_at),
+            str(milestone.id) if milestone else '',
+            milestone.title if milestone else '',
+            milestone.status if milestone else '',
+        ]
+        if include_details:
+            fees = payment.platform_fee + payment.processing_fee
+            row += [
+                payment.payer.get_full_name() if payment.payer else 'N/A',
+                payment.payee.get_full_name() if payment.payee else 'N/A',
+                payment.description or '',
+                payment.authorize_net_transaction_id or payment.stripe_payment_intent_id or '',
+                float(fees),
+                float(payment.net_amount or payment.amount - fees),
+            ]
+        yield row
+
+
+def payment_report_summary(payments, user_role, filters):
+    """Totals and status breakdown from one grouped aggregate"""
+    breakdown = payments.order_by().values('status').annotate(
+        count=Count('id'),
+        total=Sum('amount'),
+    )
+    status_breakdown = {}
+    total_records = 0
+    total_amount = 0
+    for row in breakdown:
+        status_breakdown[row['status']] = row['count']
+        total_records += row['count']
+        total_amount += row['total'] or 0
+
+    return {
+        'total_records': total_records,
+        'total_amount': float(total_amount),
+        'user_role': user_role,
+        'export_timestamp': timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'filters_applied': filters,
+        'status_breakdown': status_breakdown,
+    }
+
+
+def payment_report_source(user, params):
+    """(columns, rows, total) for a background report job"""
+    include_details = params.get('include_details', True)
+    payments = payment_report_queryset(user, params)
+    return (
+        payment_report_columns(include_details),
+        payment_report_rows(payments, include_details),
+        payments.count(),
+    )
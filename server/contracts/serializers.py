@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.db.models import Prefetch
 from .models import Contract, ContractMilestone, ContractDocument, ContractLocation, ContractCalendarEvent, ContractInstallment
 from .contract_payments import ContractPayment
 from authentication.models import User
@@ -39,6 +40,11 @@ class ContractSerializer(serializers.ModelSerializer):
             'client_signed', 'professional_signed',
             'created_at', 'updated_at'
         ]
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Join the parties and project so list pages don't load them per row"""
+        return queryset.select_related('client', 'professional', 'project')
 
 
 class ContractMilestoneSerializer(serializers.ModelSerializer):
@@ -173,6 +179,11 @@ class ContractPaymentSerializer(serializers.ModelSerializer):
         # Additional validation can be added here if needed
         return attrs
     
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load the requesting and approving users with the payments"""
+        return queryset.select_related('requested_by', 'approved_by')
+    
     def get_requested_by_name(self, obj):
         if obj.requested_by:
             return f"{obj.requested_by.first_name or ''} {obj.requested_by.last_name or ''}".strip()
@@ -191,7 +202,7 @@ class ContractDetailSerializer(serializers.ModelSerializer):
     milestones = ContractMilestoneSerializer(many=True, read_only=True)
     documents = ContractDocumentSerializer(many=True, read_only=True)
     installments = ContractInstallmentSerializer(many=True, read_only=True)
-    payments = ContractPaymentSerializer(many=True, read_only=True, source='contractpayment_set')
+    payments = ContractPaymentSerializer(many=True, read_only=True, source='contract_payments')
     available_contract_balance = serializers.ReadOnlyField()
     
     class Meta:
@@ -214,4 +225,20 @@ class ContractDetailSerializer(serializers.ModelSerializer):
             'id', 'contract_number', 'remaining_amount', 'available_contract_balance',
             'client_signed', 'professional_signed',
             'created_at', 'updated_at'
-        ]
\ No newline at end of file
+        ]
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Parties joined in, each nested list prefetched once: the query count
+        stays fixed however many milestones or payments the contract has.
+        """
+        return queryset.select_related('client', 'professional').prefetch_related(
+            'milestones',
+            'documents',
+            'installments',
+            Prefetch(
+                'contract_payments',
+                queryset=ContractPaymentSerializer.setup_eager_loading(ContractPayment.objects.all())
+            ),
+        )
@@ -1,3 +1,339 @@
+import csv
+import zipfile
+from datetime import date
+from decimal import Decimal
+from io import BytesIO, StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from common.exports import CSV_CONTENT_TYPE, XLSX_CONTENT_TYPE
+from payments.models import Currency, Payment, Wallet, WalletTransaction
+from .models import Contract, ContractInstallment, ContractMilestone
+from .contract_payments import ContractPayment
 
-# Create your tests here.
+User = get_user_model()
+
+
+class PendingPaymentsTotalTest(TestCase):
+    """Test the denormalized pending payment total on contracts"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.pro = User.objects.create_user(
+            username='pro',
+            email='pro@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.contract = Contract.objects.create(
+            title='Kitchen remodel',
+            description='Cabinets and counters',
+            client=self.client_user,
+            professional=self.pro,
+            total_amount=Decimal('1000.00'),
+            contract_balance=Decimal('1000.00'),
+            start_date=date(2026, 1, 1),
+            end_date=date(2026, 3, 1),
+            status='active'
+        )
+    
+    def _payment(self, amount):
+        return ContractPayment.objects.create(
+            contract=self.contract,
+            amount=Decimal(amount),
+            requested_by=self.pro
+        )
+    
+    def test_total_follows_payment_status(self):
+        """Pending and approved payments are held; cancelling releases them"""
+        first = self._payment('300.00')
+        second = self._payment('200.00')
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.pending_payments_total, Decimal('500.00'))
+        self.assertEqual(self.contract.available_contract_balance, Decimal('500.00'))
+        
+        first.cancel_payment(self.client_user, 'Not yet')
+        second.status = 'approved'
+        second.save()
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.pending_payments_total, Decimal('200.00'))
+        
+        second.delete()
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.pending_payments_total, Decimal('0.00'))
+    
+    def test_contract_save_keeps_concurrent_total(self):
+        """Saving a stale contract instance does not overwrite the total"""
+        stale = Contract.objects.get(pk=self.contract.pk)
+        self._payment('250.00')
+        stale.title = 'Kitchen and pantry remodel'
+        stale.save()
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.pending_payments_total, Decimal('250.00'))
+    
+    def test_reconcile_command_fixes_drift(self):
+        """The reconcile command rewrites totals that drifted"""
+        self._payment('100.00')
+        Contract.objects.filter(pk=self.contract.pk).update(pending_payments_total=Decimal('999.00'))
+        
+        out = StringIO()
+        call_command('reconcile_contract_payments', '--fix', stdout=out)
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.pending_payments_total, Decimal('100.00'))
+        self.assertIn(self.contract.contract_number, out.getvalue())
+
+
+class AllocateFundsViewTest(TestCase):
+    """Allocating funds moves the client's money through the ledger once"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.pro = User.objects.create_user(
+            username='pro',
+            email='pro@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.contract = Contract.objects.create(
+            title='Kitchen remodel',
+            description='Cabinets and counters',
+            client=self.client_user,
+            professional=self.pro,
+            total_amount=Decimal('1000.00'),
+            start_date=date(2026, 1, 1),
+            end_date=date(2026, 3, 1),
+            status='active'
+        )
+        Wallet.objects.create(user=self.client_user, available_balance=Decimal('500.00'))
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.client_user)
+        self.url = reverse('contracts:contract_allocate_funds', kwargs={'pk': self.contract.pk})
+    
+    def test_allocation_is_posted_once(self):
+        response = self.api.post(self.url, {'amount': '200.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        
+        wallet = Wallet.objects.get(user=self.client_user)
+        self.assertEqual(wallet.available_balance, Decimal('300.00'))
+        self.assertEqual(wallet.pending_balance, Decimal('200.00'))
+        self.assertEqual(WalletTransaction.objects.filter(wallet=wallet).count(), 1)
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.contract_balance, Decimal('200.00'))
+    
+    def test_insufficient_balance_changes_nothing(self):
+        response = self.api.post(self.url, {'amount': '600.00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Wallet.objects.get(user=self.client_user).available_balance, Decimal('500.00'))
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.contract_balance, Decimal('0.00'))
+    
+    def test_cancelled_installment_goes_through_ledger(self):
+        self.api.post(self.url, {'amount': '200.00'}, format='json')
+        installment = ContractInstallment.objects.create(contract=self.contract, amount=Decimal('50.00'))
+        
+        installment.cancel_installment('Changed plans')
+        
+        wallet = Wallet.objects.get(user=self.client_user)
+        self.assertEqual(wallet.available_balance, Decimal('350.00'))
+        self.assertEqual(wallet.pending_balance, Decimal('150.00'))
+        self.assertTrue(WalletTransaction.objects.filter(wallet=wallet, source='installment_refund').exists())
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.contract_balance, Decimal('150.00'))
+        installment.refresh_from_db()
+        self.assertEqual(installment.status, 'cancelled')
+        with self.assertRaises(ValueError):
+            installment.cancel_installment()
+
+
+class ContractQueryPlanTest(TestCase):
+    """Test contract list/detail query counts"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.pro = User.objects.create_user(
+            username='pro',
+            email='pro@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.outsider = User.objects.create_user(
+            username='outsider',
+            email='outsider@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.contract = Contract.objects.create(
+            title='Roof replacement',
+            description='Tear off and reshingle',
+            client=self.client_user,
+            professional=self.pro,
+            total_amount=Decimal('5000.00'),
+            contract_balance=Decimal('5000.00'),
+            start_date=date(2026, 1, 1),
+            end_date=date(2026, 3, 1),
+            status='active'
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.client_user)
+    
+    def _add_rows(self, count):
+        # (contract, order) is unique; continue after the rows already added
+        start = self.contract.milestones.count()
+        for i in range(start, start + count):
+            ContractMilestone.objects.create(
+                contract=self.contract,
+                title=f'Phase {i}',
+                amount=Decimal('100.00'),
+                due_date=date(2026, 2, 1),
+                order=i
+            )
+            ContractPayment.objects.create(
+                contract=self.contract,
+                amount=Decimal('50.00'),
+                requested_by=self.pro,
+                approved_by=self.client_user
+            )
+    
+    def _detail_queries(self):
+        url = reverse('contracts:contract_detail', kwargs={'pk': self.contract.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+    
+    def test_detail_query_count_is_bounded(self):
+        """More milestones and payments do not add queries"""
+        self._add_rows(1)
+        _, few = self._detail_queries()
+        self._add_rows(5)
+        response, many = self._detail_queries()
+        self.assertEqual(few, many)
+        self.assertEqual(len(response.data['payments']), 6)
+        self.assertEqual(len(response.data['milestones']), 6)
+    
+    def _list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get(reverse('contracts:contract_list'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+    
+    def test_list_query_count_is_bounded(self):
+        """More contracts on the page do not add queries"""
+        _, few = self._list_queries()
+        for i in range(5):
+            Contract.objects.create(
+                title=f'Contract {i}',
+                description='Test contract',
+                client=self.client_user,
+                professional=self.pro,
+                total_amount=Decimal('1000.00'),
+                start_date=date(2026, 1, 1),
+                end_date=date(2026, 3, 1),
+                status='active'
+            )
+        response, many = self._list_queries()
+        self.assertEqual(few, many)
+        self.assertEqual(len(response.data['results']), 6)
+    
+    def test_participant_union(self):
+        """Both parties see the contract, nobody else does"""
+        self.assertEqual(list(Contract.for_participant(self.client_user)), [self.contract])
+        self.assertEqual(list(Contract.for_participant(self.pro)), [self.contract])
+        self.assertFalse(Contract.for_participant(self.outsider).exists())
+
+
+class PaymentReportExportViewTest(TestCase):
+    """Exports stream only the requesting user's payments"""
+    
+    def setUp(self):
+        Currency.objects.get_or_create(id=1, defaults={'code': 'USD', 'name': 'US Dollar', 'symbol': '$'})
+        pro = User.objects.create_user(
+            username='pro',
+            email='pro@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        other_client = User.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.own, self.other = [], []
+        for client, amounts in ((self.client_user, ['100.00', '250.00']), (other_client, ['999.00'])):
+            contract = Contract.objects.create(
+                title=f'Contract for {client.username}',
+                description='Test contract',
+                client=client,
+                professional=pro,
+                total_amount=Decimal('1000.00'),
+                start_date=date(2026, 1, 1),
+                end_date=date(2026, 3, 1),
+                status='active'
+            )
+            for amount in amounts:
+                payment = Payment.objects.create(
+                    payer=client,
+                    payee=pro,
+                    contract=contract,
+                    amount=Decimal(amount),
+                    status='succeeded'
+                )
+                (self.own if client == self.client_user else self.other).append(payment)
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.client_user)
+        self.url = reverse('contracts:payment_report_export')
+    
+    def export(self, export_format):
+        response = self.api.post(self.url, {'format': export_format, 'include_details': False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+    
+    def test_csv(self):
+        response, content = self.export('csv')
+        self.assertEqual(response['Content-Type'], CSV_CONTENT_TYPE)
+        self.assertIn('.csv"', response['Content-Disposition'])
+        
+        rows = list(csv.reader(StringIO(content.decode('utf-8'))))
+        self.assertEqual(rows[0][0], 'payment_id')
+        self.assertEqual(sorted(row[0] for row in rows[1:]), sorted(str(payment.id) for payment in self.own))
+    
+    def test_xlsx(self):
+        response, content = self.export('excel')
+        self.assertEqual(response['Content-Type'], XLSX_CONTENT_TYPE)
+        self.assertIn('.xlsx"', response['Content-Disposition'])
+        
+        archive = zipfile.ZipFile(BytesIO(content))
+        self.assertIsNone(archive.testzip())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('<row r="3">', sheet)
+        self.assertNotIn('<row r="4">', sheet)
+        for payment in self.own:
+            self.assertIn(str(payment.id), sheet)
+        self.assertNotIn(str(self.other[0].id), sheet)
@@ -1,7 +1,9 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q, Sum, Count
+from django.db import transaction
+from django.db.models import F, Q, Sum, Count
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from drf_spectacular.utils import extend_schema
 from .models import Contract, ContractMilestone, ContractDocument, ContractLocation, ContractCalendarEvent, ContractInstallment
@@ -17,8 +19,15 @@ from location_services.serializers import UserLocationSerializer
 from calendar_app.models import Appointment
 from calendar_app.serializers import AppointmentSerializer
 # Import payments for contract termination
-from payments.models import Payment, Wallet, WalletTransaction
+from payments import ledger
+from payments.models import Payment, Wallet
 from payments.serializers import PaymentSerializer
+from common.pagination import KeysetPagination
+from common.exports import CSV_CONTENT_TYPE, XLSX_CONTENT_TYPE, stream_csv, stream_xlsx
+from .reports import (
+    payment_report_columns, payment_report_queryset, payment_report_rows,
+    payment_report_summary, report_user_role
+)
 from decimal import Decimal
 
 
@@ -26,11 +35,11 @@ class ContractListView(generics.ListAPIView):
     """قائمة العقود"""
     serializer_class = ContractSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
-        user = self.request.user
-        return Contract.objects.filter(
-            Q(client=user) | Q(professional=user)
+        return ContractSerializer.setup_eager_loading(
+            Contract.for_participant(self.request.user)
         )
 
 
@@ -40,9 +49,8 @@ class ContractDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
-        return Contract.objects.filter(
-            Q(client=user) | Q(professional=user)
+        return ContractDetailSerializer.setup_eager_loading(
+            Contract.for_participant(self.request.user)
         )
 
 
@@ -131,10 +139,7 @@ class ContractUpdateView(generics.UpdateAPIView):
     lookup_field = 'pk'
     
     def get_queryset(self):
-        user = self.request.user
-        return Contract.objects.filter(
-            Q(client=user) | Q(professional=user)
-        )
+        return Contract.for_participant(self.request.user)
     
     def update(self, request, *args, **kwargs):
         """Override update method with detailed error logging"""
@@ -297,6 +302,10 @@ class PaymentReportExportView(APIView):
                     'type': 'boolean',
                     'description': 'تضمين التفاصيل'
                 },
+                'async': {
+                    'type': 'boolean',
+                    'description': 'إنشاء الملف في الخلفية وإرجاع معرف المهمة'
+                },
                 'contract_id': {
                     'type': 'string',
                     'format': 'uuid',
@@ -312,153 +321,55 @@ class PaymentReportExportView(APIView):
     )
     def post(self, request):
         try:
-            from payments.models import Payment, WalletTransaction
-            import csv
-            import json
-            from django.http import HttpResponse
-            from datetime import datetime
-            
-            # Get filter parameters
-            start_date = request.data.get('start_date')
-            end_date = request.data.get('end_date')
-            payment_status = request.data.get('status', 'all')
-            export_format = request.data.get('format', 'json')
-            include_details = request.data.get('include_details', True)
-            contract_id = request.data.get('contract_id')
-            payment_type = request.data.get('payment_type', 'all')
-            
-            # Get user's contracts
-            if hasattr(request.user, 'professional_profile'):
-                contracts = Contract.objects.filter(professional=request.user)
-                user_role = 'professional'
-            else:
-                contracts = Contract.objects.filter(client=request.user)
-                user_role = 'client'
+            params = request.data
+            export_format = params.get('format', 'json')
+            include_details = params.get('include_details', True)
+            user_role = report_user_role(request.user)
+            filters = {
+                'start_date': params.get('start_date'),
+                'end_date': params.get('end_date'),
+                'status': params.get('status', 'all'),
+                'contract_id': params.get('contract_id'),
+                'payment_type': params.get('payment_type', 'all'),
+                'include_details': include_details
+            }
             
-            # Filter by specific contract if provided
-            if contract_id:
-                contracts = contracts.filter(id=contract_id)
-            
-            # Get payments related to user's contracts
-            payments = Payment.objects.filter(
-                Q(milestone__contract__in=contracts) | Q(contract__in=contracts)
-            ).select_related('milestone', 'contract', 'payer', 'recipient')
-            
-            # Apply date filters
-            if start_date:
-                try:
-                    start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-                    payments = payments.filter(created_at__date__gte=start_date_obj)
-                except ValueError:
-                    pass
-            
-            if end_date:
-                try:
-                    end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-                    payments = payments.filter(created_at__date__lte=end_date_obj)
-                except ValueError:
-                    pass
-            
-            # Apply status filter
-            if payment_status != 'all':
-                payments = payments.filter(status=payment_status)
-            
-            # Apply payment type filter
-            if payment_type != 'all':
-                if payment_type == 'milestone':
-                    payments = payments.filter(milestone__isnull=False)
-                elif payment_type == 'full_payment':
-                    payments = payments.filter(milestone__isnull=True)
-            
-            # Prepare report data
-            report_data = []
-            total_amount = 0
-            
-            for payment in payments:
-                payment_data = {
-                    'payment_id': str(payment.id),
-                    'contract_id': str(payment.contract.id),
-                    'contract_title': payment.contract.title,
-                    'amount': float(payment.amount),
-                    'status': payment.status,
-                    'payment_method': payment.payment_method,
-                    'created_at': payment.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    'completed_at': payment.completed_at.strftime('%Y-%m-%d %H:%M:%S') if payment.completed_at else None,
-                }
+            # Large exports can be built in the background and polled for
+            if params.get('async') and export_format in ('csv', 'excel'):
+                from dashboard.report_jobs import submit_report_job
+                from dashboard.serializers import ReportJobSerializer
                 
-                # Add milestone info if exists
-                if payment.milestone:
-                    payment_data.update({
-                        'milestone_id': str(payment.milestone.id),
-                        'milestone_title': payment.milestone.title,
-                        'milestone_status': payment.milestone.status,
-                    })
-                
-                if include_details:
-                    payment_data.update({
-                        'payer_name': payment.payer.get_full_name() if payment.payer else 'N/A',
-                        'recipient_name': payment.recipient.get_full_name() if payment.recipient else 'N/A',
-                        'description': payment.description or '',
-                        'transaction_id': payment.transaction_id or '',
-                        'fees': float(payment.fees) if payment.fees else 0,
-                        'net_amount': float(payment.amount - (payment.fees or 0)),
-                    })
-                
-                report_data.append(payment_data)
-                total_amount += payment.amount
-            
-            # Generate summary statistics
-            summary = {
-                'total_records': len(report_data),
-                'total_amount': float(total_amount),
-                'user_role': user_role,
-                'export_timestamp': timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'filters_applied': {
-                    'start_date': start_date,
-                    'end_date': end_date,
-                    'status': payment_status,
-                    'contract_id': contract_id,
-                    'payment_type': payment_type,
-                    'include_details': include_details
-                },
-                'status_breakdown': {}
-            }
+                job, created = submit_report_job(request.user, 'payments', export_format, filters)
+                return Response(
+                    ReportJobSerializer(job, context={'request': request}).data,
+                    status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+                )
             
-            # Calculate status breakdown
-            for payment in payments:
-                status_key = payment.status
-                if status_key in summary['status_breakdown']:
-                    summary['status_breakdown'][status_key] += 1
-                else:
-                    summary['status_breakdown'][status_key] = 1
+            payments = payment_report_queryset(request.user, params)
+            columns = payment_report_columns(include_details)
+            rows = payment_report_rows(payments, include_details)
+            filename = f'payment_report_{timezone.now().strftime("%Y%m%d_%H%M%S")}'
             
-            # Return data based on format
-            if export_format == 'json':
-                return Response({
-                    'success': True,
-                    'message': 'Payment report generated successfully',
-                    'summary': summary,
-                    'data': report_data
-                })
+            # Files are streamed row by row straight from the database cursor
+            if export_format == 'csv':
+                response = StreamingHttpResponse(stream_csv(columns, rows), content_type=CSV_CONTENT_TYPE)
+                response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+                return response
             
-            elif export_format == 'csv':
-                response = HttpResponse(content_type='text/csv')
-                response['Content-Disposition'] = f'attachment; filename="payment_report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-                
-                if report_data:
-                    writer = csv.DictWriter(response, fieldnames=report_data[0].keys())
-                    writer.writeheader()
-                    writer.writerows(report_data)
-                
+            if export_format == 'excel':
+                response = StreamingHttpResponse(
+                    stream_xlsx(columns, rows, sheet_name='Payments'),
+                    content_type=XLSX_CONTENT_TYPE
+                )
+                response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
                 return response
             
-            else:  # Default to JSON if unsupported format
-                return Response({
-                    'success': True,
-                    'message': f'Export format {export_format} not fully implemented, returning JSON',
-                    'summary': summary,
-                    'data': report_data
-                })
+            return Response({
+                'success': True,
+                'message': 'Payment report generated successfully',
+                'summary': payment_report_summary(payments, user_role, filters),
+                'data': [dict(zip(columns, row)) for row in rows]
+            })
             
         except Exception as e:
             return Response(
@@ -541,9 +452,7 @@ class ContractMilestoneListView(generics.ListCreateAPIView):
         user = self.request.user
         return ContractMilestone.objects.filter(
             contract_id=contract_id,
-            contract__in=Contract.objects.filter(
-                Q(client=user) | Q(professional=user)
-            )
+            contract__in=Contract.for_participant(user)
         )
     
     def perform_create(self, serializer):
@@ -552,10 +461,7 @@ class ContractMilestoneListView(generics.ListCreateAPIView):
         
         # Get the contract
         try:
-            contract = Contract.objects.get(
-                id=contract_id,
-                **{Q(client=user) | Q(professional=user): True}
-            )
+            contract = Contract.for_participant(user).get(id=contract_id)
         except Contract.DoesNotExist:
             from rest_framework.exceptions import NotFound
             raise NotFound("Contract not found")
@@ -589,9 +495,7 @@ class ContractDocumentListView(generics.ListAPIView):
         user = self.request.user
         return ContractDocument.objects.filter(
             contract_id=contract_id,
-            contract__in=Contract.objects.filter(
-                Q(client=user) | Q(professional=user)
-            )
+            contract__in=Contract.for_participant(user)
         )
 
 
@@ -599,6 +503,7 @@ class ClientContractListView(generics.ListAPIView):
     """قائمة عقود العميل"""
     serializer_class = ContractSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         return Contract.objects.filter(client=self.request.user)
@@ -608,6 +513,7 @@ class ProfessionalContractListView(generics.ListAPIView):
     """قائمة عقود المحترف"""
     serializer_class = ContractSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         return Contract.objects.filter(professional=self.request.user)
@@ -814,9 +720,7 @@ class ContractStatsView(APIView):
         user = request.user
         
         # Get user's contracts (both as client and professional)
-        user_contracts = Contract.objects.filter(
-            Q(client=user) | Q(professional=user)
-        )
+        user_contracts = Contract.for_participant(user)
         
         # Calculate statistics
         total_contracts = user_contracts.count()
@@ -975,32 +879,16 @@ class ContractAllocateFundsView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Get client wallet
-            client_wallet = Wallet.objects.get(user=request.user)
-            
-            # Check if client has sufficient balance
-            if client_wallet.available_balance < amount:
+            # Moves the funds from the client's available to pending balance
+            # through the ledger and adds them to the contract balance
+            if not contract.allocate_contract_funds(amount):
                 return Response(
                     {'error': 'Insufficient wallet balance'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Move funds from available to pending balance
-            client_wallet.available_balance -= amount
-            client_wallet.pending_balance += amount
-            client_wallet.save()
-            
-            # Create wallet transaction
-            WalletTransaction.objects.create(
-                wallet=client_wallet,
-                amount=-amount,
-                transaction_type='debit',
-                source='project_allocation',
-                description=f'Funds allocated to contract {contract.contract_number}'
-            )
-            
-            # Allocate funds to contract
-            contract.allocate_contract_funds(amount)
+            contract.refresh_from_db()
+            client_wallet = Wallet.objects.get(user=request.user)
             
             return Response({
                 'message': 'Funds allocated successfully',
@@ -1440,41 +1328,17 @@ class ReleasePendingFundsView(APIView):
     )
     def post(self, request):
         try:
-            from payments.models import Wallet, WalletTransaction
-            from datetime import timedelta
+            from payments.models import Wallet
+            from payments.holds import release_due_holds
             
             # Get user's wallet
             wallet = Wallet.objects.get(user=request.user)
             
-            # Find transactions that are older than 3 days and still pending
-            three_days_ago = timezone.now() - timedelta(days=3)
-            
-            pending_transactions = WalletTransaction.objects.filter(
-                wallet=wallet,
-                transaction_type='credit',
-                source='milestone_payment',
-                created_at__lte=three_days_ago,
-                description__contains='3-day hold period'
-            )
-            
-            total_released = 0
-            released_count = 0
-            
-            for transaction in pending_transactions:
-                # Move from pending to available balance
-                wallet.pending_balance -= transaction.amount
-                wallet.available_balance += transaction.amount
-                total_released += transaction.amount
-                released_count += 1
-                
-                # Update transaction description to mark as released
-                transaction.description = transaction.description.replace(
-                    '(3-day hold period)', 
-                    '(released to available balance)'
-                )
-                transaction.save()
-            
-            wallet.save()
+            # Release this user's holds that are already due
+            totals = release_due_holds(user_id=request.user.id)
+            total_released = totals['amount']
+            released_count = totals['released']
+            wallet.refresh_from_db()
             
             return Response({
                 'message': f'Successfully released {released_count} pending transactions',
@@ -1546,35 +1410,25 @@ class ConfirmWorkReceiptView(APIView):
             milestone.save()
             
             # Trigger automatic payment release
-            from payments.models import Payment
             try:
-                payment = Payment.objects.get(
-                    milestone=milestone,
-                    status='held'
-                )
-                payment.status = 'completed'
-                payment.completed_at = timezone.now()
-                payment.save()
-                
-                # Add to professional's wallet
-                from payments.models import Wallet, WalletTransaction
-                wallet, created = Wallet.objects.get_or_create(
-                    user=milestone.contract.professional
-                )
-                
-                # Add to available balance immediately since client confirmed
-                wallet.available_balance += payment.amount
-                wallet.save()
-                
-                # Create transaction record
-                WalletTransaction.objects.create(
-                    wallet=wallet,
-                    amount=payment.amount,
-                    transaction_type='credit',
-                    source='milestone_payment',
-                    description=f'Payment for milestone: {milestone.title} (client confirmed receipt)',
-                    reference_id=str(payment.id)
-                )
+                with transaction.atomic():
+                    # Locked so a repeated confirmation cannot release it twice
+                    payment = Payment.objects.select_for_update().get(
+                        milestone=milestone,
+                        status='held'
+                    )
+                    payment.status = 'completed'
+                    payment.completed_at = timezone.now()
+                    payment.save()
+                    
+                    # Add to the professional's available balance immediately since client confirmed
+                    ledger.post([ledger.credit(
+                        milestone.contract.professional_id,
+                        payment.amount,
+                        'milestone_payment',
+                        f'Payment for milestone: {milestone.title} (client confirmed receipt)',
+                        payment=payment
+                    )])
                 
             except Payment.DoesNotExist:
                 pass
@@ -1761,52 +1615,45 @@ class ContractInstallmentListView(generics.ListCreateAPIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Check if contract has sufficient balance
-            if contract.contract_balance < amount:
-                return Response(
-                    {'error': 'Insufficient contract balance. Please allocate more funds to the contract first.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Get or create client wallet
-            client_wallet, created = Wallet.objects.get_or_create(user=contract.client)
+            # Calculate platform commission and net amount
+            platform_commission = amount * contract.platform_commission_rate
+            net_amount = amount - platform_commission
             
-            # Check if client has sufficient pending balance (since contract balance comes from pending)
-            if client_wallet.pending_balance < amount:
+            try:
+                with transaction.atomic():
+                    # Lock the contract before the ledger locks the client's wallet
+                    if contract._locked_copy().contract_balance < amount:
+                        return Response(
+                            {'error': 'Insufficient contract balance. Please allocate more funds to the contract first.'},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+                    
+                    # Create installment
+                    installment = ContractInstallment.objects.create(
+                        contract=contract,
+                        amount=amount,
+                        description=description,
+                        platform_commission_amount=platform_commission,
+                        net_amount_to_professional=net_amount
+                    )
+                    
+                    # Deduct from client's pending balance (since contract balance comes from pending)
+                    wallets = ledger.post([ledger.debit(
+                        contract.client_id,
+                        amount,
+                        'installment_creation',
+                        f'Installment created for contract {contract.contract_number}',
+                        pending=True
+                    )])
+                    
+                    # Deduct from contract balance
+                    contract._update_balances(contract_balance=F('contract_balance') - amount)
+            except ledger.InsufficientFunds:
                 return Response(
                     {'error': 'Insufficient pending balance in wallet.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            
-            # Calculate platform commission and net amount
-            platform_commission = amount * contract.platform_commission_rate
-            net_amount = amount - platform_commission
-            
-            # Create installment
-            installment = ContractInstallment.objects.create(
-                contract=contract,
-                amount=amount,
-                description=description,
-                platform_commission_amount=platform_commission,
-                net_amount_to_professional=net_amount
-            )
-            
-            # Deduct from contract balance
-            contract.contract_balance -= amount
-            contract.save()
-            
-            # Deduct from client's pending balance (since contract balance comes from pending)
-            client_wallet.pending_balance -= amount
-            client_wallet.save()
-            
-            # Create wallet transaction record
-            WalletTransaction.objects.create(
-                wallet=client_wallet,
-                amount=-amount,
-                transaction_type='debit',
-                source='installment_creation',
-                description=f'Installment created for contract {contract.contract_number}'
-            )
+            client_wallet = wallets[contract.client_id]
             
             serializer = ContractInstallmentSerializer(installment)
             return Response({
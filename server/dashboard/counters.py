@@ -0,0 +1,207 @@
+"""
+Buffered engagement counters.
+
+Hot read paths (project pages, file downloads, portfolio views) record hits
+here instead of writing on every request:
+
+* ``first_hit`` deduplicates a viewer inside a time window using the shared
+  cache, so every process agrees on what counts as a new view.
+* ``increment`` accumulates per-row deltas in this process.
+* ``add_row`` queues log rows such as ProjectView.
+
+Pending work is written out at most every ``ENGAGEMENT_COUNTER_FLUSH_INTERVAL``
+seconds (or once ``ENGAGEMENT_COUNTER_MAX_PENDING`` items are queued) with one
+``F()`` update per distinct delta and one ``bulk_create`` per model, and once
+more when the process exits. Deltas and rows of one flush are written in a
+single transaction. If that fails the deltas are retried on their own; when
+they go through, rows are inserted one at a time and a row the database
+keeps rejecting (say, a view of a deleted project) is dropped rather than
+blocking later flushes. If the deltas fail too, everything is queued again.
+The buffer lives in process memory, so a daemon
+thread in each process flushes it every interval too; an idle process does
+not sit on its hits until the next request. Counters can lag by up to one
+interval.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def first_hit(scope, object_id, viewer, window=3600):
+    """True the first time ``viewer`` hits ``object_id`` within ``window`` seconds"""
+    return cache.add(f'engagement:seen:{scope}:{object_id}:{viewer}', 1, timeout=window)
+
+
+class CounterBuffer:
+    """
+    Per-process buffer of counter deltas and rows waiting to be written.
+    With ``background`` a daemon thread flushes it every interval.
+    """
+
+    def __init__(self, background=False):
+        self._lock = threading.Lock()
+        self._reset()
+        self._last_flush = time.monotonic()
+        self._background = background
+        self._flusher_pid = None
+
+    def _reset(self):
+        # {(model, field, touch_field): {pk: delta}}
+        self._deltas = defaultdict(lambda: defaultdict(int))
+        # {model: [instances]}
+        self._rows = defaultdict(list)
+        self._pending = 0
+
+    def increment(self, model, pk, field, amount=1, touch_field=None):
+        with self._lock:
+            self._deltas[(model, field, touch_field)][pk] += amount
+            self._pending += 1
+        self._start_flusher()
+        self.flush_if_due()
+
+    def add_row(self, instance):
+        with self._lock:
+            self._rows[type(instance)].append(instance)
+            self._pending += 1
+        self._start_flusher()
+        self.flush_if_due()
+
+    def _start_flusher(self):
+        # Started lazily, and again in a forked worker: threads do not survive a fork
+        pid = os.getpid()
+        if not self._background or self._flusher_pid == pid:
+            return
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+        threading.Thread(target=self._flush_periodically, name='engagement-counters', daemon=True).start()
+
+    def _flush_periodically(self):
+        while True:
+            # wake when the last flush (by this thread or a request) falls due
+            interval = getattr(settings, 'ENGAGEMENT_COUNTER_FLUSH_INTERVAL', 30)
+            time.sleep(max(interval - (time.monotonic() - self._last_flush), 1))
+            try:
+                self.flush_if_due()
+            except Exception as e:
+                logger.error(f'Periodic engagement counter flush failed: {str(e)}')
+            finally:
+                # this thread's own connection; don't hold it open between flushes
+                connection.close()
+
+    def pending(self, model, pk, field):
+        """Delta not yet written for one row (used to show fresh counts)"""
+        with self._lock:
+            return sum(
+                deltas.get(pk, 0)
+                for (delta_model, delta_field, _), deltas in self._deltas.items()
+                if delta_model is model and delta_field == field
+            )
+
+    def flush_if_due(self):
+        interval = getattr(settings, 'ENGAGEMENT_COUNTER_FLUSH_INTERVAL', 30)
+        max_pending = getattr(settings, 'ENGAGEMENT_COUNTER_MAX_PENDING', 500)
+        if self._pending >= max_pending or time.monotonic() - self._last_flush >= interval:
+            self.flush()
+
+    def flush(self):
+        """Write all pending deltas and rows; returns the number of items written"""
+        with self._lock:
+            deltas, rows, pending = self._deltas, self._rows, self._pending
+            self._reset()
+            self._last_flush = time.monotonic()
+
+        if not pending:
+            return 0
+
+        try:
+            with transaction.atomic():
+                self._write(deltas, rows)
+        except Exception as e:
+            logger.warning(f'Failed to flush engagement counters, retrying deltas and rows separately: {str(e)}')
+            return self._salvage(deltas, rows)
+        return pending
+
+    def _salvage(self, deltas, rows):
+        try:
+            with transaction.atomic():
+                self._write(deltas, {})
+        except Exception as e:
+            logger.error(f'Failed to flush engagement counters, re-queued them: {str(e)}')
+            self._requeue(deltas, rows)
+            return 0
+
+        written = sum(len(per_row) for per_row in deltas.values())
+        dropped = 0
+        for model, instances in rows.items():
+            for instance in instances:
+                try:
+                    with transaction.atomic():
+                        model.objects.bulk_create([instance], ignore_conflicts=True)
+                except Exception:
+                    dropped += 1
+                else:
+                    written += 1
+        if dropped:
+            logger.error(f'Dropped {dropped} engagement rows the database rejected')
+        return written
+
+    def _write(self, deltas, rows):
+        now = timezone.now()
+        for (model, field, touch_field), per_row in deltas.items():
+            # Rows sharing the same delta go out in a single UPDATE
+            by_amount = defaultdict(list)
+            for pk, amount in per_row.items():
+                if amount:
+                    by_amount[amount].append(pk)
+            for amount, pks in by_amount.items():
+                values = {field: F(field) + amount}
+                if touch_field:
+                    values[touch_field] = now
+                model.objects.filter(pk__in=pks).update(**values)
+
+        for model, instances in rows.items():
+            model.objects.bulk_create(instances, batch_size=500, ignore_conflicts=True)
+
+    def _requeue(self, deltas, rows):
+        max_pending = getattr(settings, 'ENGAGEMENT_COUNTER_MAX_PENDING', 500)
+        with self._lock:
+            for key, per_row in deltas.items():
+                for pk, amount in per_row.items():
+                    self._deltas[key][pk] += amount
+                self._pending += len(per_row)
+            for model, instances in rows.items():
+                # Deltas are tiny, log rows are not: keep the buffer bounded
+                room = max(max_pending * 10 - len(self._rows[model]), 0)
+                self._rows[model].extend(instances[:room])
+                self._pending += min(len(instances), room)
+
+
+counters = CounterBuffer(background=True)
+atexit.register(counters.flush)
+
+
+def increment(model, pk, field, amount=1, touch_field=None):
+    """Buffer ``field += amount`` for one row (``touch_field`` is set to now on flush)"""
+    counters.increment(model, pk, field, amount=amount, touch_field=touch_field)
+
+
+def add_row(instance):
+    """Buffer an unsaved log row; rows are bulk inserted ignoring conflicts"""
+    counters.add_row(instance)
+
+
+def flush():
+    return counters.flush()
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('file_management', '0001_initial'),
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('report_type', models.CharField(choices=[('payments', 'Payments'), ('reviews', 'Reviews'), ('disputes', 'Disputes')], max_length=20)),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('excel', 'Excel')], default='csv', max_length=10)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('params_hash', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('total_rows', models.PositiveIntegerField(blank=True, null=True)),
+                ('rows_written', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('output', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_jobs', to='file_management.uploadedfile')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'report_jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'params_hash'], name='report_jobs_user_id_371e10_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('user', 'params_hash'), name='unique_active_report_job')],
+            },
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+import uuid
 
 User = get_user_model()
 
@@ -115,3 +116,68 @@ class PendingAction(models.Model):
 
     def __str__(self):
         return f"Pending Actions for {self.user.username}"
+
+
+class ReportJob(models.Model):
+    """Background report export; the output is stored as a temporary UploadedFile"""
+    REPORT_TYPES = [
+        ('payments', 'Payments'),
+        ('reviews', 'Reviews'),
+        ('disputes', 'Disputes'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('excel', 'Excel'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    ACTIVE_STATUSES = ('pending', 'running')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs')
+    report_type = models.CharField(max_length=20, choices=REPORT_TYPES)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    params = models.JSONField(default=dict, blank=True)
+    params_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    rows_written = models.PositiveIntegerField(default=0)
+    output = models.ForeignKey(
+        'file_management.UploadedFile', on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='report_jobs'
+    )
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'report_jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'params_hash']),
+        ]
+        constraints = [
+            # At most one queued or running job per identical request
+            models.UniqueConstraint(
+                fields=['user', 'params_hash'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_report_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.report_type} report {self.id} ({self.status})"
+
+    @property
+    def progress(self):
+        """Percent of rows written, when the total is known"""
+        if self.status == 'completed':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, int(self.rows_written * 100 / self.total_rows))
@@ -0,0 +1,180 @@
+"""
+Background report exports.
+
+``submit_report_job`` records a ReportJob and hands it to the
+``run_report_job`` task, so the request returns a job id immediately instead
+of building a multi-year report inside the request. Identical requests
+(same user, report type, format and parameters, hashed into ``params_hash``)
+share one job: a queued or running job is always reused, a completed one
+while its output is younger than ``REPORT_JOB_REUSE_WINDOW`` seconds.
+
+``execute_report_job`` streams the rows through the CSV/XLSX writers into a
+temporary file chunk by chunk, reporting progress every
+``REPORT_JOB_PROGRESS_EVERY`` rows, and stores the result as a temporary
+UploadedFile (purpose ``general``) that expires after
+``REPORT_JOB_RETENTION`` seconds.
+"""
+import hashlib
+import json
+import logging
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from common.exports import CSV_CONTENT_TYPE, XLSX_CONTENT_TYPE, stream_csv, stream_xlsx
+
+logger = logging.getLogger(__name__)
+
+# report_type -> callable(user, params) returning (columns, rows, total)
+REPORT_SOURCES = {
+    'payments': 'contracts.reports.payment_report_source',
+    'reviews': 'reviews.reports.review_report_source',
+    'disputes': 'disputes.reports.dispute_report_source',
+}
+
+
+def params_hash(report_type, export_format, params):
+    payload = json.dumps([report_type, export_format, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _expire_stale_jobs(user, digest):
+    """Fail queued/running jobs whose worker evidently went away"""
+    from .models import ReportJob
+
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'REPORT_JOB_STALE_AFTER', 60 * 60))
+    ReportJob.objects.filter(
+        user=user, params_hash=digest, status__in=ReportJob.ACTIVE_STATUSES, created_at__lt=cutoff
+    ).update(status='failed', error='Timed out', completed_at=timezone.now())
+
+
+def reusable_job(user, digest):
+    """An existing job that already answers this request, if any"""
+    from .models import ReportJob
+
+    now = timezone.now()
+    reuse_since = now - timedelta(seconds=getattr(settings, 'REPORT_JOB_REUSE_WINDOW', 10 * 60))
+    return ReportJob.objects.filter(user=user, params_hash=digest).filter(
+        Q(status__in=ReportJob.ACTIVE_STATUSES)
+        | Q(status='completed', completed_at__gte=reuse_since, output__expires_at__gt=now)
+    ).select_related('output').order_by('-created_at').first()
+
+
+def submit_report_job(user, report_type, export_format, params):
+    """Return (job, created); identical requests share one job"""
+    from .models import ReportJob
+    from .tasks import run_report_job
+
+    digest = params_hash(report_type, export_format, params)
+    _expire_stale_jobs(user, digest)
+    job = reusable_job(user, digest)
+    if job:
+        return job, False
+
+    try:
+        with transaction.atomic():
+            job = ReportJob.objects.create(
+                user=user,
+                report_type=report_type,
+                format=export_format,
+                params=params,
+                params_hash=digest,
+            )
+    except IntegrityError:
+        # A concurrent identical request won the unique active-job slot
+        job = reusable_job(user, digest)
+        if job:
+            return job, False
+        raise
+
+    job_id = str(job.pk)
+    transaction.on_commit(lambda: run_report_job.delay(job_id))
+    return job, True
+
+
+def _track_progress(job_id, rows):
+    """Pass rows through, recording how many were written every so often"""
+    from .models import ReportJob
+
+    every = getattr(settings, 'REPORT_JOB_PROGRESS_EVERY', 1000)
+    written = 0
+    for row in rows:
+        yield row
+        written += 1
+        if written % every == 0:
+            ReportJob.objects.filter(pk=job_id).update(rows_written=written)
+    ReportJob.objects.filter(pk=job_id).update(rows_written=written)
+
+
+def _encoded(chunks):
+    for chunk in chunks:
+        yield chunk.encode('utf-8')
+
+
+def _store_output(job, handle, size):
+    from file_management.models import UploadedFile
+
+    extension = 'xlsx' if job.format == 'excel' else 'csv'
+    filename = f"{job.report_type}_report_{timezone.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    upload = UploadedFile(
+        original_filename=filename,
+        file_size=size,
+        file_type='document',
+        mime_type=XLSX_CONTENT_TYPE if job.format == 'excel' else CSV_CONTENT_TYPE,
+        uploaded_by=job.user,
+        upload_purpose='general',
+        is_temp=True,
+        expires_at=timezone.now() + timedelta(seconds=getattr(settings, 'REPORT_JOB_RETENTION', 24 * 60 * 60)),
+        metadata={'report_job': str(job.pk), 'report_type': job.report_type},
+        description=f'{job.get_report_type_display()} report',
+    )
+    upload.file.save(filename, File(handle), save=False)
+    upload.save()
+    return upload
+
+
+def execute_report_job(job_id):
+    """Build a queued job's output; returns the job, or None if another worker has it"""
+    from .models import ReportJob
+
+    claimed = ReportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=timezone.now()
+    )
+    if not claimed:
+        return None
+
+    job = ReportJob.objects.select_related('user').get(pk=job_id)
+    try:
+        source = import_string(REPORT_SOURCES[job.report_type])
+        columns, rows, total = source(job.user, job.params)
+        ReportJob.objects.filter(pk=job.pk).update(total_rows=total)
+
+        rows = _track_progress(job.pk, rows)
+        if job.format == 'excel':
+            chunks = stream_xlsx(columns, rows, sheet_name=f'{job.report_type.title()} Report')
+        else:
+            chunks = _encoded(stream_csv(columns, rows))
+
+        with tempfile.TemporaryFile() as handle:
+            for chunk in chunks:
+                handle.write(chunk)
+            size = handle.tell()
+            handle.seek(0)
+            upload = _store_output(job, handle, size)
+    except Exception as e:
+        ReportJob.objects.filter(pk=job.pk).update(
+            status='failed', error=str(e), completed_at=timezone.now()
+        )
+        raise
+
+    ReportJob.objects.filter(pk=job.pk).update(
+        status='completed', output=upload, completed_at=timezone.now()
+    )
+    job.refresh_from_db()
+    return job
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from .models import (
     DashboardStats, DashboardNotification, QuickAction, 
-    DashboardAnalytics, PerformanceMetrics, PendingAction
+    DashboardAnalytics, PerformanceMetrics, PendingAction, ReportJob
 )
 from django.contrib.auth import get_user_model
 
@@ -142,4 +142,48 @@ class ClientDashboardSerializer(serializers.Serializer):
     analytics = DashboardAnalyticsDataSerializer()
     pending_actions = PendingActionSerializer()
     notifications = DashboardNotificationSerializer(many=True)
-    quick_actions = QuickActionSerializer(many=True) 
\ No newline at end of file
+    quick_actions = QuickActionSerializer(many=True) 
+
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    """Serializer for queueing a background report"""
+    report_type = serializers.ChoiceField(choices=ReportJob.REPORT_TYPES)
+    format = serializers.ChoiceField(choices=ReportJob.FORMAT_CHOICES, default='csv')
+    params = serializers.DictField(required=False, default=dict)
+
+    def validate(self, attrs):
+        if attrs['report_type'] == 'reviews':
+            from reviews.serializers import ReviewReportSerializer
+
+            params = ReviewReportSerializer(data=attrs['params'])
+            params.is_valid(raise_exception=True)
+            attrs['params'] = dict(params.validated_data)
+        return attrs
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """Serializer for report job progress"""
+    job_id = serializers.UUIDField(source='id', read_only=True)
+    progress = serializers.IntegerField(read_only=True)
+    download_url = serializers.SerializerMethodField()
+    expires_at = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'job_id', 'report_type', 'format', 'params', 'status', 'progress',
+            'total_rows', 'rows_written', 'error', 'download_url', 'expires_at',
+            'created_at', 'started_at', 'completed_at',
+        ]
+
+    def get_download_url(self, obj):
+        if obj.status != 'completed' or not obj.output:
+            return None
+        from django.urls import reverse
+
+        url = reverse('file_management:file_download', kwargs={'file_id': obj.output.file_id})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_expires_at(self, obj):
+        return obj.output.expires_at if obj.output else None
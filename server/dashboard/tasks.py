@@ -0,0 +1,31 @@
+from celery import shared_task
+from .report_jobs import execute_report_job
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def run_report_job(job_id):
+    """
+    إنشاء ملف التقرير المطلوب في الخلفية وحفظه كملف مؤقت للتحميل
+    """
+    try:
+        job = execute_report_job(job_id)
+        if job is None:
+            logger.info(f'Report job {job_id} already claimed, skipping')
+            return {'success': True, 'job_id': job_id, 'skipped': True}
+
+        logger.info(f'Report job {job_id} completed: {job.rows_written} rows')
+        return {
+            'success': True,
+            'job_id': job_id,
+            'rows_written': job.rows_written
+        }
+    except Exception as e:
+        logger.error(f'Report job {job_id} failed: {str(e)}')
+        return {
+            'success': False,
+            'job_id': job_id,
+            'error': str(e)
+        }
@@ -1,3 +1,172 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from unittest.mock import patch
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from projects.models import Project, ProjectView
+from reviews.models import Review
+from .counters import CounterBuffer, first_hit
+from .models import ReportJob
+from .report_jobs import execute_report_job, submit_report_job
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(ENGAGEMENT_COUNTER_FLUSH_INTERVAL=3600, ENGAGEMENT_COUNTER_MAX_PENDING=1000)
+class CounterBufferTest(TestCase):
+    """Test buffered engagement counters"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.project = Project.objects.create(
+            title='Deck repair',
+            description='Replace rotten boards',
+            client=self.user,
+            location='Austin, TX',
+            status='published'
+        )
+        self.buffer = CounterBuffer()
+    
+    def test_first_hit_dedupes_within_window(self):
+        """Only the first hit of a viewer counts"""
+        self.assertTrue(first_hit('project', self.project.pk, 'ip-1.2.3.4'))
+        self.assertFalse(first_hit('project', self.project.pk, 'ip-1.2.3.4'))
+        self.assertTrue(first_hit('project', self.project.pk, 'ip-5.6.7.8'))
+    
+    def test_deltas_are_written_on_flush(self):
+        """Nothing is written until flush, then counts and rows land in bulk"""
+        for _ in range(3):
+            self.buffer.increment(Project, self.project.pk, 'views_count')
+            self.buffer.add_row(ProjectView(project=self.project, ip_address='1.2.3.4'))
+        
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.views_count, 0)
+        self.assertEqual(self.buffer.pending(Project, self.project.pk, 'views_count'), 3)
+        
+        # the two writes plus the savepoint around them
+        with self.assertNumQueries(4):
+            self.assertEqual(self.buffer.flush(), 6)
+        
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.views_count, 3)
+        self.assertEqual(ProjectView.objects.filter(project=self.project).count(), 3)
+        self.assertEqual(self.buffer.flush(), 0)
+    
+    def test_failed_flush_requeues_everything(self):
+        """Deltas and rows survive a failed write and are counted as pending again"""
+        self.buffer.increment(Project, self.project.pk, 'views_count')
+        self.buffer.increment(Project, self.project.pk, 'views_count')
+        self.buffer.add_row(ProjectView(project=self.project, ip_address='1.2.3.4'))
+        
+        with patch.object(self.buffer, '_write', side_effect=RuntimeError('db down')):
+            self.assertEqual(self.buffer.flush(), 0)
+        
+        # one merged delta plus the row
+        self.assertEqual(self.buffer.flush(), 2)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.views_count, 2)
+        self.assertEqual(ProjectView.objects.filter(project=self.project).count(), 1)
+    
+    def test_rejected_row_is_dropped_without_recounting(self):
+        """A row the database rejects is dropped; the deltas are written once"""
+        self.buffer.increment(Project, self.project.pk, 'views_count')
+        self.buffer.increment(Project, self.project.pk, 'views_count')
+        self.buffer.add_row(ProjectView(project=self.project, ip_address='1.2.3.4'))
+        self.buffer.add_row(ProjectView(project=self.project, ip_address='5.6.7.8'))
+        
+        bulk_create = ProjectView.objects.bulk_create
+        
+        def reject_one(instances, **kwargs):
+            if any(view.ip_address == '5.6.7.8' for view in instances):
+                raise IntegrityError('project is gone')
+            return bulk_create(instances, **kwargs)
+        
+        with patch.object(ProjectView.objects, 'bulk_create', side_effect=reject_one):
+            self.assertEqual(self.buffer.flush(), 2)
+            self.assertEqual(self.buffer.flush(), 0)
+        
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.views_count, 2)
+        self.assertEqual(
+            list(ProjectView.objects.filter(project=self.project).values_list('ip_address', flat=True)),
+            ['1.2.3.4']
+        )
+
+
+class ReportJobTest(TestCase):
+    """Test background report jobs"""
+    
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.pro = User.objects.create_user(
+            username='pro',
+            email='pro@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        for rating in (5, 4):
+            Review.objects.create(
+                reviewer=self.client_user,
+                reviewee=self.pro,
+                review_type='client_to_professional',
+                rating=rating,
+                comment='Great, on time'
+            )
+    
+    @patch('dashboard.tasks.run_report_job.delay')
+    def test_identical_requests_share_a_job(self, delay):
+        """The same parameters reuse the queued job; different ones get their own"""
+        params = {'period': 'month', 'include_comments': True}
+        job, created = submit_report_job(self.client_user, 'reviews', 'csv', params)
+        again, created_again = submit_report_job(self.client_user, 'reviews', 'csv', dict(params))
+        other, created_other = submit_report_job(self.client_user, 'reviews', 'excel', params)
+        
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.pk, job.pk)
+        self.assertTrue(created_other)
+        self.assertEqual(ReportJob.objects.count(), 2)
+    
+    @patch('dashboard.tasks.run_report_job.delay')
+    def test_job_writes_temporary_upload(self, delay):
+        """Running a job stores the rows as an expiring general upload"""
+        job, _ = submit_report_job(self.client_user, 'reviews', 'csv', {'include_comments': True})
+        job = execute_report_job(job.pk)
+        
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.total_rows, 2)
+        self.assertEqual(job.rows_written, 2)
+        self.assertEqual(job.progress, 100)
+        upload = job.output
+        self.assertEqual(upload.upload_purpose, 'general')
+        self.assertTrue(upload.is_temp)
+        self.assertIsNotNone(upload.expires_at)
+        with upload.file.open('rb') as handle:
+            lines = handle.read().decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('comment', lines[0])
+        
+        # A finished job is claimed only once and is reused while fresh
+        self.assertIsNone(execute_report_job(job.pk))
+        reused, created = submit_report_job(self.client_user, 'reviews', 'csv', {'include_comments': True})
+        self.assertFalse(created)
+        self.assertEqual(reused.pk, job.pk)
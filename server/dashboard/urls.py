@@ -25,8 +25,12 @@ urlpatterns = [
     path('notifications/', views.notifications, name='notifications'),
     path('quick-actions/', views.quick_actions, name='quick_actions'),
     
+    # Background report exports
+    path('reports/', views.create_report_job, name='report_job_create'),
+    path('reports/<uuid:job_id>/', views.report_job_status, name='report_job_status'),
+    
     # Action endpoints
     path('jobs/<int:job_id>/progress/', views.update_job_progress, name='update_job_progress'),
     path('messages/<int:message_id>/read/', views.mark_message_read, name='mark_message_read'),
     path('notifications/<int:notification_id>/read/', views.mark_notification_read, name='mark_notification_read'),
-] 
\ No newline at end of file
+] 
\ No newline at end of file
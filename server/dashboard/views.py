@@ -7,14 +7,15 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 from .models import (
     DashboardStats, DashboardNotification, QuickAction, 
-    DashboardAnalytics, PerformanceMetrics, PendingAction
+    DashboardAnalytics, PerformanceMetrics, PendingAction, ReportJob
 )
 from .serializers import (
     ProfessionalDashboardSerializer, ClientDashboardSerializer,
     DashboardStatsSerializer, DashboardNotificationSerializer,
     QuickActionSerializer, PerformanceMetricsSerializer,
-    PendingActionSerializer
+    PendingActionSerializer, ReportJobCreateSerializer, ReportJobSerializer
 )
+from .report_jobs import submit_report_job
 from projects.models import Project
 from proposals.models import Proposal
 from contracts.models import Contract
@@ -975,3 +976,33 @@ def quick_actions(request):
             {'error': f'Failed to load quick actions: {str(e)}'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_report_job(request):
+    """Queue a payments, reviews or disputes report; identical requests share one job"""
+    serializer = ReportJobCreateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    try:
+        job, created = submit_report_job(request.user, data['report_type'], data['format'], data['params'])
+        return Response(
+            ReportJobSerializer(job, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+        )
+    except Exception as e:
+        return Response(
+            {'error': f'Failed to queue report: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_job_status(request, job_id):
+    """Poll a report job's progress; completed jobs carry a download link"""
+    job = ReportJob.objects.select_related('output').filter(pk=job_id, user=request.user).first()
+    if job is None:
+        return Response({'error': 'Report job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(ReportJobSerializer(job, context={'request': request}).data)
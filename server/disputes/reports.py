@@ -0,0 +1,69 @@
+"""
+Dispute report rows for background report jobs.
+"""
+from datetime import datetime
+
+from django.db.models import Q
+
+from .models import Dispute
+
+COLUMNS = [
+    'dispute_id', 'title', 'dispute_type', 'status', 'priority', 'raised_by', 'against',
+    'contract_id', 'disputed_amount', 'refund_amount', 'created_at', 'resolution_date',
+]
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _timestamp(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+
+def dispute_report_queryset(user, params):
+    """Disputes visible to ``user`` (all of them for staff) narrowed by the filters"""
+    disputes = Dispute.objects.all()
+    if not user.is_staff:
+        disputes = disputes.filter(Q(raised_by=user) | Q(against=user))
+
+    for field in ('status', 'dispute_type', 'priority'):
+        value = params.get(field)
+        if value and value != 'all':
+            disputes = disputes.filter(**{field: value})
+
+    start_date = _parse_date(params.get('start_date'))
+    if start_date:
+        disputes = disputes.filter(created_at__date__gte=start_date)
+    end_date = _parse_date(params.get('end_date'))
+    if end_date:
+        disputes = disputes.filter(created_at__date__lte=end_date)
+    return disputes
+
+
+def dispute_report_rows(disputes, chunk_size=2000):
+    disputes = disputes.select_related('raised_by', 'against').order_by('created_at', 'pk')
+    for dispute in disputes.iterator(chunk_size=chunk_size):
+        yield [
+            str(dispute.dispute_id),
+            dispute.title,
+            dispute.dispute_type,
+            dispute.status,
+            dispute.priority,
+            dispute.raised_by.get_full_name() or dispute.raised_by.username,
+            dispute.against.get_full_name() or dispute.against.username,
+            dispute.contract_id or '',
+            float(dispute.disputed_amount) if dispute.disputed_amount is not None else None,
+            float(dispute.refund_amount) if dispute.refund_amount is not None else None,
+            _timestamp(dispute.created_at),
+            _timestamp(dispute.resolution_date),
+        ]
+
+
+def dispute_report_source(user, params):
+    """(columns, rows, total) for a background report job"""
+    disputes = dispute_report_queryset(user, params)
+    return COLUMNS, dispute_report_rows(disputes), disputes.count()
@@ -0,0 +1,50 @@
+"""Expired temporary uploads and file shares"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from common.scheduler import DueJob
+
+from .models import FileShare, UploadedFile
+
+
+def _delete_stored_files(names, storage):
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            # A file missing from storage is already as gone as we want it
+            pass
+
+
+def _delete_temp_files(files):
+    names = []
+    for upload in files:
+        names.extend(name for name in (upload.file.name, upload.thumbnail.name) if name)
+    UploadedFile.objects.filter(pk__in=[upload.pk for upload in files]).delete()
+
+    # Only drop the stored files once the rows are really gone
+    storage = UploadedFile._meta.get_field('file').storage
+    transaction.on_commit(lambda: _delete_stored_files(names, storage))
+
+
+def _delete_shares(shares):
+    FileShare.objects.filter(pk__in=[share.pk for share in shares]).delete()
+
+
+temp_file_expiry = DueJob(
+    name='temp_file_expiry',
+    model=UploadedFile,
+    due_field='expires_at',
+    handle=_delete_temp_files,
+    filters=Q(is_temp=True),
+)
+
+# Expired shares stay listed (as expired) for a while before they are removed
+file_share_expiry = DueJob(
+    name='file_share_expiry',
+    model=FileShare,
+    due_field='expires_at',
+    handle=_delete_shares,
+    grace=getattr(settings, 'FILE_SHARE_EXPIRED_RETENTION', 7 * 24 * 60 * 60),
+)
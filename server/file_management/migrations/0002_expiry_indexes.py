@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='uploadedfile',
+            index=models.Index(fields=['is_temp', 'expires_at'], name='uploaded_fi_is_temp_41d2ed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fileshare',
+            index=models.Index(fields=['expires_at'], name='file_shares_expires_1bc2a0_idx'),
+        ),
+    ]
@@ -113,6 +113,7 @@ class UploadedFile(models.Model):
             models.Index(fields=['file_type']),
             models.Index(fields=['upload_purpose']),
             models.Index(fields=['is_public']),
+            models.Index(fields=['is_temp', 'expires_at']),
         ]
     
     def __str__(self):
@@ -134,10 +135,9 @@ class UploadedFile(models.Model):
         return os.path.splitext(self.original_filename)[1].lower()
     
     def increment_download_count(self):
-        """Increment download counter"""
-        self.download_count += 1
-        self.last_accessed = timezone.now()
-        self.save(update_fields=['download_count', 'last_accessed'])
+        """Increment download counter (buffered, written by the next counter flush)"""
+        from dashboard.counters import increment
+        increment(UploadedFile, self.pk, 'download_count', touch_field='last_accessed')
     
     def is_image(self):
         """Check if file is an image"""
@@ -186,6 +186,9 @@ class FileShare(models.Model):
         verbose_name = 'File Share'
         verbose_name_plural = 'File Shares'
         unique_together = ['file', 'shared_with']
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
     
     def __str__(self):
         return f"{self.file.original_filename} shared with {self.shared_with.get_full_name()}"
@@ -204,12 +207,23 @@ class FileShare(models.Model):
     
     def record_access(self):
         """Record file access"""
-        if self.can_access():
-            self.access_count += 1
-            self.last_accessed = timezone.now()
-            self.save(update_fields=['access_count', 'last_accessed'])
-            return True
-        return False
+        if not self.can_access():
+            return False
+        
+        if self.max_access_count:
+            # Limited shares are enforced in the database so concurrent hits can't overshoot
+            updated = FileShare.objects.filter(
+                pk=self.pk,
+                access_count__lt=self.max_access_count
+            ).update(
+                access_count=models.F('access_count') + 1,
+                last_accessed=timezone.now()
+            )
+            return bool(updated)
+        
+        from dashboard.counters import increment
+        increment(FileShare, self.pk, 'access_count', touch_field='last_accessed')
+        return True
 
 
 class FileVersion(models.Model):
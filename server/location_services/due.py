@@ -0,0 +1,19 @@
+"""Location permissions switched off once they expire"""
+from django.db.models import Q
+
+from common.scheduler import DueJob
+
+from .models import LocationPermission
+
+
+def _deactivate(permissions):
+    LocationPermission.objects.filter(pk__in=[permission.pk for permission in permissions]).update(is_active=False)
+
+
+location_permission_expiry = DueJob(
+    name='location_permission_expiry',
+    model=LocationPermission,
+    due_field='expires_at',
+    handle=_deactivate,
+    filters=Q(is_active=True),
+)
@@ -1,11 +1,253 @@
-from django.core.management.base import BaseCommand
+import csv
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from location_services.models import Country, City
 
 
+DEFAULT_BATCH_SIZE = 2000
+
+# أعمدة ملف countryInfo.txt من GeoNames
+GEONAMES_COUNTRY_COLUMNS = {'iso2': 0, 'code': 1, 'name': 4, 'currency': 10}
+
+# أعمدة ملفات cities*.txt / allCountries.txt من GeoNames
+GEONAMES_CITY_COLUMNS = {
+    'name': 1,
+    'latitude': 4,
+    'longitude': 5,
+    'country_code': 8,
+    'population': 14,
+    'timezone': 17,
+}
+
+# البيانات الافتراضية عند عدم تمرير ملفات
+DEFAULT_LOCATIONS = {
+    'مصر': {
+        'code': 'EGY',
+        'currency': 'EGP',
+        'cities': [
+            {'name': 'القاهرة', 'lat': 30.0444, 'lng': 31.2357, 'timezone': 'Africa/Cairo'},
+            {'name': 'الإسكندرية', 'lat': 31.2001, 'lng': 29.9187, 'timezone': 'Africa/Cairo'},
+            {'name': 'الجيزة', 'lat': 30.0131, 'lng': 31.2089, 'timezone': 'Africa/Cairo'},
+            {'name': 'شبرا الخيمة', 'lat': 30.1281, 'lng': 31.2441, 'timezone': 'Africa/Cairo'},
+            {'name': 'بورسعيد', 'lat': 31.2653, 'lng': 32.3019, 'timezone': 'Africa/Cairo'},
+            {'name': 'السويس', 'lat': 29.9668, 'lng': 32.5498, 'timezone': 'Africa/Cairo'},
+            {'name': 'الأقصر', 'lat': 25.6872, 'lng': 32.6396, 'timezone': 'Africa/Cairo'},
+            {'name': 'أسوان', 'lat': 24.0889, 'lng': 32.8998, 'timezone': 'Africa/Cairo'},
+            {'name': 'المنيا', 'lat': 28.0871, 'lng': 30.7618, 'timezone': 'Africa/Cairo'},
+            {'name': 'طنطا', 'lat': 30.7865, 'lng': 31.0004, 'timezone': 'Africa/Cairo'},
+        ]
+    },
+    'السعودية': {
+        'code': 'SAU',
+        'currency': 'SAR',
+        'cities': [
+            {'name': 'الرياض', 'lat': 24.7136, 'lng': 46.6753, 'timezone': 'Asia/Riyadh'},
+            {'name': 'جدة', 'lat': 21.4858, 'lng': 39.1925, 'timezone': 'Asia/Riyadh'},
+            {'name': 'مكة المكرمة', 'lat': 21.3891, 'lng': 39.8579, 'timezone': 'Asia/Riyadh'},
+            {'name': 'المدينة المنورة', 'lat': 24.5247, 'lng': 39.5692, 'timezone': 'Asia/Riyadh'},
+            {'name': 'الدمام', 'lat': 26.4282, 'lng': 50.0888, 'timezone': 'Asia/Riyadh'},
+            {'name': 'الخبر', 'lat': 26.2172, 'lng': 50.1971, 'timezone': 'Asia/Riyadh'},
+            {'name': 'تبوك', 'lat': 28.3838, 'lng': 36.5550, 'timezone': 'Asia/Riyadh'},
+            {'name': 'بريدة', 'lat': 26.3260, 'lng': 43.9750, 'timezone': 'Asia/Riyadh'},
+        ]
+    },
+    'الإمارات': {
+        'code': 'UAE',
+        'currency': 'AED',
+        'cities': [
+            {'name': 'دبي', 'lat': 25.2048, 'lng': 55.2708, 'timezone': 'Asia/Dubai'},
+            {'name': 'أبوظبي', 'lat': 24.2992, 'lng': 54.6973, 'timezone': 'Asia/Dubai'},
+            {'name': 'الشارقة', 'lat': 25.3573, 'lng': 55.4033, 'timezone': 'Asia/Dubai'},
+            {'name': 'عجمان', 'lat': 25.4052, 'lng': 55.5136, 'timezone': 'Asia/Dubai'},
+            {'name': 'رأس الخيمة', 'lat': 25.7889, 'lng': 55.9598, 'timezone': 'Asia/Dubai'},
+            {'name': 'الفجيرة', 'lat': 25.1164, 'lng': 56.3267, 'timezone': 'Asia/Dubai'},
+            {'name': 'أم القيوين', 'lat': 25.5206, 'lng': 55.7324, 'timezone': 'Asia/Dubai'},
+        ]
+    },
+    'الكويت': {
+        'code': 'KWT',
+        'currency': 'KWD',
+        'cities': [
+            {'name': 'مدينة الكويت', 'lat': 29.3759, 'lng': 47.9774, 'timezone': 'Asia/Kuwait'},
+            {'name': 'حولي', 'lat': 29.3375, 'lng': 48.0281, 'timezone': 'Asia/Kuwait'},
+            {'name': 'الفروانية', 'lat': 29.2975, 'lng': 47.9583, 'timezone': 'Asia/Kuwait'},
+            {'name': 'مبارك الكبير', 'lat': 29.2542, 'lng': 48.0833, 'timezone': 'Asia/Kuwait'},
+            {'name': 'الأحمدي', 'lat': 29.0769, 'lng': 48.0492, 'timezone': 'Asia/Kuwait'},
+            {'name': 'الجهراء', 'lat': 29.3375, 'lng': 47.6581, 'timezone': 'Asia/Kuwait'},
+        ]
+    },
+    'قطر': {
+        'code': 'QAT',
+        'currency': 'QAR',
+        'cities': [
+            {'name': 'الدوحة', 'lat': 25.2854, 'lng': 51.5310, 'timezone': 'Asia/Qatar'},
+            {'name': 'الريان', 'lat': 25.2919, 'lng': 51.4240, 'timezone': 'Asia/Qatar'},
+            {'name': 'أم صلال', 'lat': 25.4058, 'lng': 51.4064, 'timezone': 'Asia/Qatar'},
+            {'name': 'الوكرة', 'lat': 25.1624, 'lng': 51.6030, 'timezone': 'Asia/Qatar'},
+        ]
+    },
+    'البحرين': {
+        'code': 'BHR',
+        'currency': 'BHD',
+        'cities': [
+            {'name': 'المنامة', 'lat': 26.2285, 'lng': 50.5860, 'timezone': 'Asia/Bahrain'},
+            {'name': 'المحرق', 'lat': 26.2700, 'lng': 50.6100, 'timezone': 'Asia/Bahrain'},
+            {'name': 'الرفاع', 'lat': 26.1300, 'lng': 50.5550, 'timezone': 'Asia/Bahrain'},
+            {'name': 'حمد', 'lat': 26.1300, 'lng': 50.4800, 'timezone': 'Asia/Bahrain'},
+        ]
+    },
+    'عُمان': {
+        'code': 'OMN',
+        'currency': 'OMR',
+        'cities': [
+            {'name': 'مسقط', 'lat': 23.5859, 'lng': 58.4059, 'timezone': 'Asia/Muscat'},
+            {'name': 'صلالة', 'lat': 17.0193, 'lng': 54.0924, 'timezone': 'Asia/Muscat'},
+            {'name': 'السيب', 'lat': 23.6700, 'lng': 58.1900, 'timezone': 'Asia/Muscat'},
+            {'name': 'صحار', 'lat': 24.3467, 'lng': 56.7069, 'timezone': 'Asia/Muscat'},
+        ]
+    },
+    'الأردن': {
+        'code': 'JOR',
+        'currency': 'JOD',
+        'cities': [
+            {'name': 'عمان', 'lat': 31.9539, 'lng': 35.9106, 'timezone': 'Asia/Amman'},
+            {'name': 'إربد', 'lat': 32.5556, 'lng': 35.8500, 'timezone': 'Asia/Amman'},
+            {'name': 'الزرقاء', 'lat': 32.0728, 'lng': 36.0908, 'timezone': 'Asia/Amman'},
+            {'name': 'العقبة', 'lat': 29.5267, 'lng': 35.0067, 'timezone': 'Asia/Amman'},
+        ]
+    },
+    'لبنان': {
+        'code': 'LBN',
+        'currency': 'LBP',
+        'cities': [
+            {'name': 'بيروت', 'lat': 33.8886, 'lng': 35.4955, 'timezone': 'Asia/Beirut'},
+            {'name': 'طرابلس', 'lat': 34.4467, 'lng': 35.8397, 'timezone': 'Asia/Beirut'},
+            {'name': 'صيدا', 'lat': 33.5633, 'lng': 35.3650, 'timezone': 'Asia/Beirut'},
+            {'name': 'صور', 'lat': 33.2700, 'lng': 35.2000, 'timezone': 'Asia/Beirut'},
+        ]
+    },
+    'المغرب': {
+        'code': 'MAR',
+        'currency': 'MAD',
+        'cities': [
+            {'name': 'الدار البيضاء', 'lat': 33.5731, 'lng': -7.5898, 'timezone': 'Africa/Casablanca'},
+            {'name': 'الرباط', 'lat': 34.0209, 'lng': -6.8416, 'timezone': 'Africa/Casablanca'},
+            {'name': 'فاس', 'lat': 34.0181, 'lng': -5.0078, 'timezone': 'Africa/Casablanca'},
+            {'name': 'مراكش', 'lat': 31.6295, 'lng': -7.9811, 'timezone': 'Africa/Casablanca'},
+            {'name': 'طنجة', 'lat': 35.7595, 'lng': -5.8340, 'timezone': 'Africa/Casablanca'},
+            {'name': 'أغادير', 'lat': 30.4278, 'lng': -9.5981, 'timezone': 'Africa/Casablanca'},
+        ]
+    }
+}
+
+
+def chunked(iterable, size):
+    """تقسيم أي مولّد إلى دفعات بحجم ثابت دون تحميله كاملاً في الذاكرة"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def read_records(path, file_format):
+    """قراءة ملف TSV/CSV سطراً بسطر وإرجاع السجلات كمولّد"""
+    with open(path, encoding='utf-8', newline='') as handle:
+        if file_format == 'geonames':
+            reader = csv.reader(handle, delimiter='\t', quoting=csv.QUOTE_NONE)
+            for row in reader:
+                if not row or row[0].startswith('#'):
+                    continue
+                yield row
+        else:
+            delimiter = '\t' if path.endswith('.tsv') else ','
+            yield from csv.DictReader(handle, delimiter=delimiter)
+
+
+def _column(record, key, columns):
+    """قراءة عمود من سجل GeoNames (قائمة) أو CSV (قاموس)"""
+    if isinstance(record, dict):
+        return (record.get(key) or '').strip()
+    index = columns[key]
+    return record[index].strip() if index < len(record) else ''
+
+
+def _coordinate(value):
+    try:
+        return Decimal(value).quantize(Decimal('0.00000001')) if value else None
+    except InvalidOperation:
+        return None
+
+
+def parse_countries(records):
+    """تحويل السجلات إلى بيانات دول"""
+    for record in records:
+        code = _column(record, 'code', GEONAMES_COUNTRY_COLUMNS).upper()
+        name = _column(record, 'name', GEONAMES_COUNTRY_COLUMNS)
+        if not code or not name:
+            continue
+        yield {
+            'code': code[:3],
+            'iso2': _column(record, 'iso2', GEONAMES_COUNTRY_COLUMNS).upper(),
+            'name': name[:100],
+            'currency': _column(record, 'currency', GEONAMES_COUNTRY_COLUMNS).upper()[:3],
+        }
+
+
+def parse_cities(records, min_population=0):
+    """تحويل السجلات إلى بيانات مدن مع تجاهل السجلات غير الصالحة"""
+    for record in records:
+        name = _column(record, 'name', GEONAMES_CITY_COLUMNS)
+        country_code = _column(record, 'country_code', GEONAMES_CITY_COLUMNS).upper()
+        if not name or not country_code:
+            continue
+        if min_population:
+            population = _column(record, 'population', GEONAMES_CITY_COLUMNS)
+            if not population.isdigit() or int(population) < min_population:
+                continue
+        yield {
+            'name': name[:100],
+            'country_code': country_code,
+            'latitude': _coordinate(_column(record, 'latitude', GEONAMES_CITY_COLUMNS)),
+            'longitude': _coordinate(_column(record, 'longitude', GEONAMES_CITY_COLUMNS)),
+            'timezone': _column(record, 'timezone', GEONAMES_CITY_COLUMNS)[:50],
+        }
+
+
+def default_countries():
+    for country_name, country_info in DEFAULT_LOCATIONS.items():
+        yield {
+            'code': country_info['code'],
+            'iso2': '',
+            'name': country_name,
+            'currency': country_info['currency'],
+        }
+
+
+def default_cities():
+    for country_info in DEFAULT_LOCATIONS.values():
+        for city_info in country_info['cities']:
+            yield {
+                'name': city_info['name'],
+                'country_code': country_info['code'],
+                'latitude': _coordinate(str(city_info['lat'])),
+                'longitude': _coordinate(str(city_info['lng'])),
+                'timezone': city_info['timezone'],
+            }
+
+
 class Command(BaseCommand):
     """
     أمر إدارة لتعبئة البيانات الأولية للدول والمدن
+
+    يقرأ ملفات GeoNames (TSV) أو CSV بشكل متدفق ويكتبها على دفعات باستخدام
+    bulk_create(update_conflicts=True)، لذلك يبقى استهلاك الذاكرة ثابتاً
+    ويمكن إعادة التشغيل أكثر من مرة دون تكرار البيانات.
     """
     help = 'تعبئة البيانات الأولية للدول والمدن'
 
@@ -15,8 +257,38 @@ class Command(BaseCommand):
             action='store_true',
             help='مسح البيانات الموجودة قبل التعبئة',
         )
+        parser.add_argument(
+            '--countries-file',
+            help='ملف الدول (countryInfo.txt من GeoNames أو CSV بأعمدة code,iso2,name,currency)',
+        )
+        parser.add_argument(
+            '--cities-file',
+            help='ملف المدن (cities*.txt من GeoNames أو CSV بأعمدة name,country_code,latitude,longitude,timezone)',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['geonames', 'csv'],
+            default='geonames',
+            help='صيغة الملفات المدخلة',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='عدد السجلات في كل دفعة كتابة',
+        )
+        parser.add_argument(
+            '--min-population',
+            type=int,
+            default=0,
+            help='تجاهل المدن الأقل من هذا العدد من السكان (GeoNames فقط)',
+        )
 
     def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        if self.batch_size <= 0:
+            raise CommandError('--batch-size يجب أن يكون أكبر من صفر')
+
         self.stdout.write(
             self.style.SUCCESS('بدء تعبئة البيانات الأولية للمواقع...')
         )
@@ -24,8 +296,39 @@ class Command(BaseCommand):
         if options['clear']:
             self.clear_existing_data()
 
-        with transaction.atomic():
-            self.create_countries_and_cities()
+        file_format = options['format']
+        if options['countries_file']:
+            countries = parse_countries(read_records(options['countries_file'], file_format))
+        elif options['cities_file']:
+            countries = iter(())
+        else:
+            countries = default_countries()
+
+        if options['cities_file']:
+            cities = parse_cities(
+                read_records(options['cities_file'], file_format),
+                min_population=options['min_population'],
+            )
+        else:
+            cities = default_cities()
+
+        self.load_countries(countries)
+
+        # مدن GeoNames تستخدم رموز ISO2، والخريطة محفوظة مع الدول من تشغيل سابق أو حالي
+        iso2_codes = dict(Country.objects.exclude(iso2='').values_list('iso2', 'code'))
+        if options['cities_file'] and file_format == 'geonames' and not iso2_codes:
+            raise CommandError(
+                'مدن GeoNames تستخدم رموز ISO2 ولا توجد دول برموز ISO2 بعد؛ '
+                'مرّر --countries-file (countryInfo.txt) مرة واحدة على الأقل'
+            )
+        self.load_cities(cities, iso2_codes)
+
+        # إحصائيات نهائية
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('=== إحصائيات نهائية ==='))
+        self.stdout.write(f'إجمالي الدول: {Country.objects.count()}')
+        self.stdout.write(f'إجمالي المدن: {City.objects.count()}')
+        self.stdout.write('')
 
         self.stdout.write(
             self.style.SUCCESS('تم تعبئة البيانات الأولية بنجاح!')
@@ -38,172 +341,123 @@ class Command(BaseCommand):
         Country.objects.all().delete()
         self.stdout.write(self.style.WARNING('تم مسح البيانات الموجودة'))
 
-    def create_countries_and_cities(self):
-        """إنشاء الدول والمدن"""
-        
-        # بيانات الدول والمدن
-        countries_data = {
-            'مصر': {
-                'code': 'EGY',
-                'currency': 'EGP',
-                'cities': [
-                    {'name': 'القاهرة', 'lat': 30.0444, 'lng': 31.2357, 'timezone': 'Africa/Cairo'},
-                    {'name': 'الإسكندرية', 'lat': 31.2001, 'lng': 29.9187, 'timezone': 'Africa/Cairo'},
-                    {'name': 'الجيزة', 'lat': 30.0131, 'lng': 31.2089, 'timezone': 'Africa/Cairo'},
-                    {'name': 'شبرا الخيمة', 'lat': 30.1281, 'lng': 31.2441, 'timezone': 'Africa/Cairo'},
-                    {'name': 'بورسعيد', 'lat': 31.2653, 'lng': 32.3019, 'timezone': 'Africa/Cairo'},
-                    {'name': 'السويس', 'lat': 29.9668, 'lng': 32.5498, 'timezone': 'Africa/Cairo'},
-                    {'name': 'الأقصر', 'lat': 25.6872, 'lng': 32.6396, 'timezone': 'Africa/Cairo'},
-                    {'name': 'أسوان', 'lat': 24.0889, 'lng': 32.8998, 'timezone': 'Africa/Cairo'},
-                    {'name': 'المنيا', 'lat': 28.0871, 'lng': 30.7618, 'timezone': 'Africa/Cairo'},
-                    {'name': 'طنطا', 'lat': 30.7865, 'lng': 31.0004, 'timezone': 'Africa/Cairo'},
-                ]
-            },
-            'السعودية': {
-                'code': 'SAU',
-                'currency': 'SAR',
-                'cities': [
-                    {'name': 'الرياض', 'lat': 24.7136, 'lng': 46.6753, 'timezone': 'Asia/Riyadh'},
-                    {'name': 'جدة', 'lat': 21.4858, 'lng': 39.1925, 'timezone': 'Asia/Riyadh'},
-                    {'name': 'مكة المكرمة', 'lat': 21.3891, 'lng': 39.8579, 'timezone': 'Asia/Riyadh'},
-                    {'name': 'المدينة المنورة', 'lat': 24.5247, 'lng': 39.5692, 'timezone': 'Asia/Riyadh'},
-                    {'name': 'الدمام', 'lat': 26.4282, 'lng': 50.0888, 'timezone': 'Asia/Riyadh'},
-                    {'name': 'الخبر', 'lat': 26.2172, 'lng': 50.1971, 'timezone': 'Asia/Riyadh'},
-                    {'name': 'تبوك', 'lat': 28.3838, 'lng': 36.5550, 'timezone': 'Asia/Riyadh'},
-                    {'name': 'بريدة', 'lat': 26.3260, 'lng': 43.9750, 'timezone': 'Asia/Riyadh'},
-                ]
-            },
-            'الإمارات': {
-                'code': 'UAE',
-                'currency': 'AED',
-                'cities': [
-                    {'name': 'دبي', 'lat': 25.2048, 'lng': 55.2708, 'timezone': 'Asia/Dubai'},
-                    {'name': 'أبوظبي', 'lat': 24.2992, 'lng': 54.6973, 'timezone': 'Asia/Dubai'},
-                    {'name': 'الشارقة', 'lat': 25.3573, 'lng': 55.4033, 'timezone': 'Asia/Dubai'},
-                    {'name': 'عجمان', 'lat': 25.4052, 'lng': 55.5136, 'timezone': 'Asia/Dubai'},
-                    {'name': 'رأس الخيمة', 'lat': 25.7889, 'lng': 55.9598, 'timezone': 'Asia/Dubai'},
-                    {'name': 'الفجيرة', 'lat': 25.1164, 'lng': 56.3267, 'timezone': 'Asia/Dubai'},
-                    {'name': 'أم القيوين', 'lat': 25.5206, 'lng': 55.7324, 'timezone': 'Asia/Dubai'},
-                ]
-            },
-            'الكويت': {
-                'code': 'KWT',
-                'currency': 'KWD',
-                'cities': [
-                    {'name': 'مدينة الكويت', 'lat': 29.3759, 'lng': 47.9774, 'timezone': 'Asia/Kuwait'},
-                    {'name': 'حولي', 'lat': 29.3375, 'lng': 48.0281, 'timezone': 'Asia/Kuwait'},
-                    {'name': 'الفروانية', 'lat': 29.2975, 'lng': 47.9583, 'timezone': 'Asia/Kuwait'},
-                    {'name': 'مبارك الكبير', 'lat': 29.2542, 'lng': 48.0833, 'timezone': 'Asia/Kuwait'},
-                    {'name': 'الأحمدي', 'lat': 29.0769, 'lng': 48.0492, 'timezone': 'Asia/Kuwait'},
-                    {'name': 'الجهراء', 'lat': 29.3375, 'lng': 47.6581, 'timezone': 'Asia/Kuwait'},
-                ]
-            },
-            'قطر': {
-                'code': 'QAT',
-                'currency': 'QAR',
-                'cities': [
-                    {'name': 'الدوحة', 'lat': 25.2854, 'lng': 51.5310, 'timezone': 'Asia/Qatar'},
-                    {'name': 'الريان', 'lat': 25.2919, 'lng': 51.4240, 'timezone': 'Asia/Qatar'},
-                    {'name': 'أم صلال', 'lat': 25.4058, 'lng': 51.4064, 'timezone': 'Asia/Qatar'},
-                    {'name': 'الوكرة', 'lat': 25.1624, 'lng': 51.6030, 'timezone': 'Asia/Qatar'},
-                ]
-            },
-            'البحرين': {
-                'code': 'BHR',
-                'currency': 'BHD',
-                'cities': [
-                    {'name': 'المنامة', 'lat': 26.2285, 'lng': 50.5860, 'timezone': 'Asia/Bahrain'},
-                    {'name': 'المحرق', 'lat': 26.2700, 'lng': 50.6100, 'timezone': 'Asia/Bahrain'},
-                    {'name': 'الرفاع', 'lat': 26.1300, 'lng': 50.5550, 'timezone': 'Asia/Bahrain'},
-                    {'name': 'حمد', 'lat': 26.1300, 'lng': 50.4800, 'timezone': 'Asia/Bahrain'},
-                ]
-            },
-            'عُمان': {
-                'code': 'OMN',
-                'currency': 'OMR',
-                'cities': [
-                    {'name': 'مسقط', 'lat': 23.5859, 'lng': 58.4059, 'timezone': 'Asia/Muscat'},
-                    {'name': 'صلالة', 'lat': 17.0193, 'lng': 54.0924, 'timezone': 'Asia/Muscat'},
-                    {'name': 'السيب', 'lat': 23.6700, 'lng': 58.1900, 'timezone': 'Asia/Muscat'},
-                    {'name': 'صحار', 'lat': 24.3467, 'lng': 56.7069, 'timezone': 'Asia/Muscat'},
-                ]
-            },
-            'الأردن': {
-                'code': 'JOR',
-                'currency': 'JOD',
-                'cities': [
-                    {'name': 'عمان', 'lat': 31.9539, 'lng': 35.9106, 'timezone': 'Asia/Amman'},
-                    {'name': 'إربد', 'lat': 32.5556, 'lng': 35.8500, 'timezone': 'Asia/Amman'},
-                    {'name': 'الزرقاء', 'lat': 32.0728, 'lng': 36.0908, 'timezone': 'Asia/Amman'},
-                    {'name': 'العقبة', 'lat': 29.5267, 'lng': 35.0067, 'timezone': 'Asia/Amman'},
-                ]
-            },
-            'لبنان': {
-                'code': 'LBN',
-                'currency': 'LBP',
-                'cities': [
-                    {'name': 'بيروت', 'lat': 33.8886, 'lng': 35.4955, 'timezone': 'Asia/Beirut'},
-                    {'name': 'طرابلس', 'lat': 34.4467, 'lng': 35.8397, 'timezone': 'Asia/Beirut'},
-                    {'name': 'صيدا', 'lat': 33.5633, 'lng': 35.3650, 'timezone': 'Asia/Beirut'},
-                    {'name': 'صور', 'lat': 33.2700, 'lng': 35.2000, 'timezone': 'Asia/Beirut'},
-                ]
-            },
-            'المغرب': {
-                'code': 'MAR',
-                'currency': 'MAD',
-                'cities': [
-                    {'name': 'الدار البيضاء', 'lat': 33.5731, 'lng': -7.5898, 'timezone': 'Africa/Casablanca'},
-                    {'name': 'الرباط', 'lat': 34.0209, 'lng': -6.8416, 'timezone': 'Africa/Casablanca'},
-                    {'name': 'فاس', 'lat': 34.0181, 'lng': -5.0078, 'timezone': 'Africa/Casablanca'},
-                    {'name': 'مراكش', 'lat': 31.6295, 'lng': -7.9811, 'timezone': 'Africa/Casablanca'},
-                    {'name': 'طنجة', 'lat': 35.7595, 'lng': -5.8340, 'timezone': 'Africa/Casablanca'},
-                    {'name': 'أغادير', 'lat': 30.4278, 'lng': -9.5981, 'timezone': 'Africa/Casablanca'},
-                ]
-            }
-        }
+    def load_countries(self, rows):
+        """كتابة الدول على دفعات مع حفظ رموز ISO2 لربط المدن بها لاحقاً"""
+        started = time.monotonic()
+        total = 0
+        skipped = 0
 
-        # إنشاء الدول والمدن
-        for country_name, country_info in countries_data.items():
-            self.stdout.write(f'إنشاء دولة: {country_name}')
-            
-            country, created = Country.objects.get_or_create(
-                name=country_name,
-                defaults={
-                    'code': country_info['code'],
-                    'currency': country_info['currency'],
-                    'is_active': True
-                }
-            )
-            
-            if created:
-                self.stdout.write(
-                    self.style.SUCCESS(f'✓ تم إنشاء دولة: {country_name}')
+        for batch in chunked(rows, self.batch_size):
+            countries = {}
+            for row in batch:
+                countries[row['code']] = Country(
+                    code=row['code'],
+                    iso2=row['iso2'],
+                    name=row['name'],
+                    currency=row['currency'],
+                    is_active=True,
                 )
+
+            update_fields = ['name', 'currency', 'is_active', 'updated_at']
+            if any(country.iso2 for country in countries.values()):
+                # البيانات الافتراضية بلا ISO2 فلا تمسح رموزاً محفوظة
+                update_fields.append('iso2')
+
+            with transaction.atomic():
+                skipped += self.resolve_name_conflicts(countries)
+                Country.objects.bulk_create(
+                    countries.values(),
+                    update_conflicts=True,
+                    unique_fields=['code'],
+                    update_fields=update_fields,
+                )
+            total += len(countries)
+            self.report_progress('الدول', total, started)
+
+        if skipped:
+            self.stdout.write(
+                self.style.WARNING(f'تم تجاهل {skipped} دولة لأن اسمها مستخدم لدولة أخرى')
+            )
+
+    def resolve_name_conflicts(self, countries):
+        """
+        اسم الدولة فريد أيضاً: الدولة المحفوظة بنفس الاسم ورمز مختلف يُنقل صفها
+        إلى الرمز الجديد إن كان متاحاً، وإلا تُحذف الدولة من الدفعة
+        يعدّل ``countries`` ({code: Country}) ويرجع عدد الدول المحذوفة منها
+        """
+        by_name = {}
+        skipped = 0
+        for code, country in list(countries.items()):
+            if by_name.setdefault(country.name, code) != code:
+                # اسم مكرر داخل نفس الدفعة
+                del countries[code]
+                skipped += 1
+
+        clashes = [
+            (code, name)
+            for code, name in Country.objects.filter(name__in=by_name).values_list('code', 'name')
+            if by_name[name] != code
+        ]
+        if not clashes:
+            return skipped
+
+        existing_codes = set(
+            Country.objects.filter(code__in=[by_name[name] for _, name in clashes]).values_list('code', flat=True)
+        )
+        for old_code, name in clashes:
+            new_code = by_name[name]
+            if old_code not in countries and new_code not in existing_codes:
+                # نفس الدولة برمز جديد: الصف ومدنه يبقون
+                Country.objects.filter(code=old_code).update(code=new_code)
+                existing_codes.add(new_code)
             else:
-                self.stdout.write(f'• دولة موجودة: {country_name}')
-
-            # إنشاء المدن
-            for city_info in country_info['cities']:
-                city, created = City.objects.get_or_create(
-                    name=city_info['name'],
-                    country=country,
-                    defaults={
-                        'latitude': city_info['lat'],
-                        'longitude': city_info['lng'],
-                        'timezone': city_info['timezone'],
-                        'is_active': True
-                    }
+                del countries[new_code]
+                skipped += 1
+        return skipped
+
+    def load_cities(self, rows, iso2_codes):
+        """كتابة المدن على دفعات مع إزالة التكرار داخل كل دفعة"""
+        country_ids = dict(Country.objects.values_list('code', 'id'))
+        started = time.monotonic()
+        total = 0
+        skipped = 0
+
+        for batch in chunked(rows, self.batch_size):
+            # ON CONFLICT لا يسمح بتحديث نفس الصف مرتين في نفس الأمر
+            cities = {}
+            for row in batch:
+                code = iso2_codes.get(row['country_code'], row['country_code'])
+                country_id = country_ids.get(code)
+                if country_id is None:
+                    skipped += 1
+                    continue
+                cities[(row['name'], country_id)] = City(
+                    name=row['name'],
+                    country_id=country_id,
+                    latitude=row['latitude'],
+                    longitude=row['longitude'],
+                    timezone=row['timezone'],
+                    is_active=True,
                 )
-                
-                if created:
-                    self.stdout.write(f'  ✓ تم إنشاء مدينة: {city_info["name"]}')
 
-        # إحصائيات نهائية
-        countries_count = Country.objects.count()
-        cities_count = City.objects.count()
-        
-        self.stdout.write('')
-        self.stdout.write(self.style.SUCCESS('=== إحصائيات نهائية ==='))
-        self.stdout.write(f'إجمالي الدول: {countries_count}')
-        self.stdout.write(f'إجمالي المدن: {cities_count}')
-        self.stdout.write('') 
\ No newline at end of file
+            if cities:
+                with transaction.atomic():
+                    City.objects.bulk_create(
+                        cities.values(),
+                        update_conflicts=True,
+                        unique_fields=['name', 'country'],
+                        update_fields=['latitude', 'longitude', 'timezone', 'is_active', 'updated_at'],
+                    )
+            total += len(cities)
+            self.report_progress('المدن', total, started)
+
+        if skipped:
+            self.stdout.write(
+                self.style.WARNING(f'تم تجاهل {skipped} مدينة لعدم وجود الدولة التابعة لها')
+            )
+
+    def report_progress(self, label, total, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'  ✓ {label}: {total} سجل ({total / elapsed:,.0f} سجل/ثانية)'
+        )
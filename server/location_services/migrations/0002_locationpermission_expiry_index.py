@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('location_services', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='locationpermission',
+            index=models.Index(fields=['is_active', 'expires_at'], name='location_se_is_acti_8e1155_idx'),
+        ),
+    ]
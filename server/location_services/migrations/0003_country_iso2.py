@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('location_services', '0002_locationpermission_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='country',
+            name='iso2',
+            field=models.CharField(blank=True, default='', help_text='رمز الدولة الثنائي (ISO 3166-1 alpha-2)، تستخدمه ملفات مدن GeoNames', max_length=2),
+        ),
+    ]
@@ -21,6 +21,12 @@ class Country(models.Model):
         unique=True,
         help_text='رمز الدولة (ISO)'
     )
+    iso2 = models.CharField(
+        max_length=2,
+        blank=True,
+        default='',
+        help_text='رمز الدولة الثنائي (ISO 3166-1 alpha-2)، تستخدمه ملفات مدن GeoNames'
+    )
     currency = models.CharField(
         max_length=3,
         help_text='رمز العملة'
@@ -450,6 +456,9 @@ class LocationPermission(models.Model):
         verbose_name_plural = 'Location Permissions'
         unique_together = ['user', 'granted_to', 'permission_type']
         ordering = ['-granted_at']
+        indexes = [
+            models.Index(fields=['is_active', 'expires_at']),
+        ]
 
     def __str__(self):
         return f"{self.user.username} -> {self.granted_to.username} ({self.permission_type})"
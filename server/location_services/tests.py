@@ -1,3 +1,90 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+from .management.commands.populate_locations import parse_cities, parse_countries
+from .models import City, Country
 
-# Create your tests here.
+
+def geonames_country(iso2, iso3, name, currency):
+    row = [''] * 11
+    row[0], row[1], row[4], row[10] = iso2, iso3, name, currency
+    return row
+
+
+def geonames_city(name, iso2, population='100000'):
+    row = [''] * 18
+    row[1], row[4], row[5], row[8], row[14], row[17] = name, '30.0444', '31.2357', iso2, population, 'Africa/Cairo'
+    return row
+
+
+class GeoNamesParserTest(SimpleTestCase):
+    """Test parsing GeoNames rows"""
+    
+    def test_countries(self):
+        rows = [geonames_country('eg', 'egy', 'Egypt', 'egp'), geonames_country('', '', 'Nowhere', '')]
+        self.assertEqual(
+            list(parse_countries(rows)),
+            [{'code': 'EGY', 'iso2': 'EG', 'name': 'Egypt', 'currency': 'EGP'}]
+        )
+    
+    def test_cities_skip_small_and_incomplete_rows(self):
+        rows = [geonames_city('Cairo', 'eg'), geonames_city('Tiny', 'EG', '12'), geonames_city('', 'EG')]
+        cities = list(parse_cities(rows, min_population=1000))
+        self.assertEqual(len(cities), 1)
+        self.assertEqual(cities[0]['country_code'], 'EG')
+        self.assertEqual(cities[0]['latitude'], Decimal('30.04440000'))
+        self.assertEqual(cities[0]['timezone'], 'Africa/Cairo')
+
+
+class PopulateLocationsCommandTest(TestCase):
+    """Test loading GeoNames files with populate_locations"""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+    
+    def write(self, name, rows):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write('#ISO\tISO3\n')
+            for row in rows:
+                handle.write('\t'.join(row) + '\n')
+        return path
+    
+    def populate(self, **options):
+        call_command('populate_locations', stdout=StringIO(), **options)
+    
+    def test_cities_only_run_uses_stored_iso2_codes(self):
+        countries = self.write('countryInfo.txt', [geonames_country('EG', 'EGY', 'Egypt', 'EGP')])
+        self.populate(countries_file=countries)
+        self.assertEqual(Country.objects.get(code='EGY').iso2, 'EG')
+        
+        cities = self.write('cities.txt', [geonames_city('Cairo', 'EG'), geonames_city('Paris', 'FR')])
+        self.populate(cities_file=cities)
+        self.assertEqual(list(City.objects.values_list('name', 'country__code')), [('Cairo', 'EGY')])
+    
+    def test_cities_without_iso2_codes_fail_loudly(self):
+        cities = self.write('cities.txt', [geonames_city('Cairo', 'EG')])
+        with self.assertRaises(CommandError):
+            self.populate(cities_file=cities)
+    
+    def test_name_held_by_another_code(self):
+        """A country known under another code is re-keyed, a clashing one is skipped"""
+        egypt = Country.objects.create(code='EGT', name='Egypt', currency='EGP')
+        Country.objects.create(code='JOR', name='Jordan', currency='JOD')
+        Country.objects.create(code='XJO', name='Old Jordan', currency='JOD')
+        countries = self.write('countryInfo.txt', [
+            geonames_country('EG', 'EGY', 'Egypt', 'EGP'),
+            geonames_country('JO', 'XJO', 'Jordan', 'JOD'),
+        ])
+        self.populate(countries_file=countries)
+        
+        egypt.refresh_from_db()
+        self.assertEqual((egypt.code, egypt.iso2), ('EGY', 'EG'))
+        self.assertEqual(Country.objects.get(code='XJO').name, 'Old Jordan')
+        self.assertEqual(Country.objects.get(code='JOR').name, 'Jordan')
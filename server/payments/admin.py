@@ -3,9 +3,10 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.db.models import Sum, Count, Q
 from django.utils.safestring import mark_safe
+from django.utils import timezone
 from .models import (
     Currency, Wallet, WalletTransaction, EscrowAccount, 
-    PaymentMethod, Payment, Withdrawal, BankAccount
+    PaymentMethod, Payment, Withdrawal, BankAccount, GatewayMismatch
 )
 
 
@@ -353,7 +354,8 @@ class PaymentAdmin(admin.ModelAdmin):
         )
     
     def mark_as_succeeded(self, request, queryset):
-        updated = queryset.update(status='succeeded')
+        # processed_at is the day platform revenue books the payment on
+        updated = queryset.exclude(status='succeeded').update(status='succeeded', processed_at=timezone.now())
         self.message_user(request, '{} دفعة تم تأكيد نجاحها.'.format(updated))
     mark_as_succeeded.short_description = 'تأكيد نجاح الدفع'
     
@@ -478,6 +480,21 @@ class WithdrawalAdmin(admin.ModelAdmin):
         )
 
 
+@admin.register(GatewayMismatch)
+class GatewayMismatchAdmin(admin.ModelAdmin):
+    """
+    إدارة فروقات المطابقة مع بوابة الدفع
+    """
+    list_display = (
+        'transaction_id', 'kind', 'expected', 'actual',
+        'payment', 'created_at', 'resolved_at'
+    )
+    list_filter = ('kind', 'resolved_at', 'created_at')
+    search_fields = ('transaction_id', 'payment__payment_id')
+    readonly_fields = ('created_at', 'updated_at')
+    raw_id_fields = ('payment',)
+
+
 # تخصيص موقع الإدارة
 admin.site.site_header = 'A-List Payments Admin'
 admin.site.site_title = 'Payments Management'
@@ -2,11 +2,14 @@ import requests
 import json
 import hashlib
 import hmac
+import threading
 import time
 from django.conf import settings
 import logging
 from decimal import Decimal
 from typing import Dict, Any, Optional
+from common.http import CallMetrics, backoff_delays, pooled_session
+from common.resilience import ProviderUnavailable, provider_guard
 
 logger = logging.getLogger(__name__)
 
@@ -17,18 +20,89 @@ class AuthorizeNetService:
     تتعامل مع معالجة المدفوعات والبطاقات الائتمانية
     """
     
-    def __init__(self):
+    def __init__(self, api_endpoint: Optional[str] = None):
         self.api_login_id = settings.AUTHORIZE_NET_API_LOGIN_ID
         self.transaction_key = settings.AUTHORIZE_NET_TRANSACTION_KEY
         self.signature_key = settings.AUTHORIZE_NET_SIGNATURE_KEY
         self.public_client_key = settings.AUTHORIZE_NET_PUBLIC_CLIENT_KEY
         self.sandbox = settings.AUTHORIZE_NET_SANDBOX
         
-        # Set API endpoint based on environment
-        if self.sandbox:
+        # Set API endpoint based on environment (or point it at the local stub gateway)
+        if api_endpoint or getattr(settings, 'AUTHORIZE_NET_API_ENDPOINT', None):
+            self.api_endpoint = api_endpoint or settings.AUTHORIZE_NET_API_ENDPOINT
+        elif self.sandbox:
             self.api_endpoint = "https://apitest.authorize.net/xml/v1/request.api"
         else:
             self.api_endpoint = "https://api.authorize.net/xml/v1/request.api"
+        
+        # (connect, read) timeouts and extra attempts for idempotent calls
+        self.timeout = (
+            getattr(settings, 'AUTHORIZE_NET_CONNECT_TIMEOUT', 5),
+            getattr(settings, 'AUTHORIZE_NET_READ_TIMEOUT', 30),
+        )
+        self.idempotent_retries = getattr(settings, 'AUTHORIZE_NET_IDEMPOTENT_RETRIES', 2)
+        self.metrics = CallMetrics()
+        # concurrency cap and circuit breaker shared by every call to the gateway
+        self.guard = provider_guard('authorize_net')
+        self._session = None
+        self._session_lock = threading.Lock()
+    
+    @property
+    def session(self) -> requests.Session:
+        """
+        Keep-alive session shared by every call from this process, so a charge
+        reuses an open TLS connection instead of handshaking again
+        """
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = pooled_session(
+                        pool_size=getattr(settings, 'AUTHORIZE_NET_POOL_SIZE', 20),
+                        headers={
+                            'Content-Type': 'application/xml',
+                            'Accept': 'application/xml'
+                        }
+                    )
+        return self._session
+    
+    def _send(self, operation: str, xml_request: str, idempotent: bool = False) -> requests.Response:
+        """
+        إرسال الطلب عبر الجلسة المشتركة
+        
+        Connection failures (the request never left) are retried for every
+        call by the session. Idempotent calls (lookups, voids) are also
+        retried with backoff on timeouts and 5xx responses; charges and
+        refunds are not, since the gateway may already have processed them.
+        
+        The call holds one of the gateway's bulkhead slots throughout, and
+        raises ProviderUnavailable without sending anything while the circuit
+        is open or every slot is taken. Timeouts, connection errors and 5xx
+        responses count as gateway failures; declines do not.
+        """
+        delays = backoff_delays(self.idempotent_retries) if idempotent else []
+        with self.guard.attempt() as guarded, self.metrics.timer(operation) as call:
+            for attempt in range(len(delays) + 1):
+                last_attempt = attempt == len(delays)
+                try:
+                    response = self.session.post(
+                        self.api_endpoint,
+                        data=xml_request.encode('utf-8'),
+                        timeout=self.timeout
+                    )
+                except (requests.ConnectionError, requests.Timeout):
+                    if last_attempt:
+                        call.ok = False
+                        raise
+                else:
+                    if response.status_code < 500 or last_attempt:
+                        call.ok = response.status_code == 200
+                        if response.status_code >= 500:
+                            guarded.failed()
+                        return response
+                
+                call.retries += 1
+                logger.warning(f"Authorize.Net {operation} attempt {attempt + 1} failed, retrying")
+                time.sleep(delays[attempt])
     
     def _create_xml_request(self, transaction_type: str, **kwargs) -> str:
         """
@@ -181,18 +255,7 @@ class AuthorizeNetService:
                 ref_id=f"ref_{invoice_number or str(int(time.time()))}"
             )
             
-            # Send request
-            headers = {
-                'Content-Type': 'application/xml',
-                'Accept': 'application/xml'
-            }
-            
-            response = requests.post(
-                self.api_endpoint,
-                data=xml_request,
-                headers=headers,
-                timeout=30
-            )
+            response = self._send('charge', xml_request)
             
             if response.status_code == 200:
                 return self._parse_xml_response(response.text)
@@ -202,6 +265,13 @@ class AuthorizeNetService:
                     'error': f'HTTP Error {response.status_code}: {response.text}'
                 }
                 
+        except ProviderUnavailable as e:
+            logger.warning(f"Authorize.Net charge rejected: {str(e)}")
+            return {
+                'success': False,
+                'error': 'Payment gateway is temporarily unavailable, please try again shortly',
+                'unavailable': True
+            }
         except Exception as e:
             logger.error(f"Authorize.Net charge error: {str(e)}")
             return {
@@ -242,18 +312,7 @@ class AuthorizeNetService:
             </createTransactionRequest>
             """
             
-            # Send request
-            headers = {
-                'Content-Type': 'application/xml',
-                'Accept': 'application/xml'
-            }
-            
-            response = requests.post(
-                self.api_endpoint,
-                data=xml_template.strip(),
-                headers=headers,
-                timeout=30
-            )
+            response = self._send('refund', xml_template.strip())
             
             if response.status_code == 200:
                 return self._parse_xml_response(response.text)
@@ -263,6 +322,13 @@ class AuthorizeNetService:
                     'error': f'HTTP Error {response.status_code}: {response.text}'
                 }
                 
+        except ProviderUnavailable as e:
+            logger.warning(f"Authorize.Net refund rejected: {str(e)}")
+            return {
+                'success': False,
+                'error': 'Payment gateway is temporarily unavailable, please try again shortly',
+                'unavailable': True
+            }
         except Exception as e:
             logger.error(f"Authorize.Net refund error: {str(e)}")
             return {
@@ -316,18 +382,7 @@ class AuthorizeNetService:
             </createTransactionRequest>
             """
             
-            # Send request
-            headers = {
-                'Content-Type': 'application/xml',
-                'Accept': 'application/xml'
-            }
-            
-            response = requests.post(
-                self.api_endpoint,
-                data=xml_template.strip(),
-                headers=headers,
-                timeout=30
-            )
+            response = self._send('validate_card', xml_template.strip())
             
             if response.status_code == 200:
                 result = self._parse_xml_response(response.text)
@@ -378,17 +433,7 @@ class AuthorizeNetService:
             </createTransactionRequest>
             """
             
-            headers = {
-                'Content-Type': 'application/xml',
-                'Accept': 'application/xml'
-            }
-            
-            response = requests.post(
-                self.api_endpoint,
-                data=xml_template.strip(),
-                headers=headers,
-                timeout=30
-            )
+            response = self._send('void', xml_template.strip(), idempotent=True)
             
             return self._parse_xml_response(response.text) if response.status_code == 200 else {'success': False}
             
@@ -434,17 +479,7 @@ class AuthorizeNetService:
             </getTransactionDetailsRequest>
             """
             
-            headers = {
-                'Content-Type': 'application/xml',
-                'Accept': 'application/xml'
-            }
-            
-            response = requests.post(
-                self.api_endpoint,
-                data=xml_template.strip(),
-                headers=headers,
-                timeout=30
-            )
+            response = self._send('transaction_details', xml_template.strip(), idempotent=True)
             
             if response.status_code == 200:
                 # Parse transaction details response
@@ -468,9 +503,12 @@ class AuthorizeNetService:
                                 'status': status.text if status is not None else 'unknown'
                             }
                     
+                    # E00040: the gateway has no record of this transaction
+                    error_code_elem = root.find('.//ns:message/ns:code', namespace)
                     return {
                         'success': False,
-                        'error': 'Transaction not found or API error'
+                        'error': 'Transaction not found or API error',
+                        'error_code': error_code_elem.text if error_code_elem is not None else ''
                     }
                     
                 except Exception as parse_error:
@@ -0,0 +1,213 @@
+"""
+Local stand-in for the Authorize.Net XML API.
+
+``StubGateway`` answers the requests AuthorizeNetService sends
+(``createTransactionRequest`` for authCapture, authOnly, refund and void, and
+``getTransactionDetailsRequest``) from an in-memory ledger, so charges and
+refunds can be exercised and load-tested without network access or sandbox
+credentials. Point the service at it with ``AUTHORIZE_NET_API_ENDPOINT`` or
+``AuthorizeNetService(api_endpoint=stub.url)``.
+
+Behaviour worth knowing when testing:
+
+* card numbers ending in ``DECLINE_SUFFIX`` are declined;
+* ``latency`` delays every response, to mimic a remote gateway;
+* ``fail_next(n)`` makes the next ``n`` requests return HTTP 503.
+"""
+import itertools
+import threading
+import time
+import xml.etree.ElementTree as ET
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+NAMESPACE = 'AnetApi/xml/v1/schema/AnetApiSchema.xsd'
+NS = {'ns': NAMESPACE}
+DECLINE_SUFFIX = '0002'
+API_PATH = '/xml/v1/request.api'
+
+
+def _text(element, path, default=''):
+    found = element.find(path, NS)
+    return found.text.strip() if found is not None and found.text else default
+
+
+def _response(root_name, result_code, message_code, message_text, body='', ref_id=''):
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        f'<{root_name} xmlns="{NAMESPACE}">'
+        f'<refId>{escape(ref_id)}</refId>'
+        f'<messages><resultCode>{result_code}</resultCode>'
+        f'<message><code>{message_code}</code><text>{escape(message_text)}</text></message></messages>'
+        f'{body}'
+        f'</{root_name}>'
+    )
+
+
+class StubGateway:
+    """In-memory gateway plus the HTTP server that exposes it"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        self.latency = latency
+        self.transactions = {}
+        self.requests_served = 0
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count(60000000001)
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}{API_PATH}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def fail_next(self, count=1):
+        with self._lock:
+            self._failures += count
+
+    # --- request handling -------------------------------------------------
+
+    def _handler_class(self):
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real gateway
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                status, payload = gateway.handle(body)
+                data = payload.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/xml; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def handle(self, body):
+        """(HTTP status, XML body) for one request"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests_served += 1
+            if self._failures:
+                self._failures -= 1
+                return 503, 'Service Unavailable'
+
+        try:
+            root = ET.fromstring(body)
+        except ET.ParseError:
+            return 200, _response('ErrorResponse', 'Error', 'E00003', 'Invalid XML.')
+
+        name = root.tag.split('}')[-1]
+        if name == 'createTransactionRequest':
+            return 200, self._create_transaction(root)
+        if name == 'getTransactionDetailsRequest':
+            return 200, self._transaction_details(root)
+        return 200, _response('ErrorResponse', 'Error', 'E00045', f'Unsupported request {name}.')
+
+    def _create_transaction(self, root):
+        ref_id = _text(root, 'ns:refId')
+        request = root.find('ns:transactionRequest', NS)
+        transaction_type = _text(request, 'ns:transactionType')
+        amount = Decimal(_text(request, 'ns:amount', '0') or '0')
+
+        with self._lock:
+            if transaction_type in ('authCaptureTransaction', 'authOnlyTransaction'):
+                card_number = _text(request, 'ns:payment/ns:creditCard/ns:cardNumber')
+                if not card_number or card_number.endswith(DECLINE_SUFFIX):
+                    return self._declined(ref_id, 'This transaction has been declined.')
+                status = (
+                    'capturedPendingSettlement' if transaction_type == 'authCaptureTransaction'
+                    else 'authorizedPendingCapture'
+                )
+                return self._approved(ref_id, self._record(status, amount, card_number[-4:]))
+
+            original = self.transactions.get(_text(request, 'ns:refTransId'))
+            if original is None:
+                return self._declined(ref_id, 'The referenced transaction does not meet the criteria for issuing a credit.')
+
+            if transaction_type == 'voidTransaction':
+                if original['status'] not in ('capturedPendingSettlement', 'authorizedPendingCapture', 'voided'):
+                    return self._declined(ref_id, 'The transaction cannot be voided.')
+                original['status'] = 'voided'
+                return self._approved(ref_id, original)
+
+            if transaction_type == 'refundTransaction':
+                amount = amount or original['amount'] - original['refunded']
+                if original['status'] == 'voided' or amount > original['amount'] - original['refunded']:
+                    return self._declined(ref_id, 'The sum of credits against the referenced transaction would exceed original debit amount.')
+                original['refunded'] += amount
+                return self._approved(ref_id, self._record('refundPendingSettlement', amount, original['card_last4']))
+
+        return self._declined(ref_id, f'Unsupported transaction type {transaction_type}.')
+
+    def _record(self, status, amount, card_last4):
+        transaction = {
+            'id': str(next(self._ids)),
+            'status': status,
+            'amount': amount,
+            'refunded': Decimal('0'),
+            'card_last4': card_last4,
+            'auth_code': f'S{len(self.transactions):05d}',
+            'submitted_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime()),
+        }
+        self.transactions[transaction['id']] = transaction
+        return transaction
+
+    def _approved(self, ref_id, transaction):
+        body = (
+            '<transactionResponse>'
+            '<responseCode>1</responseCode>'
+            f"<authCode>{transaction['auth_code']}</authCode>"
+            f"<transId>{transaction['id']}</transId>"
+            f"<accountNumber>XXXX{transaction['card_last4']}</accountNumber>"
+            '<messages><message><code>1</code><description>This transaction has been approved.</description></message></messages>'
+            '</transactionResponse>'
+        )
+        return _response('createTransactionResponse', 'Ok', 'I00001', 'Successful.', body, ref_id)
+
+    def _declined(self, ref_id, reason):
+        body = (
+            '<transactionResponse>'
+            '<responseCode>2</responseCode>'
+            '<transId>0</transId>'
+            f'<errors><error><errorCode>2</errorCode><errorText>{escape(reason)}</errorText></error></errors>'
+            '</transactionResponse>'
+        )
+        return _response('createTransactionResponse', 'Error', 'E00027', 'The transaction was unsuccessful.', body, ref_id)
+
+    def _transaction_details(self, root):
+        with self._lock:
+            transaction = self.transactions.get(_text(root, 'ns:transId'))
+            if transaction is None:
+                return _response('getTransactionDetailsResponse', 'Error', 'E00040', 'The record cannot be found.')
+            body = (
+                '<transaction>'
+                f"<transId>{transaction['id']}</transId>"
+                f"<submitTimeUTC>{transaction['submitted_at']}</submitTimeUTC>"
+                f"<transactionStatus>{transaction['status']}</transactionStatus>"
+                f"<authAmount>{transaction['amount']:.2f}</authAmount>"
+                f"<settleAmount>{transaction['amount'] - transaction['refunded']:.2f}</settleAmount>"
+                '</transaction>'
+            )
+        return _response('getTransactionDetailsResponse', 'Ok', 'I00001', 'Successful.', body)
@@ -0,0 +1,21 @@
+"""Project funds accounts released automatically once auto_release_date passes"""
+from django.db.models import Q
+
+from common.scheduler import DueJob, each_row
+
+from .models import EscrowAccount
+
+
+@each_row
+def _auto_release(escrow):
+    # release_funds re-checks the status, so a row released meanwhile is a no-op
+    escrow.release_funds()
+
+
+escrow_auto_release = DueJob(
+    name='escrow_auto_release',
+    model=EscrowAccount,
+    due_field='auto_release_date',
+    handle=_auto_release,
+    filters=Q(status='funded'),
+)
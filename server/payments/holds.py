@@ -0,0 +1,100 @@
+"""
+Held (pending) wallet credits and their release.
+
+A credit that lands in a wallet's pending balance carries ``hold_until``;
+``released_at`` is stamped once it has moved to the available balance. The
+partial index on unreleased holds keeps "what is due" an index range scan
+however large ``wallet_transactions`` grows.
+
+``release_due_holds`` drains due holds in bounded batches: each batch is
+locked (SKIP LOCKED, so concurrent runs split the work), grouped per wallet,
+applied as one ledger update per wallet and marked with a single
+``bulk_update``.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import ledger
+
+logger = logging.getLogger(__name__)
+
+
+def hold_until(now=None):
+    """When a hold placed now becomes releasable"""
+    return (now or timezone.now()) + timedelta(days=getattr(settings, 'PAYMENT_HOLD_DAYS', 3))
+
+
+def unreleased_holds(wallet=None):
+    from .models import WalletTransaction
+
+    holds = WalletTransaction.objects.filter(hold_until__isnull=False, released_at__isnull=True)
+    if wallet is not None:
+        holds = holds.filter(wallet=wallet)
+    return holds
+
+
+def due_holds(now=None, user_id=None):
+    holds = unreleased_holds().filter(hold_until__lte=now or timezone.now())
+    if user_id is not None:
+        holds = holds.filter(wallet__user_id=user_id)
+    return holds
+
+
+def _lock_batch(holds, batch_size):
+    holds = holds.select_related('wallet').order_by('hold_until', 'pk')
+    if connection.features.has_select_for_update_of:
+        # Lock only the transaction rows; wallets are locked by the ledger in id order
+        return list(holds.select_for_update(skip_locked=True, of=('self',))[:batch_size])
+    return list(holds.select_for_update(skip_locked=True)[:batch_size])
+
+
+def release_due_holds(batch_size=None, user_id=None, now=None):
+    """Move every due hold to the available balance; returns run totals"""
+    batch_size = batch_size or getattr(settings, 'PAYMENT_HOLD_RELEASE_BATCH_SIZE', 500)
+    now = now or timezone.now()
+    totals = {'released': 0, 'amount': Decimal('0'), 'wallets': set(), 'skipped': 0}
+    skipped_ids = set()
+
+    while True:
+        with transaction.atomic():
+            batch = _lock_batch(due_holds(now, user_id).exclude(pk__in=skipped_ids), batch_size)
+            if not batch:
+                break
+
+            per_user = defaultdict(list)
+            for hold in batch:
+                per_user[hold.wallet.user_id].append(hold)
+
+            wallets = ledger.lock_wallets(per_user)
+            entries = []
+            released = []
+            for user_id_, holds in per_user.items():
+                amount = sum((hold.amount for hold in holds), Decimal('0'))
+                if wallets[user_id_].pending_balance < amount:
+                    logger.error(
+                        f'Pending balance of user {user_id_} is below its due holds '
+                        f'({wallets[user_id_].pending_balance} < {amount}); skipping'
+                    )
+                    skipped_ids.update(hold.pk for hold in holds)
+                    totals['skipped'] += len(holds)
+                    continue
+                entries.append(ledger.Entry(user_id_, available=amount, pending=-amount))
+                released.extend(holds)
+                totals['amount'] += amount
+                totals['wallets'].add(user_id_)
+
+            ledger.post(entries)
+            released_at = timezone.now()
+            for hold in released:
+                hold.released_at = released_at
+            type(batch[0]).objects.bulk_update(released, ['released_at'])
+            totals['released'] += len(released)
+
+    totals['wallets'] = len(totals['wallets'])
+    return totals
@@ -0,0 +1,169 @@
+"""
+Wallet ledger.
+
+Wallet balances only change through ``post`` (the Wallet helpers such as
+``add_funds`` and ``move_to_pending`` wrap it); code must never assign a
+balance on a Wallet instance and save() it, since that copy may be stale and
+would overwrite concurrent postings. Inside one transaction ``post``
+
+* locks all the wallets involved with ``SELECT ... FOR UPDATE`` in ascending
+  id order, so two payouts touching the same wallets queue behind each other
+  instead of deadlocking or overwriting each other's totals;
+* rejects the whole posting if any wallet would go negative;
+* applies the net delta per wallet with a single F() ``UPDATE``;
+* writes the WalletTransaction rows with the wallet's available and pending
+  balances after each entry (a running balance that can be audited).
+
+A transfer between several wallets is just several entries in one ``post``
+call: either all of them land or none do.
+"""
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+ZERO = Decimal('0')
+
+# Sources that count towards a wallet's lifetime earnings
+EARNING_SOURCES = (
+    'escrow_release', 'project_payment', 'milestone_payment',
+    'contract_payment', 'platform_earning',
+)
+
+
+class InsufficientFunds(ValueError):
+    """A posting would take a wallet balance below zero"""
+
+    def __init__(self, user_id, balance, message=None):
+        self.user_id = user_id
+        self.balance = balance
+        super().__init__(message or f'Insufficient {balance} balance for user {user_id}')
+
+
+class Entry(NamedTuple):
+    """
+    One wallet's share of a posting.
+
+    ``available``/``pending``/``earned`` are signed deltas. ``amount`` is what
+    the WalletTransaction records (signed, debit when negative); leave it None
+    to move money between a wallet's own balances without a ledger line.
+    ``hold_until`` marks a pending credit for release by payments.holds.
+    """
+    user: object
+    available: Decimal = ZERO
+    pending: Decimal = ZERO
+    earned: Decimal = ZERO
+    amount: Optional[Decimal] = None
+    source: str = ''
+    description: str = ''
+    payment: object = None
+    escrow: object = None
+    hold_until: object = None
+
+
+def credit(user, amount, source, description='', pending=False, **refs):
+    """Entry adding ``amount`` to the available (or pending) balance"""
+    if refs.get('hold_until') and not pending:
+        raise ValueError('Only pending credits can be held')
+    amount = Decimal(amount)
+    return Entry(
+        user=user,
+        available=ZERO if pending else amount,
+        pending=amount if pending else ZERO,
+        earned=amount if source in EARNING_SOURCES and not pending else ZERO,
+        amount=amount,
+        source=source,
+        description=description,
+        **refs,
+    )
+
+
+def debit(user, amount, source, description='', pending=False, **refs):
+    """Entry taking ``amount`` from the available (or pending) balance"""
+    amount = Decimal(amount)
+    return Entry(
+        user=user,
+        available=ZERO if pending else -amount,
+        pending=-amount if pending else ZERO,
+        amount=-amount,
+        source=source,
+        description=description,
+        **refs,
+    )
+
+
+def _user_id(user):
+    return getattr(user, 'pk', user)
+
+
+def lock_wallets(user_ids):
+    """{user_id: Wallet} for ``user_ids``, created if missing, locked in id order"""
+    from .models import Wallet
+
+    user_ids = sorted(set(user_ids))
+    existing = set(Wallet.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+    for user_id in user_ids:
+        if user_id not in existing:
+            Wallet.objects.get_or_create(user_id=user_id)
+
+    wallets = Wallet.objects.select_for_update().filter(user_id__in=user_ids).order_by('pk')
+    return {wallet.user_id: wallet for wallet in wallets}
+
+
+def post(entries):
+    """
+    Apply ``entries`` atomically; returns {user_id: Wallet} with the new balances.
+
+    Raises InsufficientFunds (nothing is written) if a balance would go negative.
+    """
+    from .models import Wallet, WalletTransaction
+
+    entries = [entry for entry in entries if entry is not None]
+    with transaction.atomic():
+        wallets = lock_wallets(_user_id(entry.user) for entry in entries)
+
+        deltas = {}
+        records = []
+        for entry in entries:
+            user_id = _user_id(entry.user)
+            wallet = wallets[user_id]
+            wallet.available_balance += entry.available
+            wallet.pending_balance += entry.pending
+            wallet.total_earned += entry.earned
+            if wallet.available_balance < 0:
+                raise InsufficientFunds(user_id, 'available')
+            if wallet.pending_balance < 0:
+                raise InsufficientFunds(user_id, 'pending')
+
+            delta = deltas.setdefault(user_id, [ZERO, ZERO, ZERO])
+            delta[0] += entry.available
+            delta[1] += entry.pending
+            delta[2] += entry.earned
+
+            if entry.amount is not None:
+                records.append(WalletTransaction(
+                    wallet=wallet,
+                    amount=entry.amount,
+                    transaction_type='debit' if entry.amount < 0 else 'credit',
+                    source=entry.source,
+                    description=entry.description,
+                    payment=entry.payment,
+                    escrow=entry.escrow,
+                    hold_until=entry.hold_until,
+                    available_balance_after=wallet.available_balance,
+                    pending_balance_after=wallet.pending_balance,
+                ))
+
+        now = timezone.now()
+        for user_id, (available, pending, earned) in deltas.items():
+            if available or pending or earned:
+                Wallet.objects.filter(pk=wallets[user_id].pk).update(
+                    available_balance=F('available_balance') + available,
+                    pending_balance=F('pending_balance') + pending,
+                    total_earned=F('total_earned') + earned,
+                    updated_at=now,
+                )
+        WalletTransaction.objects.bulk_create(records)
+    return wallets
@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import time
+from django.core.management.base import BaseCommand
+from payments.authorize_net_service import AuthorizeNetService
+from payments.authorize_net_stub import StubGateway
+
+
+class Command(BaseCommand):
+    help = 'Run charge + refund pairs through AuthorizeNetService and report latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Charge/refund pairs to run')
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument(
+            '--endpoint',
+            help='Gateway URL; by default an in-process stub gateway is started',
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.05,
+            help='Simulated gateway latency of the in-process stub, in seconds',
+        )
+
+    def handle(self, *args, **options):
+        gateway = None
+        endpoint = options.get('endpoint')
+        if not endpoint:
+            gateway = StubGateway(latency=options['latency']).start()
+            endpoint = gateway.url
+        
+        service = AuthorizeNetService(api_endpoint=endpoint)
+        
+        def charge_and_refund(index):
+            charge = service.charge_credit_card(
+                amount=Decimal('10.00'),
+                card_number='4111111111111111',
+                expiry_date='1230',
+                card_code='123',
+                invoice_number=f'LOAD-{index}'
+            )
+            if charge['success']:
+                service.refund_transaction(charge['transaction_id'], Decimal('10.00'))
+            return charge['success']
+        
+        started = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                results = list(pool.map(charge_and_refund, range(options['requests'])))
+        finally:
+            if gateway:
+                gateway.stop()
+        elapsed = time.monotonic() - started
+        
+        for operation, stats in sorted(service.metrics.snapshot().items()):
+            self.stdout.write(
+                f"{operation}: {stats['calls']} calls, {stats['errors']} errors, "
+                f"avg {stats['avg_ms']}ms, p50 {stats['p50_ms']}ms, p95 {stats['p95_ms']}ms, max {stats['max_ms']}ms"
+            )
+        guard = service.guard.snapshot()
+        self.stdout.write(
+            f"guard: {guard['state']}, {guard['rejected_saturated']} rejected (saturated), "
+            f"{guard['rejected_open']} rejected (open), {guard['failures']} failures"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{sum(results)}/{len(results)} charges approved in {elapsed:.1f}s '
+                f'({len(results) / elapsed:.1f} pairs/s)'
+            )
+        )
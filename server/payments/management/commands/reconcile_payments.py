@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from payments.authorize_net_service import AuthorizeNetService, authorize_net_service
+from payments.reconciliation import reconcile, reset_checkpoint
+
+
+class Command(BaseCommand):
+    help = 'Check payments against Authorize.Net transaction details and record mismatches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, help='Payments per chunk')
+        parser.add_argument('--workers', type=int, help='Concurrent gateway lookups')
+        parser.add_argument('--max-chunks', type=int, help='Stop after this many chunks')
+        parser.add_argument(
+            '--endpoint',
+            help='Gateway URL, e.g. a stub started with run_authorize_net_stub',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the checkpoint and start from the first payment',
+        )
+
+    def handle(self, *args, **options):
+        if options['restart']:
+            reset_checkpoint()
+        
+        service = authorize_net_service
+        if options.get('endpoint'):
+            service = AuthorizeNetService(api_endpoint=options['endpoint'])
+        
+        totals = reconcile(
+            service=service,
+            chunk_size=options.get('chunk_size'),
+            workers=options.get('workers'),
+            max_chunks=options.get('max_chunks'),
+        )
+        
+        status = 'pass finished' if totals['finished'] else 'will resume from checkpoint'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{totals['checked']} payments checked, {totals['mismatches']} new mismatches, "
+                f"{totals['errors']} lookups failed ({status})"
+            )
+        )
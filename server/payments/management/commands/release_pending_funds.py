@@ -1,12 +1,11 @@
 from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
 from django.utils import timezone
-from datetime import timedelta
-from payments.models import Wallet, WalletTransaction
-from django.db import transaction
+from payments.holds import due_holds, release_due_holds
 
 
 class Command(BaseCommand):
-    help = 'Release pending funds that have been held for more than 3 days'
+    help = 'Release held wallet credits whose hold period has ended'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -19,98 +18,54 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be released without actually doing it',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Holds released per transaction',
+        )
 
     def handle(self, *args, **options):
         user_id = options.get('user_id')
         dry_run = options.get('dry_run', False)
         
-        # Calculate the cutoff date (3 days ago)
-        cutoff_date = timezone.now() - timedelta(days=3)
-        
-        # Base query for pending transactions older than 3 days
-        pending_transactions = WalletTransaction.objects.filter(
-            created_at__lt=cutoff_date,
-            description__icontains='pending'
-        ).exclude(
-            description__icontains='released'
-        )
-        
-        # Filter by user if specified
-        if user_id:
-            pending_transactions = pending_transactions.filter(wallet__user_id=user_id)
-            
-        if not pending_transactions.exists():
+        holds = due_holds(timezone.now(), user_id)
+        if not holds.exists():
             self.stdout.write(
                 self.style.WARNING('No pending funds found to release.')
             )
             return
-            
-        total_released = 0
-        users_affected = set()
         
         if dry_run:
             self.stdout.write(
                 self.style.WARNING('DRY RUN MODE - No actual changes will be made')
             )
-            
-        for transaction in pending_transactions:
-            wallet = transaction.wallet
-            amount = transaction.amount
-            
-            if dry_run:
+            per_user = holds.order_by().values('wallet__user__username').annotate(
+                count=Count('id'), total=Sum('amount')
+            ).order_by('wallet__user__username')
+            total = 0
+            for row in per_user:
+                total += row['total']
                 self.stdout.write(
-                    f'Would release ${amount} for user {wallet.user.username} '
-                    f'(Transaction ID: {transaction.id})'
+                    f"Would release ${row['total']} for user {row['wallet__user__username']} "
+                    f"({row['count']} transactions)"
                 )
-                total_released += amount
-                users_affected.add(wallet.user.username)
-                continue
-                
-            try:
-                with transaction.atomic():
-                    # Move funds from pending to available
-                    if wallet.pending_balance >= amount:
-                        wallet.pending_balance -= amount
-                        wallet.available_balance += amount
-                        wallet.save()
-                        
-                        # Update transaction description to mark as released
-                        transaction.description = f"{transaction.description} - Released on {timezone.now().date()}"
-                        transaction.save()
-                        
-                        self.stdout.write(
-                            self.style.SUCCESS(
-                                f'Released ${amount} for user {wallet.user.username} '
-                                f'(Transaction ID: {transaction.id})'
-                            )
-                        )
-                        
-                        total_released += amount
-                        users_affected.add(wallet.user.username)
-                    else:
-                        self.stdout.write(
-                            self.style.ERROR(
-                                f'Insufficient pending balance for user {wallet.user.username}. '
-                                f'Required: ${amount}, Available: ${wallet.pending_balance}'
-                            )
-                        )
-                        
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(
-                        f'Error releasing funds for user {wallet.user.username}: {str(e)}'
-                    )
+            self.stdout.write(
+                self.style.SUCCESS(f'\nWould release ${total} total for {len(per_user)} users.')
+            )
+            return
+        
+        totals = release_due_holds(batch_size=options['batch_size'], user_id=user_id)
+        
+        if totals['skipped']:
+            self.stdout.write(
+                self.style.ERROR(
+                    f"{totals['skipped']} holds skipped: wallet pending balance below the held amount"
                 )
-                
-        # Summary
-        action = 'Would release' if dry_run else 'Released'
+            )
         self.stdout.write(
             self.style.SUCCESS(
-                f'\n{action} ${total_released} total for {len(users_affected)} users.'
+                f"\nReleased ${totals['amount']} total from {totals['released']} transactions "
+                f"for {totals['wallets']} users."
             )
         )
-        
-        if users_affected:
-            self.stdout.write(
-                f'Users affected: {", ".join(sorted(users_affected))}'
-            )
\ No newline at end of file
@@ -0,0 +1,35 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from payments.rollups import ROLLUPS, rebuild_from, roll_up, rolled_until
+
+
+class Command(BaseCommand):
+    help = 'Roll up closed days of wallet transactions and platform revenue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rollup',
+            choices=sorted(ROLLUPS),
+            help='Only run this rollup',
+        )
+        parser.add_argument(
+            '--rebuild-from',
+            help='Recompute from this day (YYYY-MM-DD), e.g. after correcting old rows',
+        )
+
+    def handle(self, *args, **options):
+        names = [options['rollup']] if options.get('rollup') else sorted(ROLLUPS)
+        
+        if options.get('rebuild_from'):
+            try:
+                day = datetime.strptime(options['rebuild_from'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--rebuild-from must be a date in YYYY-MM-DD format')
+            for name in names:
+                rebuild_from(name, day)
+        
+        for name in names:
+            days = roll_up(name)
+            self.stdout.write(
+                self.style.SUCCESS(f'{name}: rolled up {days} days, next day to roll up is {rolled_until(name)}')
+            )
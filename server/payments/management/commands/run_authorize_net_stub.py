@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from payments.authorize_net_stub import StubGateway
+
+
+class Command(BaseCommand):
+    help = 'Run a local stub of the Authorize.Net XML API for offline testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.0,
+            help='Seconds to wait before every response',
+        )
+
+    def handle(self, *args, **options):
+        gateway = StubGateway(options['host'], options['port'], latency=options['latency'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Stub gateway listening on {gateway.url}\n'
+                f'Set AUTHORIZE_NET_API_ENDPOINT={gateway.url} to use it.'
+            )
+        )
+        try:
+            gateway.serve_forever()
+        except KeyboardInterrupt:
+            gateway.stop()
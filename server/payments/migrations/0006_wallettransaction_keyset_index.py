@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_remove_withdrawal_payment_method_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['wallet', 'created_at'], name='wallet_tran_wallet__aa27da_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_wallettransaction_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallettransaction',
+            name='available_balance_after',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='wallettransaction',
+            name='pending_balance_after',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+    ]
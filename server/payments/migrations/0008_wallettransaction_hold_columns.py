@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:20
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_holds(apps, schema_editor):
+    """Old holds were only marked by '(3-day hold period)' in the description"""
+    WalletTransaction = apps.get_model('payments', 'WalletTransaction')
+    holds = WalletTransaction.objects.filter(
+        transaction_type='credit',
+        source='milestone_payment',
+        description__contains='3-day hold period'
+    ).only('id', 'created_at')
+    batch = []
+    for hold in holds.iterator(chunk_size=1000):
+        hold.hold_until = hold.created_at + timedelta(days=3)
+        batch.append(hold)
+        if len(batch) >= 1000:
+            WalletTransaction.objects.bulk_update(batch, ['hold_until'])
+            batch = []
+    WalletTransaction.objects.bulk_update(batch, ['hold_until'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_wallettransaction_running_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallettransaction',
+            name='hold_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='wallettransaction',
+            name='released_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(condition=models.Q(('hold_until__isnull', False), ('released_at__isnull', True)), fields=['hold_until'], name='wallet_tx_unreleased_hold_idx'),
+        ),
+        migrations.RunPython(backfill_holds, migrations.RunPython.noop),
+    ]
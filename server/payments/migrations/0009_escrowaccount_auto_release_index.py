@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0008_wallettransaction_hold_columns'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='escrowaccount',
+            index=models.Index(fields=['status', 'auto_release_date'], name='escrow_acco_status_e53ee2_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0009_escrowaccount_auto_release_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('platform_fee', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('processing_fee', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('net', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('payment_count', models.PositiveIntegerField(default=0)),
+                ('subscription_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('subscription_payment_count', models.PositiveIntegerField(default=0)),
+                ('mrr', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True)),
+            ],
+            options={
+                'verbose_name': 'Platform Daily Rollup',
+                'verbose_name_plural': 'Platform Daily Rollups',
+                'db_table': 'platform_daily_rollups',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('rolled_until', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'rollup_watermarks',
+            },
+        ),
+        migrations.CreateModel(
+            name='WalletDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('source', models.CharField(max_length=100)),
+                ('credit_amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('debit_amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('credit_count', models.PositiveIntegerField(default=0)),
+                ('debit_count', models.PositiveIntegerField(default=0)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='payments.wallet')),
+            ],
+            options={
+                'verbose_name': 'Wallet Daily Rollup',
+                'verbose_name_plural': 'Wallet Daily Rollups',
+                'db_table': 'wallet_daily_rollups',
+                'unique_together': {('wallet', 'day', 'source')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['created_at'], name='wallet_tran_created_33245a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'created_at'], name='payments_status_426d4f_idx'),
+        ),
+    ]
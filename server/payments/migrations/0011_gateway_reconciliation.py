@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0010_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='reconciled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ReconciliationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_payment_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'reconciliation_checkpoints',
+            },
+        ),
+        migrations.CreateModel(
+            name='GatewayMismatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.CharField(max_length=255)),
+                ('kind', models.CharField(choices=[('missing', 'Missing at Gateway'), ('amount', 'Amount Mismatch'), ('status', 'Status Mismatch')], max_length=20)),
+                ('expected', models.CharField(blank=True, max_length=100)),
+                ('actual', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gateway_mismatches', to='payments.payment')),
+            ],
+            options={
+                'verbose_name': 'Gateway Mismatch',
+                'verbose_name_plural': 'Gateway Mismatches',
+                'db_table': 'gateway_mismatches',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['resolved_at', 'created_at'], name='gateway_mis_resolve_83b526_idx')],
+            },
+        ),
+    ]
@@ -77,63 +77,52 @@ class Wallet(models.Model):
         """Total balance (available + pending)"""
         return self.available_balance + self.pending_balance
     
+    def _sync_balances(self, wallet):
+        """Copy balances from the locked ledger copy onto this instance"""
+        self.available_balance = wallet.available_balance
+        self.pending_balance = wallet.pending_balance
+        self.total_earned = wallet.total_earned
+    
     def add_funds(self, amount, source='payment'):
         """Add funds to available balance"""
-        self.available_balance += amount
-        
-        # Only update total_earned for legitimate earnings (not top-ups)
-        legitimate_sources = [
-            'escrow_release', 'project_payment', 
-            'milestone_payment', 'contract_payment', 'platform_earning'
-        ]
-        if source in legitimate_sources:
-            self.total_earned += amount
-            
-        self.save()
+        from . import ledger
         
-        # Create transaction record
-        WalletTransaction.objects.create(
-            wallet=self,
-            amount=amount,
-            transaction_type='credit',
-            source=source,
-            description=f"Funds added from {source}"
-        )
+        # Only legitimate earnings (not top-ups) count towards total_earned
+        wallets = ledger.post([
+            ledger.credit(self.user_id, amount, source, f"Funds added from {source}")
+        ])
+        self._sync_balances(wallets[self.user_id])
     
     def deduct_funds(self, amount, reason='withdrawal'):
         """Deduct funds from available balance"""
-        if self.available_balance >= amount:
-            self.available_balance -= amount
-            self.save()
-            
-            # Create transaction record
-            WalletTransaction.objects.create(
-                wallet=self,
-                amount=-amount,
-                transaction_type='debit',
-                source=reason,
-                description=f"Funds deducted for {reason}"
-            )
-            return True
-        return False
+        from . import ledger
+        
+        try:
+            wallets = ledger.post([
+                ledger.debit(self.user_id, amount, reason, f"Funds deducted for {reason}")
+            ])
+        except ledger.InsufficientFunds:
+            return False
+        self._sync_balances(wallets[self.user_id])
+        return True
     
     def move_to_pending(self, amount):
         """Move funds from available to pending"""
-        if self.available_balance >= amount:
-            self.available_balance -= amount
-            self.pending_balance += amount
-            self.save()
-            return True
-        return False
+        return self._shift(available=-amount, pending=amount)
     
     def release_pending(self, amount):
         """Release pending funds to available"""
-        if self.pending_balance >= amount:
-            self.pending_balance -= amount
-            self.available_balance += amount
-            self.save()
-            return True
-        return False
+        return self._shift(available=amount, pending=-amount)
+    
+    def _shift(self, available, pending):
+        from . import ledger
+        
+        try:
+            wallets = ledger.post([ledger.Entry(self.user_id, available=available, pending=pending)])
+        except ledger.InsufficientFunds:
+            return False
+        self._sync_balances(wallets[self.user_id])
+        return True
 
 
 class WalletTransaction(models.Model):
@@ -153,6 +142,14 @@ class WalletTransaction(models.Model):
     payment = models.ForeignKey('Payment', on_delete=models.SET_NULL, null=True, blank=True)
     escrow = models.ForeignKey('EscrowAccount', on_delete=models.SET_NULL, null=True, blank=True)
     
+    # Pending credits: releasable from hold_until, stamped when released (payments.holds)
+    hold_until = models.DateTimeField(null=True, blank=True)
+    released_at = models.DateTimeField(null=True, blank=True)
+    
+    # Wallet balances right after this entry (set by payments.ledger)
+    available_balance_after = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    pending_balance_after = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -160,6 +157,15 @@ class WalletTransaction(models.Model):
         verbose_name = 'Wallet Transaction'
         verbose_name_plural = 'Wallet Transactions'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['wallet', 'created_at']),
+            models.Index(fields=['created_at']),
+            models.Index(
+                fields=['hold_until'],
+                name='wallet_tx_unreleased_hold_idx',
+                condition=models.Q(hold_until__isnull=False, released_at__isnull=True),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.wallet.user.username} - {self.transaction_type} ${self.amount}"
@@ -287,6 +293,9 @@ class EscrowAccount(models.Model):
         verbose_name = 'Project Funds Account'
         verbose_name_plural = 'Project Funds Accounts'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'auto_release_date']),
+        ]
     
     def __str__(self):
         return f"Project Funds Account {self.escrow_id} - ${self.amount}"
@@ -533,6 +542,8 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     processed_at = models.DateTimeField(null=True, blank=True)
+    # Last time the gateway's record was checked against this row
+    reconciled_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         db_table = 'payments'
@@ -544,6 +555,7 @@ class Payment(models.Model):
             models.Index(fields=['payment_type']),
             models.Index(fields=['payer']),
             models.Index(fields=['payee']),
+            models.Index(fields=['status', 'created_at']),
         ]
     
     def __str__(self):
@@ -756,6 +768,114 @@ class PlatformFeeSettings(models.Model):
         return f"Platform Fee: {self.platform_fee_rate * 100}%"
 
 
+class WalletDailyRollup(models.Model):
+    """مجاميع معاملات المحفظة اليومية حسب المصدر"""
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+    source = models.CharField(max_length=100)
+    
+    # Sums of WalletTransaction.amount as recorded (debits are stored negative by the ledger)
+    credit_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    debit_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    credit_count = models.PositiveIntegerField(default=0)
+    debit_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'wallet_daily_rollups'
+        verbose_name = 'Wallet Daily Rollup'
+        verbose_name_plural = 'Wallet Daily Rollups'
+        unique_together = ['wallet', 'day', 'source']
+    
+    def __str__(self):
+        return f"{self.wallet.user.username} {self.day} {self.source}"
+
+
+class PlatformDailyRollup(models.Model):
+    """إيرادات المنصة اليومية"""
+    day = models.DateField(unique=True)
+    
+    # Succeeded payments booked that day (refunds negative)
+    gross = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    platform_fee = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    processing_fee = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    net = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    payment_count = models.PositiveIntegerField(default=0)
+    
+    # Succeeded subscription payments paid that day
+    subscription_revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    subscription_payment_count = models.PositiveIntegerField(default=0)
+    
+    # Monthly recurring revenue of active subscriptions when the day was closed
+    # (unknown for days rolled up after the fact)
+    mrr = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    
+    class Meta:
+        db_table = 'platform_daily_rollups'
+        verbose_name = 'Platform Daily Rollup'
+        verbose_name_plural = 'Platform Daily Rollups'
+        ordering = ['-day']
+    
+    def __str__(self):
+        return f"Platform revenue {self.day}"
+
+
+class RollupWatermark(models.Model):
+    """آخر يوم تم تجميعه لكل جدول تجميع"""
+    name = models.CharField(max_length=50, unique=True)
+    rolled_until = models.DateField(null=True, blank=True)  # First day not rolled up yet
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'rollup_watermarks'
+    
+    def __str__(self):
+        return f"{self.name} rolled until {self.rolled_until}"
+
+
+class GatewayMismatch(models.Model):
+    """فروقات بين المدفوعات وسجلات بوابة الدفع"""
+    KIND_CHOICES = [
+        ('missing', 'Missing at Gateway'),
+        ('amount', 'Amount Mismatch'),
+        ('status', 'Status Mismatch'),
+    ]
+    
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='gateway_mismatches')
+    transaction_id = models.CharField(max_length=255)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    expected = models.CharField(max_length=100, blank=True)  # our side
+    actual = models.CharField(max_length=100, blank=True)  # the gateway's side
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'gateway_mismatches'
+        verbose_name = 'Gateway Mismatch'
+        verbose_name_plural = 'Gateway Mismatches'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['resolved_at', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} mismatch for {self.transaction_id}: {self.expected} != {self.actual}"
+
+
+class ReconciliationCheckpoint(models.Model):
+    """آخر دفعة تمت مطابقتها في الجولة الحالية"""
+    name = models.CharField(max_length=50, unique=True)
+    last_payment_id = models.BigIntegerField(default=0)  # 0: the pass starts from the beginning
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'reconciliation_checkpoints'
+    
+    def __str__(self):
+        return f"{self.name} after payment {self.last_payment_id}"
+
+
 # Import timezone for models
 from django.utils import timezone
 from datetime import timedelta
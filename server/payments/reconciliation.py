@@ -0,0 +1,189 @@
+"""
+Gateway reconciliation.
+
+``reconcile`` checks payments that carry an Authorize.Net transaction id
+against the gateway's record of that transaction. A payment needs checking
+when it was never reconciled or was saved again since (``updated_at`` later
+than ``reconciled_at``).
+
+Payments are read in primary-key order, a chunk at a time. Each chunk's
+transaction details are fetched concurrently by a bounded thread pool that
+shares the service's pooled session; the threads only talk to the gateway,
+all database work happens on the calling thread. The chunk's results and the
+checkpoint (the last payment id handled in the current pass) are saved in one
+transaction, so an interrupted run resumes where it stopped. When a pass
+reaches the end its checkpoint is reset, and the next pass retries whatever
+could not be looked up.
+
+Differences are recorded as GatewayMismatch rows, one open row per payment and
+kind; a difference that is gone the next time the payment is checked is marked
+resolved. Only one run should work on a checkpoint at a time.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT = 'authorize_net'
+
+# Authorize.Net "record not found"
+NOT_FOUND = 'E00040'
+
+# our payment status -> gateway transaction statuses that agree with it
+GATEWAY_STATUSES = {
+    'succeeded': {'authorizedPendingCapture', 'capturedPendingSettlement', 'settledSuccessfully'},
+    'refunded': {
+        'capturedPendingSettlement', 'settledSuccessfully', 'voided',
+        'refundPendingSettlement', 'refundSettledSuccessfully',
+    },
+    'failed': {
+        'declined', 'voided', 'expired', 'failedReview',
+        'generalError', 'communicationError', 'settlementError',
+    },
+    'cancelled': {'declined', 'voided', 'expired'},
+}
+
+
+def unreconciled_payments():
+    from .models import Payment
+
+    return Payment.objects.exclude(
+        authorize_net_transaction_id__in=['', '0']
+    ).filter(
+        Q(reconciled_at__isnull=True) | Q(updated_at__gt=F('reconciled_at'))
+    ).only('id', 'authorize_net_transaction_id', 'amount', 'status')
+
+
+def compare(payment, details):
+    """[(kind, expected, actual)] differences between ``payment`` and the gateway's details"""
+    if not details['success']:
+        return [('missing', payment.authorize_net_transaction_id, '')]
+
+    differences = []
+    try:
+        amount = Decimal(details['amount'])
+    except (InvalidOperation, TypeError):
+        amount = None
+    if amount != payment.amount:
+        differences.append(('amount', str(payment.amount), details['amount']))
+
+    expected = GATEWAY_STATUSES.get(payment.status)
+    if expected is not None and details['status'] not in expected:
+        differences.append(('status', payment.status, details['status']))
+    return differences
+
+
+def _save_chunk(chunk, results, checked_at):
+    """Record one chunk's comparisons; returns (checked, mismatches, errors)"""
+    from .models import GatewayMismatch, Payment
+
+    ids = [payment.pk for payment in chunk]
+    open_mismatches = {
+        (mismatch.payment_id, mismatch.kind): mismatch.pk
+        for mismatch in GatewayMismatch.objects.filter(payment_id__in=ids, resolved_at__isnull=True)
+    }
+
+    checked, errors, new, still_open = [], 0, [], set()
+    for payment, details in zip(chunk, results):
+        if not details['success'] and details.get('error_code') != NOT_FOUND:
+            # Lookup failed (timeout, gateway unavailable...): retried next pass
+            errors += 1
+            continue
+
+        checked.append(payment.pk)
+        for kind, expected, actual in compare(payment, details):
+            key = (payment.pk, kind)
+            if key in open_mismatches:
+                still_open.add(open_mismatches[key])
+            else:
+                new.append(GatewayMismatch(
+                    payment_id=payment.pk,
+                    transaction_id=payment.authorize_net_transaction_id,
+                    kind=kind,
+                    expected=expected[:100],
+                    actual=actual[:100],
+                ))
+
+    GatewayMismatch.objects.bulk_create(new)
+    resolved = [
+        pk for (payment_id, _), pk in open_mismatches.items()
+        if payment_id in checked and pk not in still_open
+    ]
+    if resolved:
+        GatewayMismatch.objects.filter(pk__in=resolved).update(resolved_at=checked_at)
+    Payment.objects.filter(pk__in=checked).update(reconciled_at=checked_at)
+    return len(checked), len(new), errors
+
+
+def _save_checkpoint(last_payment_id):
+    from .models import ReconciliationCheckpoint
+
+    ReconciliationCheckpoint.objects.update_or_create(
+        name=CHECKPOINT, defaults={'last_payment_id': last_payment_id}
+    )
+
+
+def reset_checkpoint():
+    """Start the next run from the first payment"""
+    _save_checkpoint(0)
+
+
+def reconcile(service=None, chunk_size=None, workers=None, max_chunks=None):
+    """Check unreconciled payments against the gateway from the checkpoint on; returns totals"""
+    from .authorize_net_service import authorize_net_service
+    from .models import ReconciliationCheckpoint
+
+    service = service or authorize_net_service
+    chunk_size = chunk_size or getattr(settings, 'RECONCILIATION_CHUNK_SIZE', 200)
+    # more threads than the gateway's bulkhead allows would only be rejected
+    workers = min(workers or getattr(settings, 'RECONCILIATION_WORKERS', 8), service.guard.max_concurrent)
+    totals = {'checked': 0, 'mismatches': 0, 'errors': 0, 'chunks': 0, 'finished': False}
+
+    checkpoint, _ = ReconciliationCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    last_id = checkpoint.last_payment_id
+
+    def lookup(payment):
+        return service.get_transaction_details(payment.authorize_net_transaction_id)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while max_chunks is None or totals['chunks'] < max_chunks:
+            # Payments saved after this moment are checked again next pass
+            checked_at = timezone.now()
+            chunk = list(unreconciled_payments().filter(pk__gt=last_id).order_by('pk')[:chunk_size])
+            if not chunk:
+                _save_checkpoint(0)
+                totals['finished'] = True
+                break
+
+            results = list(pool.map(lookup, chunk))
+            failed = sum(
+                1 for details in results
+                if not details['success'] and details.get('error_code') != NOT_FOUND
+            )
+            if failed == len(chunk):
+                # The gateway is down; keep the checkpoint and try again later
+                logger.warning(f'Reconciliation stopped after payment {last_id}: every lookup failed')
+                totals['errors'] += failed
+                break
+
+            with transaction.atomic():
+                checked, mismatches, errors = _save_chunk(chunk, results, checked_at)
+                last_id = chunk[-1].pk
+                _save_checkpoint(last_id)
+
+            totals['chunks'] += 1
+            totals['checked'] += checked
+            totals['mismatches'] += mismatches
+            totals['errors'] += errors
+
+    logger.info(
+        f"Reconciliation: {totals['checked']} checked, {totals['mismatches']} new mismatches, "
+        f"{totals['errors']} lookups failed in {totals['chunks']} chunks"
+    )
+    return totals
@@ -0,0 +1,312 @@
+"""
+Daily financial rollups.
+
+``roll_up`` folds closed days of raw rows into the rollup tables:
+
+* ``wallet``: WalletDailyRollup, credits and debits per wallet, day and source;
+* ``platform``: PlatformDailyRollup, succeeded payments (gross, fees, net) and
+  subscription revenue per day, plus MRR when the day is closed on time.
+  Payments count on the day they succeeded (``processed_at``, or
+  ``created_at`` for rows created as succeeded); refund payments count
+  negative.
+
+Each rollup keeps a RollupWatermark, the first day it has not rolled up yet.
+A run only reads raw rows from the watermark up to the start of today, a few
+days per transaction, replaces those days' rollup rows and moves the
+watermark forward, so re-running it is harmless.
+
+Wallet transactions never change once written, but payments do: they are
+approved, bulk-confirmed or refunded after the day they were booked. The
+platform rollup therefore recomputes its last FINANCIAL_ROLLUP_REROLL_DAYS
+days on every run; corrections older than that need ``rebuild_from``.
+
+The stats helpers (``wallet_totals``, ``platform_totals``) add the stored
+rollups to a live aggregate of the raw rows from the watermark on, which is
+normally just today's rows.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Min, Q, Sum, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+ZERO = Decimal('0')
+
+WALLET_FIELDS = ('credit_amount', 'debit_amount', 'credit_count', 'debit_count')
+PAYMENT_FIELDS = ('gross', 'platform_fee', 'processing_fee', 'net', 'payment_count')
+SUBSCRIPTION_FIELDS = ('subscription_revenue', 'subscription_payment_count')
+
+# Rollups whose raw rows keep changing after the day closes; their trailing
+# window is recomputed on every run
+REROLLED = {'platform'}
+
+
+def day_start(day):
+    """Aware datetime at the start of ``day`` in the current timezone"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def month_start():
+    return timezone.localdate().replace(day=1)
+
+
+# --- raw aggregates -------------------------------------------------------
+
+def _wallet_transactions(start=None, end=None):
+    from .models import WalletTransaction
+
+    transactions = WalletTransaction.objects.order_by()
+    if start:
+        transactions = transactions.filter(created_at__gte=day_start(start))
+    if end:
+        transactions = transactions.filter(created_at__lt=day_start(end))
+    return transactions
+
+
+def _wallet_sums():
+    return {
+        'credit_amount': Sum('amount', filter=Q(transaction_type='credit')),
+        'debit_amount': Sum('amount', filter=Q(transaction_type='debit')),
+        'credit_count': Count('id', filter=Q(transaction_type='credit')),
+        'debit_count': Count('id', filter=Q(transaction_type='debit')),
+    }
+
+
+def _succeeded_payments(start=None, end=None):
+    """Succeeded payments annotated with ``booked_at``, when they succeeded"""
+    from .models import Payment
+
+    payments = Payment.objects.filter(status='succeeded').annotate(
+        booked_at=Coalesce('processed_at', 'created_at')
+    ).order_by()
+    if start:
+        payments = payments.filter(booked_at__gte=day_start(start))
+    if end:
+        payments = payments.filter(booked_at__lt=day_start(end))
+    return payments
+
+
+def _signed(field):
+    """``field``, negated for refund payments"""
+    return Sum(Case(When(payment_type='refund', then=-F(field)), default=F(field)))
+
+
+def _payment_sums():
+    return {
+        'gross': _signed('amount'),
+        'platform_fee': _signed('platform_fee'),
+        'processing_fee': _signed('processing_fee'),
+        'net': _signed('net_amount'),
+        'payment_count': Count('id', filter=~Q(payment_type='refund')),
+    }
+
+
+def _succeeded_subscription_payments(start=None, end=None):
+    """Succeeded subscription payments annotated with ``booked_at``, when they were paid"""
+    from subscriptions.models import SubscriptionPayment
+
+    payments = SubscriptionPayment.objects.filter(status='succeeded').annotate(
+        booked_at=Coalesce('paid_at', 'created_at')
+    ).order_by()
+    if start:
+        payments = payments.filter(booked_at__gte=day_start(start))
+    if end:
+        payments = payments.filter(booked_at__lt=day_start(end))
+    return payments
+
+
+def _subscription_sums():
+    return {
+        'subscription_revenue': Sum('amount'),
+        'subscription_payment_count': Count('id'),
+    }
+
+
+def current_mrr():
+    """Monthly recurring revenue of the subscriptions active right now"""
+    from subscriptions.models import Subscription
+
+    total = Subscription.objects.filter(status='active').aggregate(total=Sum('plan__price'))['total']
+    return total or ZERO
+
+
+# --- rolling up -----------------------------------------------------------
+
+def _first_wallet_day():
+    first = _wallet_transactions().aggregate(first=Min('created_at'))['first']
+    return timezone.localdate(first) if first else None
+
+
+def _first_platform_day():
+    firsts = [
+        _succeeded_payments().aggregate(first=Min('booked_at'))['first'],
+        _succeeded_subscription_payments().aggregate(first=Min('booked_at'))['first'],
+    ]
+    firsts = [first for first in firsts if first]
+    return timezone.localdate(min(firsts)) if firsts else None
+
+
+def _roll_wallet_days(start, end):
+    from .models import WalletDailyRollup
+
+    groups = _wallet_transactions(start, end).annotate(
+        day=TruncDate('created_at')
+    ).values('wallet_id', 'day', 'source').annotate(**_wallet_sums())
+
+    WalletDailyRollup.objects.filter(day__gte=start, day__lt=end).delete()
+    WalletDailyRollup.objects.bulk_create(
+        [
+            WalletDailyRollup(
+                wallet_id=group['wallet_id'],
+                day=group['day'],
+                source=group['source'],
+                **{field: group[field] or 0 for field in WALLET_FIELDS}
+            )
+            for group in groups
+        ],
+        batch_size=1000,
+    )
+
+
+def _roll_platform_days(start, end):
+    from .models import PlatformDailyRollup
+
+    days = defaultdict(dict)
+    for group in _succeeded_payments(start, end).annotate(
+        day=TruncDate('booked_at')
+    ).values('day').annotate(**_payment_sums()):
+        days[group['day']].update({field: group[field] or 0 for field in PAYMENT_FIELDS})
+    for group in _succeeded_subscription_payments(start, end).annotate(
+        day=TruncDate('booked_at')
+    ).values('day').annotate(**_subscription_sums()):
+        days[group['day']].update({field: group[field] or 0 for field in SUBSCRIPTION_FIELDS})
+
+    existing = PlatformDailyRollup.objects.filter(day__gte=start, day__lt=end)
+    mrr = dict(existing.filter(mrr__isnull=False).values_list('day', 'mrr'))
+    # MRR can only be observed now, so it is recorded for yesterday when
+    # yesterday is closed on schedule; older days keep what they had
+    yesterday = timezone.localdate() - timedelta(days=1)
+    if start <= yesterday < end:
+        mrr[yesterday] = current_mrr()
+        days.setdefault(yesterday, {})
+
+    existing.delete()
+    PlatformDailyRollup.objects.bulk_create(
+        [PlatformDailyRollup(day=day, mrr=mrr.get(day), **values) for day, values in days.items()],
+        batch_size=1000,
+    )
+
+
+ROLLUPS = {
+    'wallet': (_first_wallet_day, _roll_wallet_days),
+    'platform': (_first_platform_day, _roll_platform_days),
+}
+
+
+def rolled_until(name):
+    """First day ``name`` has not rolled up yet (None if it never ran)"""
+    from .models import RollupWatermark
+
+    return RollupWatermark.objects.filter(name=name).values_list('rolled_until', flat=True).first()
+
+
+def roll_up(name, until=None):
+    """Roll up ``name`` from its watermark to ``until`` (default: today, exclusive); returns days rolled"""
+    from .models import RollupWatermark
+
+    first_day, roll_days = ROLLUPS[name]
+    until = until or timezone.localdate()
+    step = timedelta(days=getattr(settings, 'FINANCIAL_ROLLUP_DAYS_PER_BATCH', 31))
+    rolled = 0
+
+    if name in REROLLED:
+        reroll_from = until - timedelta(days=getattr(settings, 'FINANCIAL_ROLLUP_REROLL_DAYS', 35))
+        RollupWatermark.objects.filter(name=name, rolled_until__gt=reroll_from).update(rolled_until=reroll_from)
+
+    while True:
+        with transaction.atomic():
+            watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=name)
+            start = watermark.rolled_until or first_day()
+            if start is None:
+                # Nothing to roll up yet; live totals cover everything
+                return rolled
+            if start >= until:
+                return rolled
+
+            end = min(start + step, until)
+            roll_days(start, end)
+            watermark.rolled_until = end
+            watermark.save(update_fields=['rolled_until', 'updated_at'])
+            rolled += (end - start).days
+
+
+def rebuild_from(name, day):
+    """Move ``name``'s watermark back so the next run recomputes from ``day``"""
+    from .models import RollupWatermark
+
+    RollupWatermark.objects.update_or_create(name=name, defaults={'rolled_until': day})
+
+
+# --- stats ----------------------------------------------------------------
+
+def _live_start(watermark, since):
+    """Raw rows are read from the later of the watermark and ``since``"""
+    if watermark and since:
+        return max(watermark, since)
+    return watermark or since
+
+
+def wallet_totals(wallet, since=None):
+    """{source: credit/debit sums and counts} for ``wallet`` from day ``since`` on (None: all time)"""
+    from .models import WalletDailyRollup
+
+    watermark = rolled_until('wallet')
+    totals = defaultdict(lambda: dict.fromkeys(WALLET_FIELDS, 0))
+
+    if watermark:
+        rollups = WalletDailyRollup.objects.filter(wallet=wallet, day__lt=watermark)
+        if since:
+            rollups = rollups.filter(day__gte=since)
+        for row in rollups.order_by().values('source').annotate(
+            **{field: Sum(field) for field in WALLET_FIELDS}
+        ):
+            for field in WALLET_FIELDS:
+                totals[row['source']][field] += row[field] or 0
+
+    live = _wallet_transactions(_live_start(watermark, since)).filter(wallet=wallet)
+    for row in live.values('source').annotate(**_wallet_sums()):
+        for field in WALLET_FIELDS:
+            totals[row['source']][field] += row[field] or 0
+
+    return dict(totals)
+
+
+def platform_totals(since=None):
+    """Platform revenue sums from day ``since`` on (None: all time)"""
+    from .models import PlatformDailyRollup
+
+    watermark = rolled_until('platform')
+    totals = dict.fromkeys(PAYMENT_FIELDS + SUBSCRIPTION_FIELDS, 0)
+
+    if watermark:
+        rollups = PlatformDailyRollup.objects.filter(day__lt=watermark)
+        if since:
+            rollups = rollups.filter(day__gte=since)
+        stored = rollups.aggregate(**{field: Sum(field) for field in totals})
+        for field in totals:
+            totals[field] += stored[field] or 0
+
+    live_start = _live_start(watermark, since)
+    for queryset, sums in (
+        (_succeeded_payments(live_start), _payment_sums()),
+        (_succeeded_subscription_payments(live_start), _subscription_sums()),
+    ):
+        live = queryset.aggregate(**sums)
+        for field in sums:
+            totals[field] += live[field] or 0
+
+    return totals
@@ -567,9 +567,13 @@ class WalletTransactionSerializer(serializers.ModelSerializer):
         model = WalletTransaction
         fields = [
             'id', 'wallet_info', 'amount', 'transaction_type', 'source',
-            'description', 'payment_info', 'created_at'
+            'description', 'payment_info', 'available_balance_after',
+            'pending_balance_after', 'created_at'
+        ]
+        read_only_fields = [
+            'id', 'wallet_info', 'payment_info', 'available_balance_after',
+            'pending_balance_after', 'created_at'
         ]
-        read_only_fields = ['id', 'wallet_info', 'payment_info', 'created_at']
     
     def get_wallet_info(self, obj):
         return {
@@ -1,7 +1,8 @@
 from celery import shared_task
-from django.utils import timezone
-from datetime import timedelta
-from .models import Wallet, WalletTransaction
+from .models import Wallet
+from .holds import release_due_holds
+from .reconciliation import reconcile
+from .rollups import ROLLUPS, roll_up
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,60 +11,23 @@ logger = logging.getLogger(__name__)
 @shared_task
 def auto_release_pending_funds():
     """
-    مهمة مجدولة للإفراج التلقائي عن الأموال المعلقة بعد 3 أيام
-    تعمل كل ساعة للتحقق من المعاملات المؤهلة للإفراج
+    مهمة مجدولة للإفراج التلقائي عن الأموال المعلقة بعد انتهاء فترة الحجز
+    تعمل كل ساعة وتعالج المعاملات المستحقة فقط على دفعات
     """
     try:
-        # Find transactions that are older than 3 days and still pending
-        three_days_ago = timezone.now() - timedelta(days=3)
-        
-        pending_transactions = WalletTransaction.objects.filter(
-            transaction_type='credit',
-            source='milestone_payment',
-            created_at__lte=three_days_ago,
-            description__contains='3-day hold period'
-        )
-        
-        total_released = 0
-        released_count = 0
-        affected_wallets = set()
-        
-        for transaction in pending_transactions:
-            wallet = transaction.wallet
-            
-            # Move from pending to available balance
-            wallet.pending_balance -= transaction.amount
-            wallet.available_balance += transaction.amount
-            total_released += transaction.amount
-            released_count += 1
-            affected_wallets.add(wallet)
-            
-            # Update transaction description to mark as released
-            transaction.description = transaction.description.replace(
-                '(3-day hold period)', 
-                '(auto-released to available balance)'
-            )
-            transaction.save()
-            
-            logger.info(
-                f'Auto-released ${transaction.amount} for user {wallet.user.id} '
-                f'from transaction {transaction.id}'
-            )
-        
-        # Save all affected wallets
-        for wallet in affected_wallets:
-            wallet.save()
+        totals = release_due_holds()
         
         logger.info(
-            f'Auto-release task completed: {released_count} transactions, '
-            f'${total_released} total amount released'
+            f"Auto-release task completed: {totals['released']} transactions, "
+            f"${totals['amount']} total amount released"
         )
         
         return {
             'success': True,
-            'transactions_released': released_count,
-            'total_amount_released': float(total_released),
-            'affected_wallets': len(affected_wallets)
+            'transactions_released': totals['released'],
+            'total_amount_released': float(totals['amount']),
+            'affected_wallets': totals['wallets'],
+            'skipped': totals['skipped']
         }
         
     except Exception as e:
@@ -80,44 +44,21 @@ def release_specific_user_funds(user_id):
     إفراج عن الأموال المعلقة لمستخدم محدد
     """
     try:
-        wallet = Wallet.objects.get(user_id=user_id)
-        three_days_ago = timezone.now() - timedelta(days=3)
+        if not Wallet.objects.filter(user_id=user_id).exists():
+            raise Wallet.DoesNotExist
         
-        pending_transactions = WalletTransaction.objects.filter(
-            wallet=wallet,
-            transaction_type='credit',
-            source='milestone_payment',
-            created_at__lte=three_days_ago,
-            description__contains='3-day hold period'
-        )
-        
-        total_released = 0
-        released_count = 0
-        
-        for transaction in pending_transactions:
-            wallet.pending_balance -= transaction.amount
-            wallet.available_balance += transaction.amount
-            total_released += transaction.amount
-            released_count += 1
-            
-            transaction.description = transaction.description.replace(
-                '(3-day hold period)', 
-                '(manually released to available balance)'
-            )
-            transaction.save()
-        
-        wallet.save()
+        totals = release_due_holds(user_id=user_id)
         
         logger.info(
-            f'Manual release for user {user_id}: {released_count} transactions, '
-            f'${total_released} total amount'
+            f"Manual release for user {user_id}: {totals['released']} transactions, "
+            f"${totals['amount']} total amount"
         )
         
         return {
             'success': True,
             'user_id': user_id,
-            'transactions_released': released_count,
-            'total_amount_released': float(total_released)
+            'transactions_released': totals['released'],
+            'total_amount_released': float(totals['amount'])
         }
         
     except Wallet.DoesNotExist:
@@ -131,4 +72,50 @@ def release_specific_user_funds(user_id):
         return {
             'success': False,
             'error': str(e)
-        }
\ No newline at end of file
+        }
+
+
+@shared_task
+def update_daily_rollups():
+    """
+    مهمة مجدولة لتجميع معاملات المحافظ وإيرادات المنصة للأيام المكتملة
+    تعالج فقط الأيام الجديدة بعد آخر يوم تم تجميعه
+    """
+    try:
+        days = {name: roll_up(name) for name in ROLLUPS}
+        
+        logger.info(f'Daily rollups updated: {days}')
+        
+        return {
+            'success': True,
+            'days_rolled': days
+        }
+        
+    except Exception as e:
+        logger.error(f'Daily rollup task failed: {str(e)}')
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+
+@shared_task
+def reconcile_gateway_payments():
+    """
+    مهمة ليلية لمطابقة المدفوعات مع سجلات Authorize.Net
+    تكمل من آخر نقطة توقف وتسجل الفروقات في جدول مستقل
+    """
+    try:
+        totals = reconcile()
+        
+        return {
+            'success': True,
+            **totals
+        }
+        
+    except Exception as e:
+        logger.error(f'Gateway reconciliation failed: {str(e)}')
+        return {
+            'success': False,
+            'error': str(e)
+        }
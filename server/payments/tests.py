@@ -1,3 +1,516 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from common.resilience import ProviderGuard
+from contracts.models import Contract, ContractMilestone
+from . import ledger
+from .authorize_net_service import AuthorizeNetService
+from .authorize_net_stub import StubGateway
+from .holds import release_due_holds, unreleased_holds
+from .models import (
+    Currency, GatewayMismatch, Payment, PlatformDailyRollup, ReconciliationCheckpoint,
+    Wallet, WalletDailyRollup, WalletTransaction
+)
+from .reconciliation import reconcile
+from .rollups import platform_totals, roll_up, rolled_until, wallet_totals
 
-# Create your tests here.
+User = get_user_model()
+
+
+class WalletLedgerTest(TestCase):
+    """Test the locked wallet ledger"""
+    
+    def setUp(self):
+        Currency.objects.get_or_create(id=1, defaults={'code': 'USD', 'name': 'US Dollar', 'symbol': '$'})
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.pro = User.objects.create_user(
+            username='pro',
+            email='pro@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.wallet = Wallet.objects.create(user=self.client_user)
+    
+    def test_entries_record_running_balance(self):
+        """Each ledger line carries the balances right after it"""
+        self.wallet.add_funds(Decimal('100.00'), source='top_up')
+        self.assertTrue(self.wallet.deduct_funds(Decimal('30.00')))
+        self.assertEqual(self.wallet.available_balance, Decimal('70.00'))
+        
+        lines = list(WalletTransaction.objects.filter(wallet=self.wallet).order_by('id'))
+        self.assertEqual(
+            [line.available_balance_after for line in lines],
+            [Decimal('100.00'), Decimal('70.00')]
+        )
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.available_balance, Decimal('70.00'))
+        self.assertEqual(self.wallet.total_earned, Decimal('0.00'))
+    
+    def test_transfer_is_all_or_nothing(self):
+        """A transfer that would overdraw one wallet writes nothing"""
+        self.wallet.add_funds(Decimal('50.00'), source='top_up')
+        with self.assertRaises(ledger.InsufficientFunds):
+            ledger.post([
+                ledger.credit(self.pro, Decimal('80.00'), 'contract_payment'),
+                ledger.debit(self.client_user, Decimal('80.00'), 'contract_payment'),
+            ])
+        self.assertFalse(Wallet.objects.filter(user=self.pro, available_balance__gt=0).exists())
+        self.assertEqual(WalletTransaction.objects.count(), 1)
+        
+        wallets = ledger.post([
+            ledger.debit(self.client_user, Decimal('40.00'), 'contract_payment'),
+            ledger.credit(self.pro, Decimal('40.00'), 'contract_payment'),
+        ])
+        self.assertEqual(wallets[self.client_user.pk].available_balance, Decimal('10.00'))
+        self.assertEqual(wallets[self.pro.pk].available_balance, Decimal('40.00'))
+        self.assertEqual(wallets[self.pro.pk].total_earned, Decimal('40.00'))
+    
+    def test_move_to_pending_refuses_overdraw(self):
+        """Balance moves fail cleanly instead of going negative"""
+        self.wallet.add_funds(Decimal('20.00'), source='top_up')
+        self.assertFalse(self.wallet.move_to_pending(Decimal('25.00')))
+        self.assertTrue(self.wallet.move_to_pending(Decimal('15.00')))
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.available_balance, Decimal('5.00'))
+        self.assertEqual(self.wallet.pending_balance, Decimal('15.00'))
+
+
+class HoldReleaseTest(TestCase):
+    """Test batched release of held credits"""
+    
+    def setUp(self):
+        Currency.objects.get_or_create(id=1, defaults={'code': 'USD', 'name': 'US Dollar', 'symbol': '$'})
+        self.pros = [
+            User.objects.create_user(
+                username=f'pro{i}',
+                email=f'pro{i}@example.com',
+                password='testpass123',
+                user_type='home_pro'
+            )
+            for i in range(2)
+        ]
+        past = timezone.now() - timedelta(hours=1)
+        future = timezone.now() + timedelta(days=2)
+        ledger.post([
+            ledger.credit(self.pros[0], Decimal('10.00'), 'milestone_payment', pending=True, hold_until=past),
+            ledger.credit(self.pros[0], Decimal('15.00'), 'milestone_payment', pending=True, hold_until=past),
+            ledger.credit(self.pros[1], Decimal('20.00'), 'milestone_payment', pending=True, hold_until=past),
+            ledger.credit(self.pros[1], Decimal('40.00'), 'milestone_payment', pending=True, hold_until=future),
+        ])
+    
+    def test_only_due_holds_are_released(self):
+        """Due holds move to available per wallet; future holds stay pending"""
+        totals = release_due_holds(batch_size=2)
+        self.assertEqual(totals['released'], 3)
+        self.assertEqual(totals['amount'], Decimal('45.00'))
+        self.assertEqual(totals['wallets'], 2)
+        
+        first = Wallet.objects.get(user=self.pros[0])
+        second = Wallet.objects.get(user=self.pros[1])
+        self.assertEqual((first.available_balance, first.pending_balance), (Decimal('25.00'), Decimal('0.00')))
+        self.assertEqual((second.available_balance, second.pending_balance), (Decimal('20.00'), Decimal('40.00')))
+        self.assertEqual(unreleased_holds().count(), 1)
+        
+        # Released holds are not picked up again
+        self.assertEqual(release_due_holds()['released'], 0)
+
+
+class PaymentSummaryTest(TestCase):
+    """Payment summary and analytics come from grouped aggregates"""
+    
+    def setUp(self):
+        cache.clear()
+        Currency.objects.get_or_create(id=1, defaults={'code': 'USD', 'name': 'US Dollar', 'symbol': '$'})
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.pro = User.objects.create_user(
+            username='pro',
+            email='pro@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.contracts = [
+            Contract.objects.create(
+                title=f'Contract {i}',
+                description='Test contract',
+                client=self.client_user,
+                professional=self.pro,
+                total_amount=Decimal('1000.00'),
+                start_date=date(2026, 1, 1),
+                end_date=date(2026, 3, 1),
+                status='active'
+            )
+            for i in range(3)
+        ]
+        now = timezone.now()
+        for contract in self.contracts[:2]:
+            for amount, payment_status in [('100.00', 'succeeded'), ('150.00', 'succeeded'), ('500.00', 'failed')]:
+                Payment.objects.create(
+                    contract=contract,
+                    payer=self.client_user,
+                    payee=self.pro,
+                    amount=Decimal(amount),
+                    status=payment_status,
+                    processed_at=now
+                )
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.client_user)
+    
+    def test_summary_query_count_does_not_grow_with_contracts(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get(reverse('payments:payment_summary'))
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), 4)
+        
+        results = {row['contract_id']: row for row in response.data['results']}
+        paid = results[self.contracts[0].pk]
+        self.assertEqual(Decimal(paid['paid_amount']), Decimal('250.00'))
+        self.assertEqual(paid['payment_count'], 2)
+        self.assertIsNotNone(paid['last_payment_date'])
+        unpaid = results[self.contracts[2].pk]
+        self.assertEqual((Decimal(unpaid['paid_amount']), unpaid['payment_count']), (Decimal('0'), 0))
+        
+        # Served from the per-user cache the second time
+        with CaptureQueriesContext(connection) as queries:
+            self.api.get(reverse('payments:payment_summary'))
+        self.assertEqual(len(queries), 0)
+    
+    def test_analytics_daily_buckets(self):
+        response = self.api.get(reverse('payments:payment_analytics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['daily_payments']), 1)
+        day = next(iter(response.data['daily_payments'].values()))
+        self.assertEqual(day, {'paid': 500.0, 'received': 0.0, 'count': 4})
+        
+        self.api.force_authenticate(user=self.pro)
+        day = next(iter(self.api.get(reverse('payments:payment_analytics')).data['daily_payments'].values()))
+        self.assertEqual(day, {'paid': 0.0, 'received': 500.0, 'count': 4})
+    
+    def test_pending_transactions_bad_cursor_is_a_400(self):
+        response = self.api.get(reverse('payments:pending_transactions_with_release_dates'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DailyRollupTest(TestCase):
+    """Rollups plus the live delta match the raw rows"""
+    
+    def setUp(self):
+        Currency.objects.get_or_create(id=1, defaults={'code': 'USD', 'name': 'US Dollar', 'symbol': '$'})
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.pro = User.objects.create_user(
+            username='pro',
+            email='pro@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        ledger.post([ledger.credit(self.pro, Decimal('100.00'), 'milestone_payment')])
+        ledger.post([ledger.credit(self.pro, Decimal('40.00'), 'wallet_topup')])
+        ledger.post([ledger.debit(self.pro, Decimal('30.00'), 'withdrawal')])
+        for amount in ['200.00', '300.00']:
+            Payment.objects.create(
+                payer=self.client_user,
+                payee=self.pro,
+                amount=Decimal(amount),
+                platform_fee=Decimal('20.00'),
+                processing_fee=Decimal('5.00'),
+                net_amount=Decimal(amount) - Decimal('25.00'),
+                status='succeeded'
+            )
+        
+        # Everything so far happened two days ago; one more credit lands today
+        two_days_ago = timezone.now() - timedelta(days=2)
+        WalletTransaction.objects.update(created_at=two_days_ago)
+        Payment.objects.update(created_at=two_days_ago)
+        ledger.post([ledger.credit(self.pro, Decimal('15.00'), 'milestone_payment')])
+        self.wallet = Wallet.objects.get(user=self.pro)
+    
+    def test_rollup_is_incremental_and_idempotent(self):
+        live = wallet_totals(self.wallet)
+        
+        self.assertGreaterEqual(roll_up('wallet'), 2)
+        self.assertEqual(rolled_until('wallet'), timezone.localdate())
+        self.assertEqual(WalletDailyRollup.objects.filter(wallet=self.wallet).count(), 3)
+        self.assertEqual(roll_up('wallet'), 0)
+        
+        # Rollups plus today's rows give the same answer as the raw rows
+        totals = wallet_totals(self.wallet)
+        self.assertEqual(totals, live)
+        self.assertEqual(totals['milestone_payment']['credit_amount'], Decimal('115.00'))
+        self.assertEqual(totals['milestone_payment']['credit_count'], 2)
+        self.assertEqual(totals['withdrawal']['debit_amount'], Decimal('-30.00'))
+        self.assertEqual(
+            wallet_totals(self.wallet, since=timezone.localdate())['milestone_payment']['credit_amount'],
+            Decimal('15.00')
+        )
+    
+    def test_platform_totals(self):
+        before = platform_totals()
+        self.assertEqual(before['gross'], Decimal('500.00'))
+        
+        roll_up('platform')
+        self.assertEqual(PlatformDailyRollup.objects.get(payment_count__gt=0).payment_count, 2)
+        after = platform_totals()
+        self.assertEqual(after, before)
+        self.assertEqual(after['net'], Decimal('450.00'))
+        self.assertEqual(platform_totals(since=timezone.localdate())['gross'], 0)
+    
+    def test_later_status_changes_are_rolled_up(self):
+        """Payments approved or refunded after their day are picked up by the next run"""
+        late = Payment.objects.create(
+            payer=self.client_user,
+            payee=self.pro,
+            amount=Decimal('100.00'),
+            net_amount=Decimal('100.00'),
+            status='pending'
+        )
+        roll_up('platform')
+        self.assertEqual(platform_totals()['gross'], Decimal('500.00'))
+        
+        # Approved yesterday, refunded another payment since
+        Payment.objects.filter(pk=late.pk).update(
+            status='succeeded', processed_at=timezone.now() - timedelta(days=1)
+        )
+        Payment.objects.filter(amount=Decimal('200.00')).update(status='refunded')
+        roll_up('platform')
+        self.assertEqual(rolled_until('platform'), timezone.localdate())
+        self.assertEqual(platform_totals()['gross'], Decimal('400.00'))
+        self.assertEqual(platform_totals(since=timezone.localdate())['gross'], 0)
+
+
+class AuthorizeNetStubTest(SimpleTestCase):
+    """AuthorizeNetService against the local stub gateway"""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.gateway = StubGateway().start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.gateway.stop()
+        super().tearDownClass()
+    
+    def setUp(self):
+        self.service = AuthorizeNetService(api_endpoint=self.gateway.url)
+        self.service.guard = ProviderGuard('authorize_net', failure_threshold=2, reset_timeout=60)
+    
+    def charge(self, card_number='4111111111111111', amount='25.00'):
+        return self.service.charge_credit_card(
+            amount=Decimal(amount),
+            card_number=card_number,
+            expiry_date='1230',
+            card_code='123',
+            invoice_number='INV-1'
+        )
+    
+    def test_charge_refund_and_details(self):
+        charge = self.charge()
+        self.assertTrue(charge['success'])
+        
+        refund = self.service.refund_transaction(charge['transaction_id'], Decimal('10.00'))
+        self.assertTrue(refund['success'])
+        
+        details = self.service.get_transaction_details(charge['transaction_id'])
+        self.assertEqual(details['amount'], '25.00')
+        self.assertEqual(details['status'], 'capturedPendingSettlement')
+        
+        # Calls share one pooled session and are timed per operation
+        metrics = self.service.metrics.snapshot()
+        self.assertEqual(metrics['charge']['calls'], 1)
+        self.assertEqual(metrics['refund']['errors'], 0)
+    
+    def test_declined_card(self):
+        self.assertFalse(self.charge(card_number='4000000000000002')['success'])
+    
+    def test_only_idempotent_calls_are_retried(self):
+        charge = self.charge()
+        
+        self.gateway.fail_next(1)
+        details = self.service.get_transaction_details(charge['transaction_id'])
+        self.assertTrue(details['success'])
+        self.assertEqual(self.service.metrics.snapshot()['transaction_details']['retries'], 1)
+        
+        self.gateway.fail_next(1)
+        served = self.gateway.requests_served
+        self.assertFalse(self.charge()['success'])
+        self.assertEqual(self.gateway.requests_served, served + 1)
+    
+    def test_open_circuit_fails_fast(self):
+        self.gateway.fail_next(2)
+        self.assertFalse(self.charge()['success'])
+        self.assertFalse(self.charge()['success'])
+        
+        served = self.gateway.requests_served
+        charge = self.charge()
+        self.assertTrue(charge['unavailable'])
+        self.assertEqual(self.gateway.requests_served, served)
+        self.assertEqual(self.service.guard.snapshot()['rejected_open'], 1)
+
+
+class GatewayReconciliationTest(TestCase):
+    """Payments are checked against the stub gateway in resumable chunks"""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.gateway = StubGateway().start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.gateway.stop()
+        super().tearDownClass()
+    
+    def setUp(self):
+        Currency.objects.get_or_create(id=1, defaults={'code': 'USD', 'name': 'US Dollar', 'symbol': '$'})
+        self.payer = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.payee = User.objects.create_user(
+            username='pro',
+            email='pro@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.service = AuthorizeNetService(api_endpoint=self.gateway.url)
+        self.service.guard = ProviderGuard('authorize_net')
+    
+    def payment(self, amount, charged=None, payment_status='succeeded', transaction_id=None):
+        if transaction_id is None and charged:
+            transaction_id = self.service.charge_credit_card(
+                amount=Decimal(charged),
+                card_number='4111111111111111',
+                expiry_date='1230',
+                card_code='123'
+            )['transaction_id']
+        return Payment.objects.create(
+            payer=self.payer,
+            payee=self.payee,
+            amount=Decimal(amount),
+            status=payment_status,
+            authorize_net_transaction_id=transaction_id or ''
+        )
+    
+    def test_mismatches_are_recorded_and_run_resumes(self):
+        self.payment('25.00', charged='25.00')
+        wrong_amount = self.payment('45.00', charged='40.00')
+        self.payment('30.00', transaction_id='99999999')
+        self.payment('60.00', charged='60.00', payment_status='failed')
+        self.payment('10.00')  # never reached the gateway
+        
+        totals = reconcile(service=self.service, chunk_size=2, max_chunks=1)
+        self.assertEqual((totals['checked'], totals['finished']), (2, False))
+        self.assertEqual(
+            ReconciliationCheckpoint.objects.get().last_payment_id, wrong_amount.pk
+        )
+        
+        served = self.gateway.requests_served
+        totals = reconcile(service=self.service, chunk_size=2)
+        self.assertEqual((totals['checked'], totals['finished']), (2, True))
+        self.assertEqual(self.gateway.requests_served, served + 2)  # resumed after the checkpoint
+        self.assertEqual(
+            sorted(GatewayMismatch.objects.values_list('kind', 'expected', 'actual')),
+            [('amount', '45.00', '40.00'), ('missing', '99999999', ''), ('status', 'failed', 'capturedPendingSettlement')]
+        )
+        
+        # Nothing left to check until a payment changes
+        self.assertEqual(reconcile(service=self.service)['checked'], 0)
+        
+        wrong_amount.amount = Decimal('40.00')
+        wrong_amount.save()
+        totals = reconcile(service=self.service)
+        self.assertEqual((totals['checked'], totals['mismatches']), (1, 0))
+        self.assertIsNotNone(GatewayMismatch.objects.get(kind='amount').resolved_at)
+
+
+class MilestonePaymentApprovalTest(TestCase):
+    """Approving a milestone payment moves pending funds once"""
+    
+    def setUp(self):
+        Currency.objects.get_or_create(id=1, defaults={'code': 'USD', 'name': 'US Dollar', 'symbol': '$'})
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.pro = User.objects.create_user(
+            username='pro',
+            email='pro@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        contract = Contract.objects.create(
+            title='Kitchen remodel',
+            description='Test contract',
+            client=self.client_user,
+            professional=self.pro,
+            total_amount=Decimal('1000.00'),
+            start_date=date(2026, 1, 1),
+            end_date=date(2026, 3, 1),
+            status='active'
+        )
+        self.milestone = ContractMilestone.objects.create(
+            contract=contract,
+            title='Demolition',
+            amount=Decimal('300.00'),
+            due_date=date(2026, 2, 1)
+        )
+        self.payment = Payment.objects.create(
+            payer=self.client_user,
+            payee=self.pro,
+            contract=contract,
+            milestone=self.milestone,
+            amount=Decimal('300.00'),
+            payment_type='milestone_payment',
+            status='pending'
+        )
+        Wallet.objects.create(user=self.client_user, pending_balance=Decimal('500.00'))
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.client_user)
+        self.url = reverse('payments:milestone-payment-approve', args=[self.milestone.id])
+    
+    def test_approval_moves_pending_funds_once(self):
+        response = self.api.post(self.url, {'payment_id': self.payment.id, 'approved': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['client_pending_balance'], 200.0)
+        self.assertEqual(response.data['professional_pending_balance'], 300.0)
+        
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'succeeded')
+        self.assertEqual(Wallet.objects.get(user=self.pro).pending_balance, Decimal('300.00'))
+        
+        # A retry finds nothing left to approve and moves nothing
+        retry = self.api.post(self.url, {'payment_id': self.payment.id, 'approved': True}, format='json')
+        self.assertEqual(retry.status_code, 404)
+        self.assertEqual(Wallet.objects.get(user=self.client_user).pending_balance, Decimal('200.00'))
+    
+    def test_insufficient_pending_balance_changes_nothing(self):
+        Wallet.objects.filter(user=self.client_user).update(pending_balance=Decimal('100.00'))
+        response = self.api.post(self.url, {'payment_id': self.payment.id, 'approved': True}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
@@ -2,7 +2,12 @@ from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Sum, Count, Q
+from rest_framework.exceptions import APIException
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum, Count, Max, Q
+from django.db.models.functions import TruncDate
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django_filters.rest_framework import DjangoFilterBackend
@@ -21,6 +26,10 @@ from .serializers import (
     BankAccountSerializer, BankAccountCreateSerializer
 )
 from .authorize_net_service import authorize_net_service
+from . import ledger
+from .holds import hold_until, unreleased_holds
+from .rollups import current_mrr, day_start, month_start, platform_totals, wallet_totals
+from common.pagination import KeysetPagination
 
 User = get_user_model()
 
@@ -413,91 +422,80 @@ class MilestonePaymentApprovalView(APIView):
             approved = request.data.get('approved')
             notes = request.data.get('notes', '')
             
-            # Get the payment
-            payment = Payment.objects.get(
-                id=payment_id,
-                milestone=milestone,
-                status='pending'
-            )
-            
-            if approved:
-                # Check client's pending balance
-                client_wallet, created = Wallet.objects.get_or_create(user=user)
-                
-                if client_wallet.pending_balance < payment.amount:
-                    return Response(
-                        {'error': 'Insufficient pending balance'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Get or create professional's wallet
-                professional_wallet, created = Wallet.objects.get_or_create(
-                    user=milestone.contract.professional
+            with transaction.atomic():
+                # Lock the payment so a double submit or a retry cannot approve it twice
+                payment = Payment.objects.select_for_update().get(
+                    id=payment_id,
+                    milestone=milestone,
+                    status='pending'
                 )
                 
-                # Transfer funds from client's pending to professional's pending
-                client_wallet.pending_balance -= payment.amount
-                client_wallet.save()
-                
-                professional_wallet.pending_balance += payment.amount
-                professional_wallet.save()
-                
-                # Create wallet transactions
-                WalletTransaction.objects.create(
-                    wallet=client_wallet,
-                    amount=payment.amount,
-                    transaction_type='debit',
-                    source='milestone_payment',
-                    description=f'Milestone payment to {milestone.contract.professional.get_display_name()}',
-                    payment=payment
-                )
-                
-                WalletTransaction.objects.create(
-                    wallet=professional_wallet,
-                    amount=payment.amount,
-                    transaction_type='credit',
-                    source='milestone_payment',
-                    description=f'Milestone payment from {milestone.contract.client.get_display_name()}',
-                    payment=payment
-                )
-                
-                # Update payment status
-                payment.status = 'succeeded'
-                payment.processed_at = timezone.now()
-                payment.description = f"{payment.description}\nClient approval notes: {notes}" if notes else payment.description
-                payment.save()
-                
-                # Update milestone
-                milestone.status = 'completed'
-                milestone.payment_date = timezone.now().date()
-                milestone.save()
-                
-                # Update contract paid amount
-                milestone.contract.paid_amount += payment.amount
-                milestone.contract.save()
-                
-                return Response({
-                    'message': 'Milestone payment approved and processed successfully',
-                    'payment_id': payment.id,
-                    'amount_transferred': float(payment.amount),
-                    'client_pending_balance': float(client_wallet.pending_balance),
-                    'professional_pending_balance': float(professional_wallet.pending_balance)
-                })
-            else:
-                # Payment rejected
-                payment.status = 'cancelled'
-                payment.description = f"{payment.description}\nClient rejection notes: {notes}" if notes else payment.description
-                payment.save()
-                
-                # Update milestone status back to pending
-                milestone.status = 'pending'
-                milestone.save()
-                
-                return Response({
-                    'message': 'Milestone payment rejected',
-                    'payment_id': payment.id,
-                    'status': payment.status
-                })
+                if approved:
+                    # Move the amount from the client's pending balance to the
+                    # professional's, held there until payments.holds releases it
+                    try:
+                        wallets = ledger.post([
+                            ledger.debit(
+                                user,
+                                payment.amount,
+                                'milestone_payment',
+                                f'Milestone payment to {milestone.contract.professional.get_display_name()}',
+                                pending=True,
+                                payment=payment
+                            ),
+                            ledger.credit(
+                                milestone.contract.professional_id,
+                                payment.amount,
+                                'milestone_payment',
+                                f'Milestone payment from {milestone.contract.client.get_display_name()}',
+                                pending=True,
+                                payment=payment,
+                                hold_until=hold_until()
+                            ),
+                        ])
+                    except ledger.InsufficientFunds:
+                        return Response(
+                            {'error': 'Insufficient pending balance'},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+                    
+                    # Update payment status
+                    payment.status = 'succeeded'
+                    payment.processed_at = timezone.now()
+                    payment.description = f"{payment.description}\nClient approval notes: {notes}" if notes else payment.description
+                    payment.save()
+                    
+                    # Update milestone
+                    milestone.status = 'completed'
+                    milestone.payment_date = timezone.now().date()
+                    milestone.save()
+                    
+                    # Update contract paid amount
+                    milestone.contract.paid_amount += payment.amount
+                    milestone.contract.save()
+                    
+                    return Response({
+                        'message': 'Milestone payment approved and processed successfully',
+                        'payment_id': payment.id,
+                        'amount_transferred': float(payment.amount),
+                        'client_pending_balance': float(wallets[user.id].pending_balance),
+                        'professional_pending_balance': float(wallets[milestone.contract.professional_id].pending_balance)
+                    })
+                else:
+                    # Payment rejected
+                    payment.status = 'cancelled'
+                    payment.description = f"{payment.description}\nClient rejection notes: {notes}" if notes else payment.description
+                    payment.save()
+                    
+                    # Update milestone status back to pending
+                    milestone.status = 'pending'
+                    milestone.save()
+                    
+                    return Response({
+                        'message': 'Milestone payment rejected',
+                        'payment_id': payment.id,
+                        'status': payment.status
+                    })
                 
         except ContractMilestone.DoesNotExist:
             return Response(
@@ -647,56 +645,54 @@ def payment_stats(request):
     """إحصائيات المدفوعات"""
     user = request.user
     
-    # Get payments where user is involved
-    payments = Payment.objects.filter(Q(payer=user) | Q(payee=user))
-    
-    # Calculate stats
-    total_payments = payments.count()
-    total_amount_paid = payments.filter(payer=user, status='succeeded').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
-    
-    total_amount_received = payments.filter(payee=user, status='succeeded').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
-    
-    pending_payments = payments.filter(status='pending').count()
-    succeeded_payments = payments.filter(status='succeeded').count()
-    failed_payments = payments.filter(status='failed').count()
-    
-    # Calculate refunds from payments with refunded status
-    total_refunds = payments.filter(status='refunded').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
-    
-    # Current month stats
-    current_month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    current_month_payments = payments.filter(
-        payer=user,
-        status='succeeded',
-        processed_at__gte=current_month_start
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    current_month_earnings = payments.filter(
-        payee=user,
-        status='succeeded',
-        processed_at__gte=current_month_start
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    stats = {
-        'total_payments': total_payments,
-        'total_amount_paid': total_amount_paid,
-        'total_amount_received': total_amount_received,
-        'pending_payments': pending_payments,
-        'succeeded_payments': succeeded_payments,
-        'failed_payments': failed_payments,
-        'total_refunds': total_refunds,
-        'current_month_payments': current_month_payments,
-        'current_month_earnings': current_month_earnings
-    }
+    # Get payments where user is involved. Statuses change after the fact, so
+    # these are read live, but in a single conditional aggregate
+    payments = Payment.objects.filter(Q(payer=user) | Q(payee=user)).order_by()
+    
+    current_month = day_start(month_start())
+    succeeded = Q(status='succeeded')
+    totals = payments.aggregate(
+        total_payments=Count('id'),
+        total_amount_paid=Sum('amount', filter=succeeded & Q(payer=user)),
+        total_amount_received=Sum('amount', filter=succeeded & Q(payee=user)),
+        pending_payments=Count('id', filter=Q(status='pending')),
+        succeeded_payments=Count('id', filter=succeeded),
+        failed_payments=Count('id', filter=Q(status='failed')),
+        # Calculate refunds from payments with refunded status
+        total_refunds=Sum('amount', filter=Q(status='refunded')),
+        current_month_payments=Sum(
+            'amount', filter=succeeded & Q(payer=user, processed_at__gte=current_month)
+        ),
+        current_month_earnings=Sum(
+            'amount', filter=succeeded & Q(payee=user, processed_at__gte=current_month)
+        ),
+    )
+    stats = {key: value or 0 for key, value in totals.items()}
     
     serializer = PaymentStatsSerializer(stats)
-    return Response(serializer.data)
+    data = serializer.data
+    
+    if user.is_staff:
+        # Platform revenue from the daily rollups plus today's live delta
+        data['platform_revenue'] = {
+            'all_time': platform_totals(),
+            'current_month': platform_totals(since=month_start()),
+            'mrr': current_mrr(),
+        }
+    return Response(data)
+
+
+def _cached_for_user(prefix, request, build):
+    """
+    Response data for ``request`` cached per user and query string for a short
+    window (``PAYMENT_STATS_CACHE_TTL`` seconds)
+    """
+    key = f'{prefix}:{request.user.pk}:{request.query_params.urlencode()}'
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, getattr(settings, 'PAYMENT_STATS_CACHE_TTL', 60))
+    return data
 
 
 @api_view(['GET'])
@@ -705,39 +701,49 @@ def payment_summary(request):
     """ملخص المدفوعات حسب العقد"""
     user = request.user
     
-    # Get contracts where user is involved
-    from contracts.models import Contract
-    contracts = Contract.objects.filter(
-        Q(client=user) | Q(professional=user)
-    )
-    
-    summaries = []
-    for contract in contracts:
-        payments = Payment.objects.filter(
-            contract=contract,
-            status='succeeded'
-        )
-        
-        paid_amount = payments.aggregate(total=Sum('amount'))['total'] or 0
-        remaining_amount = contract.total_amount - paid_amount
-        completion_percentage = (paid_amount / contract.total_amount * 100) if contract.total_amount > 0 else 0
+    def build():
+        # Get contracts where user is involved
+        from contracts.models import Contract
+        contracts = Contract.for_participant(user).only('id', 'title', 'total_amount', 'created_at')
         
-        last_payment = payments.order_by('-processed_at').first()
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(contracts, request)
         
-        summary = {
-            'contract_id': contract.id,
-            'contract_title': contract.title,
-            'total_amount': contract.total_amount,
-            'paid_amount': paid_amount,
-            'remaining_amount': remaining_amount,
-            'payment_count': payments.count(),
-            'last_payment_date': last_payment.processed_at if last_payment else None,
-            'completion_percentage': completion_percentage
+        # One grouped aggregate for the whole page
+        totals = {
+            row['contract']: row
+            for row in Payment.objects.filter(
+                contract__in=[contract.pk for contract in page],
+                status='succeeded'
+            ).order_by().values('contract').annotate(
+                paid_amount=Sum('amount'),
+                payment_count=Count('id'),
+                last_payment_date=Max('processed_at')
+            )
         }
-        summaries.append(summary)
+        
+        summaries = []
+        for contract in page:
+            row = totals.get(contract.pk, {})
+            paid_amount = row.get('paid_amount') or 0
+            remaining_amount = contract.total_amount - paid_amount
+            completion_percentage = (paid_amount / contract.total_amount * 100) if contract.total_amount > 0 else 0
+            
+            summaries.append({
+                'contract_id': contract.id,
+                'contract_title': contract.title,
+                'total_amount': contract.total_amount,
+                'paid_amount': paid_amount,
+                'remaining_amount': remaining_amount,
+                'payment_count': row.get('payment_count', 0),
+                'last_payment_date': row.get('last_payment_date'),
+                'completion_percentage': completion_percentage
+            })
+        
+        serializer = PaymentSummarySerializer(summaries, many=True)
+        return paginator.get_paginated_data(serializer.data)
     
-    serializer = PaymentSummarySerializer(summaries, many=True)
-    return Response(serializer.data)
+    return Response(_cached_for_user('payment-summary', request, build))
 
 
 @api_view(['GET'])
@@ -748,51 +754,53 @@ def payment_analytics(request):
     
     # Get date range from query params
     days = int(request.query_params.get('days', 30))
-    start_date = timezone.now() - timedelta(days=days)
-    
-    payments = Payment.objects.filter(
-        Q(payer=user) | Q(payee=user),
-        processed_at__gte=start_date,
-        status='succeeded'
-    )
     
-    # Daily payment amounts
-    daily_payments = {}
-    for payment in payments:
-        date_key = payment.processed_at.date().isoformat()
-        if date_key not in daily_payments:
-            daily_payments[date_key] = {
-                'paid': 0,
-                'received': 0,
-                'count': 0
+    def build():
+        start_date = timezone.now() - timedelta(days=days)
+        
+        payments = Payment.objects.filter(
+            Q(payer=user) | Q(payee=user),
+            processed_at__gte=start_date,
+            status='succeeded'
+        ).order_by()
+        
+        # Daily payment amounts, bucketed and split in the database
+        daily = payments.annotate(day=TruncDate('processed_at')).values('day').annotate(
+            paid=Sum('amount', filter=Q(payer=user)),
+            received=Sum('amount', filter=~Q(payer=user)),
+            count=Count('id')
+        ).order_by('day')
+        daily_payments = {
+            row['day'].isoformat(): {
+                'paid': float(row['paid'] or 0),
+                'received': float(row['received'] or 0),
+                'count': row['count']
             }
+            for row in daily
+        }
         
-        daily_payments[date_key]['count'] += 1
-        if payment.payer == user:
-            daily_payments[date_key]['paid'] += float(payment.amount)
-        else:
-            daily_payments[date_key]['received'] += float(payment.amount)
-    
-    # Payment method distribution
-    payment_methods = payments.values('payment_method__provider').annotate(
-        count=Count('id'),
-        total=Sum('amount')
-    )
-    
-    # Payment status distribution
-    all_payments = Payment.objects.filter(Q(payer=user) | Q(payee=user))
-    status_distribution = all_payments.values('status').annotate(count=Count('id'))
-    
-    return Response({
-        'daily_payments': daily_payments,
-        'payment_methods': list(payment_methods),
-        'status_distribution': list(status_distribution),
-        'date_range': {
-            'start': start_date.date().isoformat(),
-            'end': timezone.now().date().isoformat(),
-            'days': days
+        # Payment method distribution
+        payment_methods = payments.values('payment_method__provider').annotate(
+            count=Count('id'),
+            total=Sum('amount')
+        )
+        
+        # Payment status distribution
+        all_payments = Payment.objects.filter(Q(payer=user) | Q(payee=user)).order_by()
+        status_distribution = all_payments.values('status').annotate(count=Count('id'))
+        
+        return {
+            'daily_payments': daily_payments,
+            'payment_methods': list(payment_methods),
+            'status_distribution': list(status_distribution),
+            'date_range': {
+                'start': start_date.date().isoformat(),
+                'end': timezone.now().date().isoformat(),
+                'days': days
+            }
         }
-    })
+    
+    return Response(_cached_for_user('payment-analytics', request, build))
 
 
 @api_view(['POST'])
@@ -1088,35 +1096,20 @@ def wallet_stats(request):
             defaults={'currency_id': 1}
         )
         
-        # Get transaction statistics
-        transactions = WalletTransaction.objects.filter(wallet=wallet)
+        # Daily rollups plus the rows not rolled up yet (normally just today's)
+        by_source = wallet_totals(wallet)
+        this_month = wallet_totals(wallet, since=month_start())
         
-        total_credits = transactions.filter(transaction_type='credit').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        total_debits = transactions.filter(transaction_type='debit').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        # Current month stats
-        current_month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        current_month_credits = transactions.filter(
-            transaction_type='credit',
-            created_at__gte=current_month_start
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        current_month_debits = transactions.filter(
-            transaction_type='debit',
-            created_at__gte=current_month_start
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        total_credits = sum(row['credit_amount'] for row in by_source.values())
+        total_debits = sum(row['debit_amount'] for row in by_source.values())
+        current_month_credits = sum(row['credit_amount'] for row in this_month.values())
+        current_month_debits = sum(row['debit_amount'] for row in this_month.values())
         
         # Calculate platform earnings (exclude wallet top-ups)
-        platform_earnings = transactions.filter(
-            transaction_type='credit'
-        ).exclude(
-            source__in=['wallet_topup', 'topup', 'manual_topup']
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        platform_earnings = sum(
+            row['credit_amount'] for source, row in by_source.items()
+            if source not in ['wallet_topup', 'topup', 'manual_topup']
+        )
         
         stats = {
             'available_balance': wallet.available_balance,
@@ -1127,7 +1120,7 @@ def wallet_stats(request):
             'total_debits': total_debits,
             'current_month_credits': current_month_credits,
             'current_month_debits': current_month_debits,
-            'transaction_count': transactions.count()
+            'transaction_count': sum(row['credit_count'] + row['debit_count'] for row in by_source.values())
         }
         
         return Response(stats)
@@ -1149,20 +1142,15 @@ def pending_transactions_with_release_dates(request):
             defaults={'currency_id': 1}
         )
         
-        # Get pending transactions (those with 'pending' in source or description)
-        pending_transactions = WalletTransaction.objects.filter(
-            wallet=wallet,
-            transaction_type='credit'
-        ).filter(
-            Q(source__icontains='pending') | 
-            Q(description__icontains='pending') |
-            Q(source__icontains='milestone')
-        ).order_by('-created_at')
+        # Credits still on hold, read from the hold columns
+        pending_transactions = unreleased_holds(wallet)
+        totals = pending_transactions.aggregate(total=Sum('amount'), count=Count('id'))
         
+        paginator = KeysetPagination()
         transactions_with_release = []
-        for transaction in pending_transactions:
-            # Calculate expected release date (3 days from creation)
-            expected_release_date = transaction.created_at + timedelta(days=3)
+        now = timezone.now()
+        for transaction in paginator.paginate_queryset(pending_transactions, request):
+            expected_release_date = transaction.hold_until
             
             transactions_with_release.append({
                 'id': transaction.id,
@@ -1171,16 +1159,19 @@ def pending_transactions_with_release_dates(request):
                 'source': transaction.source,
                 'created_at': transaction.created_at,
                 'expected_release_date': expected_release_date,
-                'days_remaining': max(0, (expected_release_date - timezone.now()).days),
-                'is_ready_for_release': timezone.now() >= expected_release_date
+                'days_remaining': max(0, (expected_release_date - now).days),
+                'is_ready_for_release': now >= expected_release_date
             })
         
         return Response({
             'pending_transactions': transactions_with_release,
-            'total_pending_amount': sum(t['amount'] for t in transactions_with_release),
-            'count': len(transactions_with_release)
+            'total_pending_amount': totals['total'] or 0,
+            'count': totals['count'],
+            'next_cursor': paginator.get_next_cursor()
         })
         
+    except APIException:
+        raise
     except Exception as e:
         return Response({
             'error': 'Failed to get pending transactions',
@@ -29,6 +29,11 @@ class PortfolioItem(models.Model):
     
     def __str__(self):
         return f"{self.professional.username} - {self.title}"
+    
+    def increment_views(self):
+        """Increment views count (buffered, written by the next counter flush)"""
+        from dashboard.counters import increment
+        increment(PortfolioItem, self.pk, 'views')
 
 
 class PortfolioImage(models.Model):
@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
 from drf_spectacular.utils import extend_schema
+from dashboard.counters import counters, first_hit
 from .models import PortfolioItem, PortfolioImage
 from .serializers import PortfolioItemSerializer, PortfolioItemCreateSerializer, PortfolioImageSerializer
 
@@ -42,6 +43,19 @@ class PortfolioDetailView(generics.RetrieveAPIView):
     )
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
+    
+    def retrieve(self, request, *args, **kwargs):
+        """Count one view per user/IP per hour without writing on every request"""
+        instance = self.get_object()
+        if request.user.is_authenticated:
+            viewer = f'user-{request.user.pk}'
+        else:
+            viewer = f"ip-{request.META.get('REMOTE_ADDR')}"
+        if instance.professional_id != request.user.pk and first_hit('portfolio', instance.pk, viewer):
+            instance.increment_views()
+        instance.views += counters.pending(PortfolioItem, instance.pk, 'views')
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
 
 
 class PortfolioCreateView(generics.CreateAPIView):
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
-from .models import Category, Project, ProjectImage, ProjectFile, ProjectFavorite, ProjectView, ProjectUpdate, IntakeLead
+from .models import Category, Project, ProjectImage, ProjectFile, ProjectFavorite, ProjectView, ProjectUpdate, IntakeLead, SkillStat
 
 
 @admin.register(Category)
@@ -78,13 +78,20 @@ class ProjectAdmin(admin.ModelAdmin):
     progress_bar.short_description = "Progress"
     
     def mark_as_published(self, request, queryset):
-        queryset.update(status='published')
-        self.message_user(request, f"{queryset.count()} projects marked as published.")
+        # Saved one by one so skill counters, search, geocoding and the feed cache follow
+        projects = list(queryset.exclude(status='published'))
+        for project in projects:
+            project.status = 'published'
+            project.save(update_fields=['status', 'published_at'])
+        self.message_user(request, f"{len(projects)} projects marked as published.")
     mark_as_published.short_description = "Mark selected projects as published"
     
     def mark_as_featured(self, request, queryset):
-        queryset.update(is_featured=True)
-        self.message_user(request, f"{queryset.count()} projects marked as featured.")
+        projects = list(queryset.filter(is_featured=False))
+        for project in projects:
+            project.is_featured = True
+            project.save(update_fields=['is_featured'])
+        self.message_user(request, f"{len(projects)} projects marked as featured.")
     mark_as_featured.short_description = "Mark selected projects as featured"
 
 
@@ -161,7 +168,7 @@ class IntakeLeadAdmin(admin.ModelAdmin):
     list_display = ['full_name', 'email', 'phone', 'lead_source', 'role_type', 'service_type', 'status', 'consent', 'source_path', 'language', 'created_at']
     list_filter = ['status', 'consent', 'language', 'lead_source', 'role_type', 'created_at']
     search_fields = ['full_name', 'email', 'phone', 'message', 'source_path']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['normalized_email', 'normalized_phone', 'created_at', 'updated_at']
     actions = ['mark_contacted', 'mark_converted']
 
     def mark_contacted(self, request, queryset):
@@ -174,7 +181,16 @@ class IntakeLeadAdmin(admin.ModelAdmin):
         self.message_user(request, f"{updated} leads marked as converted.")
     mark_converted.short_description = "Mark selected as converted"
 
+
+@admin.register(SkillStat)
+class SkillStatAdmin(admin.ModelAdmin):
+    list_display = ['skill', 'normalized', 'active_projects_count', 'updated_at']
+    search_fields = ['skill', 'normalized']
+    readonly_fields = ['skill', 'normalized', 'active_projects_count', 'updated_at']
+
+
 # تخصيص موقع الإدارة
 admin.site.site_header = 'A-List Projects Admin'
 admin.site.site_title = 'Projects Management'
 admin.site.index_title = 'إدارة المشاريع'
+
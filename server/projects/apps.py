@@ -5,3 +5,10 @@ class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'projects'
     verbose_name = 'Projects'
+    
+    def ready(self):
+        """
+        Called when the app is ready.
+        Import signals here to ensure they are registered.
+        """
+        import projects.signals  # noqa: F401
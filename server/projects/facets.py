@@ -0,0 +1,132 @@
+"""
+Facet counts for the project browse page.
+
+Each facet is one grouped aggregate over the same filtered queryset that feeds
+the result list. Results are cached for a short time keyed by the normalized
+filter parameters, so the unfiltered/first-page combinations that most
+anonymous traffic hits are effectively precomputed.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+FACETS = ['category', 'urgency', 'budget', 'remote', 'location']
+
+# Query parameters that don't change which projects match
+NON_FILTER_PARAMS = {'page', 'page_size', 'cursor', 'ordering', 'facets', 'include_total'}
+
+BUDGET_BUCKETS = [
+    ('under_1k', 'Under $1,000', None, 1000),
+    ('1k_5k', '$1,000 - $5,000', 1000, 5000),
+    ('5k_10k', '$5,000 - $10,000', 5000, 10000),
+    ('10k_50k', '$10,000 - $50,000', 10000, 50000),
+    ('50k_plus', '$50,000+', 50000, None),
+]
+
+LOCATION_FACET_LIMIT = 10
+
+
+def requested_facets(request):
+    """Facets asked for with ?facets=true or ?facets=category,urgency"""
+    value = request.query_params.get('facets', '').strip().lower()
+    if not value or value in ('0', 'false', 'no'):
+        return []
+    if value in ('1', 'true', 'yes', 'all'):
+        return list(FACETS)
+    return [facet for facet in value.split(',') if facet in FACETS]
+
+
+def filter_signature(request, facets):
+    params = sorted(
+        (key, sorted(request.query_params.getlist(key)))
+        for key in request.query_params
+        if key not in NON_FILTER_PARAMS
+    )
+    raw = json.dumps([params, sorted(facets)], sort_keys=True)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _budget_bucket():
+    whens = []
+    for key, _, low, high in BUDGET_BUCKETS:
+        condition = Q()
+        if low is not None:
+            condition &= Q(budget_min__gte=low)
+        if high is not None:
+            condition &= Q(budget_min__lt=high)
+        whens.append(When(condition, then=Value(key)))
+    return Case(*whens, default=Value('unspecified'), output_field=CharField())
+
+
+def _category_facet(queryset):
+    rows = queryset.values('category__slug', 'category__name').annotate(
+        count=Count('id')
+    ).order_by('-count', 'category__name')
+    return [
+        {'value': row['category__slug'], 'label': row['category__name'], 'count': row['count']}
+        for row in rows if row['category__slug']
+    ]
+
+
+def _urgency_facet(queryset):
+    from .models import Project
+    labels = dict(Project.URGENCY_CHOICES)
+    rows = queryset.values('urgency').annotate(count=Count('id')).order_by('-count')
+    return [
+        {'value': row['urgency'], 'label': labels.get(row['urgency'], row['urgency']), 'count': row['count']}
+        for row in rows
+    ]
+
+
+def _budget_facet(queryset):
+    labels = {key: label for key, label, _, _ in BUDGET_BUCKETS}
+    labels['unspecified'] = 'Not specified'
+    rows = queryset.annotate(budget_bucket=_budget_bucket()).values('budget_bucket').annotate(
+        count=Count('id')
+    ).order_by()
+    counts = {row['budget_bucket']: row['count'] for row in rows}
+    return [
+        {'value': key, 'label': label, 'count': counts[key]}
+        for key, label in labels.items() if counts.get(key)
+    ]
+
+
+def _remote_facet(queryset):
+    rows = queryset.values('is_remote_allowed').annotate(count=Count('id')).order_by()
+    return [
+        {'value': row['is_remote_allowed'], 'label': 'Remote' if row['is_remote_allowed'] else 'On site', 'count': row['count']}
+        for row in rows
+    ]
+
+
+def _location_facet(queryset):
+    rows = queryset.values('location').annotate(count=Count('id')).order_by('-count', 'location')[:LOCATION_FACET_LIMIT]
+    return [{'value': row['location'], 'label': row['location'], 'count': row['count']} for row in rows]
+
+
+FACET_BUILDERS = {
+    'category': _category_facet,
+    'urgency': _urgency_facet,
+    'budget': _budget_facet,
+    'remote': _remote_facet,
+    'location': _location_facet,
+}
+
+
+def compute_facets(queryset, facets):
+    """One grouped aggregate per requested facet over ``queryset``"""
+    queryset = queryset.order_by()
+    return {facet: FACET_BUILDERS[facet](queryset) for facet in facets}
+
+
+def cached_facets(request, queryset, facets):
+    """Facet counts for the filters in ``request``, cached for a short TTL"""
+    key = f'project-facets:{filter_signature(request, facets)}'
+    data = cache.get(key)
+    if data is None:
+        data = compute_facets(queryset, facets)
+        cache.set(key, data, getattr(settings, 'PROJECT_FACETS_CACHE_TTL', 60))
+    return data
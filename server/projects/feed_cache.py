@@ -0,0 +1,78 @@
+"""
+Shared cache for the public project feed (list, categories, stats).
+
+Responses are cached under the current feed *generation* plus a hash of the
+normalized query parameters. Any project or category write bumps the
+generation (see signals.py), which orphans every cached page at once instead
+of tracking which pages a change touches. The generation is also the feed's
+Last-Modified time, and responses carry an ETag so browsers and CDNs can
+revalidate with a 304 without the view running at all.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+GENERATION_KEY = 'project-feed:generation'
+
+
+def generation():
+    """Timestamp of the last feed change"""
+    value = cache.get(GENERATION_KEY)
+    if value is None:
+        cache.add(GENERATION_KEY, time.time(), timeout=None)
+        value = cache.get(GENERATION_KEY) or time.time()
+    return value
+
+
+def bump_generation():
+    """Invalidate every cached feed response"""
+    cache.set(GENERATION_KEY, time.time(), timeout=None)
+
+
+def _params_signature(request):
+    params = sorted((key, sorted(request.query_params.getlist(key))) for key in request.query_params)
+    return hashlib.sha1(json.dumps(params).encode('utf-8')).hexdigest()
+
+
+def _etag(data):
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode('utf-8')
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+def cached_feed_response(request, scope, build, anonymous_only=False):
+    """
+    Serve ``build()`` (a view returning a Response) through the feed cache.
+    ``anonymous_only`` skips the cache for signed in users whose responses
+    carry per-user fields.
+    """
+    if request.method != 'GET' or (anonymous_only and request.user.is_authenticated):
+        return build()
+
+    current = generation()
+    key = f'project-feed:{scope}:{current}:{_params_signature(request)}'
+    cached = cache.get(key)
+    if cached is None:
+        response = build()
+        if response.status_code != 200:
+            return response
+        cached = {'data': response.data, 'etag': _etag(response.data)}
+        cache.set(key, cached, getattr(settings, 'PROJECT_FEED_CACHE_TTL', 300))
+
+    last_modified = int(current)
+    not_modified = get_conditional_response(request, etag=cached['etag'], last_modified=last_modified)
+    response = not_modified if not_modified is not None else Response(cached['data'])
+
+    response['ETag'] = cached['etag']
+    response['Last-Modified'] = http_date(last_modified)
+    if anonymous_only:
+        patch_vary_headers(response, ['Authorization', 'Cookie'])
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'PROJECT_FEED_BROWSER_MAX_AGE', 60))
+    return response
+
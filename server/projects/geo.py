@@ -0,0 +1,192 @@
+"""
+Geocoding and radius search for projects.
+
+``Project.location`` is free text. When a project is published it is resolved
+against the platform's own ``Address``/``City`` coordinates and stored as
+latitude/longitude plus ``geo_cell``, the index of a fixed lat/lng grid cell.
+
+A radius query turns its bounding box into one ``geo_cell`` range per grid
+row (an index range scan each), then computes the exact great-circle distance
+only for the rows that survive, so open projects far away are never read.
+"""
+import math
+
+from django.core.cache import cache
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+EARTH_RADIUS_KM = 6371.0088
+
+# ~28 km per side at the equator; a 25 km radius touches at most 3x3 cells
+GEO_CELL_DEGREES = 0.25
+GEO_CELL_ROWS = int(180 / GEO_CELL_DEGREES)
+GEO_CELL_COLUMNS = int(360 / GEO_CELL_DEGREES)
+
+MAX_RADIUS_KM = 500
+
+GEOCODE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def geo_cell(latitude, longitude):
+    """Grid cell index for a coordinate pair"""
+    row = min(int((float(latitude) + 90) / GEO_CELL_DEGREES), GEO_CELL_ROWS - 1)
+    column = min(int((float(longitude) + 180) / GEO_CELL_DEGREES), GEO_CELL_COLUMNS - 1)
+    return row * GEO_CELL_COLUMNS + column
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) enclosing the circle; longitudes may leave [-180, 180]"""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(latitude - lat_delta, -90.0)
+    max_lat = min(latitude + lat_delta, 90.0)
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        # The circle contains a pole: every longitude is in range
+        return min_lat, max_lat, -180.0, 180.0
+    lng_delta = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(latitude))))
+    return min_lat, max_lat, longitude - lng_delta, longitude + lng_delta
+
+
+def _column_ranges(min_lng, max_lng):
+    """Grid column ranges covering a longitude span, split at the antimeridian"""
+    if max_lng - min_lng >= 360:
+        return [(0, GEO_CELL_COLUMNS - 1)]
+    spans = []
+    if min_lng < -180:
+        spans.append((min_lng + 360, 180.0))
+        min_lng = -180.0
+    if max_lng > 180:
+        spans.append((-180.0, max_lng - 360))
+        max_lng = 180.0
+    spans.append((min_lng, max_lng))
+    return [
+        (geo_cell(0, low) % GEO_CELL_COLUMNS, geo_cell(0, high) % GEO_CELL_COLUMNS)
+        for low, high in spans
+    ]
+
+
+def cell_filter(latitude, longitude, radius_km):
+    """Q matching every grid cell that intersects the radius' bounding box"""
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    first_row = geo_cell(min_lat, 0) // GEO_CELL_COLUMNS
+    last_row = geo_cell(max_lat, 0) // GEO_CELL_COLUMNS
+    columns = _column_ranges(min_lng, max_lng)
+
+    condition = Q()
+    for row in range(first_row, last_row + 1):
+        base = row * GEO_CELL_COLUMNS
+        for first_column, last_column in columns:
+            condition |= Q(geo_cell__range=(base + first_column, base + last_column))
+    return condition
+
+
+def distance_expression(latitude, longitude):
+    """Haversine distance in km from a point to the project's coordinates"""
+    lat1 = math.radians(latitude)
+    lat2 = Radians(F('latitude'))
+    half_dlat = (Radians(F('latitude')) - lat1) / 2
+    half_dlng = (Radians(F('longitude')) - math.radians(longitude)) / 2
+    a = Power(Sin(half_dlat), 2) + math.cos(lat1) * Cos(lat2) * Power(Sin(half_dlng), 2)
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a), output_field=FloatField())
+
+
+def within_radius(queryset, latitude, longitude, radius_km, order_by_distance=True):
+    """Projects within ``radius_km`` of the point, annotated with ``distance_km``"""
+    queryset = queryset.filter(
+        cell_filter(latitude, longitude, radius_km),
+        latitude__isnull=False,
+        longitude__isnull=False,
+    ).annotate(
+        distance_km=distance_expression(latitude, longitude)
+    ).filter(distance_km__lte=radius_km)
+    if order_by_distance:
+        queryset = queryset.order_by('distance_km', '-published_at')
+    return queryset
+
+
+def parse_radius(params):
+    """(lat, lng, radius_km) from request params, or None when not supplied"""
+    values = [params.get(name) for name in ('lat', 'lng', 'radius_km')]
+    if not any(value not in (None, '') for value in values):
+        return None
+    try:
+        latitude, longitude, radius_km = (float(value) for value in values)
+    except (TypeError, ValueError):
+        raise ValidationError({'radius_km': 'lat, lng and radius_km must all be numbers'})
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        raise ValidationError({'lat': 'Coordinates are out of range'})
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        raise ValidationError({'radius_km': f'radius_km must be between 0 and {MAX_RADIUS_KM}'})
+    return latitude, longitude, radius_km
+
+
+def _normalize_location(text):
+    return ' '.join((text or '').lower().split())
+
+
+def _lookup_coordinates(location):
+    from location_services.models import Address, City
+
+    parts = [part.strip() for part in location.split(',') if part.strip()]
+    if not parts:
+        return None
+
+    # A street address we already know, e.g. "12 Main St, Austin, TX"
+    if len(parts) >= 2:
+        address = Address.objects.filter(
+            street_address__iexact=parts[0],
+            city__name__iexact=parts[1],
+            latitude__isnull=False,
+            longitude__isnull=False,
+        ).values_list('latitude', 'longitude').first()
+        if address:
+            return address
+
+    # Otherwise the first part that names a known city; later parts pick the country
+    qualifiers = {part.lower() for part in parts}
+    for part in parts:
+        cities = list(City.objects.filter(
+            name__iexact=part,
+            is_active=True,
+            latitude__isnull=False,
+            longitude__isnull=False,
+        ).values_list('latitude', 'longitude', 'country__code', 'country__name')[:20])
+        if not cities:
+            continue
+        for latitude, longitude, code, name in cities:
+            if code.lower() in qualifiers or name.lower() in qualifiers:
+                return latitude, longitude
+        return cities[0][0], cities[0][1]
+    return None
+
+
+def geocode(location):
+    """(latitude, longitude) for free-text location, or None when it can't be resolved"""
+    normalized = _normalize_location(location)
+    if not normalized:
+        return None
+    key = f'project-geocode:{normalized}'
+    cached = cache.get(key)
+    if cached is not None:
+        return tuple(cached) if cached else None
+    coordinates = _lookup_coordinates(location)
+    if coordinates:
+        coordinates = (float(coordinates[0]), float(coordinates[1]))
+    cache.set(key, list(coordinates) if coordinates else [], GEOCODE_CACHE_TIMEOUT)
+    return coordinates
+
+
+class ProjectRadiusFilter(filters.BaseFilterBackend):
+    """
+    ``?lat=&lng=&radius_km=`` radius filter ordered by distance.
+    Keep it after OrderingFilter: an explicit ``ordering`` wins over distance.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        radius = parse_radius(request.query_params)
+        if radius is None:
+            return queryset
+        explicit_ordering = bool(request.query_params.get(api_settings.ORDERING_PARAM))
+        return within_radius(queryset, *radius, order_by_distance=not explicit_ordering)
@@ -0,0 +1,195 @@
+"""
+Queue-backed ingestion of public intake form leads.
+
+The endpoint only appends the raw submission to IntakeLeadOutbox and returns
+202. ``process_outbox`` (run by the ``process_intake_leads`` task) drains the
+outbox in batches: each submission is validated, dropped when the same
+normalized email or phone already produced a lead within
+``INTAKE_LEAD_DEDUPE_WINDOW`` seconds, and the survivors are bulk inserted.
+If a batch fails its entries are retried one at a time, and an entry that
+still fails is dropped (counted as failed) so it cannot block the queue.
+Accepted/deduped/failed totals are kept in the cache for monitoring.
+
+A drain clears the schedule flag before it starts, so a lead queued while it
+runs schedules the next drain, and schedules another one itself if rows are
+still waiting when it finishes.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+COUNTER_NAMES = ('queued', 'accepted', 'deduped', 'failed')
+SCHEDULE_FLAG = 'intake-leads:scheduled'
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def normalize_phone(phone):
+    """Digits only, keeping the last 10 so +1 (555) 010-0000 == 5550100000"""
+    digits = ''.join(ch for ch in str(phone or '') if ch.isdigit())
+    return digits[-10:]
+
+
+def _counter_key(name):
+    return f'intake-leads:{name}'
+
+
+def incr_counter(name, amount=1):
+    if not amount:
+        return
+    key = _counter_key(name)
+    if not cache.add(key, amount, timeout=None):
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            cache.set(key, amount, timeout=None)
+
+
+def counters():
+    """Totals since the counters were last reset, plus the current backlog"""
+    from .models import IntakeLeadOutbox
+
+    values = cache.get_many([_counter_key(name) for name in COUNTER_NAMES])
+    stats = {name: values.get(_counter_key(name), 0) for name in COUNTER_NAMES}
+    stats['pending'] = IntakeLeadOutbox.objects.count()
+    return stats
+
+
+def enqueue_lead(payload):
+    """Append a raw submission to the outbox and make sure a worker will drain it"""
+    from .models import IntakeLeadOutbox
+
+    entry = IntakeLeadOutbox.objects.create(payload=payload)
+    incr_counter('queued')
+    schedule_drain()
+    return entry
+
+
+def schedule_drain():
+    """Queue a drain unless one is already scheduled"""
+    from .tasks import process_intake_leads
+
+    # One scheduled drain per short interval instead of one task per lead
+    delay = getattr(settings, 'INTAKE_LEAD_PROCESS_DELAY', 2)
+    if cache.add(SCHEDULE_FLAG, 1, timeout=delay + 1):
+        try:
+            process_intake_leads.apply_async(countdown=delay)
+        except Exception as e:
+            # The row is safe in the outbox; the next schedule picks it up
+            logger.error(f'Failed to schedule intake lead processing: {str(e)}')
+
+
+def _recent_duplicates(emails, phones, since):
+    from .models import IntakeLead
+
+    condition = Q()
+    if emails:
+        condition |= Q(normalized_email__in=emails)
+    if phones:
+        condition |= Q(normalized_phone__in=phones)
+    if not condition:
+        return set(), set()
+    rows = IntakeLead.objects.filter(condition, created_at__gte=since).values_list(
+        'normalized_email', 'normalized_phone'
+    )
+    seen_emails, seen_phones = set(), set()
+    for email, phone in rows:
+        seen_emails.add(email)
+        seen_phones.add(phone)
+    return seen_emails, seen_phones
+
+
+def process_batch(entries):
+    """Validate, dedupe and insert one batch; returns (accepted, deduped, failed)"""
+    from .models import IntakeLead
+    from .serializers import IntakeLeadSerializer
+
+    valid = []
+    failed = 0
+    for entry in entries:
+        serializer = IntakeLeadSerializer(data=entry.payload)
+        if serializer.is_valid():
+            valid.append(serializer.validated_data)
+        else:
+            failed += 1
+            logger.warning(f'Dropping invalid intake lead {entry.pk}: {serializer.errors}')
+
+    window = timedelta(seconds=getattr(settings, 'INTAKE_LEAD_DEDUPE_WINDOW', 24 * 60 * 60))
+    seen_emails, seen_phones = _recent_duplicates(
+        {normalize_email(data['email']) for data in valid},
+        {normalize_phone(data['phone']) for data in valid} - {''},
+        timezone.now() - window,
+    )
+
+    leads = []
+    for data in valid:
+        email = normalize_email(data['email'])
+        phone = normalize_phone(data['phone'])
+        if email in seen_emails or (phone and phone in seen_phones):
+            continue
+        seen_emails.add(email)
+        if phone:
+            seen_phones.add(phone)
+        leads.append(IntakeLead(status='new', normalized_email=email, normalized_phone=phone, **data))
+
+    IntakeLead.objects.bulk_create(leads)
+    return len(leads), len(valid) - len(leads), failed
+
+
+def _process_entries(entries):
+    """process_batch in a savepoint, falling back to one entry at a time when it fails"""
+    try:
+        with transaction.atomic():
+            return process_batch(entries)
+    except Exception as e:
+        logger.error(f'Intake lead batch of {len(entries)} failed, retrying one by one: {str(e)}')
+
+    totals = [0, 0, 0]
+    for entry in entries:
+        try:
+            with transaction.atomic():
+                result = process_batch([entry])
+        except Exception as e:
+            result = (0, 0, 1)
+            logger.error(f'Dropping intake lead {entry.pk} that could not be inserted: {str(e)}')
+        totals = [total + amount for total, amount in zip(totals, result)]
+    return tuple(totals)
+
+
+def process_outbox(batch_size=None):
+    """Drain the outbox; returns the totals for this run"""
+    from .models import IntakeLeadOutbox
+
+    batch_size = batch_size or getattr(settings, 'INTAKE_LEAD_BATCH_SIZE', 200)
+    totals = dict.fromkeys(('accepted', 'deduped', 'failed'), 0)
+    # leads queued from now on schedule the next drain
+    cache.delete(SCHEDULE_FLAG)
+
+    while True:
+        with transaction.atomic():
+            # SKIP LOCKED lets several workers drain the outbox side by side
+            entries = list(
+                IntakeLeadOutbox.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size]
+            )
+            if not entries:
+                break
+            accepted, deduped, failed = _process_entries(entries)
+            IntakeLeadOutbox.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+
+        for name, amount in (('accepted', accepted), ('deduped', deduped), ('failed', failed)):
+            totals[name] += amount
+            incr_counter(name, amount)
+
+    # rows committed after the last batch, or held by another worker
+    if IntakeLeadOutbox.objects.exists():
+        schedule_drain()
+    return totals
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from projects.geo import geocode, geo_cell
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Geocode published projects for radius search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-geocode projects that already have coordinates')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        projects = Project.objects.filter(status='published').only('id', 'location')
+        if not options['all']:
+            projects = projects.filter(geo_cell__isnull=True)
+
+        batch, located, total = [], 0, 0
+        for project in projects.iterator(chunk_size=options['batch_size']):
+            coordinates = geocode(project.location)
+            if coordinates:
+                project.latitude, project.longitude = coordinates
+                project.geo_cell = geo_cell(*coordinates)
+                located += 1
+            else:
+                project.latitude = project.longitude = project.geo_cell = None
+            batch.append(project)
+            total += 1
+            if len(batch) >= options['batch_size']:
+                Project.objects.bulk_update(batch, ['latitude', 'longitude', 'geo_cell'])
+                batch = []
+        if batch:
+            Project.objects.bulk_update(batch, ['latitude', 'longitude', 'geo_cell'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Geocoded {located} of {total} projects')
+        )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from projects.models import Project
+from projects.similarity import update_signatures
+
+
+class Command(BaseCommand):
+    help = 'Recompute the MinHash signatures used by the similar projects lookup'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of projects written per batch',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        projects = Project.objects.only('id', 'title', 'description', 'required_skills')
+
+        total = 0
+        batch = []
+        for project in projects.iterator(chunk_size=batch_size):
+            batch.append(project)
+            if len(batch) >= batch_size:
+                update_signatures(batch)
+                total += len(batch)
+                batch = []
+        update_signatures(batch)
+        total += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt signatures for {total} projects')
+        )
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from projects.models import Project
+from projects.search import get_search_backend, project_document
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the project full-text search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of projects indexed per batch',
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        batch_size = options['batch_size']
+        rows = Project.objects.values('id', 'title', 'required_skills', 'description', 'location')
+
+        with transaction.atomic():
+            backend.uninstall()
+            backend.install()
+
+            total = 0
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(project_document(row))
+                if len(batch) >= batch_size:
+                    backend.index(batch)
+                    total += len(batch)
+                    batch = []
+            backend.index(batch)
+            total += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {total} projects')
+        )
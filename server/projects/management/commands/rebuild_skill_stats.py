@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from projects.models import Project, SkillStat
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SkillStat counters from active projects'
+
+    def handle(self, *args, **options):
+        counts = {}
+        display = {}
+        projects = Project.objects.filter(
+            status__in=Project.ACTIVE_STATUSES
+        ).values_list('required_skills', flat=True)
+
+        for required_skills in projects.iterator(chunk_size=2000):
+            for normalized, skill in SkillStat.skills_for(required_skills).items():
+                counts[normalized] = counts.get(normalized, 0) + 1
+                display.setdefault(normalized, skill)
+
+        with transaction.atomic():
+            SkillStat.objects.exclude(normalized__in=list(counts)).update(active_projects_count=0)
+            SkillStat.objects.bulk_create(
+                [
+                    SkillStat(skill=display[normalized], normalized=normalized, active_projects_count=count)
+                    for normalized, count in counts.items()
+                ],
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['normalized'],
+                update_fields=['active_projects_count', 'updated_at'],
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt counters for {len(counts)} skills')
+        )
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+def backfill_skill_stats(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    SkillStat = apps.get_model('projects', 'SkillStat')
+
+    counts = {}
+    display = {}
+    projects = Project.objects.filter(
+        status__in=['published', 'in_progress']
+    ).values_list('required_skills', flat=True)
+    for required_skills in projects.iterator(chunk_size=2000):
+        seen = set()
+        for skill in required_skills or []:
+            if not isinstance(skill, str):
+                continue
+            normalized = ' '.join(skill.split()).lower()[:100]
+            if not normalized or normalized in seen:
+                continue
+            seen.add(normalized)
+            counts[normalized] = counts.get(normalized, 0) + 1
+            display.setdefault(normalized, skill.strip()[:100])
+
+    SkillStat.objects.bulk_create(
+        [
+            SkillStat(skill=display[normalized], normalized=normalized, active_projects_count=count)
+            for normalized, count in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_intakelead_lead_source_intakelead_role_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('skill', models.CharField(help_text='Display form of the skill', max_length=100)),
+                ('normalized', models.CharField(max_length=100, unique=True)),
+                ('active_projects_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Skill Stat',
+                'verbose_name_plural': 'Skill Stats',
+                'db_table': 'project_skill_stats',
+                'ordering': ['-active_projects_count', 'skill'],
+                'indexes': [models.Index(fields=['-active_projects_count', 'skill'], name='project_ski_active__f60217_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_skill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:30
+
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from projects.search import get_search_backend, project_document
+
+    backend = get_search_backend(schema_editor.connection)
+    backend.install()
+
+    Project = apps.get_model('projects', 'Project')
+    rows = Project.objects.values('id', 'title', 'required_skills', 'description', 'location')
+    batch = []
+    for row in rows.iterator(chunk_size=1000):
+        batch.append(project_document(row))
+        if len(batch) >= 1000:
+            backend.index(batch)
+            batch = []
+    backend.index(batch)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from projects.search import get_search_backend
+
+    get_search_backend(schema_editor.connection).uninstall()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0008_skillstat'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_project_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='projectfavorite',
+            index=models.Index(fields=['user', 'created_at'], name='project_fav_user_id_911ed6_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0010_projectfavorite_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['geo_cell', 'status'], name='projects_geo_cel_0c9b56_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_signatures(apps, schema_editor):
+    from projects.similarity import minhash, project_tokens
+
+    Project = apps.get_model('projects', 'Project')
+    ProjectSignature = apps.get_model('projects', 'ProjectSignature')
+
+    batch = []
+    rows = Project.objects.values_list('id', 'title', 'description', 'required_skills')
+    for project_id, title, description, required_skills in rows.iterator(chunk_size=2000):
+        batch.append(ProjectSignature(
+            project_id=project_id,
+            signature=minhash(project_tokens(title, description, required_skills)),
+        ))
+        if len(batch) >= 1000:
+            ProjectSignature.objects.bulk_create(batch)
+            batch = []
+    ProjectSignature.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0011_project_geo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectSignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('signature', models.BinaryField(help_text='NUM_PERM uint32 minimum hashes (see similarity.py)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='signature', to='projects.project')),
+            ],
+            options={
+                'verbose_name': 'Project Signature',
+                'verbose_name_plural': 'Project Signatures',
+                'db_table': 'project_signatures',
+            },
+        ),
+        migrations.RunPython(backfill_signatures, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+def backfill_normalized_contacts(apps, schema_editor):
+    from projects.intake import normalize_email, normalize_phone
+
+    IntakeLead = apps.get_model('projects', 'IntakeLead')
+    batch = []
+    for lead in IntakeLead.objects.only('id', 'email', 'phone').iterator(chunk_size=2000):
+        lead.normalized_email = normalize_email(lead.email)
+        lead.normalized_phone = normalize_phone(lead.phone)
+        batch.append(lead)
+        if len(batch) >= 1000:
+            IntakeLead.objects.bulk_update(batch, ['normalized_email', 'normalized_phone'])
+            batch = []
+    IntakeLead.objects.bulk_update(batch, ['normalized_email', 'normalized_phone'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0012_projectsignature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='intakelead',
+            name='normalized_email',
+            field=models.CharField(blank=True, db_index=True, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='intakelead',
+            name='normalized_phone',
+            field=models.CharField(blank=True, db_index=True, max_length=30),
+        ),
+        migrations.CreateModel(
+            name='IntakeLeadOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'intake_lead_outbox',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(backfill_normalized_contacts, migrations.RunPython.noop),
+    ]
@@ -61,6 +61,9 @@ class Project(models.Model):
         ('estimate', 'Estimate'),
     ]
     
+    # Statuses that count as open/active on the marketplace
+    ACTIVE_STATUSES = ['published', 'in_progress']
+    
     # Basic Information
     title = models.CharField(max_length=255)
     slug = models.SlugField(unique=True, blank=True)
@@ -85,6 +88,11 @@ class Project(models.Model):
         help_text='Project location/address'
     )
     
+    # Resolved from ``location`` on publish (see geo.py)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geo_cell = models.IntegerField(null=True, blank=True, editable=False)
+    
     # Budget Information
     budget_type = models.CharField(
         max_length=20,
@@ -201,6 +209,7 @@ class Project(models.Model):
             models.Index(fields=['assigned_professional']),
             models.Index(fields=['published_at']),
             models.Index(fields=['urgency']),
+            models.Index(fields=['geo_cell', 'status']),
         ]
     
     def __str__(self):
@@ -213,8 +222,25 @@ class Project(models.Model):
         if self.status == 'published' and not self.published_at:
             self.published_at = timezone.now()
         
+        update_fields = kwargs.get('update_fields')
+        if self.status == 'published' and (update_fields is None or {'status', 'location'} & set(update_fields)):
+            self.update_coordinates()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'latitude', 'longitude', 'geo_cell'}
+        
         super().save(*args, **kwargs)
     
+    def update_coordinates(self):
+        """Geocode ``location`` into latitude/longitude and the radius search grid cell"""
+        from .geo import geocode, geo_cell
+        
+        coordinates = geocode(self.location)
+        if coordinates:
+            self.latitude, self.longitude = coordinates
+            self.geo_cell = geo_cell(*coordinates)
+        else:
+            self.latitude = self.longitude = self.geo_cell = None
+    
     def get_absolute_url(self):
         return reverse('projects:detail', kwargs={'slug': self.slug})
     
@@ -232,16 +258,16 @@ class Project(models.Model):
     
     def is_active(self):
         """Check if project is active"""
-        return self.status in ['published', 'in_progress']
+        return self.status in self.ACTIVE_STATUSES
     
     def can_receive_proposals(self):
         """Check if project can receive proposals"""
-        return self.status == 'published' and not self.assigned_professional
+        return self.status == 'published' and not self.assigned_professional_id
     
     def increment_views(self):
-        """Increment views count"""
-        self.views_count += 1
-        self.save(update_fields=['views_count'])
+        """Increment views count (buffered, written by the next counter flush)"""
+        from dashboard.counters import increment
+        increment(Project, self.pk, 'views_count')
     
     def increment_proposals(self):
         """Increment proposals count"""
@@ -256,6 +282,104 @@ class Project(models.Model):
         self.save(update_fields=['completion_percentage', 'status'])
 
 
+class SkillStat(models.Model):
+    """
+    عدد المشاريع النشطة لكل مهارة مطلوبة
+
+    يتم تحديثه تلقائياً عبر إشارات حفظ وحذف المشاريع (projects/signals.py)
+    ويمكن إعادة بنائه بالكامل بالأمر rebuild_skill_stats.
+    """
+    skill = models.CharField(max_length=100, help_text='Display form of the skill')
+    normalized = models.CharField(max_length=100, unique=True)
+    active_projects_count = models.PositiveIntegerField(default=0)
+    
+    # Timestamps
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'project_skill_stats'
+        verbose_name = 'Skill Stat'
+        verbose_name_plural = 'Skill Stats'
+        ordering = ['-active_projects_count', 'skill']
+        indexes = [
+            models.Index(fields=['-active_projects_count', 'skill']),
+        ]
+    
+    def __str__(self):
+        return f"{self.skill} ({self.active_projects_count})"
+    
+    @staticmethod
+    def normalize(skill):
+        """Normalize a skill name for counting and lookups"""
+        return ' '.join(str(skill).split()).lower()[:100]
+    
+    @classmethod
+    def skills_for(cls, required_skills):
+        """Map normalized form -> display form for a project's skills list"""
+        skills = {}
+        for skill in required_skills or []:
+            if not isinstance(skill, str):
+                continue
+            normalized = cls.normalize(skill)
+            if normalized:
+                skills.setdefault(normalized, skill.strip()[:100])
+        return skills
+    
+    @classmethod
+    def apply_delta(cls, added, removed):
+        """
+        Increment counts for ``added`` skills and decrement ``removed`` ones.
+        ``added`` is a {normalized: display} mapping, ``removed`` an iterable
+        of normalized forms.
+        """
+        if added:
+            cls.objects.bulk_create(
+                [cls(skill=display, normalized=normalized) for normalized, display in added.items()],
+                ignore_conflicts=True,
+            )
+            cls.objects.filter(normalized__in=list(added)).update(
+                active_projects_count=models.F('active_projects_count') + 1,
+                updated_at=timezone.now(),
+            )
+        if removed:
+            cls.objects.filter(
+                normalized__in=list(removed),
+                active_projects_count__gt=0,
+            ).update(
+                active_projects_count=models.F('active_projects_count') - 1,
+                updated_at=timezone.now(),
+            )
+    
+    @classmethod
+    def trending(cls, limit=10):
+        """Most requested skills across active projects"""
+        return cls.objects.filter(active_projects_count__gt=0).order_by(
+            '-active_projects_count', 'skill'
+        )[:limit]
+    
+    # Shorter queries only get prefix matches; a substring match scans the table
+    SUBSTRING_SUGGEST_MIN_LENGTH = 3
+    
+    @classmethod
+    def suggest(cls, query, limit=5):
+        """
+        Skills matching ``query``, most requested first. Prefix matches (an
+        index range scan) come first; when they don't fill ``limit`` and the
+        query is long enough, skills containing it fill the rest, so "script"
+        still suggests "JavaScript".
+        """
+        normalized = cls.normalize(query)
+        if not normalized:
+            return []
+        active = cls.objects.filter(active_projects_count__gt=0).order_by('-active_projects_count', 'skill')
+        skills = list(active.filter(normalized__startswith=normalized)[:limit])
+        if len(skills) < limit and len(normalized) >= cls.SUBSTRING_SUGGEST_MIN_LENGTH:
+            skills += active.filter(normalized__contains=normalized).exclude(
+                normalized__startswith=normalized
+            )[:limit - len(skills)]
+        return skills
+
+
 class ProjectImage(models.Model):
     """
     صور المشاريع
@@ -354,6 +478,9 @@ class ProjectFavorite(models.Model):
         verbose_name_plural = 'Project Favorites'
         unique_together = ['user', 'project']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.project.title}"
@@ -442,6 +569,30 @@ class ProjectUpdate(models.Model):
     def __str__(self):
         return f"{self.project.title} - {self.title}"
 
+class ProjectSignature(models.Model):
+    """
+    MinHash signature of a project's text used by the similar projects lookup
+
+    يتم تحديثه عند حفظ المشروع (projects/signals.py) ويمكن إعادة بنائه
+    بالأمر rebuild_project_signatures.
+    """
+    project = models.OneToOneField(
+        Project,
+        on_delete=models.CASCADE,
+        related_name='signature'
+    )
+    signature = models.BinaryField(help_text='NUM_PERM uint32 minimum hashes (see similarity.py)')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'project_signatures'
+        verbose_name = 'Project Signature'
+        verbose_name_plural = 'Project Signatures'
+    
+    def __str__(self):
+        return f"Signature for {self.project_id}"
+
+
 class IntakeLead(models.Model):
     """Requests from public intake/contact form."""
     full_name = models.CharField(max_length=120)
@@ -454,6 +605,9 @@ class IntakeLead(models.Model):
     service_type = models.CharField(max_length=100, blank=True, help_text="Specific trade or service interest")
     language = models.CharField(max_length=10, blank=True)
     consent = models.BooleanField(default=False)
+    # Dedupe keys filled in by the intake worker (see intake.py)
+    normalized_email = models.CharField(max_length=254, blank=True, db_index=True)
+    normalized_phone = models.CharField(max_length=30, blank=True, db_index=True)
     status = models.CharField(
         max_length=20,
         choices=(
@@ -472,3 +626,16 @@ class IntakeLead(models.Model):
 
     def __str__(self):
         return f"{self.full_name} ({self.email})"
+
+
+class IntakeLeadOutbox(models.Model):
+    """Raw intake form submissions waiting for the intake worker"""
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'intake_lead_outbox'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Queued lead {self.pk}"
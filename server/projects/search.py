@@ -0,0 +1,384 @@
+"""
+Full-text search for projects.
+
+The index is stored outside the ORM because its shape depends on the
+database: an FTS5 virtual table on SQLite (development) and a weighted
+``tsvector`` column with a GIN index on PostgreSQL. Both weight the fields
+title > skills > description > location and are kept in sync by the project
+signals (see signals.py). ``rebuild_search_index`` repopulates it.
+
+Highlights are user text: the database marks matches with private-use
+characters, the text is HTML-escaped and only then are those markers turned
+into ``<mark>`` tags.
+"""
+import re
+from abc import ABC, abstractmethod
+from html import escape
+
+from django.conf import settings
+from django.db import connection as default_connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+
+# Fields that feed the index; saves touching none of them skip re-indexing
+INDEXED_FIELDS = {'title', 'required_skills', 'description', 'location'}
+
+# Upper bound of ranked matches fed back into a queryset; list views report
+# ``search_truncated`` when a search has more matches than this
+MAX_SEARCH_RESULTS = 1000
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_STOP = '</mark>'
+
+# Placeholders the database wraps matches in, replaced after escaping
+MARK_START = '\ue000'
+MARK_STOP = '\ue001'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_tokens(query):
+    """Split free text into safe search tokens (no operators survive)"""
+    return _TOKEN_RE.findall(query or '')[:16]
+
+
+def render_highlight(text):
+    """HTML-escape highlighted text, keeping only our own match markers"""
+    if text is None:
+        return None
+    return escape(text).replace(MARK_START, HIGHLIGHT_START).replace(MARK_STOP, HIGHLIGHT_STOP)
+
+
+def project_document(project):
+    """Index columns for a project instance or a values() row"""
+    get = project.get if isinstance(project, dict) else lambda name: getattr(project, name)
+    skills = get('required_skills') or []
+    return (
+        get('id'),
+        get('title') or '',
+        ' '.join(skill for skill in skills if isinstance(skill, str)),
+        get('description') or '',
+        get('location') or '',
+    )
+
+
+class BaseSearchBackend(ABC):
+    """Common interface for the vendor specific search backends"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self):
+        pass
+
+    def uninstall(self):
+        pass
+
+    def index(self, documents):
+        pass
+
+    def remove(self, project_ids):
+        pass
+
+    @abstractmethod
+    def match(self, query, queryset, limit=MAX_SEARCH_RESULTS, offset=0):
+        """Return [(project_id, rank)] best first, restricted to ``queryset``"""
+
+    def highlights(self, query, project_ids):
+        """Return {project_id: {'title': ..., 'description': ...}}"""
+        return {}
+
+    def _within(self, queryset):
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        return sql, list(params)
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """FTS5 virtual table keyed by the project id (rowid)"""
+    table = 'project_search_fts'
+    weights = '10.0, 5.0, 2.0, 1.0'
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                "title, skills, description, location, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def index(self, documents):
+        documents = list(documents)
+        if not documents:
+            return
+        with self.connection.cursor() as cursor:
+            self._delete(cursor, [document[0] for document in documents])
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, title, skills, description, location) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                documents,
+            )
+
+    def remove(self, project_ids):
+        with self.connection.cursor() as cursor:
+            self._delete(cursor, project_ids)
+
+    def _delete(self, cursor, project_ids):
+        project_ids = list(project_ids)
+        if project_ids:
+            placeholders = ', '.join(['%s'] * len(project_ids))
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", project_ids)
+
+    def _match_expression(self, query):
+        tokens = search_tokens(query)
+        if not tokens:
+            return None
+        # Every term must match, the last one as a prefix (search-as-you-type)
+        return ' '.join(f'"{token}"' for token in tokens) + '*'
+
+    def match(self, query, queryset, limit=MAX_SEARCH_RESULTS, offset=0):
+        expression = self._match_expression(query)
+        if not expression:
+            return []
+        within_sql, within_params = self._within(queryset)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, bm25({self.table}, {self.weights}) AS rank "
+                f"FROM {self.table} WHERE {self.table} MATCH %s AND rowid IN ({within_sql}) "
+                "ORDER BY rank, rowid DESC LIMIT %s OFFSET %s",
+                [expression, *within_params, limit, offset],
+            )
+            # bm25() is lower-is-better; flip it so every backend ranks descending
+            return [(project_id, -rank) for project_id, rank in cursor.fetchall()]
+
+    def highlights(self, query, project_ids):
+        expression = self._match_expression(query)
+        project_ids = list(project_ids)
+        if not expression or not project_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(project_ids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, highlight({self.table}, 0, %s, %s), "
+                f"snippet({self.table}, 2, %s, %s, '…', 24) "
+                f"FROM {self.table} WHERE {self.table} MATCH %s AND rowid IN ({placeholders})",
+                [MARK_START, MARK_STOP, MARK_START, MARK_STOP, expression, *project_ids],
+            )
+            return {
+                project_id: {'title': render_highlight(title), 'description': render_highlight(description)}
+                for project_id, title, description in cursor.fetchall()
+            }
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Weighted tsvector per project with a GIN index"""
+    table = 'project_search_index'
+    headline_options = f'StartSel={MARK_START}, StopSel={MARK_STOP}, MaxWords=35, MinWords=15, MaxFragments=2'
+
+    @property
+    def config(self):
+        return getattr(settings, 'PROJECT_SEARCH_CONFIG', 'english')
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "project_id bigint PRIMARY KEY REFERENCES projects (id) ON DELETE CASCADE "
+                "DEFERRABLE INITIALLY DEFERRED, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_document_gin "
+                f"ON {self.table} USING GIN (document)"
+            )
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def index(self, documents):
+        config = self.config
+        rows = [
+            (project_id, config, title, config, skills, config, description, config, location)
+            for project_id, title, skills, description, location in documents
+        ]
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (project_id, document) VALUES (%s, "
+                "setweight(to_tsvector(%s::regconfig, %s), 'A') || "
+                "setweight(to_tsvector(%s::regconfig, %s), 'B') || "
+                "setweight(to_tsvector(%s::regconfig, %s), 'C') || "
+                "setweight(to_tsvector(%s::regconfig, %s), 'D')) "
+                "ON CONFLICT (project_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def remove(self, project_ids):
+        project_ids = list(project_ids)
+        if project_ids:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.table} WHERE project_id = ANY(%s)", [project_ids])
+
+    def _tsquery(self, query):
+        tokens = search_tokens(query)
+        if not tokens:
+            return None
+        terms = [f"'{token}'" for token in tokens]
+        terms[-1] += ':*'
+        return ' & '.join(terms)
+
+    def match(self, query, queryset, limit=MAX_SEARCH_RESULTS, offset=0):
+        tsquery = self._tsquery(query)
+        if not tsquery:
+            return []
+        within_sql, within_params = self._within(queryset)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT i.project_id, ts_rank(i.document, q) AS rank "
+                f"FROM {self.table} i, to_tsquery(%s::regconfig, %s) q "
+                f"WHERE i.document @@ q AND i.project_id IN ({within_sql}) "
+                "ORDER BY rank DESC, i.project_id DESC LIMIT %s OFFSET %s",
+                [self.config, tsquery, *within_params, limit, offset],
+            )
+            return cursor.fetchall()
+
+    def highlights(self, query, project_ids):
+        tsquery = self._tsquery(query)
+        project_ids = list(project_ids)
+        if not tsquery or not project_ids:
+            return {}
+        config = self.config
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT p.id, ts_headline(%s::regconfig, p.title, q, %s), "
+                "ts_headline(%s::regconfig, p.description, q, %s) "
+                "FROM projects p, to_tsquery(%s::regconfig, %s) q WHERE p.id = ANY(%s)",
+                [config, self.headline_options, config, self.headline_options, config, tsquery, project_ids],
+            )
+            return {
+                project_id: {'title': render_highlight(title), 'description': render_highlight(description)}
+                for project_id, title, description in cursor.fetchall()
+            }
+
+
+class FallbackSearchBackend(BaseSearchBackend):
+    """Plain icontains matching for databases without a native index"""
+
+    def match(self, query, queryset, limit=MAX_SEARCH_RESULTS, offset=0):
+        tokens = search_tokens(query)
+        if not tokens:
+            return []
+        for token in tokens:
+            queryset = queryset.filter(
+                Q(title__icontains=token) | Q(description__icontains=token) | Q(location__icontains=token)
+            )
+        queryset = queryset.annotate(
+            search_rank=Case(
+                When(title__icontains=tokens[0], then=Value(2)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('-search_rank', '-pk')
+        return list(queryset.values_list('pk', 'search_rank')[offset:offset + limit])
+
+
+def get_search_backend(connection=None):
+    connection = connection or default_connection
+    if connection.vendor == 'sqlite':
+        return SQLiteSearchBackend(connection)
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend(connection)
+    return FallbackSearchBackend(connection)
+
+
+def index_projects(projects):
+    """Add or refresh the index rows for the given projects"""
+    get_search_backend().index(project_document(project) for project in projects)
+
+
+def remove_projects(project_ids):
+    get_search_backend().remove(project_ids)
+
+
+def ranked_project_ids(queryset, query, limit=MAX_SEARCH_RESULTS, offset=0):
+    """([project_id] best first, whether more matches exist past ``limit``)"""
+    matches = get_search_backend().match(query, queryset, limit=limit + 1, offset=offset)
+    return [project_id for project_id, _ in matches[:limit]], len(matches) > limit
+
+
+def search_projects(queryset, query, limit=MAX_SEARCH_RESULTS, offset=0, order_by_rank=True):
+    """
+    Restrict ``queryset`` to projects matching ``query``.
+    Results are ordered by relevance unless ``order_by_rank`` is False.
+    """
+    project_ids, _ = ranked_project_ids(queryset, query, limit=limit, offset=offset)
+    return _restrict(queryset, project_ids, order_by_rank)
+
+
+def _restrict(queryset, project_ids, order_by_rank):
+    queryset = queryset.filter(pk__in=project_ids)
+    if order_by_rank:
+        queryset = queryset.annotate(
+            search_position=Case(
+                *[When(pk=project_id, then=Value(position)) for position, project_id in enumerate(project_ids)],
+                default=Value(len(project_ids)),
+                output_field=IntegerField(),
+            )
+        ).order_by('search_position')
+    return queryset
+
+
+def attach_highlights(projects, query):
+    """Set ``search_highlight`` on each project of an already evaluated page"""
+    projects = list(projects)
+    if not projects or not search_tokens(query):
+        return projects
+    highlights = get_search_backend().highlights(query, [project.pk for project in projects])
+    for project in projects:
+        project.search_highlight = highlights.get(project.pk)
+    return projects
+
+
+class ProjectSearchFilter(filters.SearchFilter):
+    """
+    Relevance ranked replacement for SearchFilter's icontains scan.
+    Keep it after OrderingFilter: an explicit ``ordering`` wins over relevance.
+    Only the best MAX_SEARCH_RESULTS matches are kept; ``view.search_truncated``
+    tells whether any were cut off.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = ' '.join(self.get_search_terms(request))
+        if not search_tokens(query):
+            return queryset
+        explicit_ordering = bool(request.query_params.get(api_settings.ORDERING_PARAM))
+        project_ids, view.search_truncated = ranked_project_ids(queryset, query, limit=MAX_SEARCH_RESULTS)
+        return _restrict(queryset, project_ids, order_by_rank=not explicit_ordering)
+
+
+class ProjectSearchHighlightMixin:
+    """
+    Attach highlight snippets to the current page when searching, and flag
+    pages of a search whose matches were capped at MAX_SEARCH_RESULTS.
+    """
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        query = self.request.query_params.get(api_settings.SEARCH_PARAM, '')
+        if page is not None and search_tokens(query):
+            page = attach_highlights(page, query)
+        return page
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if getattr(self, 'search_truncated', False):
+            response.data['search_truncated'] = True
+            response.data['search_max_results'] = MAX_SEARCH_RESULTS
+        return response
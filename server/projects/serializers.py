@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.core.files.base import ContentFile
 from .models import Project, Category, ProjectImage, ProjectFile, ProjectFavorite, ProjectView, ProjectUpdate, IntakeLead
 from file_management.models import UploadedFile
@@ -24,7 +26,11 @@ class CategorySerializer(serializers.ModelSerializer):
     
     def get_projects_count(self, obj):
         """Get count of active projects in this category"""
-        return obj.projects.filter(status__in=['published', 'in_progress']).count()
+        # Lists annotate the count up front (see CategoryListView / ProjectListSerializer)
+        count = getattr(obj, 'active_projects_count', None)
+        if count is not None:
+            return count
+        return obj.projects.filter(status__in=Project.ACTIVE_STATUSES).count()
 
 
 class ProjectImageSerializer(serializers.ModelSerializer):
@@ -92,6 +98,10 @@ class ProjectListSerializer(serializers.ModelSerializer):
     client = UserBasicSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     budget_display = serializers.SerializerMethodField()
+    primary_image = serializers.SerializerMethodField()
+    is_favorited = serializers.SerializerMethodField()
+    search_highlight = serializers.SerializerMethodField()
+    distance_km = serializers.SerializerMethodField()
     
     class Meta:
         model = Project
@@ -101,11 +111,73 @@ class ProjectListSerializer(serializers.ModelSerializer):
             'required_skills', 'required_roles', 'is_featured', 'is_remote_allowed',
             'requires_license', 'requires_insurance', 'is_paid', 'views_count', 
             'favorites_count', 'proposals_count', 'assigned_professional',
-            'completion_percentage', 'published_at', 'created_at'
+            'completion_percentage', 'published_at', 'created_at', 'primary_image',
+            'is_favorited', 'search_highlight', 'distance_km'
         ]
     
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load everything the list representation needs in a fixed number of queries"""
+        category_count = Project.objects.filter(
+            category=OuterRef('category'),
+            status__in=Project.ACTIVE_STATUSES
+        ).order_by().values('category').annotate(count=Count('id')).values('count')
+        return queryset.select_related('client', 'category').prefetch_related(
+            Prefetch(
+                'images',
+                queryset=ProjectImage.objects.filter(is_primary=True),
+                to_attr='primary_images'
+            )
+        ).annotate(
+            category_projects_count=Coalesce(Subquery(category_count), 0)
+        )
+    
+    def to_representation(self, instance):
+        count = getattr(instance, 'category_projects_count', None)
+        if count is not None and instance.category is not None:
+            instance.category.active_projects_count = count
+        return super().to_representation(instance)
+    
     def get_budget_display(self, obj):
         return obj.get_budget_display()
+    
+    def get_primary_image(self, obj):
+        images = getattr(obj, 'primary_images', None)
+        if images is None:
+            images = obj.images.filter(is_primary=True)[:1]
+        if not images:
+            return None
+        url = images[0].image.url
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+    
+    def get_is_favorited(self, obj):
+        """Favorites of the requesting user are loaded once per list, not per project"""
+        request = self.context.get('request')
+        if not request or not request.user.is_authenticated:
+            return False
+        
+        favorites = ProjectFavorite.objects.filter(user=request.user)
+        if not isinstance(self.parent, serializers.ListSerializer):
+            return favorites.filter(project_id=obj.pk).exists()
+        
+        favorite_ids = self.context.get('favorite_project_ids')
+        if favorite_ids is None:
+            page = self.parent.instance
+            if isinstance(page, (list, tuple)):
+                favorites = favorites.filter(project_id__in=[project.pk for project in page])
+            favorite_ids = set(favorites.values_list('project_id', flat=True))
+            self.context['favorite_project_ids'] = favorite_ids
+        return obj.pk in favorite_ids
+    
+    def get_search_highlight(self, obj):
+        """Highlighted title/description snippets when the list is a search result"""
+        return getattr(obj, 'search_highlight', None)
+    
+    def get_distance_km(self, obj):
+        """Distance from the searched point when filtering by radius"""
+        distance = getattr(obj, 'distance_km', None)
+        return round(distance, 2) if distance is not None else None
 
 
 class ProjectDetailSerializer(serializers.ModelSerializer):
@@ -394,9 +466,9 @@ class ProjectUpdateSerializer(serializers.ModelSerializer):
     
     def update(self, instance, validated_data):
         """Handle project updates including cancellation refunds"""
-        from payments.models import Wallet, WalletTransaction, EscrowAccount
+        from payments import ledger
+        from payments.models import EscrowAccount
         from contracts.models import Contract
-        from decimal import Decimal
         from django.db import transaction
         
         new_status = validated_data.get('status')
@@ -427,28 +499,21 @@ class ProjectUpdateSerializer(serializers.ModelSerializer):
                         if escrow_accounts.exists():
                             escrow = escrow_accounts.first()
                             
-                            # Get client's wallet
-                            wallet, created = Wallet.objects.get_or_create(
-                                user=instance.client,
-                                defaults={'available_balance': Decimal('0.00')}
-                            )
-                            
                             # Move funds from pending back to available balance
                             refund_amount = escrow.amount
-                            if wallet.pending_balance >= refund_amount:
-                                wallet.pending_balance -= refund_amount
-                                wallet.available_balance += refund_amount
-                                wallet.save()
-                                
-                                # Create wallet transaction record
-                                WalletTransaction.objects.create(
-                                    wallet=wallet,
+                            try:
+                                ledger.post([ledger.Entry(
+                                    instance.client_id,
+                                    available=refund_amount,
+                                    pending=-refund_amount,
                                     amount=refund_amount,
-                                    transaction_type='credit',
                                     source='project_cancellation_refund',
-                                    description=f"Refund for cancelled project: {instance.title}"
-                                )
-                                
+                                    description=f"Refund for cancelled project: {instance.title}",
+                                    escrow=escrow
+                                )])
+                            except ledger.InsufficientFunds:
+                                print(f"❌ Insufficient pending balance for refund. Required: ${refund_amount}")
+                            else:
                                 # Update Project Funds Account status
                                 escrow.status = 'refunded'
                                 escrow.save()
@@ -463,8 +528,6 @@ class ProjectUpdateSerializer(serializers.ModelSerializer):
                                 instance.is_paid = False
                                 
                                 print(f"✅ Refunded ${refund_amount} to client {instance.client.username} for cancelled project {instance.title}")
-                            else:
-                                print(f"❌ Insufficient pending balance for refund. Required: ${refund_amount}, Available: ${wallet.pending_balance}")
                         else:
                             print(f"❌ No funded Project Funds Account found for project {instance.title}")
                     else:
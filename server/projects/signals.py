@@ -0,0 +1,95 @@
+"""
+Keep SkillStat counters, the search index, similarity signatures and the
+public feed cache in sync with project saves and deletes.
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Category, Project, SkillStat
+from .feed_cache import bump_generation
+from .search import INDEXED_FIELDS, index_projects, remove_projects
+from .similarity import update_signatures
+
+
+def _active_skills(status, required_skills):
+    """Skills a project contributes to the counters (none unless active)"""
+    if status not in Project.ACTIVE_STATUSES:
+        return {}
+    return SkillStat.skills_for(required_skills)
+
+
+@receiver(pre_save, sender=Project)
+def remember_previous_skills(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Snapshot the counted skills before the row changes"""
+    instance._skill_stat_previous = None
+    if raw:
+        return
+    if update_fields is not None and not {'status', 'required_skills'} & set(update_fields):
+        return
+
+    previous = {}
+    if instance.pk:
+        row = Project.objects.filter(pk=instance.pk).values('status', 'required_skills').first()
+        if row:
+            previous = _active_skills(row['status'], row['required_skills'])
+    instance._skill_stat_previous = previous
+
+
+@receiver(post_save, sender=Project)
+def update_skill_stats_on_save(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_skill_stat_previous', None)
+    if raw or previous is None:
+        return
+    instance._skill_stat_previous = None
+
+    current = _active_skills(instance.status, instance.required_skills)
+    added = {normalized: display for normalized, display in current.items() if normalized not in previous}
+    removed = [normalized for normalized in previous if normalized not in current]
+    SkillStat.apply_delta(added, removed)
+
+
+@receiver(post_delete, sender=Project)
+def update_skill_stats_on_delete(sender, instance, **kwargs):
+    removed = _active_skills(instance.status, instance.required_skills)
+    SkillStat.apply_delta({}, list(removed))
+
+
+@receiver(post_save, sender=Project)
+def update_search_index_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not INDEXED_FIELDS & set(update_fields):
+        return
+    index_projects([instance])
+
+
+@receiver(post_delete, sender=Project)
+def update_search_index_on_delete(sender, instance, **kwargs):
+    remove_projects([instance.pk])
+
+
+@receiver(post_save, sender=Project)
+def update_signature_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not {'title', 'description', 'required_skills'} & set(update_fields):
+        return
+    update_signatures([instance])
+
+
+# Saves that only touch engagement counters don't change the public feed
+COUNTER_FIELDS = {'views_count', 'favorites_count', 'proposals_count', 'updated_at'}
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Category)
+def invalidate_feed_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= COUNTER_FIELDS:
+        return
+    bump_generation()
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Category)
+def invalidate_feed_on_delete(sender, instance, **kwargs):
+    bump_generation()
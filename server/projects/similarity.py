@@ -0,0 +1,135 @@
+"""
+"Similar projects" from MinHash signatures.
+
+Each project's title, description and skills are reduced to a set of tokens
+and summarised by ``NUM_PERM`` 32-bit minimum hashes (256 bytes per project,
+stored in ProjectSignature when the project is saved). The fraction of equal
+positions between two signatures estimates the Jaccard similarity of the
+token sets, so a lookup is one vectorised comparison of the target against
+every published project's signature. Top-N results are cached per project
+under the feed generation, so any project save or delete (which bumps it, see
+signals.py) retires every cached list, not just the edited project's own.
+"""
+import re
+import zlib
+
+import numpy as np
+from django.core.cache import cache
+
+NUM_PERM = 64
+SIGNATURE_DTYPE = np.uint32
+
+SIMILAR_CACHE_TIMEOUT = 60 * 60
+SIMILAR_RESULTS = 20
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Fixed seed: signatures must stay comparable across processes and deploys
+_random = np.random.RandomState(1)
+_PERM_A = _random.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _random.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have',
+    'i', 'in', 'is', 'it', 'need', 'of', 'on', 'or', 'our', 'the', 'this', 'to',
+    'we', 'will', 'with', 'you', 'your',
+}
+
+
+def project_tokens(title, description, required_skills):
+    """Token set describing a project; skills are kept as whole phrases"""
+    words = _WORD_RE.findall(f'{title or ""} {description or ""}'.lower())
+    tokens = {word for word in words if len(word) > 2 and word not in STOP_WORDS}
+    # Title words count twice so they weigh more than long descriptions
+    tokens.update(f't:{word}' for word in _WORD_RE.findall((title or '').lower()) if word not in STOP_WORDS)
+    for skill in required_skills or []:
+        if isinstance(skill, str) and skill.strip():
+            tokens.add('s:' + ' '.join(skill.lower().split()))
+    return tokens
+
+
+def minhash(tokens):
+    """Signature bytes for a token set"""
+    if not tokens:
+        return np.full(NUM_PERM, _MAX_HASH, dtype=SIGNATURE_DTYPE).tobytes()
+    hashes = np.array(
+        [zlib.crc32(token.encode('utf-8')) for token in tokens],
+        dtype=np.uint64,
+    )
+    # (a * x + b) mod p for every token/permutation pair, then the column minimum
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME
+    signature = np.bitwise_and(permuted, _MAX_HASH).min(axis=0)
+    return signature.astype(SIGNATURE_DTYPE).tobytes()
+
+
+def project_signature(project):
+    return minhash(project_tokens(project.title, project.description, project.required_skills))
+
+
+def update_signatures(projects):
+    """Store fresh signatures for the given projects"""
+    from .models import ProjectSignature
+
+    signatures = [
+        ProjectSignature(project_id=project.pk, signature=project_signature(project))
+        for project in projects
+    ]
+    if not signatures:
+        return
+    ProjectSignature.objects.bulk_create(
+        signatures,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['project'],
+        update_fields=['signature', 'updated_at'],
+    )
+
+
+def _cache_key(project_id):
+    from .feed_cache import generation
+
+    return f'project-similar:{generation()}:{project_id}'
+
+
+def nearest(target, candidates, limit):
+    """
+    [(project_id, similarity)] best first.
+    ``candidates`` is an iterable of (project_id, signature bytes).
+    """
+    candidates = list(candidates)
+    if not candidates:
+        return []
+    ids = np.fromiter((project_id for project_id, _ in candidates), dtype=np.int64, count=len(candidates))
+    matrix = np.frombuffer(
+        b''.join(bytes(signature) for _, signature in candidates),
+        dtype=SIGNATURE_DTYPE,
+    ).reshape(len(candidates), NUM_PERM)
+    target = np.frombuffer(bytes(target), dtype=SIGNATURE_DTYPE)
+
+    scores = (matrix == target).mean(axis=1)
+    if len(scores) > limit:
+        top = np.argpartition(-scores, limit)[:limit]
+    else:
+        top = np.arange(len(scores))
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return [(int(ids[i]), round(float(scores[i]), 4)) for i in top if scores[i] > 0]
+
+
+def similar_project_ids(project, limit=SIMILAR_RESULTS):
+    """Most similar published projects to ``project`` (cached)"""
+    from .models import ProjectSignature
+
+    key = _cache_key(project.pk)
+    results = cache.get(key)
+    if results is None:
+        stored = ProjectSignature.objects.filter(project=project).values_list('signature', flat=True).first()
+        target = stored if stored is not None else project_signature(project)
+        candidates = ProjectSignature.objects.filter(
+            project__status='published'
+        ).exclude(project=project).values_list('project_id', 'signature')
+        results = nearest(target, candidates.iterator(chunk_size=5000), SIMILAR_RESULTS)
+        cache.set(key, results, SIMILAR_CACHE_TIMEOUT)
+    return results[:limit]
@@ -0,0 +1,26 @@
+from celery import shared_task
+from .intake import process_outbox
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_intake_leads():
+    """
+    إدخال طلبات نموذج الاستقبال المنتظرة في صندوق الانتظار على دفعات
+    يمكن جدولتها دورياً كاحتياط إذا تعذر جدولتها عند الاستقبال
+    """
+    try:
+        totals = process_outbox()
+        logger.info(
+            f"Intake leads processed: {totals['accepted']} accepted, "
+            f"{totals['deduped']} deduped, {totals['failed']} failed"
+        )
+        return {'success': True, **totals}
+    except Exception as e:
+        logger.error(f'Intake lead processing failed: {str(e)}')
+        return {
+            'success': False,
+            'error': str(e)
+        }
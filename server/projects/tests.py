@@ -1,3 +1,544 @@
-from django.test import TestCase
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib import admin
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+from .models import (
+    Project, SkillStat, Category, ProjectImage, ProjectFavorite, ProjectSignature, IntakeLead, IntakeLeadOutbox
+)
+from .intake import process_outbox, counters as intake_counters
+from .search import attach_highlights, ranked_project_ids, search_projects
+from .geo import geo_cell
+from location_services.models import Country, City
+
+User = get_user_model()
+
+
+class SkillStatSignalTest(TestCase):
+    """Test SkillStat counters maintained by project signals"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+    
+    def create_project(self, skills, status='published'):
+        return Project.objects.create(
+            title='Kitchen remodel',
+            description='Full kitchen remodel',
+            client=self.client_user,
+            location='Austin, TX',
+            required_skills=skills,
+            status=status
+        )
+    
+    def count(self, skill):
+        stat = SkillStat.objects.filter(normalized=SkillStat.normalize(skill)).first()
+        return stat.active_projects_count if stat else 0
+    
+    def test_counts_active_projects_only(self):
+        """Draft projects do not count until published"""
+        project = self.create_project(['Plumbing', 'plumbing ', 'Tiling'], status='draft')
+        self.assertEqual(self.count('plumbing'), 0)
+        
+        project.status = 'published'
+        project.save()
+        self.assertEqual(self.count('plumbing'), 1)
+        self.assertEqual(self.count('tiling'), 1)
+    
+    def test_skill_changes_and_close(self):
+        """Editing skills and closing a project move the counters"""
+        project = self.create_project(['Plumbing', 'Tiling'])
+        self.create_project(['Plumbing'])
+        self.assertEqual(self.count('plumbing'), 2)
+        
+        project.required_skills = ['Plumbing', 'Electrical']
+        project.save()
+        self.assertEqual(self.count('tiling'), 0)
+        self.assertEqual(self.count('electrical'), 1)
+        
+        project.status = 'completed'
+        project.save()
+        self.assertEqual(self.count('plumbing'), 1)
+        self.assertEqual(self.count('electrical'), 0)
+    
+    def test_delete_and_trending(self):
+        """Deleting a project decrements and trending is ordered by count"""
+        project = self.create_project(['Plumbing', 'Tiling'])
+        self.create_project(['Plumbing'])
+        self.assertEqual(
+            list(SkillStat.trending(10).values_list('skill', flat=True)),
+            ['Plumbing', 'Tiling']
+        )
+        self.assertEqual([s.skill for s in SkillStat.suggest('plum')], ['Plumbing'])
+        # substring matches fill in behind prefix matches, for longer queries only
+        self.assertEqual([s.skill for s in SkillStat.suggest('umbing')], ['Plumbing'])
+        self.assertEqual(SkillStat.suggest('ng'), [])
+        
+        project.delete()
+        self.assertEqual(self.count('plumbing'), 1)
+        self.assertEqual(self.count('tiling'), 0)
+
+
+class ProjectSearchTest(TestCase):
+    """Test the full-text project index"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.in_description = Project.objects.create(
+            title='Bathroom refresh',
+            description='Replace the sink next to the kitchen',
+            client=self.client_user,
+            location='Dallas, TX',
+            status='published'
+        )
+        self.in_title = Project.objects.create(
+            title='Kitchen remodel',
+            description='Cabinets and counters',
+            client=self.client_user,
+            location='Austin, TX',
+            status='published'
+        )
+    
+    def test_title_matches_rank_first(self):
+        """Title hits outrank description hits, prefixes match"""
+        results = list(search_projects(Project.objects.all(), 'kitch'))
+        self.assertEqual(results, [self.in_title, self.in_description])
+    
+    def test_index_follows_saves_and_queryset(self):
+        """Edits are re-indexed and the base queryset still applies"""
+        self.in_title.title = 'Garage remodel'
+        self.in_title.save()
+        self.assertEqual(list(search_projects(Project.objects.all(), 'garage')), [self.in_title])
+        
+        self.in_description.status = 'draft'
+        self.in_description.save()
+        self.assertEqual(list(search_projects(Project.objects.filter(status='published'), 'kitchen')), [])
+    
+    def test_highlights(self):
+        """Matches are wrapped in <mark> tags"""
+        projects = attach_highlights([self.in_title], 'kitchen')
+        self.assertEqual(projects[0].search_highlight['title'], '<mark>Kitchen</mark> remodel')
+    
+    def test_highlights_escape_project_text(self):
+        """Markup in a title is escaped; only the match markers become tags"""
+        self.in_title.title = '<img src=x onerror=alert(1)> Kitchen'
+        self.in_title.save()
+        projects = attach_highlights([self.in_title], 'kitchen')
+        self.assertEqual(
+            projects[0].search_highlight['title'],
+            '&lt;img src=x onerror=alert(1)&gt; <mark>Kitchen</mark>'
+        )
+    
+    def test_truncation_is_reported(self):
+        """Matches past the limit are cut off and say so"""
+        project_ids, truncated = ranked_project_ids(Project.objects.all(), 'kitchen', limit=1)
+        self.assertEqual(project_ids, [self.in_title.pk])
+        self.assertTrue(truncated)
+        self.assertFalse(ranked_project_ids(Project.objects.all(), 'kitchen', limit=2)[1])
+
+
+class ProjectListQueryCountTest(TestCase):
+    """The project list runs a fixed number of queries whatever the page size"""
+    
+    def setUp(self):
+        self.api_client = APIClient()
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.pro = User.objects.create_user(
+            username='pro',
+            email='pro@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.api_client.force_authenticate(self.pro)
+        self.categories = [
+            Category.objects.create(name=f'Category {i}', slug=f'category-{i}')
+            for i in range(3)
+        ]
+    
+    def create_projects(self, count):
+        for i in range(count):
+            project = Project.objects.create(
+                title=f'Project {i}',
+                description='Test project',
+                client=self.client_user,
+                category=self.categories[i % 3],
+                location='Austin, TX',
+                status='published'
+            )
+            ProjectImage.objects.create(project=project, image='projects/test.jpg', is_primary=True)
+            if i % 2:
+                ProjectFavorite.objects.create(user=self.pro, project=project)
+    
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.api_client.get(reverse('projects:project_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.data
+    
+    def test_query_count_is_constant(self):
+        self.create_projects(2)
+        small_count, _ = self.count_queries()
+        
+        self.create_projects(8)
+        large_count, data = self.count_queries()
+        
+        self.assertEqual(small_count, large_count)
+        self.assertLessEqual(large_count, 5)
+        
+        results = data['results'] if isinstance(data, dict) else data
+        favorited = [project['is_favorited'] for project in results]
+        self.assertIn(True, favorited)
+        self.assertIn(False, favorited)
+        category = results[0]['category']
+        self.assertEqual(
+            category['projects_count'],
+            Project.objects.filter(category__slug=category['slug'], status='published').count()
+        )
+        self.assertTrue(results[0]['primary_image'].endswith('projects/test.jpg'))
+
+
+class ProjectFacetTest(TestCase):
+    """Facet counts follow the active filters"""
+    
+    def setUp(self):
+        cache.clear()
+        self.api_client = APIClient()
+        client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.category = Category.objects.create(name='Plumbing', slug='plumbing')
+        other = Category.objects.create(name='Roofing', slug='roofing')
+        for i, (category, budget, remote) in enumerate([
+            (self.category, 500, True),
+            (self.category, 2500, False),
+            (other, 60000, False),
+        ]):
+            Project.objects.create(
+                title=f'Project {i}',
+                description='Test project',
+                client=client_user,
+                category=category,
+                location='Austin, TX',
+                budget_min=budget,
+                is_remote_allowed=remote,
+                status='published'
+            )
+    
+    def get_facets(self, **params):
+        response = self.api_client.get(reverse('projects:project_list'), {'facets': 'true', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['facets']
+    
+    def test_unfiltered_facets(self):
+        facets = self.get_facets()
+        self.assertEqual(
+            {row['value']: row['count'] for row in facets['category']},
+            {'plumbing': 2, 'roofing': 1}
+        )
+        self.assertEqual(
+            {row['value']: row['count'] for row in facets['budget']},
+            {'under_1k': 1, '1k_5k': 1, '50k_plus': 1}
+        )
+        self.assertEqual(facets['location'], [{'value': 'Austin, TX', 'label': 'Austin, TX', 'count': 3}])
+    
+    def test_filtered_facets(self):
+        facets = self.get_facets(category='plumbing')
+        self.assertEqual([row['count'] for row in facets['category']], [2])
+        self.assertEqual(
+            {row['value']: row['count'] for row in facets['remote']},
+            {True: 1, False: 1}
+        )
+    
+    def test_facets_are_optional(self):
+        response = self.api_client.get(reverse('projects:project_list'))
+        data = response.data
+        self.assertFalse(isinstance(data, dict) and 'facets' in data)
+
+
+class ProjectRadiusSearchTest(TestCase):
+    """Projects are geocoded on publish and filtered by distance"""
+    
+    def setUp(self):
+        cache.clear()
+        self.api_client = APIClient()
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        country = Country.objects.create(name='United States', code='USA', currency='USD')
+        City.objects.create(name='Austin', country=country, latitude=30.2672, longitude=-97.7431)
+        City.objects.create(name='Round Rock', country=country, latitude=30.5083, longitude=-97.6789)
+        City.objects.create(name='Dallas', country=country, latitude=32.7767, longitude=-96.7970)
+    
+    def create_project(self, location, status='published'):
+        return Project.objects.create(
+            title=f'Project in {location}',
+            description='Test project',
+            client=self.client_user,
+            location=location,
+            status=status
+        )
+    
+    def test_geocoded_on_publish(self):
+        draft = self.create_project('Austin, TX', status='draft')
+        self.assertIsNone(draft.geo_cell)
+        
+        draft.status = 'published'
+        draft.save(update_fields=['status'])
+        draft.refresh_from_db()
+        self.assertAlmostEqual(draft.latitude, 30.2672, places=3)
+        self.assertEqual(draft.geo_cell, geo_cell(30.2672, -97.7431))
+        
+        unknown = self.create_project('Somewhere else')
+        self.assertIsNone(unknown.geo_cell)
+    
+    def test_radius_filter_orders_by_distance(self):
+        self.create_project('Round Rock, TX')
+        self.create_project('Austin, TX')
+        self.create_project('Dallas, TX')
+        
+        response = self.api_client.get(
+            reverse('projects:project_list'),
+            {'lat': 30.27, 'lng': -97.74, 'radius_km': 50}
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(
+            [project['location'] for project in results],
+            ['Austin, TX', 'Round Rock, TX']
+        )
+        self.assertLess(results[0]['distance_km'], 1)
+    
+    def test_invalid_radius(self):
+        response = self.api_client.get(
+            reverse('projects:project_list'),
+            {'lat': 30.27, 'lng': -97.74, 'radius_km': 'far'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class SimilarProjectsTest(TestCase):
+    """Similar projects are ranked by signature overlap"""
+    
+    def setUp(self):
+        cache.clear()
+        self.api_client = APIClient()
+        client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        
+        def create(title, description, skills, status='published'):
+            return Project.objects.create(
+                title=title,
+                description=description,
+                client=client_user,
+                location='Austin, TX',
+                required_skills=skills,
+                status=status
+            )
+        
+        self.project = create('Kitchen sink plumbing repair', 'Leaking kitchen sink pipes', ['Plumbing'])
+        self.close = create('Bathroom sink plumbing', 'Replace leaking sink pipes', ['Plumbing'])
+        self.far = create('Roof shingle replacement', 'Storm damaged roof shingles', ['Roofing'])
+        create('Kitchen sink plumbing fix', 'Leaking kitchen sink pipes', ['Plumbing'], status='draft')
+    
+    def test_signature_stored_on_save(self):
+        self.assertTrue(ProjectSignature.objects.filter(project=self.project).exists())
+    
+    def test_similar_endpoint_ranks_published_projects(self):
+        response = self.api_client.get(reverse('projects:project_similar', kwargs={'slug': self.project.slug}))
+        self.assertEqual(response.status_code, 200)
+        
+        results = response.data['results']
+        self.assertEqual(results[0]['id'], self.close.id)
+        self.assertNotIn(self.project.id, [item['id'] for item in results])
+        scores = [item['similarity'] for item in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+    
+    def test_cached_lists_follow_edits_to_other_projects(self):
+        url = reverse('projects:project_similar', kwargs={'slug': self.project.slug})
+        self.assertIn(self.close.id, [item['id'] for item in self.api_client.get(url).data['results']])
+        
+        self.close.title = 'Roof shingle replacement'
+        self.close.description = 'Storm damaged roof shingles'
+        self.close.required_skills = ['Roofing']
+        self.close.save()
+        self.assertNotIn(self.close.id, [item['id'] for item in self.api_client.get(url).data['results']])
+
+
+class PublicFeedCacheTest(TestCase):
+    """Anonymous feed responses are cached until a project changes"""
+    
+    def setUp(self):
+        cache.clear()
+        self.api_client = APIClient()
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.create_project('First project')
+    
+    def create_project(self, title):
+        return Project.objects.create(
+            title=title,
+            description='Test project',
+            client=self.client_user,
+            location='Austin, TX',
+            status='published'
+        )
+    
+    def results(self, response):
+        data = response.data
+        return data['results'] if isinstance(data, dict) else data
+    
+    def test_cached_until_generation_bump(self):
+        url = reverse('projects:project_list')
+        first = self.api_client.get(url)
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+        
+        with CaptureQueriesContext(connection) as context:
+            second = self.api_client.get(url)
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(second['ETag'], first['ETag'])
+        
+        self.create_project('Second project')
+        third = self.api_client.get(url)
+        self.assertEqual(len(self.results(third)), 2)
+        self.assertNotEqual(third['ETag'], first['ETag'])
+    
+    def test_conditional_request_returns_304(self):
+        url = reverse('projects:project_stats')
+        first = self.api_client.get(url)
+        self.assertEqual(first.status_code, 200)
+        
+        revalidated = self.api_client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+    
+    def test_admin_publish_refreshes_feed(self):
+        draft = Project.objects.create(
+            title='Draft project',
+            description='Test project',
+            client=self.client_user,
+            location='Austin, TX',
+            required_skills=['Tiling'],
+            status='draft'
+        )
+        url = reverse('projects:project_list')
+        first = self.api_client.get(url)
+        
+        model_admin = admin.site._registry[Project]
+        with patch.object(model_admin, 'message_user'):
+            model_admin.mark_as_published(RequestFactory().post('/'), Project.objects.filter(pk=draft.pk))
+        
+        second = self.api_client.get(url)
+        self.assertEqual(len(self.results(second)), 2)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(SkillStat.objects.get(normalized='tiling').active_projects_count, 1)
+
+
+@patch('projects.tasks.process_intake_leads.apply_async')
+class IntakeLeadQueueTest(TestCase):
+    """Intake submissions are queued, then deduplicated and inserted in bulk"""
+    
+    def setUp(self):
+        cache.clear()
+        self.api_client = APIClient()
+    
+    def submit(self, email, phone):
+        return self.api_client.post(reverse('projects:intake_create'), {
+            'full_name': 'Jane Doe',
+            'email': email,
+            'phone': phone,
+            'consent': True
+        }, format='json')
+    
+    def test_submission_is_queued(self, apply_async):
+        response = self.submit('jane@example.com', '+1 (555) 010-0000')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(IntakeLeadOutbox.objects.count(), 1)
+        self.assertEqual(IntakeLead.objects.count(), 0)
+        apply_async.assert_called_once()
+        
+        self.assertEqual(self.submit('jane@example.com', '12').status_code, 400)
+    
+    def test_worker_dedupes_and_inserts(self, apply_async):
+        self.submit('jane@example.com', '+1 (555) 010-0000')
+        self.submit('JANE@example.com ', '555-010-1111')
+        self.submit('other@example.com', '5550100000')
+        self.submit('new@example.com', '555 010 2222')
+        
+        totals = process_outbox()
+        self.assertEqual(totals, {'accepted': 2, 'deduped': 2, 'failed': 0})
+        self.assertEqual(IntakeLeadOutbox.objects.count(), 0)
+        self.assertEqual(
+            set(IntakeLead.objects.values_list('normalized_email', flat=True)),
+            {'jane@example.com', 'new@example.com'}
+        )
+        
+        # A repeat inside the window is still a duplicate
+        self.submit('new@example.com', '5550103333')
+        self.assertEqual(process_outbox()['deduped'], 1)
+        self.assertEqual(intake_counters()['accepted'], 2)
+    
+    def test_lead_after_drain_is_scheduled(self, apply_async):
+        """A drain clears the schedule flag, so the next lead schedules a new drain"""
+        self.submit('jane@example.com', '5550100000')
+        self.submit('other@example.com', '5550101111')
+        self.assertEqual(apply_async.call_count, 1)
+        
+        process_outbox()
+        self.assertEqual(apply_async.call_count, 1)
+        self.submit('new@example.com', '5550102222')
+        self.assertEqual(apply_async.call_count, 2)
+    
+    def test_failing_entry_does_not_block_the_queue(self, apply_async):
+        """A batch that fails is retried entry by entry and the bad entry is dropped"""
+        self.submit('jane@example.com', '5550100000')
+        self.submit('bad@example.com', '5550101111')
+        self.submit('new@example.com', '5550102222')
+        
+        bulk_create = IntakeLead.objects.bulk_create
+        
+        def reject_bad(leads, **kwargs):
+            if any(lead.normalized_email == 'bad@example.com' for lead in leads):
+                raise IntegrityError('bad row')
+            return bulk_create(leads, **kwargs)
+        
+        with patch.object(IntakeLead.objects, 'bulk_create', side_effect=reject_bad):
+            totals = process_outbox()
+        self.assertEqual(totals, {'accepted': 2, 'deduped': 0, 'failed': 1})
+        self.assertEqual(IntakeLeadOutbox.objects.count(), 0)
+        self.assertEqual(
+            set(IntakeLead.objects.values_list('normalized_email', flat=True)),
+            {'jane@example.com', 'new@example.com'}
+        )
@@ -8,6 +8,7 @@ urlpatterns = [
     path('', views.ProjectListView.as_view(), name='project_list'),
     path('create/', views.ProjectCreateView.as_view(), name='project_create'),
     path('intake/', views.IntakeLeadCreateView.as_view(), name='intake_create'),
+    path('intake/stats/', views.intake_lead_stats, name='intake_stats'),
     path('my/', views.MyProjectsView.as_view(), name='my_projects'),
     path('search/', views.project_search, name='project_search'),
     path('stats/', views.project_stats, name='project_stats'),
@@ -22,4 +23,5 @@ urlpatterns = [
     path('<slug:slug>/', views.ProjectDetailView.as_view(), name='project_detail'),
     path('<slug:slug>/images/', views.ProjectImageViewSet.as_view({'post': 'create'}), name='project_images'),
     path('<slug:slug>/files/', views.ProjectFileViewSet.as_view({'post': 'create'}), name='project_files'),
+    path('<slug:slug>/similar/', views.similar_projects, name='project_similar'),
 ]
\ No newline at end of file
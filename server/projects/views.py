@@ -5,10 +5,17 @@ from rest_framework.viewsets import ModelViewSet
 from django.db.models import Q, Count, Avg, Sum
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema
 
-from .models import Project, Category, ProjectImage, ProjectFile, ProjectView
+from .models import Project, Category, ProjectImage, ProjectFile, ProjectView, SkillStat
+from .search import ProjectSearchFilter, ProjectSearchHighlightMixin, search_projects, attach_highlights
+from .facets import requested_facets, cached_facets
+from .geo import ProjectRadiusFilter, parse_radius, within_radius
+from .similarity import similar_project_ids
+from .feed_cache import cached_feed_response
+from .intake import enqueue_lead, counters as intake_counters
 from .serializers import (
     ProjectListSerializer, 
     ProjectDetailSerializer, 
@@ -18,25 +25,27 @@ from .serializers import (
     ProjectFileSerializer,
     IntakeLeadSerializer
 )
+from dashboard.counters import counters, first_hit, add_row
 from notifications.views import send_project_created_notification, send_new_project_notifications_to_providers
 
 User = get_user_model()
 
 
-class ProjectListView(generics.ListAPIView):
+class ProjectListView(ProjectSearchHighlightMixin, generics.ListAPIView):
     """قائمة المشاريع مع فلترة وبحث"""
     serializer_class = ProjectListSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'description', 'location']
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ProjectRadiusFilter, ProjectSearchFilter]
     ordering_fields = ['created_at', 'published_at', 'budget_min', 'budget_max']
     ordering = ['-published_at']
     
     def get_queryset(self):
         """Get filtered queryset"""
-        queryset = Project.objects.filter(
-            status='published'
-        ).select_related('client', 'category')
+        return ProjectListSerializer.setup_eager_loading(self.get_base_queryset())
+    
+    def get_base_queryset(self):
+        """Published projects narrowed by the query parameters, without eager loading"""
+        queryset = Project.objects.filter(status='published')
         
         # Apply filters from query parameters
         category = self.request.query_params.get('category')
@@ -68,6 +77,32 @@ class ProjectListView(generics.ListAPIView):
             queryset = queryset.filter(requires_license=requires_license.lower() == 'true')
         
         return queryset
+    
+    def list(self, request, *args, **kwargs):
+        # Anonymous pages are served from the feed cache; is_favorited differs per user
+        return cached_feed_response(
+            request, 'projects', lambda: self.list_with_facets(request, *args, **kwargs), anonymous_only=True
+        )
+    
+    def list_with_facets(self, request, *args, **kwargs):
+        # Filtered once: the page and the facet counts share the search and radius lookups
+        filtered = self.filter_queryset(self.get_base_queryset())
+        queryset = ProjectListSerializer.setup_eager_loading(filtered)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        else:
+            response = Response(self.get_serializer(queryset, many=True).data)
+        
+        facets = requested_facets(request)
+        if facets:
+            # Facets count the whole filtered set, not just the current page
+            facet_counts = cached_facets(request, filtered, facets)
+            if isinstance(response.data, dict):
+                response.data['facets'] = facet_counts
+            else:
+                response.data = {'results': response.data, 'facets': facet_counts}
+        return response
 
 
 class ProjectDetailView(generics.RetrieveAPIView):
@@ -94,43 +129,70 @@ class ProjectDetailView(generics.RetrieveAPIView):
         # Get user agent
         user_agent = request.META.get('HTTP_USER_AGENT', '')
         
-        # Check if this user/IP has already viewed this project recently (within last hour)
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        recent_view = ProjectView.objects.filter(
-            project=instance,
-            ip_address=ip_address,
-            created_at__gte=timezone.now() - timedelta(hours=1)
-        )
-        
-        # If user is authenticated, also check by user
-        if request.user.is_authenticated:
-            recent_view = recent_view.filter(user=request.user)
-        
-        # Only create a new view record if no recent view exists
-        if not recent_view.exists():
-            ProjectView.objects.create(
+        # Count one view per user/IP per hour; the view row and the counter
+        # are buffered and written in batches instead of on every request
+        viewer = f'user-{request.user.pk}' if request.user.is_authenticated else f'ip-{ip_address}'
+        if first_hit('project', instance.pk, viewer, window=3600):
+            add_row(ProjectView(
                 project=instance,
                 user=request.user if request.user.is_authenticated else None,
                 ip_address=ip_address,
                 user_agent=user_agent
-            )
-            # Increment the views count on the project
+            ))
             instance.increment_views()
+        instance.views_count += counters.pending(Project, instance.pk, 'views_count')
         
         # Return the normal response
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@extend_schema(
+    operation_id="get_similar_projects",
+    summary="Similar Projects",
+    description="Open projects similar to this one by title, description and skills",
+    tags=["Projects"],
+)
+def similar_projects(request, slug):
+    """Similar open projects"""
+    project = get_object_or_404(Project, slug=slug)
+    
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 20)
+    except (TypeError, ValueError):
+        limit = 10
+    
+    # Cached (id, score) pairs; the status filter drops projects closed since
+    scores = dict(similar_project_ids(project, limit=limit))
+    projects = ProjectListSerializer.setup_eager_loading(
+        Project.objects.filter(pk__in=list(scores), status='published')
+    )
+    projects = sorted(projects, key=lambda item: -scores[item.pk])
+    
+    serializer = ProjectListSerializer(projects, many=True, context={'request': request})
+    results = serializer.data
+    for item, related in zip(results, projects):
+        item['similarity'] = scores[related.pk]
+    return Response({'results': results})
+
+
 class CategoryListView(generics.ListAPIView):
     """قائمة تصنيفات المشاريع"""
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-        return Category.objects.filter(is_active=True).order_by('order', 'name')
+        return Category.objects.filter(is_active=True).annotate(
+            active_projects_count=Count(
+                'projects',
+                filter=Q(projects__status__in=Project.ACTIVE_STATUSES)
+            )
+        ).order_by('order', 'name')
+    
+    def list(self, request, *args, **kwargs):
+        return cached_feed_response(request, 'categories', lambda: super(CategoryListView, self).list(request, *args, **kwargs))
 
 
 @api_view(['GET'])
@@ -143,7 +205,10 @@ class CategoryListView(generics.ListAPIView):
 )
 def project_stats(request):
     """Get project statistics"""
-    
+    return cached_feed_response(request, 'stats', _build_project_stats)
+
+
+def _build_project_stats():
     # Basic stats
     total_projects = Project.objects.filter(status__in=['published', 'in_progress']).count()
     active_projects = Project.objects.filter(status='published').count()
@@ -175,14 +240,7 @@ def project_stats(request):
         })
     
     # Trending skills (most common required skills)
-    all_projects = Project.objects.filter(status__in=['published', 'in_progress'])
-    skills_counter = {}
-    for project in all_projects:
-        for skill in project.required_skills:
-            skills_counter[skill] = skills_counter.get(skill, 0) + 1
-    
-    trending_skills = sorted(skills_counter.items(), key=lambda x: x[1], reverse=True)[:10]
-    trending_skills = [skill[0] for skill in trending_skills]
+    trending_skills = list(SkillStat.trending(10).values_list('skill', flat=True))
     
     # Location stats
     location_stats = Project.objects.filter(
@@ -219,34 +277,34 @@ def project_search(request):
             'results': [],
             'suggestions': []
         })
-
-
- 
-    projects = Project.objects.filter(
-        Q(title__icontains=query) | 
-        Q(description__icontains=query) |
-        Q(required_skills__overlap=[query]) |
-        Q(location__icontains=query),
-        status__in=['published', 'in_progress']
-    ).select_related('client', 'category')[:10]
+    
+    try:
+        page = max(int(request.data.get('page', 1)), 1)
+        page_size = min(max(int(request.data.get('page_size', 10)), 1), 50)
+    except (TypeError, ValueError):
+        page, page_size = 1, 10
+    
+    # Relevance ranked full-text search; one extra row tells us if there is a next page
+    active_projects = Project.objects.filter(status__in=Project.ACTIVE_STATUSES)
+    radius = parse_radius(request.data)
+    if radius:
+        active_projects = within_radius(active_projects, *radius, order_by_distance=False)
+    projects = list(ProjectListSerializer.setup_eager_loading(search_projects(
+        active_projects, query, limit=page_size + 1, offset=(page - 1) * page_size
+    )))
+    has_next = len(projects) > page_size
+    projects = attach_highlights(projects[:page_size], query)
     
     # Generate suggestions
     suggestions = []
     
     # Skill suggestions
-    all_projects = Project.objects.filter(status__in=['published', 'in_progress'])
-    matching_skills = set()
-    for project in all_projects:
-        for skill in project.required_skills:
-            if query.lower() in skill.lower():
-                matching_skills.add(skill)
-    
-    for skill in list(matching_skills)[:5]:
+    for skill in SkillStat.suggest(query, 5):
         suggestions.append({
-            'id': f'skill-{skill}',
+            'id': f'skill-{skill.skill}',
             'type': 'skill',
-            'text': skill,
-            'count': len([p for p in all_projects if skill in p.required_skills])
+            'text': skill.skill,
+            'count': skill.active_projects_count
         })
     
     # Location suggestions
@@ -273,11 +331,14 @@ def project_search(request):
             'count': category.projects.filter(status__in=['published', 'in_progress']).count()
         })
     
-    serializer = ProjectListSerializer(projects, many=True)
+    serializer = ProjectListSerializer(projects, many=True, context={'request': request})
     
     return Response({
         'results': serializer.data,
-        'suggestions': suggestions
+        'suggestions': suggestions,
+        'page': page,
+        'page_size': page_size,
+        'has_next': has_next
     })
 
 
@@ -287,13 +348,22 @@ class IntakeLeadCreateView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
 
     def create(self, request, *args, **kwargs):
+        # Field checks only (no queries) so the form can show errors; the
+        # submission itself is queued and inserted in bulk by the intake worker
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+        entry = enqueue_lead(dict(serializer.validated_data))
         return Response({
             'message': 'Your request has been received successfully',
-            'lead_id': serializer.instance.id
-        }, status=status.HTTP_201_CREATED)
+            'reference': entry.id
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def intake_lead_stats(request):
+    """Intake queue counters"""
+    return Response(intake_counters())
 
 
 class ProjectCreateView(generics.CreateAPIView):
@@ -355,12 +425,11 @@ class ProjectCreateView(generics.CreateAPIView):
             )
 
 
-class MyProjectsView(generics.ListAPIView):
+class MyProjectsView(ProjectSearchHighlightMixin, generics.ListAPIView):
     """عرض مشاريع المستخدم الحالي"""
     serializer_class = ProjectListSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'description', 'location']
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ProjectSearchFilter]
     ordering_fields = ['created_at', 'published_at', 'deadline', 'budget_min', 'budget_max']
     ordering = ['-created_at']
     
@@ -370,14 +439,12 @@ class MyProjectsView(generics.ListAPIView):
         
         if user.user_type == 'client':
             # للعملاء: إرجاع المشاريع التي نشروها
-            queryset = Project.objects.filter(
-                client=user
-            ).select_related('client', 'category', 'assigned_professional')
+            queryset = Project.objects.filter(client=user)
         else:
             # للمهنيين: إرجاع المشاريع المكلفين بها
-            queryset = Project.objects.filter(
-                assigned_professional=user
-            ).select_related('client', 'category', 'assigned_professional')
+            queryset = Project.objects.filter(assigned_professional=user)
+        
+        queryset = ProjectListSerializer.setup_eager_loading(queryset)
         
         # Add status filter
         status = self.request.query_params.get('status')
@@ -405,8 +472,7 @@ class PublicProfessionalProjectsView(generics.ListAPIView):
     """Public view of professional's completed projects"""
     serializer_class = ProjectListSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'description', 'location']
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ProjectSearchFilter]
     ordering_fields = ['created_at', 'published_at', 'deadline']
     ordering = ['-created_at']
     
@@ -422,10 +488,10 @@ class PublicProfessionalProjectsView(generics.ListAPIView):
             )
             
             # Return only completed projects for public viewing
-            queryset = Project.objects.filter(
+            queryset = ProjectListSerializer.setup_eager_loading(Project.objects.filter(
                 assigned_professional=professional,
                 status='completed'
-            ).select_related('client', 'category', 'assigned_professional')
+            ))
             
             return queryset
             
@@ -5,3 +5,10 @@ class ProposalsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'proposals'
     verbose_name = 'العروض والمقترحات'
+    
+    def ready(self):
+        """
+        Called when the app is ready.
+        Import signals here to ensure they are registered.
+        """
+        import proposals.signals  # noqa: F401
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proposals', '0003_proposal_contract'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='proposal',
+            index=models.Index(fields=['project', 'created_at'], name='proposals_project_c4ac64_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proposal',
+            index=models.Index(fields=['created_at', 'id'], name='proposals_created_bfb846_idx'),
+        ),
+    ]
@@ -184,6 +184,8 @@ class Proposal(models.Model):
             models.Index(fields=['status', 'created_at']),
             models.Index(fields=['is_featured', 'created_at']),
             models.Index(fields=['amount']),
+            models.Index(fields=['project', 'created_at']),
+            models.Index(fields=['created_at', 'id']),
         ]
         unique_together = ['project', 'professional']
     
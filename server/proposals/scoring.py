@@ -0,0 +1,152 @@
+"""
+Side-by-side ranking of a project's proposals for the client.
+
+Every proposal is scored on five criteria, each normalised to 0..1 across the
+proposals being compared (1 is best):
+
+* price     - cheaper is better, penalised when above the project's budget
+* timeline  - shorter is better (parsed from free text such as "2-3 weeks")
+* rating    - the professional's ``rating_average`` out of 5
+* completion - ``professional_completion_rate`` out of 100
+* response  - quoted response time, else how long after publishing the bid came
+
+Missing values score a neutral 0.5. The whole matrix is built once and scored
+with a single weighted dot product; results are cached per project until one
+of its proposals changes (see signals.py).
+"""
+import re
+
+import numpy as np
+from django.core.cache import cache
+
+WEIGHTS = {
+    'price': 0.35,
+    'timeline': 0.2,
+    'rating': 0.2,
+    'completion': 0.15,
+    'response': 0.1,
+}
+CRITERIA = list(WEIGHTS)
+
+COMPARE_CACHE_TIMEOUT = 60 * 60
+
+# Statuses still worth comparing
+COMPARABLE_STATUSES = ['pending', 'accepted']
+
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(?:\s*(?:-|to)\s*(\d+(?:\.\d+)?))?\s*(hour|hr|day|week|wk|month|year)', re.I)
+_UNIT_HOURS = {'hour': 1, 'hr': 1, 'day': 24, 'week': 24 * 7, 'wk': 24 * 7, 'month': 24 * 30, 'year': 24 * 365}
+
+
+def duration_hours(text):
+    """Hours described by free text like "2-3 weeks" or "within an hour" (midpoint of ranges)"""
+    if not text:
+        return np.nan
+    text = str(text).lower()
+    match = _DURATION_RE.search(text)
+    if match:
+        low = float(match.group(1))
+        high = float(match.group(2)) if match.group(2) else low
+        return (low + high) / 2 * _UNIT_HOURS[match.group(3).lower()]
+    for unit, hours in _UNIT_HOURS.items():
+        if re.search(rf'\b(an?|one)\s+{unit}', text):
+            return float(hours)
+    return np.nan
+
+
+def _lower_is_better(column):
+    """Min-max normalise so the smallest value scores 1"""
+    valid = ~np.isnan(column)
+    if not valid.any():
+        return column
+    low, high = column[valid].min(), column[valid].max()
+    if high == low:
+        return np.where(valid, 1.0, np.nan)
+    return (high - column) / (high - low)
+
+
+def _cache_key(project_id):
+    return f'proposal-compare:{project_id}'
+
+
+def invalidate(project_id):
+    cache.delete(_cache_key(project_id))
+
+
+def feature_matrix(project, proposals):
+    """(n, len(CRITERIA)) float matrix of raw criteria; NaN where unknown"""
+    budget_max = float(project.budget_max or project.budget_min or 0) or np.nan
+    published_at = project.published_at
+
+    rows = []
+    for proposal in proposals:
+        response_hours = duration_hours(proposal.response_time)
+        if np.isnan(response_hours) and published_at and proposal.created_at:
+            response_hours = max((proposal.created_at - published_at).total_seconds() / 3600, 0)
+        rating = proposal.professional.rating_average
+        completion = proposal.professional_completion_rate
+        rows.append([
+            float(proposal.amount),
+            duration_hours(proposal.timeline),
+            float(rating) if rating else np.nan,
+            float(completion) if completion is not None else np.nan,
+            response_hours,
+        ])
+    matrix = np.array(rows, dtype=float).reshape(len(rows), len(CRITERIA))
+    return matrix, budget_max
+
+
+def score_matrix(matrix, budget_max):
+    """Normalised criteria and weighted totals for a raw feature matrix"""
+    amounts = matrix[:, 0]
+    price = _lower_is_better(amounts.copy())
+    if not np.isnan(budget_max):
+        # Bids over budget lose score in proportion to the overrun
+        price = price * np.clip(budget_max / amounts, 0, 1)
+    normalized = np.column_stack([
+        price,
+        _lower_is_better(matrix[:, 1]),
+        np.clip(matrix[:, 2] / 5, 0, 1),
+        np.clip(matrix[:, 3] / 100, 0, 1),
+        _lower_is_better(matrix[:, 4]),
+    ])
+    normalized = np.where(np.isnan(normalized), 0.5, normalized)
+    weights = np.array([WEIGHTS[name] for name in CRITERIA])
+    return normalized, normalized @ weights
+
+
+def compare_proposals(project):
+    """
+    [{'proposal_id', 'score', 'rank', 'breakdown'}] best first (cached).
+    """
+    from .models import Proposal
+
+    key = _cache_key(project.pk)
+    ranking = cache.get(key)
+    if ranking is not None:
+        return ranking
+
+    proposals = list(
+        Proposal.objects.filter(project=project, status__in=COMPARABLE_STATUSES)
+        .select_related('professional')
+        .only(
+            'id', 'professional', 'amount', 'timeline', 'response_time', 'created_at',
+            'professional_completion_rate', 'professional__rating_average'
+        )
+    )
+    ranking = []
+    if proposals:
+        matrix, budget_max = feature_matrix(project, proposals)
+        normalized, totals = score_matrix(matrix, budget_max)
+        order = np.argsort(-totals, kind='stable')
+        for rank, index in enumerate(order, start=1):
+            ranking.append({
+                'proposal_id': str(proposals[index].pk),
+                'score': round(float(totals[index]) * 100, 1),
+                'rank': rank,
+                'breakdown': {
+                    name: round(float(value) * 100, 1)
+                    for name, value in zip(CRITERIA, normalized[index])
+                },
+            })
+    cache.set(key, ranking, COMPARE_CACHE_TIMEOUT)
+    return ranking
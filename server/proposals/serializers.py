@@ -1,5 +1,9 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from .models import Proposal, ProposalMilestone, ProposalAttachment, ProposalView
 from contracts.models import Contract
 
@@ -29,6 +33,32 @@ class UserBasicSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+def _subquery_count(model):
+    rows = model.objects.filter(proposal=OuterRef('pk')).order_by().values('proposal')
+    return Coalesce(
+        Subquery(rows.annotate(count=Count('pk')).values('count')[:1], output_field=IntegerField()),
+        0
+    )
+
+
+def with_counts(queryset, milestones=False):
+    """Annotate views_count (and milestone count/total) as correlated subqueries"""
+    queryset = queryset.annotate(views_count=_subquery_count(ProposalView))
+    if milestones:
+        totals = ProposalMilestone.objects.filter(
+            proposal=OuterRef('pk')
+        ).order_by().values('proposal').annotate(total=Sum('amount')).values('total')[:1]
+        queryset = queryset.annotate(
+            milestones_count=_subquery_count(ProposalMilestone),
+            milestones_total=Coalesce(
+                Subquery(totals, output_field=DecimalField(max_digits=12, decimal_places=2)),
+                Decimal('0'),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+        )
+    return queryset
+
+
 class ProposalMilestoneSerializer(serializers.ModelSerializer):
     """سيريالايزر للمعالم"""
     
@@ -78,13 +108,26 @@ class ProposalListSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = fields
     
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Related rows and per-proposal counts the list needs, without per-row queries"""
+        return with_counts(queryset.select_related(
+            'professional', 'project', 'contract'
+        ), milestones=True)
+    
     def get_milestones_count(self, obj):
+        if hasattr(obj, 'milestones_count'):
+            return obj.milestones_count
         return obj.milestones.count()
     
     def get_milestones_total(self, obj):
+        if hasattr(obj, 'milestones_total'):
+            return obj.milestones_total
         return sum(milestone.amount for milestone in obj.milestones.all())
     
     def get_views_count(self, obj):
+        if hasattr(obj, 'views_count'):
+            return obj.views_count
         return obj.views.count()
     
     def get_can_be_accepted(self, obj):
@@ -125,7 +168,15 @@ class ProposalDetailSerializer(serializers.ModelSerializer):
             'can_be_accepted', 'can_be_rejected', 'can_be_withdrawn'
         ]
     
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return with_counts(queryset.select_related(
+            'professional', 'project', 'contract'
+        ).prefetch_related('milestones', 'attachments_files'))
+    
     def get_views_count(self, obj):
+        if hasattr(obj, 'views_count'):
+            return obj.views_count
         return obj.views.count()
     
     def get_can_be_accepted(self, obj):
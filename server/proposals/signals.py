@@ -0,0 +1,14 @@
+"""
+Drop the cached proposal comparison of a project whenever one of its proposals changes.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Proposal
+from .scoring import invalidate
+
+
+@receiver(post_save, sender=Proposal)
+@receiver(post_delete, sender=Proposal)
+def invalidate_comparison(sender, instance, **kwargs):
+    invalidate(instance.project_id)
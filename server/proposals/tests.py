@@ -1,3 +1,101 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from projects.models import Project
+from .models import Proposal, ProposalMilestone, ProposalView
+
+User = get_user_model()
+
 
-# Create your tests here.
+class ProposalCompareTest(TestCase):
+    """Proposal lists use annotated counts and the compare view ranks bids"""
+    
+    def setUp(self):
+        cache.clear()
+        self.api_client = APIClient()
+        self.client_user = User.objects.create_user(
+            username='client',
+            email='client@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.project = Project.objects.create(
+            title='Kitchen remodel',
+            description='Full kitchen remodel',
+            client=self.client_user,
+            location='Austin, TX',
+            budget_min=Decimal('4000'),
+            budget_max=Decimal('5000'),
+            status='published'
+        )
+        self.proposals = []
+        for i, (amount, timeline, rating) in enumerate([
+            ('4500', '2-3 weeks', '4.9'),
+            ('7000', '2 months', '3.0'),
+            ('4800', '3 weeks', '4.5'),
+        ]):
+            pro = User.objects.create_user(
+                username=f'pro{i}',
+                email=f'pro{i}@example.com',
+                password='testpass123',
+                user_type='home_pro',
+                rating_average=Decimal(rating)
+            )
+            proposal = Proposal.objects.create(
+                project=self.project,
+                professional=pro,
+                cover_letter='I can do this',
+                amount=Decimal(amount),
+                timeline=timeline,
+                professional_completion_rate=Decimal('90')
+            )
+            ProposalMilestone.objects.create(proposal=proposal, title='Start', amount=Decimal('100'), order=1)
+            ProposalMilestone.objects.create(proposal=proposal, title='Finish', amount=Decimal('200'), order=2)
+            ProposalView.objects.create(proposal=proposal, viewer=self.client_user)
+            self.proposals.append(proposal)
+    
+    def test_list_counts_without_per_row_queries(self):
+        url = reverse('project-proposals', kwargs={'project_id': self.project.id})
+        with CaptureQueriesContext(connection) as context:
+            response = self.api_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        
+        results = response.data['results']
+        self.assertEqual(len(results), 3)
+        for item in results:
+            self.assertEqual(item['milestones_count'], 2)
+            self.assertEqual(item['milestones_total'], Decimal('300'))
+            self.assertEqual(item['views_count'], 1)
+        # The page and its total count; nothing per milestone or view
+        self.assertLessEqual(len(context.captured_queries), 3)
+    
+    def test_bad_cursor_is_a_400(self):
+        for url in (reverse('proposal-list'), reverse('project-proposals', kwargs={'project_id': self.project.id})):
+            response = self.api_client.get(url, {'cursor': 'not-a-cursor'})
+            self.assertEqual(response.status_code, 400)
+    
+    def test_compare_ranks_and_invalidates(self):
+        self.api_client.force_authenticate(self.client_user)
+        url = reverse('project-proposals-compare', kwargs={'project_id': self.project.id})
+        
+        ranked = [item['proposal_id'] for item in self.api_client.get(url).data['results']]
+        self.assertEqual(ranked[0], str(self.proposals[0].id))
+        self.assertEqual(ranked[-1], str(self.proposals[1].id))
+        
+        self.proposals[1].amount = Decimal('3000')
+        self.proposals[1].timeline = '1 week'
+        self.proposals[1].save()
+        ranked = [item['proposal_id'] for item in self.api_client.get(url).data['results']]
+        self.assertEqual(ranked[0], str(self.proposals[1].id))
+    
+    def test_compare_is_owner_only(self):
+        self.api_client.force_authenticate(self.proposals[0].professional)
+        url = reverse('project-proposals-compare', kwargs={'project_id': self.project.id})
+        self.assertEqual(self.api_client.get(url).status_code, 403)
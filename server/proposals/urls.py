@@ -2,7 +2,8 @@ from django.urls import path
 from .views import (
     proposal_list, project_proposals, create_proposal,
     proposal_detail, accept_proposal, reject_proposal,
-    create_contract_from_proposal_custom, professional_proposals
+    create_contract_from_proposal_custom, professional_proposals,
+    compare_proposals
 )
 
 urlpatterns = [
@@ -16,5 +17,6 @@ urlpatterns = [
     
     # Project-specific proposals
     path('project/<int:project_id>/', project_proposals, name='project-proposals'),
+    path('project/<int:project_id>/compare/', compare_proposals, name='project-proposals-compare'),
     path('professional/', professional_proposals, name='professional-proposals'),
 ]
\ No newline at end of file
@@ -2,16 +2,21 @@ from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import APIException
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.db.models import Q
 from datetime import datetime, timedelta
-from .models import Proposal, ProposalMilestone
+from .models import Proposal, ProposalMilestone, ProposalView
 from .serializers import (
     ProposalListSerializer, ProposalDetailSerializer, 
     CreateProposalSerializer
 )
 from contracts.models import Contract, ContractMilestone
+from dashboard.counters import first_hit, add_row
+from common.pagination import KeysetPagination
+from projects.models import Project
+from .scoring import WEIGHTS, compare_proposals as rank_proposals
 
 
 @api_view(['GET'])
@@ -19,15 +24,15 @@ from contracts.models import Contract, ContractMilestone
 def proposal_list(request):
     """Get all proposals"""
     try:
-        proposals = Proposal.objects.all().select_related(
-            'professional', 'project'
-        ).prefetch_related('milestones')
-        
-        serializer = ProposalListSerializer(proposals, many=True)
-        return Response({
-            'count': proposals.count(),
-            'results': serializer.data
-        })
+        proposals = ProposalListSerializer.setup_eager_loading(Proposal.objects.all())
+        
+        paginator = KeysetPagination()
+        paginator.include_count = True
+        page = paginator.paginate_queryset(proposals, request)
+        serializer = ProposalListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    except APIException:
+        raise
     except Exception as e:
         return Response(
             {'error': str(e)}, 
@@ -40,16 +45,55 @@ def proposal_list(request):
 def project_proposals(request, project_id):
     """Get proposals for a specific project"""
     try:
-        proposals = Proposal.objects.filter(
-            project_id=project_id
-        ).select_related(
-            'professional', 'project'
-        ).prefetch_related('milestones')
+        proposals = ProposalListSerializer.setup_eager_loading(
+            Proposal.objects.filter(project_id=project_id)
+        )
+        
+        paginator = KeysetPagination()
+        paginator.include_count = True
+        page = paginator.paginate_queryset(proposals, request)
+        serializer = ProposalListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    except APIException:
+        raise
+    except Exception as e:
+        return Response(
+            {'error': str(e)}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def compare_proposals(request, project_id):
+    """Rank a project's proposals side by side (project owner only)"""
+    project = get_object_or_404(Project, id=project_id)
+    if project.client_id != request.user.id and not request.user.is_staff:
+        return Response(
+            {'error': 'Only the project owner can compare its proposals'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    try:
+        ranking = rank_proposals(project)
+        proposals = ProposalListSerializer.setup_eager_loading(
+            Proposal.objects.filter(id__in=[item['proposal_id'] for item in ranking])
+        )
+        serialized = {
+            item['id']: item
+            for item in ProposalListSerializer(proposals, many=True).data
+        }
+        
+        results = []
+        for item in ranking:
+            proposal = serialized.get(item['proposal_id'])
+            if proposal is not None:
+                results.append({**item, 'proposal': proposal})
         
-        serializer = ProposalListSerializer(proposals, many=True)
         return Response({
-            'count': proposals.count(),
-            'results': serializer.data
+            'project_id': project.id,
+            'weights': WEIGHTS,
+            'results': results
         })
     except Exception as e:
         return Response(
@@ -90,7 +134,21 @@ def create_proposal(request):
 def proposal_detail(request, proposal_id):
     """Get proposal details"""
     try:
-        proposal = get_object_or_404(Proposal, id=proposal_id)
+        proposal = get_object_or_404(
+            ProposalDetailSerializer.setup_eager_loading(Proposal.objects.all()),
+            id=proposal_id
+        )
+        
+        # Record the first view of each signed-in viewer other than the author (buffered)
+        user = request.user
+        if user.is_authenticated and user.pk != proposal.professional_id:
+            if first_hit('proposal', proposal.pk, user.pk, window=86400):
+                add_row(ProposalView(
+                    proposal=proposal,
+                    viewer=user,
+                    ip_address=request.META.get('REMOTE_ADDR')
+                ))
+        
         serializer = ProposalDetailSerializer(proposal)
         return Response(serializer.data)
     except Exception as e:
@@ -525,15 +583,11 @@ def professional_proposals(request):
             )
         
         # Get all proposals for this professional
-        proposals = Proposal.objects.filter(
-            professional=request.user
+        proposals = ProposalListSerializer.setup_eager_loading(
+            Proposal.objects.filter(professional=request.user)
         ).select_related(
-            'project', 
-            'project__client', 
+            'project__client',
             'project__category'
-        ).prefetch_related(
-            'milestones',
-            'attachments_files'
         ).order_by('-created_at')
         
         # Apply filters if provided
@@ -0,0 +1,78 @@
+"""
+Review report rows shared by ``review_report`` and background report jobs.
+"""
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Review
+
+PERIOD_DAYS = {'week': 7, 'month': 30, 'quarter': 90, 'year': 365}
+
+BASE_COLUMNS = [
+    'review_id', 'created_at', 'reviewer', 'reviewee', 'project', 'review_type',
+    'rating', 'would_recommend',
+]
+DETAIL_COLUMNS = [
+    'quality_rating', 'communication_rating', 'timeliness_rating', 'professionalism_rating',
+]
+
+
+def period_start(period, now=None):
+    now = now or timezone.now()
+    return now - timedelta(days=PERIOD_DAYS.get(period, PERIOD_DAYS['month']))
+
+
+def review_report_queryset(user, params):
+    """Reviews in the report period, limited to what ``user`` may see"""
+    queryset = Review.objects.filter(created_at__gte=period_start(params.get('period', 'month')))
+    if not user.is_staff:
+        queryset = queryset.filter(Q(is_public=True) | Q(reviewer=user) | Q(reviewee=user))
+
+    professional_id = params.get('professional_id')
+    if professional_id:
+        queryset = queryset.filter(reviewee_id=professional_id)
+    return queryset
+
+
+def review_report_columns(params):
+    columns = list(BASE_COLUMNS)
+    if params.get('include_detailed_ratings', True):
+        columns += DETAIL_COLUMNS
+    if params.get('include_comments', False):
+        columns.append('comment')
+    return columns
+
+
+def review_report_rows(reviews, params, chunk_size=2000):
+    """Yield one list per review in ``review_report_columns`` order"""
+    detailed = params.get('include_detailed_ratings', True)
+    comments = params.get('include_comments', False)
+    reviews = reviews.select_related('reviewer', 'reviewee', 'project').order_by('created_at', 'pk')
+
+    for review in reviews.iterator(chunk_size=chunk_size):
+        row = [
+            review.pk,
+            review.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            review.reviewer.get_full_name() or review.reviewer.username,
+            review.reviewee.get_full_name() or review.reviewee.username,
+            review.project.title if review.project else '',
+            review.review_type,
+            review.rating,
+            review.would_recommend,
+        ]
+        if detailed:
+            row += [
+                review.quality_rating, review.communication_rating,
+                review.timeliness_rating, review.professionalism_rating,
+            ]
+        if comments:
+            row.append(review.comment)
+        yield row
+
+
+def review_report_source(user, params):
+    """(columns, rows, total) for a background report job"""
+    reviews = review_report_queryset(user, params)
+    return review_report_columns(params), review_report_rows(reviews, params), reviews.count()
@@ -12,6 +12,7 @@ from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 from datetime import datetime, timedelta
 from .models import Review
+from .reports import period_start, review_report_queryset
 from contracts.models import Contract
 from .serializers import (
     ReviewSerializer, ReviewCreateSerializer, ReviewUpdateSerializer,
@@ -504,27 +505,13 @@ def review_report(request):
     if serializer.is_valid():
         data = serializer.validated_data
         period = data.get('period', 'month')
-        professional_id = data.get('professional_id')
-        
-        # Calculate date range
         now = timezone.now()
-        if period == 'week':
-            start_date = now - timedelta(days=7)
-        elif period == 'month':
-            start_date = now - timedelta(days=30)
-        elif period == 'quarter':
-            start_date = now - timedelta(days=90)
-        else:  # year
-            start_date = now - timedelta(days=365)
-        
-        # Base queryset
-        queryset = Review.objects.filter(created_at__gte=start_date)
-        
-        if professional_id:
-            queryset = queryset.filter(professional_id=professional_id)
+        start_date = period_start(period, now)
         
         # Generate report data
-        reviews = queryset.select_related('professional', 'client', 'project')
+        reviews = review_report_queryset(request.user, data).select_related(
+            'reviewer', 'reviewee', 'project'
+        )
         
         report_data = {
             'period': period,
@@ -4,7 +4,7 @@ from django.urls import reverse
 from django.utils.safestring import mark_safe
 from .models import (
     SubscriptionPlan, Subscription, SubscriptionUsage, 
-    SubscriptionPayment, SubscriptionFeature, PlanFeature
+    SubscriptionPayment, SubscriptionFeature, PlanFeature, StripeWebhookEvent
 )
 
 
@@ -421,4 +421,36 @@ class PlanFeatureAdmin(admin.ModelAdmin):
     def value_display(self, obj):
         """Display feature value"""
         return str(obj.value)
-    value_display.short_description = 'Value' 
\ No newline at end of file
+    value_display.short_description = 'Value'
+
+
+@admin.register(StripeWebhookEvent)
+class StripeWebhookEventAdmin(admin.ModelAdmin):
+    """
+    إدارة صندوق وارد أحداث Stripe
+    """
+    list_display = (
+        'event_id',
+        'event_type',
+        'ordering_key',
+        'status',
+        'attempts',
+        'stripe_created',
+        'processed_at',
+    )
+    
+    list_filter = (
+        'status',
+        'event_type',
+    )
+    
+    search_fields = (
+        'event_id',
+        'ordering_key',
+    )
+    
+    readonly_fields = (
+        'received_at',
+        'processed_at',
+    )
+ 
\ No newline at end of file
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscriptionpayment',
+            index=models.Index(fields=['status', 'created_at'], name='subscriptio_status_c8a072_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0002_subscriptionpayment_status_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True)),
+                ('event_type', models.CharField(max_length=100)),
+                ('ordering_key', models.CharField(blank=True, max_length=255)),
+                ('stripe_created', models.DateTimeField()),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processed', 'Processed'), ('ignored', 'Ignored'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Stripe Webhook Event',
+                'verbose_name_plural': 'Stripe Webhook Events',
+                'db_table': 'stripe_webhook_events',
+                'ordering': ['stripe_created', 'id'],
+                'indexes': [
+                    models.Index(fields=['status', 'stripe_created'], name='stripe_webh_status_8ab0aa_idx'),
+                    models.Index(fields=['ordering_key', 'status'], name='stripe_webh_orderin_d5cb8e_idx'),
+                ],
+            },
+        ),
+    ]
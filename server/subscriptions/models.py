@@ -205,6 +205,9 @@ class SubscriptionPayment(models.Model):
         verbose_name = 'Subscription Payment'
         verbose_name_plural = 'Subscription Payments'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.subscription.user.username} - ${self.amount} ({self.status})"
@@ -263,4 +266,46 @@ class PlanFeature(models.Model):
         unique_together = ['plan', 'feature']
     
     def __str__(self):
-        return f"{self.plan.name} - {self.feature.name}" 
\ No newline at end of file
+        return f"{self.plan.name} - {self.feature.name}"
+
+
+class StripeWebhookEvent(models.Model):
+    """
+    صندوق وارد أحداث Stripe
+    يحفظ الحدث كما وصل ويعالج لاحقاً بالترتيب لكل اشتراك
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    ]
+    
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    # Stripe subscription the event belongs to; events with the same key are processed in order
+    ordering_key = models.CharField(max_length=255, blank=True)
+    stripe_created = models.DateTimeField()
+    payload = models.JSONField(default=dict)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    # Timestamps
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'stripe_webhook_events'
+        verbose_name = 'Stripe Webhook Event'
+        verbose_name_plural = 'Stripe Webhook Events'
+        ordering = ['stripe_created', 'id']
+        indexes = [
+            models.Index(fields=['status', 'stripe_created']),
+            models.Index(fields=['ordering_key', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} ({self.status})"
+ 
\ No newline at end of file
@@ -190,6 +190,7 @@ class SubscriptionStatsSerializer(serializers.Serializer):
     # Revenue stats
     monthly_revenue = serializers.DecimalField(max_digits=15, decimal_places=2)
     total_revenue = serializers.DecimalField(max_digits=15, decimal_places=2)
+    mrr = serializers.DecimalField(max_digits=15, decimal_places=2)
     
     # User type breakdown
     home_pro_subscriptions = serializers.IntegerField()
@@ -0,0 +1,36 @@
+from celery import shared_task
+from django.conf import settings
+from .webhooks import process_events
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_stripe_webhooks():
+    """
+    معالجة أحداث Stripe المحفوظة في صندوق الوارد على دفعات
+    بترتيب وصولها من Stripe لكل اشتراك
+    وتعيد جدولة نفسها ما دامت هناك أحداث معلقة
+    """
+    try:
+        totals = process_events()
+        
+        logger.info(
+            f"Stripe webhooks: {totals['processed']} processed, {totals['failed']} failed "
+            f"in {totals['batches']} batches, {totals['pending']} pending"
+        )
+        
+        if totals['pending']:
+            # Continue right away after the batch limit, otherwise wait for retries
+            countdown = getattr(settings, 'STRIPE_WEBHOOK_RETRY_DELAY', 30) if totals['drained'] else 0
+            process_stripe_webhooks.apply_async(countdown=countdown)
+        
+        return {'success': True, **totals}
+        
+    except Exception as e:
+        logger.error(f'Stripe webhook processing failed: {str(e)}')
+        return {
+            'success': False,
+            'error': str(e)
+        }
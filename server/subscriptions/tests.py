@@ -1,9 +1,12 @@
+import json
+from unittest.mock import patch
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import SubscriptionPlan, Subscription, SubscriptionFeature, PlanFeature
+from . import webhooks
+from .models import SubscriptionPlan, Subscription, SubscriptionFeature, PlanFeature, SubscriptionPayment, StripeWebhookEvent
 from decimal import Decimal
 
 User = get_user_model()
@@ -231,4 +234,111 @@ class PlanFeatureTest(TestCase):
     def test_plan_feature_str_method(self):
         """Test plan feature string representation"""
         expected = "Home Pro Premium - Priority Support"
-        self.assertEqual(str(self.plan_feature), expected) 
\ No newline at end of file
+        self.assertEqual(str(self.plan_feature), expected)
+
+
+class StripeWebhookInboxTest(APITestCase):
+    """Webhooks are stored once, acknowledged, then processed in order"""
+    
+    def setUp(self):
+        user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        plan = SubscriptionPlan.objects.create(
+            name='Home Pro Basic',
+            user_type='home_pro',
+            plan_type='basic',
+            price=Decimal('150.00')
+        )
+        self.subscription = Subscription.objects.create(
+            user=user,
+            plan=plan,
+            status='trial',
+            stripe_subscription_id='sub_1'
+        )
+    
+    def invoice_event(self, event_id, event_type, created, invoice_id='in_1'):
+        return {
+            'id': event_id,
+            'type': event_type,
+            'created': created,
+            'data': {'object': {
+                'object': 'invoice',
+                'id': invoice_id,
+                'subscription': 'sub_1',
+                'amount_paid': 15000,
+                'amount_due': 15000,
+                'currency': 'usd',
+                'period_start': 1790000000,
+                'period_end': 1792600000,
+                'payment_intent': 'pi_1',
+            }},
+        }
+    
+    def post(self, event):
+        with patch('subscriptions.views.stripe.Webhook.construct_event', return_value=event):
+            return self.client.post(
+                reverse('subscriptions:stripe_webhook'),
+                data=json.dumps(event),
+                content_type='application/json',
+                HTTP_STRIPE_SIGNATURE='t=1,v1=test'
+            )
+    
+    def test_redelivered_events_are_processed_once(self):
+        failed = self.invoice_event('evt_1', 'invoice.payment_failed', 100)
+        succeeded = self.invoice_event('evt_2', 'invoice.payment_succeeded', 200)
+        for event in (succeeded, failed, succeeded, succeeded):
+            self.assertEqual(self.post(event).status_code, 200)
+        
+        # Acknowledged without touching subscriptions
+        self.assertEqual(StripeWebhookEvent.objects.count(), 2)
+        self.assertFalse(SubscriptionPayment.objects.exists())
+        
+        self.assertEqual(webhooks.process_events()['processed'], 2)
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.status, 'active')  # failure first, then success
+        self.assertEqual(
+            sorted(SubscriptionPayment.objects.values_list('status', flat=True)), ['failed', 'succeeded']
+        )
+        
+        self.post(succeeded)
+        self.assertEqual(webhooks.process_events()['processed'], 0)
+        self.assertEqual(SubscriptionPayment.objects.count(), 2)
+    
+    def test_failed_event_holds_back_its_subscription(self):
+        webhooks.ingest(self.invoice_event('evt_1', 'invoice.payment_failed', 100))
+        webhooks.ingest(self.invoice_event('evt_2', 'invoice.payment_succeeded', 200))
+        
+        def boom(invoice):
+            raise ValueError('boom')
+        
+        with patch.dict(webhooks.HANDLERS, {'invoice.payment_failed': boom}):
+            totals = webhooks.process_events()
+        self.assertEqual((totals['processed'], totals['failed']), (0, 1))
+        self.assertEqual(StripeWebhookEvent.objects.get(event_id='evt_2').status, 'pending')
+        
+        totals = webhooks.process_events()
+        self.assertEqual(totals['processed'], 2)
+        self.assertEqual(StripeWebhookEvent.objects.get(event_id='evt_1').attempts, 2)
+    
+    def test_blocked_batch_does_not_end_the_run(self):
+        """A batch left empty by held-back events does not stop later subscriptions"""
+        webhooks.ingest(self.invoice_event('evt_1', 'invoice.payment_failed', 100))
+        webhooks.ingest(self.invoice_event('evt_2', 'invoice.payment_succeeded', 200))
+        other = self.invoice_event('evt_3', 'invoice.payment_succeeded', 300, invoice_id='in_2')
+        other['data']['object']['subscription'] = 'sub_2'
+        webhooks.ingest(other)
+        
+        def boom(invoice):
+            raise ValueError('boom')
+        
+        with patch.dict(webhooks.HANDLERS, {'invoice.payment_failed': boom}):
+            totals = webhooks.process_events(batch_size=1)
+        self.assertEqual((totals['processed'], totals['failed']), (1, 1))
+        self.assertEqual(StripeWebhookEvent.objects.get(event_id='evt_3').status, 'processed')
+        self.assertEqual(totals['pending'], 2)
+        self.assertTrue(totals['drained'])
+ 
\ No newline at end of file
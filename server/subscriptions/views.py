@@ -2,20 +2,21 @@ from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q, Count, Sum
+from django.db.models import Q, Count
 from django.utils import timezone
 from django.conf import settings
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
-from datetime import datetime, timedelta
+from datetime import timedelta
 import stripe
 import json
 from .models import (
     SubscriptionPlan, Subscription, SubscriptionUsage, 
     SubscriptionPayment, SubscriptionFeature, PlanFeature
 )
+from . import webhooks
 from .serializers import (
     SubscriptionPlanSerializer, SubscriptionSerializer, SubscriptionCreateSerializer,
     SubscriptionUpdateSerializer, SubscriptionUsageSerializer, SubscriptionPaymentSerializer,
@@ -324,12 +325,15 @@ class StripeWebhookView(APIView):
     permission_classes = []
     
     def post(self, request):
-        """Handle Stripe webhooks"""
+        """
+        Verify and store the event, then acknowledge it right away.
+        The inbox worker (subscriptions.webhooks) does the actual processing.
+        """
         payload = request.body
         sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
         
         try:
-            event = stripe.Webhook.construct_event(
+            stripe.Webhook.construct_event(
                 payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
             )
         except ValueError:
@@ -337,100 +341,9 @@ class StripeWebhookView(APIView):
         except stripe.error.SignatureVerificationError:
             return Response({'error': 'Invalid signature'}, status=400)
         
-        # Handle the event
-        if event['type'] == 'invoice.payment_succeeded':
-            self.handle_payment_succeeded(event['data']['object'])
-        elif event['type'] == 'invoice.payment_failed':
-            self.handle_payment_failed(event['data']['object'])
-        elif event['type'] == 'customer.subscription.updated':
-            self.handle_subscription_updated(event['data']['object'])
-        elif event['type'] == 'customer.subscription.deleted':
-            self.handle_subscription_deleted(event['data']['object'])
+        webhooks.ingest(json.loads(payload))
         
         return Response({'status': 'success'})
-    
-    def handle_payment_succeeded(self, invoice):
-        """Handle successful payment"""
-        subscription_id = invoice['subscription']
-        try:
-            subscription = Subscription.objects.get(stripe_subscription_id=subscription_id)
-            
-            # Create payment record
-            SubscriptionPayment.objects.create(
-                subscription=subscription,
-                amount=invoice['amount_paid'] / 100,  # Convert from cents
-                currency=invoice['currency'],
-                status='succeeded',
-                period_start=datetime.fromtimestamp(invoice['period_start']),
-                period_end=datetime.fromtimestamp(invoice['period_end']),
-                stripe_payment_intent_id=invoice['payment_intent'],
-                stripe_invoice_id=invoice['id'],
-                paid_at=timezone.now()
-            )
-            
-            # Update subscription status
-            subscription.status = 'active'
-            subscription.save()
-            
-        except Subscription.DoesNotExist:
-            pass
-    
-    def handle_payment_failed(self, invoice):
-        """Handle failed payment"""
-        subscription_id = invoice['subscription']
-        try:
-            subscription = Subscription.objects.get(stripe_subscription_id=subscription_id)
-            
-            # Create payment record
-            SubscriptionPayment.objects.create(
-                subscription=subscription,
-                amount=invoice['amount_due'] / 100,  # Convert from cents
-                currency=invoice['currency'],
-                status='failed',
-                period_start=datetime.fromtimestamp(invoice['period_start']),
-                period_end=datetime.fromtimestamp(invoice['period_end']),
-                stripe_invoice_id=invoice['id']
-            )
-            
-            # Update subscription status
-            subscription.status = 'past_due'
-            subscription.save()
-            
-        except Subscription.DoesNotExist:
-            pass
-    
-    def handle_subscription_updated(self, subscription_data):
-        """Handle subscription update"""
-        try:
-            subscription = Subscription.objects.get(
-                stripe_subscription_id=subscription_data['id']
-            )
-            
-            # Update subscription details
-            subscription.status = subscription_data['status']
-            subscription.current_period_start = datetime.fromtimestamp(
-                subscription_data['current_period_start']
-            )
-            subscription.current_period_end = datetime.fromtimestamp(
-                subscription_data['current_period_end']
-            )
-            subscription.save()
-            
-        except Subscription.DoesNotExist:
-            pass
-    
-    def handle_subscription_deleted(self, subscription_data):
-        """Handle subscription deletion"""
-        try:
-            subscription = Subscription.objects.get(
-                stripe_subscription_id=subscription_data['id']
-            )
-            subscription.status = 'cancelled'
-            subscription.ended_at = timezone.now()
-            subscription.save()
-            
-        except Subscription.DoesNotExist:
-            pass
 
 
 @api_view(['GET'])
@@ -452,16 +365,11 @@ def subscription_stats(request):
     cancelled_subscriptions = Subscription.objects.filter(status='cancelled').count()
     expired_subscriptions = Subscription.objects.filter(status='expired').count()
     
-    # Revenue stats
-    current_month = timezone.now().replace(day=1)
-    monthly_revenue = SubscriptionPayment.objects.filter(
-        created_at__gte=current_month,
-        status='succeeded'
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    total_revenue = SubscriptionPayment.objects.filter(
-        status='succeeded'
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    # Revenue stats from the daily platform rollups plus today's live delta
+    from payments.rollups import current_mrr, month_start, platform_totals
+    monthly_revenue = platform_totals(since=month_start())['subscription_revenue']
+    total_revenue = platform_totals()['subscription_revenue']
+    mrr = current_mrr()
     
     # User type breakdown
     user_type_stats = Subscription.objects.values('plan__user_type').annotate(
@@ -507,6 +415,7 @@ def subscription_stats(request):
         'expired_subscriptions': expired_subscriptions,
         'monthly_revenue': monthly_revenue,
         'total_revenue': total_revenue,
+        'mrr': mrr,
         'home_pro_subscriptions': home_pro_subscriptions,
         'crew_member_subscriptions': crew_member_subscriptions,
         'specialist_subscriptions': specialist_subscriptions,
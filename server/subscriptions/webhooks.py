@@ -0,0 +1,242 @@
+"""
+Stripe webhook inbox.
+
+``StripeWebhookView`` only verifies the signature and calls ``ingest``, which
+stores the raw event in StripeWebhookEvent with a single
+``INSERT ... ON CONFLICT DO NOTHING`` on the unique event id, so Stripe gets
+its 200 straight away and a redelivered event adds no rows.
+
+``process_events`` (run by the ``process_stripe_webhooks`` task) drains the
+inbox in batches. Each batch is locked with ``SELECT ... FOR UPDATE SKIP
+LOCKED``; events of one subscription (``ordering_key``) are handled in Stripe
+creation order, and a subscription whose earlier events are still pending in
+another worker's batch is left for the next run. Each event is handled in its
+own savepoint; a failing event is retried on later runs and holds back the
+later events of its subscription until it succeeds or runs out of attempts.
+
+The task queues another run while pending events remain (straight away when
+a run stopped at its batch limit, after STRIPE_WEBHOOK_RETRY_DELAY when only
+retries and blocked events are left), so nothing depends on a new webhook
+arriving to be picked up.
+"""
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import StripeWebhookEvent, Subscription, SubscriptionPayment
+
+logger = logging.getLogger(__name__)
+
+WAKE_KEY = 'stripe_webhooks:wake'
+
+
+# --- handlers -------------------------------------------------------------
+
+def handle_payment_succeeded(invoice):
+    """Handle successful payment"""
+    try:
+        subscription = Subscription.objects.get(stripe_subscription_id=invoice['subscription'])
+    except Subscription.DoesNotExist:
+        return
+
+    # One row per invoice outcome, however often it is delivered
+    SubscriptionPayment.objects.update_or_create(
+        subscription=subscription,
+        stripe_invoice_id=invoice['id'],
+        status='succeeded',
+        defaults={
+            'amount': invoice['amount_paid'] / 100,  # Convert from cents
+            'currency': invoice['currency'],
+            'period_start': datetime.fromtimestamp(invoice['period_start']),
+            'period_end': datetime.fromtimestamp(invoice['period_end']),
+            'stripe_payment_intent_id': invoice['payment_intent'] or '',
+            'paid_at': timezone.now(),
+        }
+    )
+
+    subscription.status = 'active'
+    subscription.save()
+
+
+def handle_payment_failed(invoice):
+    """Handle failed payment"""
+    try:
+        subscription = Subscription.objects.get(stripe_subscription_id=invoice['subscription'])
+    except Subscription.DoesNotExist:
+        return
+
+    SubscriptionPayment.objects.update_or_create(
+        subscription=subscription,
+        stripe_invoice_id=invoice['id'],
+        status='failed',
+        defaults={
+            'amount': invoice['amount_due'] / 100,  # Convert from cents
+            'currency': invoice['currency'],
+            'period_start': datetime.fromtimestamp(invoice['period_start']),
+            'period_end': datetime.fromtimestamp(invoice['period_end']),
+        }
+    )
+
+    subscription.status = 'past_due'
+    subscription.save()
+
+
+def handle_subscription_updated(subscription_data):
+    """Handle subscription update"""
+    try:
+        subscription = Subscription.objects.get(stripe_subscription_id=subscription_data['id'])
+    except Subscription.DoesNotExist:
+        return
+
+    subscription.status = subscription_data['status']
+    subscription.current_period_start = datetime.fromtimestamp(subscription_data['current_period_start'])
+    subscription.current_period_end = datetime.fromtimestamp(subscription_data['current_period_end'])
+    subscription.save()
+
+
+def handle_subscription_deleted(subscription_data):
+    """Handle subscription deletion"""
+    try:
+        subscription = Subscription.objects.get(stripe_subscription_id=subscription_data['id'])
+    except Subscription.DoesNotExist:
+        return
+
+    subscription.status = 'cancelled'
+    subscription.ended_at = timezone.now()
+    subscription.save()
+
+
+# event type -> handler of its data.object
+HANDLERS = {
+    'invoice.payment_succeeded': handle_payment_succeeded,
+    'invoice.payment_failed': handle_payment_failed,
+    'customer.subscription.updated': handle_subscription_updated,
+    'customer.subscription.deleted': handle_subscription_deleted,
+}
+
+
+# --- ingestion ------------------------------------------------------------
+
+def ordering_key(event):
+    """Stripe subscription id an event belongs to ('' if none)"""
+    obj = event['data']['object']
+    if obj.get('object') == 'subscription':
+        return obj.get('id') or ''
+    return obj.get('subscription') or ''
+
+
+def ingest(event):
+    """Store a verified event (the decoded request body) unless it is already in the inbox"""
+    StripeWebhookEvent.objects.bulk_create(
+        [
+            StripeWebhookEvent(
+                event_id=event['id'],
+                event_type=event['type'],
+                ordering_key=ordering_key(event),
+                stripe_created=datetime.fromtimestamp(event['created'], tz=dt_timezone.utc),
+                payload=event,
+                status='pending' if event['type'] in HANDLERS else 'ignored',
+            )
+        ],
+        ignore_conflicts=True,
+    )
+    if event['type'] in HANDLERS:
+        _wake_worker()
+
+
+def _wake_worker():
+    """Queue the worker, at most once per debounce window however many events arrive"""
+    from .tasks import process_stripe_webhooks
+
+    if cache.add(WAKE_KEY, True, timeout=getattr(settings, 'STRIPE_WEBHOOK_WAKE_DEBOUNCE', 2)):
+        transaction.on_commit(process_stripe_webhooks.delay)
+
+
+# --- processing -----------------------------------------------------------
+
+def _lock_batch(batch_size, attempted):
+    """(locked events, those of them that can be handled now)"""
+    pending = StripeWebhookEvent.objects.filter(status='pending')
+    batch = list(
+        pending.exclude(pk__in=attempted).order_by('stripe_created', 'id')
+        .select_for_update(skip_locked=True)[:batch_size]
+    )
+
+    # A subscription with an older pending event outside this batch is
+    # being handled by another worker; leave its events for the next run
+    oldest = {}
+    for event in batch:
+        oldest.setdefault(event.ordering_key, event)
+    blocked = {
+        key for key, first in oldest.items()
+        if key and pending.filter(
+            Q(stripe_created__lt=first.stripe_created) | Q(stripe_created=first.stripe_created, pk__lt=first.pk),
+            ordering_key=key,
+        ).exists()
+    }
+    return batch, [event for event in batch if event.ordering_key not in blocked]
+
+
+def _handle(event, max_attempts):
+    event.attempts += 1
+    try:
+        with transaction.atomic():
+            HANDLERS[event.event_type](event.payload['data']['object'])
+    except Exception as e:
+        logger.error(f'Stripe event {event.event_id} ({event.event_type}) failed: {str(e)}')
+        event.last_error = str(e)
+        if event.attempts >= max_attempts:
+            event.status = 'failed'
+            event.processed_at = timezone.now()
+        event.save(update_fields=['attempts', 'last_error', 'status', 'processed_at'])
+        return False
+
+    event.status = 'processed'
+    event.processed_at = timezone.now()
+    event.save(update_fields=['attempts', 'status', 'processed_at'])
+    return True
+
+
+def process_events(batch_size=None, max_batches=None):
+    """
+    Handle pending inbox events batch by batch; returns counts, ``pending``
+    (events still waiting) and ``drained`` (False if stopped by ``max_batches``)
+    """
+    batch_size = batch_size or getattr(settings, 'STRIPE_WEBHOOK_BATCH_SIZE', 100)
+    max_batches = max_batches or getattr(settings, 'STRIPE_WEBHOOK_MAX_BATCHES', 20)
+    max_attempts = getattr(settings, 'STRIPE_WEBHOOK_MAX_ATTEMPTS', 5)
+    totals = {'processed': 0, 'failed': 0, 'batches': 0, 'drained': False}
+    attempted = set()
+    # events arriving from now on need another wake-up
+    cache.delete(WAKE_KEY)
+
+    for _ in range(max_batches):
+        with transaction.atomic():
+            locked, batch = _lock_batch(batch_size, attempted)
+            if not locked:
+                totals['drained'] = True
+                break
+            # blocked or held events wait for the next run; look past them
+            attempted.update(event.pk for event in locked)
+
+            held = set()
+            for event in batch:
+                if event.ordering_key in held:
+                    continue
+                if _handle(event, max_attempts):
+                    totals['processed'] += 1
+                else:
+                    totals['failed'] += 1
+                    # keep this subscription's later events behind the failed one
+                    if event.ordering_key and event.status == 'pending':
+                        held.add(event.ordering_key)
+
+        totals['batches'] += 1
+
+    totals['pending'] = StripeWebhookEvent.objects.filter(status='pending').count()
+    return totals